@@ -81,6 +81,11 @@ CONFIG_GLOBALS_DIRNAME = "WikidPadGlobals"
 
 DEADBLOCKTIMEOUT = 1800
 
+# Seconds a read connection of the "readers" database access mode waits for
+# a lock of another connection before the read falls back to the main
+# connection
+READCONNECTIONTIMEOUT = 0.5
+
 
 # For use in isinstance(v, BYTETYPES)
 BYTETYPES = (bytes, bytearray) 
@@ -100,6 +105,10 @@ FormatTypes = Enumeration("FormatTypes", ["Default", "WikiWord",
 DATABLOCK_STOREHINT_INTERN = 0
 DATABLOCK_STOREHINT_EXTERN = 1
 
+# Attributes whose values are wiki words (they are changed when a word
+# is renamed)
+ATTRIBUTES_WITH_WIKIWORD_VALUES = ['template', 'parent', 'import_scripts']
+
 # Content was modified and isn't in sync with meta data
 WIKIWORDMETADATA_STATE_DIRTY = 0
 # Attributes were processed
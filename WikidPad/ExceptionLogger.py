@@ -73,7 +73,11 @@ def onException(typ, value, trace):
 
 def setLogDestDir(path):
     global EL
-    
+
+    if EL is None:
+        # Logger not started (batch mode writes errors to stderr only)
+        return
+
     try:
         logPath = os.path.join(path, "WikidPad_Error.log")
         if os.path.exists(logPath) and os.stat(logPath).st_size > FILE_CLEAR_LIMIT:
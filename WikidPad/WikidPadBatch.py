@@ -0,0 +1,47 @@
+"""
+Entry point to run actions (rebuild, export, search, stats) on a wiki
+without GUI. See lib/pwiki/BatchAction.py for the options.
+"""
+
+import time
+
+# Measure startup time from here on (without the interpreter startup)
+_startTime = time.perf_counter()
+
+import sys, os, os.path
+
+if not hasattr(sys, 'frozen'):
+    origin = os.path.dirname(os.path.abspath(__file__))
+
+    sys.path.insert(0, origin)
+    sys.path.insert(1, os.path.join(origin, "lib"))
+
+    del origin
+
+import builtins
+
+# Dummies for localization
+def N_(s):
+    return s
+builtins.N_ = N_
+del N_
+
+builtins._ = N_
+
+
+# wx must not be loaded in batch mode. Plugins importing it are skipped
+# by the plugin manager, any other import of wx fails loudly
+sys.modules["wx"] = None
+
+
+def main(argv=None):
+    from pwiki import BatchAction
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    return BatchAction.main(argv, _startTime)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,14 @@
 
 
 
+import time
+
+# Measure startup time from here on (without the interpreter startup),
+# reported with --report-resources like in WikidPadBatch
+_startTime = time.perf_counter()
+
 import sys, os, traceback, os.path, glob, shutil, imp, warnings, configparser
+import multiprocessing
 
 if not hasattr(sys, 'frozen'):
     origin = __spec__.origin
@@ -230,8 +237,11 @@ exception = None
 
 
 def main():
+    # Needed for worker processes of the rebuild engine in frozen executables
+    multiprocessing.freeze_support()
+
     try:
-        app = App(0)
+        app = App(0, startTime=_startTime)
         app.MainLoop()
         del app
     #     srePersistent.saveCodeCache()
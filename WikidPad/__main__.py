@@ -1,6 +1,12 @@
 #!python3.4
 
-from . import WikidPadStarter
+import sys
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        # Headless actions, must not import WikidPadStarter which loads wx
+        from . import WikidPadBatch
+        sys.exit(WikidPadBatch.main(sys.argv[2:]))
+
+    from . import WikidPadStarter
     WikidPadStarter.main()
@@ -9,14 +9,13 @@ import shutil
 
 import pwiki.urllib_red as urllib
 
-import wx
 from pwiki.rtlibRepl import minidom
 
-from pwiki.wxHelper import XrcControls, GUI_ID, wxKeyFunctionSink
-
 import Consts
+from pwiki.AppContext import GetApp
+from pwiki import AppContext
 from pwiki.WikiExceptions import WikiWordNotFoundException, ExportException, \
-        InternalError
+        InternalError, RenderInMainProcessException
 from pwiki.ParseUtilities import getFootnoteAnchorDict
 from pwiki.Utilities import calcResizeArIntoBoundingBox, seqSupportWithTemplate
 from pwiki.StringOps import *
@@ -27,7 +26,8 @@ from pwiki.TempFileSet import TempFileSet
 from pwiki.SearchAndReplace import SearchReplaceOperation, ListWikiPagesOperation, \
         ListItemWithSubtreeWikiPagesNode
 
-from pwiki import SystemInfo, PluginManager, OsAbstract, DocPages
+from pwiki import SystemInfo, PluginManager, OsAbstract, DocPages, ImageDims
+from pwiki.HtmlExportEngine import HtmlExportEngine
 
 
 from pwiki.Exporters import AbstractExporter
@@ -130,6 +130,197 @@ class FilenameConverter:
                     self._valueSet.add(fname)
                     return fname
 
+    def getUsedFilenames(self):
+        """
+        Return dictionary {wikiWord: filename} of filenames assigned so far
+        """
+        return dict(self._used)
+
+    def presetUsedFilenames(self, used):
+        """
+        Take over filenames assigned by another FilenameConverter (in
+        another process)
+        """
+        self._used = dict(used)
+        self._valueSet = set(self._used.values())
+
+
+
+class HtmlOutputEmitter:
+    """
+    Receives the HTML fragments produced by HtmlExporter.processAst().
+    Only the last fragment is held back (the exporter may replace it to eat
+    a break), all others are written to the file object fp immediately.
+    If fp is None, the fragments are collected and returned by getOutput().
+    """
+    __slots__ = ("fp", "collected", "last")
+
+    def __init__(self, fp=None):
+        self.fp = fp
+        self.collected = [] if fp is None else None
+        self.last = None
+
+
+    def append(self, fragment):
+        if self.last is not None:
+            if self.fp is None:
+                self.collected.append(self.last)
+            else:
+                self.fp.write(self.last)
+
+        self.last = fragment
+
+
+    def getLast(self):
+        """
+        Return last appended fragment (not yet written) or None.
+        """
+        return self.last
+
+
+    def replaceLast(self, fragment):
+        self.last = fragment
+
+
+    def flush(self):
+        """
+        Write the held back fragment. Must be called after the last append().
+        """
+        if self.last is not None:
+            self.append(None)
+
+
+    def getOutput(self):
+        """
+        Return collected output if no file object was given. 
+        """
+        self.flush()
+        result = "".join(self.collected)
+        self.collected = [result]
+        return result
+
+
+
+class MultiPageSegmentWriter:
+    """
+    Writes the file of a continuous "html_multi" export from cached
+    segments (file header with table of contents, one segment per wiki page,
+    footer), so only changed pages must be rendered again.
+
+    Segments are stored encoded together with their byte offset in the
+    output file. The file content before the first changed segment is kept,
+    the file is only rewritten from there on.
+    """
+    def __init__(self):
+        self.reset(None)
+
+
+    def reset(self, outputPath):
+        self.outputPath = outputPath
+        self.headSegments = ()
+        # {word: (encoded segment or None, frozenset of child page names)}
+        self.pageSegments = {}
+        self.footSegment = b""
+
+        # Lists of keys, segments and byte offsets as currently in the file
+        self.writtenKeys = []
+        self.writtenSegments = []
+        self.writtenOffsets = []
+        self.writtenSize = 0
+
+
+    @staticmethod
+    def _encode(text):
+        if os.linesep != "\n":
+            text = text.replace("\n", os.linesep)
+        return text.encode("utf-8", "surrogateescape")
+
+
+    def setHeadSegments(self, segments):
+        self.headSegments = tuple(self._encode(s) for s in segments)
+
+
+    def setFootSegment(self, segment):
+        self.footSegment = self._encode(segment)
+
+
+    def setPageSegment(self, word, segment, children=frozenset()):
+        """
+        segment -- HTML of the page or None if page isn't exported
+        children -- page names the page links to. They are remembered to
+                find pages with changed parent list after an update.
+        """
+        if segment is not None:
+            segment = self._encode(segment)
+
+        self.pageSegments[word] = (segment, frozenset(children))
+
+
+    def removePageSegment(self, word):
+        self.pageSegments.pop(word, None)
+
+
+    def hasPageSegment(self, word):
+        return self.pageSegments.get(word, (None,))[0] is not None
+
+
+    def getPageChildren(self, word):
+        return self.pageSegments.get(word, (None, frozenset()))[1]
+
+
+    def write(self, words):
+        """
+        Write the file with the pages of sequence  words  in this order.
+        Returns number of bytes actually written.
+        """
+        keys = [("head", i) for i in range(len(self.headSegments))]
+        segments = list(self.headSegments)
+
+        for word in words:
+            entry = self.pageSegments.get(word)
+            if entry is None or entry[0] is None:
+                continue
+            keys.append(("page", word))
+            segments.append(entry[0])
+
+        keys.append(("foot",))
+        segments.append(self.footSegment)
+
+        # Find first segment which differs from file content
+        start = 0
+        try:
+            if os.path.getsize(pathEnc(self.outputPath)) == self.writtenSize:
+                for key, wKey, seg, wSeg in zip(keys, self.writtenKeys,
+                        segments, self.writtenSegments):
+                    if key != wKey or (seg is not wSeg and seg != wSeg):
+                        break
+                    start += 1
+        except OSError:
+            pass
+
+        if start == len(segments):
+            return 0  # Nothing changed
+
+        offsets = self.writtenOffsets[:start]
+        startPos = self.writtenOffsets[start] if start > 0 else 0
+        pos = startPos
+
+        mode = "r+b" if start > 0 else "wb"
+        with open(pathEnc(self.outputPath), mode) as fp:
+            fp.seek(pos)
+            for seg in segments[start:]:
+                offsets.append(pos)
+                fp.write(seg)
+                pos += len(seg)
+            fp.truncate()
+
+        self.writtenKeys = keys
+        self.writtenSegments = segments
+        self.writtenOffsets = offsets
+        self.writtenSize = pos
+
+        return pos - startPos
+
 
 
 class SizeValue:
@@ -447,6 +638,20 @@ class HtmlExporter(AbstractExporter):
         self.avoidDeadWikiLinks = True  # avoid links to not exported wikiwords
         self.listPagesOperation = None
 
+        # For continuous "html_multi" export
+        self.multiPageWriter = None
+        self.multiPageUpdateTimer = None
+        self.multiPageDirtyWords = set()
+        self.multiPageMembershipChanged = set()
+        # {word: data of page determining its subtree in the table of contents}
+        self.multiPageTreeInfos = {}
+
+        # Render pages in worker processes for large exports?
+        self.processPoolAllowed = False
+        self.exportEngine = None
+        # Set in worker processes of the HtmlExportEngine
+        self.renderingInWorker = False
+
         self.wordAnchor = None  # For multiple wiki pages in one HTML page, this contains the anchor
                 # of the current word.
         self.tempFileSet = None
@@ -454,7 +659,7 @@ class HtmlExporter(AbstractExporter):
         self.filenameConverter = FilenameConverter(False)
 #         self.convertFilename = removeBracketsFilename
 
-        self.result = None
+        self.result = None   # HtmlOutputEmitter while formatting a page
         
         # Flag to control how to push output into self.result
         self.outFlagEatPostBreak = False
@@ -467,6 +672,15 @@ class HtmlExporter(AbstractExporter):
         if self.wikiDocument is not None:
             self.buildStyleSheetList()
 
+    def setProcessPoolAllowed(self, allowed):
+        """
+        Allow rendering pages of "html_single" and "html_multi" exports
+        in worker processes (see HtmlExportEngine). Should only be set
+        for unattended exports as pages are rendered from a snapshot
+        of the wiki.
+        """
+        self.processPoolAllowed = allowed
+
     @staticmethod
     def getExportTypes(mainControl, continuousExport=False):
         """
@@ -504,6 +718,9 @@ class HtmlExporter(AbstractExporter):
                 not "html_single" in exportTypes:
             return ()
 
+        import wx.xrc
+        from pwiki.wxHelper import XrcControls
+
         res = wx.xrc.XmlResource.Get()
         htmlPanel = res.LoadPanel(guiparent, "ExportSubHtml")
         ctrls = XrcControls(htmlPanel)
@@ -576,6 +793,8 @@ class HtmlExporter(AbstractExporter):
                     boolToInt(True),
                     )
         else:
+            from pwiki.wxHelper import XrcControls
+
             ctrls = XrcControls(addoptpanel)
 
             picsAsLinks = boolToInt(ctrls.cbPicsAsLinks.GetValue())
@@ -598,6 +817,8 @@ class HtmlExporter(AbstractExporter):
                 
         # volatileDir is currently ignored
 
+        from pwiki.wxHelper import XrcControls
+
         ctrls = XrcControls(addoptpanel)
 
         ctrls.cbPicsAsLinks.SetValue(picsAsLinks != 0)
@@ -680,16 +901,24 @@ class HtmlExporter(AbstractExporter):
             self.referencedStorageFiles = set()
 
 
-        if exportType == "html_multi":
-            browserFile = self.exportHtmlMultiFile()
-        elif exportType == "html_single":
-            browserFile = self._exportHtmlSingleFiles(self.wordList)
+        if self.processPoolAllowed and \
+                exportType in ("html_single", "html_multi"):
+            self.exportEngine = HtmlExportEngine.createForExporter(self,
+                    len(self.wordList))
+
+        try:
+            if exportType == "html_multi":
+                browserFile = self.exportHtmlMultiFile()
+            elif exportType == "html_single":
+                browserFile = self._exportHtmlSingleFiles(self.wordList)
+        finally:
+            self.exportEngine = None
 
         # Other supported types: html_previewWX, html_previewIE, html_previewMOZ,
         #   html_previewWK
         # are not handled in this function
 
-        wx.GetApp().getInsertionPluginManager().taskEnd()
+        GetApp().getInsertionPluginManager().taskEnd()
 
         if self.referencedStorageFiles is not None:
             # Some files must be available
@@ -706,7 +935,8 @@ class HtmlExporter(AbstractExporter):
 
 
         if self.mainControl.getConfig().getboolean(
-                "main", "start_browser_after_export") and browserFile:
+                "main", "start_browser_after_export") and browserFile and \
+                not AppContext.isHeadless():
             OsAbstract.startFile(self.mainControl, browserFile)
 
         if tempFileSetReset:
@@ -723,6 +953,10 @@ class HtmlExporter(AbstractExporter):
         # for continuous export we want to have dead links to simplify updates
         self.avoidDeadWikiLinks = False
 
+        if exportType == "html_multi":
+            # Keep rendered pages so updates only render changed pages
+            self.multiPageWriter = MultiPageSegmentWriter()
+
         wordList = wikiDocument.searchWiki(self.listPagesOperation)
         
         self.listPagesOperation.beginWikiSearch(wikiDocument)
@@ -733,6 +967,8 @@ class HtmlExporter(AbstractExporter):
             
         self.progressHandler = None
 
+        from pwiki.wxHelper import wxKeyFunctionSink
+
         self.__sinkWikiDocument = wxKeyFunctionSink((
                 ("deleted wiki page", self.onDeletedWikiPage),
                 ("renamed wiki page", self.onRenamedWikiPage),
@@ -742,10 +978,18 @@ class HtmlExporter(AbstractExporter):
 
 
     def stopContinuousExport(self):
+        self.__sinkWikiDocument.disconnect()
+
+        if self.multiPageUpdateTimer is not None:
+            self.multiPageUpdateTimer.Stop()
+            self._writeMultiPageUpdates()
+
+        self.multiPageWriter = None
+        self.multiPageTreeInfos = {}
+
         self.listPagesOperation.endWikiSearch()
         self.listPagesOperation = None
         self.avoidDeadWikiLinks = True
-        self.__sinkWikiDocument.disconnect()
 
         self.tempFileSet.reset()
         self.tempFileSet = None
@@ -761,7 +1005,7 @@ class HtmlExporter(AbstractExporter):
         self.wordList.remove(wikiWord)
         
         if self.exportType == "html_multi":
-            self.exportHtmlMultiFile()
+            self._scheduleMultiPageUpdate((wikiWord,), (wikiWord,))
 
         elif self.exportType == "html_single":
             self._exportHtmlSingleFiles([])
@@ -786,7 +1030,8 @@ class HtmlExporter(AbstractExporter):
 
 
         if self.exportType == "html_multi":
-            self.exportHtmlMultiFile()
+            self._scheduleMultiPageUpdate((oldWord, newWord),
+                    (oldWord, newWord))
 
         elif self.exportType == "html_single":
             if newInList:
@@ -817,20 +1062,115 @@ class HtmlExporter(AbstractExporter):
                 updList = []
             else:
                 updList = [wikiWord]
-        
+
+        if self.exportType == "html_multi":
+            if oldInList != newInList:
+                self._scheduleMultiPageUpdate((wikiWord,), (wikiWord,))
+            elif self.multiPageWriter.hasPageSegment(wikiWord) or \
+                    self.shouldExport(wikiWord, wikiPage) or \
+                    self._multiPageRelationsChanged(wikiWord):
+                # Not exported pages only matter through their relations
+                self._scheduleMultiPageUpdate((wikiWord,))
+            return
+
         if not wikiWord in self.wordList:
             return
 
         try:
-            if self.exportType == "html_multi":
-                self.exportHtmlMultiFile()
-    
-            elif self.exportType == "html_single":
+            if self.exportType == "html_single":
                 self._exportHtmlSingleFiles(updList)
         except WikiWordNotFoundException:
             pass
 
 
+    def _scheduleMultiPageUpdate(self, words, membershipChanged=()):
+        """
+        Mark pages  words  for rendering during the next write of a
+        continuous "html_multi" export. Updates arriving within the
+        configured delay are written together.
+
+        membershipChanged -- words which were added to or removed from
+                self.wordList. Pages linking to them are rendered again
+                because their links change.
+        """
+        self.multiPageDirtyWords.update(words)
+        self.multiPageMembershipChanged.update(membershipChanged)
+
+        delay = self.mainControl.getConfig().getfloat("main",
+                "html_export_continuous_updateDelay", 1.0)
+        delay = max(1, int(delay * 1000))
+
+        if self.multiPageUpdateTimer is None:
+            import wx
+
+            self.multiPageUpdateTimer = wx.CallLater(delay,
+                    self._writeMultiPageUpdates)
+        else:
+            self.multiPageUpdateTimer.Start(delay)
+
+
+    def _writeMultiPageUpdates(self):
+        """
+        Render pages marked by _scheduleMultiPageUpdate() and the pages
+        depending on them, then write the export file from the cached
+        segments.
+        """
+        self.multiPageUpdateTimer = None
+        writer = self.multiPageWriter
+        if writer is None:
+            return
+
+        dirtyWords = self.multiPageDirtyWords
+        membershipChanged = self.multiPageMembershipChanged
+        self.multiPageDirtyWords = set()
+        self.multiPageMembershipChanged = set()
+
+        self.setLinkConverter(LinkConverterForHtmlMultiPageExport(
+                self.wikiDocument, self))
+        self.buildStyleSheetList()
+
+        wordSet = set(self.wordList)
+        # Pages which must be rendered again because their links or their
+        # list of parents changed
+        dependents = set()
+        # The table of contents only changes with the set of exported pages
+        # or (for the tree) with the relations of a page
+        tocChanged = len(membershipChanged) > 0
+
+        wikiData = self.wikiDocument.getWikiData()
+        for word in membershipChanged:
+            dependents.update(wikiData.getParentRelationships(word))
+
+        for word in dirtyWords:
+            oldChildren = writer.getPageChildren(word)
+            oldTreeInfo = self.multiPageTreeInfos.get(word)
+            if word in wordSet:
+                self._renderMultiPageSegment(word)
+                dependents.update(oldChildren ^ writer.getPageChildren(word))
+            else:
+                writer.removePageSegment(word)
+                self.multiPageTreeInfos.pop(word, None)
+                dependents.update(oldChildren)
+
+            if self.multiPageTreeInfos.get(word) != oldTreeInfo:
+                tocChanged = True
+
+        for word in (dependents & wordSet) - dirtyWords:
+            self._renderMultiPageSegment(word)
+
+        if tocChanged:
+            writer.setHeadSegments(self._getMultiPageHeadSegments(
+                    self.mainControl.wikiName,
+                    self.addOpt[self.ADDOPT_IDX_TABLE_OF_CONTENTS]))
+        writer.setFootSegment(self.getFileFooter())
+
+        try:
+            writer.write(self.wordList)
+        except (IOError, OSError):
+            traceback.print_exc()
+
+        self.copyCssFiles(self.exportDest)
+
 
     def getTempFileSet(self):
         return self.tempFileSet
@@ -859,12 +1199,6 @@ class HtmlExporter(AbstractExporter):
         """
         Multiple wiki pages in one file.
         """
-        config = self.mainControl.getConfig()
-        sepLineCount = config.getint("main",
-                "html_export_singlePage_sepLineCount", 10)
-
-        if sepLineCount < 0:
-            sepLineCount = 10
 #         if len(self.wordList) == 1:
 #             self.exportType = u"html_single"
 #             return self._exportHtmlSingleFiles(self.wordList)
@@ -874,36 +1208,100 @@ class HtmlExporter(AbstractExporter):
 
         self.buildStyleSheetList()
 
+        # For continuous export segments are collected in the writer
+        writer = None
+
         if realfp is None:
             outputFile = join(self.exportDest, 
                     self.filenameConverter.getFilenameForWikiWord(
                     self.mainControl.wikiName) + ".html")
 
-            if exists(pathEnc(outputFile)):
-                os.unlink(pathEnc(outputFile))
+            if self.multiPageWriter is not None:
+                writer = self.multiPageWriter
+                writer.reset(outputFile)
+                self.multiPageTreeInfos = {}
+            else:
+                if exists(pathEnc(outputFile)):
+                    os.unlink(pathEnc(outputFile))
 
-            realfp = open(pathEnc(outputFile), "w", encoding="utf-8",
-                    errors="surrogateescape")
+                realfp = open(pathEnc(outputFile), "w", encoding="utf-8",
+                        errors="surrogateescape")
         else:
             outputFile = None
 
         #filePointer = utf8Writer(realfp, "replace")
         filePointer = realfp
 
-        filePointer.write(self.getFileHeaderMultiPage(self.mainControl.wikiName))
-
-        tocTitle = self.addOpt[self.ADDOPT_IDX_TOC_TITLE]
-        
         if tocMode is None:
             tocMode = self.addOpt[self.ADDOPT_IDX_TABLE_OF_CONTENTS]
 
+        headSegments = self._getMultiPageHeadSegments(
+                self.mainControl.wikiName, tocMode)
+
+        if writer is None:
+            for segment in headSegments:
+                filePointer.write(segment)
+        else:
+            writer.setHeadSegments(headSegments)
+
+        if self.progressHandler is not None:
+            self.progressHandler.open(len(self.wordList))
+            step = 0
+
+        # Then create the big page word by word
+        for word, segment in self._iterRenderedPages(self.wordList,
+                writer is None):
+            if self.progressHandler is not None:
+                step += 1
+                self.progressHandler.update(step, _("Exporting %s") % word)
+
+            if writer is None:
+                if segment is None:
+                    # Not rendered by a worker process
+                    segment = self._getMultiPageSegment(word)
+                if segment:
+                    filePointer.write(segment)
+            else:
+                self._renderMultiPageSegment(word)
+
+        if writer is None:
+            filePointer.write(self.getFileFooter())
+        
+            #filePointer.reset()
+
+            if outputFile is not None:
+                realfp.close()
+        else:
+            writer.setFootSegment(self.getFileFooter())
+            writer.write(self.wordList)
+
+        self.copyCssFiles(self.exportDest)
+        return outputFile
+
+
+    def _getMultiPageHeadSegments(self, title, tocMode):
+        """
+        Return list of file header and table of contents for a multi page
+        file.
+        """
+        config = self.mainControl.getConfig()
+        sepLineCount = config.getint("main",
+                "html_export_singlePage_sepLineCount", 10)
+
+        if sepLineCount < 0:
+            sepLineCount = 10
+
+        result = [self.getFileHeaderMultiPage(title)]
+
+        tocTitle = self.addOpt[self.ADDOPT_IDX_TOC_TITLE]
+
         if tocMode == 1:
             # Write a content tree at beginning
             rootPage = self.mainControl.getWikiDocument().getWikiPage(
                         self.mainControl.getWikiDocument().getWikiName())
             flatTree = rootPage.getFlatTree()
 
-            filePointer.write(('<h2 class="wikidpad">%s</h2>\n'
+            result.append(('<h2 class="wikidpad">%s</h2>\n'
                     '%s%s<hr class="wikidpad" />') %
                     (tocTitle, # = "Table of Contents"
                     self.getContentTreeBody(flatTree, linkAsFragments=True),
@@ -911,70 +1309,156 @@ class HtmlExporter(AbstractExporter):
 
         elif tocMode == 2:
             # Write a content list at beginning
-            filePointer.write(('<h2 class="wikidpad">%s</h2>\n'
+            result.append(('<h2 class="wikidpad">%s</h2>\n'
                     '%s%s<hr class="wikidpad" />') %
                     (tocTitle, # = "Table of Contents"
                     self.getContentListBody(linkAsFragments=True),
                     '<br class="wikidpad" />\n' * sepLineCount))
 
+        return result
 
-        if self.progressHandler is not None:
-            self.progressHandler.open(len(self.wordList))
-            step = 0
-
-        # Then create the big page word by word
-        for word in self.wordList:
-            if self.progressHandler is not None:
-                step += 1
-                self.progressHandler.update(step, _("Exporting %s") % word)
 
+    def _getMultiPageSegment(self, word):
+        """
+        Return HTML of wiki page  word  inside of a multi page file or None
+        if page shouldn't or couldn't be exported. The page is rendered
+        completely before anything is returned so a page failing in the
+        middle doesn't leave a partial segment in the file.
+        """
+        try:
             wikiPage = self.wikiDocument.getWikiPage(word)
             if not self.shouldExport(word, wikiPage):
-                continue
+                return None
+
+            return self._formatMultiPageSegment(word, wikiPage)
+        except WikiWordNotFoundException:
+            return None
+        except Exception as e:
+            traceback.print_exc()
+            return None
+
+
+    def _formatMultiPageSegment(self, word, wikiPage):
+        """
+        Return HTML of wikiPage inside of a multi page file. Exceptions
+        are passed to the caller.
+        """
+        fp = StringIO()
+        self._writeMultiPageSegment(fp, word, wikiPage)
+        return fp.getvalue()
+
+
+    def _writeMultiPageSegment(self, fp, word, wikiPage):
+        """
+        Write HTML of wikiPage inside of a multi page file to file object fp.
+        Exceptions are passed to the caller.
+        """
+        config = self.mainControl.getConfig()
+        sepLineCount = config.getint("main",
+                "html_export_singlePage_sepLineCount", 10)
+
+        if sepLineCount < 0:
+            sepLineCount = 10
+
+        try:
+            self.wordAnchor = _escapeAnchor(word)
+
+            if self.addOpt[self.ADDOPT_IDX_LIST_PARENTS] != 0:
+                if self.avoidDeadWikiLinks:
+                    parentLinks = self.getParentLinks(wikiPage, False,
+                            self.wordList)
+                else:
+                    parentLinks = self.getParentLinks(wikiPage, False)
                 
-            try:
-                content = wikiPage.getLiveText()
-#                 formatDetails = wikiPage.getFormatDetails()
-                    
-                self.wordAnchor = _escapeAnchor(word)
-                formattedContent = self.formatContent(wikiPage)
+                parentLinks = ('<span class="wikidpad parent-nodes">parent nodes: {0}'
+                        '<br class="wikidpad" /><br class="wikidpad" /></span>')\
+                        .format(parentLinks)
                 
-                if self.addOpt[self.ADDOPT_IDX_LIST_PARENTS] != 0:
-                    if self.avoidDeadWikiLinks:
-                        parentLinks = self.getParentLinks(wikiPage, False,
-                                self.wordList)
-                    else:
-                        parentLinks = self.getParentLinks(wikiPage, False)
-                    
-                    parentLinks = ('<span class="wikidpad parent-nodes">parent nodes: {0}'
-                            '<br class="wikidpad" /><br class="wikidpad" /></span>')\
-                            .format(parentLinks)
-                    
-                else:
-                    parentLinks = u""
-                    
+            else:
+                parentLinks = u""
+
+            fp.write(('<span class="wikidpad wiki-name-ref">'
+                    '[<a name="{0}" class="wikidpad">{1}</a>]<br class="wikidpad" />'
+                    '<br class="wikidpad" /></span>{2}')
+                    .format(self.wordAnchor, word, parentLinks))
+            self.formatContent(wikiPage, fp=fp)
+            fp.write('<br class="wikidpad" />\n' * sepLineCount +
+                    '<hr class="wikidpad" />')
+        finally:
+            self.wordAnchor = None
 
-                filePointer.write(('<span class="wikidpad wiki-name-ref">'
-                        '[<a name="{0}" class="wikidpad">{1}</a>]<br class="wikidpad" />'
-                        '<br class="wikidpad" /></span>'
-                        '{2}{3}{4}<hr class="wikidpad" />')\
-                        .format(self.wordAnchor, word, parentLinks,
-                        formattedContent,
-                        '<br class="wikidpad" />\n' * sepLineCount))
-            except Exception as e:
-                traceback.print_exc()
 
-        self.wordAnchor = None
+    def _renderMultiPageSegment(self, word):
+        """
+        Render page  word  into self.multiPageWriter (continuous export).
+        Pages which aren't exported are kept without segment to remember
+        their relations.
+        """
+        segment = self._getMultiPageSegment(word)
+
+        try:
+            children, treeInfo = self._getMultiPageRelations(word)
+        except WikiWordNotFoundException:
+            self.multiPageWriter.removePageSegment(word)
+            self.multiPageTreeInfos.pop(word, None)
+            return
 
-        filePointer.write(self.getFileFooter())
-        
-        #filePointer.reset()
+        self.multiPageWriter.setPageSegment(word, segment, children)
+        if treeInfo is None:
+            self.multiPageTreeInfos.pop(word, None)
+        else:
+            self.multiPageTreeInfos[word] = treeInfo
 
-        if outputFile is not None:
-            realfp.close()
 
-        self.copyCssFiles(self.exportDest)
-        return outputFile
+    def _getMultiPageRelations(self, word):
+        """
+        Return tuple (children, treeInfo) for page  word  in a continuous
+        "html_multi" export. children  is the frozenset of child page names
+        if parent lists are shown,  treeInfo  the data determining the
+        subtree of the page in the content tree if it is shown, else None.
+        """
+        listParents = self.addOpt[self.ADDOPT_IDX_LIST_PARENTS] != 0
+        contentTree = self.addOpt[self.ADDOPT_IDX_TABLE_OF_CONTENTS] == 1
+
+        if not listParents and not contentTree:
+            return frozenset(), None
+
+        wikiPage = self.wikiDocument.getWikiPage(word)
+        childTerms = wikiPage.getChildRelationships(existingonly=True,
+                selfreference=False)
+        children = frozenset(
+                self.wikiDocument.getWikiPageNameForLinkTerm(c)
+                for c in childTerms)
+        children -= frozenset((None,))
+
+        if not contentTree:
+            return children, None
+
+        # Attributes changing the order of the tree
+        attrs = wikiPage.getAttributes()
+        treeInfo = (children, tuple(tuple(attrs.get(key, ()))
+                for key in ("child_sort_order", "global.child_sort_order",
+                    "tree_position", "priority")))
+
+        if not listParents:
+            children = frozenset()
+
+        return children, treeInfo
+
+
+    def _multiPageRelationsChanged(self, word):
+        """
+        Return True if the relations of page  word  relevant for a continuous
+        "html_multi" export differ from the ones remembered when it was
+        rendered.
+        """
+        try:
+            children, treeInfo = self._getMultiPageRelations(word)
+        except WikiWordNotFoundException:
+            return True
+
+        return children != self.multiPageWriter.getPageChildren(word) or \
+                treeInfo != self.multiPageTreeInfos.get(word)
 
 
     def _exportHtmlSingleFiles(self, wordListToUpdate):
@@ -1030,11 +1514,15 @@ class HtmlExporter(AbstractExporter):
             self.progressHandler.open(len(self.wordList))
             step = 0
 
-        for word in wordListToUpdate:
+        for word, rendered in self._iterRenderedPages(wordListToUpdate):
             if self.progressHandler is not None:
                 step += 1
                 self.progressHandler.update(step, _("Exporting %s") % word)
 
+            if rendered is not None:
+                # Written by a worker process
+                continue
+
             wikiPage = self.wikiDocument.getWikiPage(word)
             if not self.shouldExport(word, wikiPage):
                 continue
@@ -1048,6 +1536,109 @@ class HtmlExporter(AbstractExporter):
         return rootFile
 
 
+    def _iterRenderedPages(self, words, useEngine=True):
+        """
+        Yield tuples (word, rendered) for all words. If an export engine
+        is set, pages are rendered in worker processes and  rendered  is the
+        result of renderPageInWorker(). It is None if the page must be
+        rendered by the caller.
+        """
+        if self.exportEngine is None or not useEngine:
+            return ((word, None) for word in words)
+
+        return self.exportEngine.iterRenderedPages(words)
+
+
+    def getWorkerJobData(self):
+        """
+        Return dictionary with the job data for prepareWorkerExport() in
+        the worker processes of the HtmlExportEngine.
+        """
+        # All file names must be assigned here, a worker can't know which
+        # names other workers would choose
+        for word in self.wordList:
+            self.filenameConverter.getFilenameForWikiWord(word)
+
+        for word in self.wikiDocument.getWikiData()\
+                .getAllDefinedWikiPageNames():
+            self.filenameConverter.getFilenameForWikiWord(word)
+
+        return {
+                "wordList": self.wordList,
+                "exportType": self.exportType,
+                "exportDest": self.exportDest,
+                "compatFilenames": self.compatFilenames,
+                "addOpt": self.addOpt,
+                "usedFilenames": self.filenameConverter.getUsedFilenames(),
+                "styleSheetList": self.styleSheetList,
+                "avoidDeadWikiLinks": self.avoidDeadWikiLinks
+            }
+
+
+    def prepareWorkerExport(self, wikiDocument, wordList, exportType,
+            exportDest, compatFilenames, addOpt, usedFilenames,
+            styleSheetList, avoidDeadWikiLinks):
+        """
+        Set job data in a worker process of the HtmlExportEngine.
+        In contrast to setJobData() the page list isn't checked and
+        the style sheets are taken from the main process.
+        """
+        self.wikiDocument = wikiDocument
+        self.wordList = frozenset(wordList)
+        self.exportType = exportType
+        self.exportDest = exportDest
+        self.compatFilenames = compatFilenames
+        self.addOpt = addOpt
+        self.avoidDeadWikiLinks = avoidDeadWikiLinks
+        self.filenameConverter = FilenameConverter(bool(compatFilenames))
+        self.filenameConverter.presetUsedFilenames(usedFilenames)
+        self.styleSheetList = styleSheetList
+        self.renderingInWorker = True
+
+        if exportType == "html_multi":
+            self.setLinkConverter(LinkConverterForHtmlMultiPageExport(
+                    wikiDocument, self))
+        else:
+            self.setLinkConverter(LinkConverterForHtmlSingleFilesExport(
+                    wikiDocument, self))
+
+
+    def renderPageInWorker(self, word):
+        """
+        Render page  word  in a worker process of the HtmlExportEngine.
+        For "html_multi" the HTML of the page inside the multi page file is
+        returned, for "html_single" the page file is written and an empty
+        string returned. Returns also an empty string if the page isn't
+        exported.
+        
+        Raises RenderInMainProcessException if the page needs something
+        only available in the main process.
+        """
+        wikiPage = self.wikiDocument.getWikiPage(word)
+        if not self.shouldExport(word, wikiPage):
+            return ""
+
+        pageAst = wikiPage.getLivePageAst()
+        for node in pageAst.iterDeepByName("insertion"):
+            # Insertions need plugins and access to the whole wiki
+            raise RenderInMainProcessException()
+
+        if self.exportType == "html_multi":
+            return self._formatMultiPageSegment(word, wikiPage)
+
+        outputFile = join(self.exportDest,
+                self.filenameConverter.getFilenameForWikiWord(word) + ".html")
+
+        if exists(pathEnc(outputFile)):
+            os.unlink(pathEnc(outputFile))
+
+        with open(pathEnc(outputFile), "w", encoding="utf-8",
+                errors="surrogateescape") as fp:
+            self.writeWikiPageAsHtml(fp, wikiPage, False)
+
+        return ""
+
+
     def exportWordToHtmlPage(self, dir, word, startFile=True,
             onlyInclude=None):
             
@@ -1064,8 +1655,7 @@ class HtmlExporter(AbstractExporter):
             fp = realfp
             
             wikiPage = self.wikiDocument.getWikiPage(word)
-            fp.write(self.exportWikiPageToHtmlString(wikiPage,
-                    startFile, onlyInclude))
+            self.writeWikiPageAsHtml(fp, wikiPage, startFile, onlyInclude)
             #fp.reset()        
             realfp.close()
         except Exception as e:
@@ -1080,23 +1670,31 @@ class HtmlExporter(AbstractExporter):
         """
         Read content of wiki word word, create an HTML page and return it
         """
-        result = []
+        fp = StringIO()
+        self.writeWikiPageAsHtml(fp, wikiPage, startFile, onlyInclude)
+        return fp.getvalue()
 
-        formattedContent = self.formatContent(wikiPage)
 
-        result.append(self.getFileHeader(wikiPage))
+    def writeWikiPageAsHtml(self, fp, wikiPage, startFile=True,
+            onlyInclude=None):
+        """
+        Create an HTML page for wikiPage and write it to file object fp
+        while it is produced.
+        """
+        if self.linkConverter is None:
+            self.linkConverter = BasicLinkConverter(self.wikiDocument, self)
+
+        fp.write(self.getFileHeader(wikiPage))
 
         # if startFile is set then this is the only page being exported so
         # do not include the parent header.
         if not startFile and self.addOpt[self.ADDOPT_IDX_LIST_PARENTS] != 0:
-            result.append(('<span class="wikidpad parent-nodes">parent nodes: %s'
+            fp.write(('<span class="wikidpad parent-nodes">parent nodes: %s'
                     '<br class="wikidpad" /><br class="wikidpad" /></span>\n')
                     % self.getParentLinks(wikiPage, True, onlyInclude))
 
-        result.append(formattedContent)
-        result.append(self.getFileFooter())
-        
-        return "".join(result)
+        self.formatContent(wikiPage, fp=fp)
+        fp.write(self.getFileFooter())
 
 
     def _getGenericHtmlHeader(self, title, charSet='; charset=UTF-8'):
@@ -1267,7 +1865,7 @@ class HtmlExporter(AbstractExporter):
                         "wikistyle.css"),
 
                     # User modified file
-                    join(wx.GetApp().globalConfigSubDir, "wikistyle.css")
+                    join(GetApp().globalConfigSubDir, "wikistyle.css")
                 ]
 
             # Wiki specific file
@@ -1283,7 +1881,7 @@ class HtmlExporter(AbstractExporter):
                     join(self.mainControl.wikiAppDir, "export",
                             "wikipreview.css"),
                     # User modified file
-                    join(wx.GetApp().globalConfigSubDir, "wikipreview.css")
+                    join(GetApp().globalConfigSubDir, "wikipreview.css")
                 ]
 
             # Wiki specific file
@@ -1309,7 +1907,7 @@ class HtmlExporter(AbstractExporter):
                     (join(self.mainControl.wikiAppDir, "export", "wikistyle.css"),
                         "admbase.css"),
                     # User modified file
-                    (join(wx.GetApp().globalConfigSubDir, "wikistyle.css"),
+                    (join(GetApp().globalConfigSubDir, "wikistyle.css"),
                         "userbase.css")
                 ]
 
@@ -1443,7 +2041,12 @@ class HtmlExporter(AbstractExporter):
         return self.wikiWord
 
 
-    def formatContent(self, wikiPage, content=None):
+    def formatContent(self, wikiPage, content=None, fp=None):
+        """
+        Return HTML of the content of wikiPage (or of content in the context of
+        wikiPage). If file object fp is given, the HTML is written to it while
+        it is produced and an empty string is returned.
+        """
         word = wikiPage.getWikiWord()
         formatDetails = wikiPage.getFormatDetails()
         if content is None:
@@ -1460,7 +2063,7 @@ class HtmlExporter(AbstractExporter):
                 "html_previewIE", "html_previewMOZ", "html_previewWK")
         self.wikiWord = word
 
-        self.result = []
+        self.result = HtmlOutputEmitter(fp)
         self.optsStack = StackedCopyDict()
         self.insertionVisitStack = []
         self.astNodeStack = []
@@ -1502,6 +2105,10 @@ class HtmlExporter(AbstractExporter):
         if self.asHtmlPreview and facename:
             self.outAppend('</font>')
 
+        if fp is not None:
+            self.result.flush()
+            return ""
+
         return self.getOutput()
 
 
@@ -1511,6 +2118,32 @@ class HtmlExporter(AbstractExporter):
         couldn't be determined.
         """
         try:
+            dims = ImageDims.getImageDims(absUrl,
+                    self.wikiDocument.getImageDimsCache())
+        except (IOError, ValueError):
+            return None, None
+
+        if dims is None:
+            # Format unknown to the header parser
+            dims = self._getImageDimsByDecoding(absUrl)
+
+        return dims
+
+
+    def _getImageDimsByDecoding(self, absUrl):
+        """
+        Decode image with wx to get its dimensions. Returns (None, None)
+        if not possible.
+        """
+        if self.renderingInWorker:
+            raise RenderInMainProcessException()
+
+        if AppContext.isHeadless():
+            return None, None
+
+        try:
+            import wx
+
             if absUrl.startswith("file:"):
                 absLink = pathnameFromUrl(absUrl)
                 imgFile = open(absLink, "rb")
@@ -1529,7 +2162,7 @@ class HtmlExporter(AbstractExporter):
 
             return None, None
 
-        except IOError:
+        except (IOError, ImportError):
             return None, None
 
 
@@ -1555,8 +2188,8 @@ class HtmlExporter(AbstractExporter):
 
     def outAppend(self, toAppend, eatPreBreak=False, eatPostBreak=False):
         """
-        Append toAppend to self.result, maybe remove or modify it according to
-        flags
+        Append toAppend to self.result (an HtmlOutputEmitter), maybe remove
+        or modify it according to flags
         """
         if toAppend == "":    # .strip()
             return
@@ -1566,12 +2199,13 @@ class HtmlExporter(AbstractExporter):
             self.outFlagPostBreakEaten = True
             return
 
-        if eatPreBreak and len(self.result) > 0 and \
-                self.result[-1].strip() == '<br class="wikidpad" />' and \
-                not self.outFlagPostBreakEaten:
-            self.result[-1] = toAppend
-            self.outFlagEatPostBreak = eatPostBreak
-            return
+        if eatPreBreak and not self.outFlagPostBreakEaten:
+            last = self.result.getLast()
+            if last is not None and \
+                    last.strip() == '<br class="wikidpad" />':
+                self.result.replaceLast(toAppend)
+                self.outFlagEatPostBreak = eatPostBreak
+                return
         
         if self.outFlagPostBreakEaten:
             self.outFlagPostBreakEaten = (toAppend.strip() == '<br class="wikidpad" />')
@@ -1638,7 +2272,7 @@ class HtmlExporter(AbstractExporter):
 
 
     def getOutput(self):
-        return "".join(self.result)
+        return self.result.getOutput()
 
 
     def getCommonStylesFromAppendix(self, appendix):
@@ -1898,7 +2532,7 @@ class HtmlExporter(AbstractExporter):
 
             containingPage = self.optsStack["innermostDocPage"]
             
-            langHelper = wx.GetApp().createWikiLanguageHelper(
+            langHelper = GetApp().createWikiLanguageHelper(
                     containingPage.getWikiLanguageName())
                     
             if langHelper.checkForInvalidWikiLink(value,
@@ -2112,7 +2746,7 @@ class HtmlExporter(AbstractExporter):
                             escapeHtmlNoBreaks(s.getvalue()) + '\n</pre>\n'
         elif key == "iconimage":
             imgName = astNode.value
-            icPath = wx.GetApp().getIconCache().lookupIconPath(imgName)
+            icPath = GetApp().getIconCache().lookupIconPath(imgName)
             if icPath is None:
                 htmlContent = _('<pre class="wikidpad">[Icon "%s" not found]</pre>' % imgName)
             else:
@@ -2131,13 +2765,13 @@ class HtmlExporter(AbstractExporter):
         else:
             # Call external plugins
             exportType = self.exportType
-            handler = wx.GetApp().getInsertionPluginManager().getHandler(self,
+            handler = GetApp().getInsertionPluginManager().getHandler(self,
                     exportType, key)
 
             if handler is None and self.asHtmlPreview:
                 # No handler found -> try to find generic HTML preview handler
                 exportType = "html_preview"
-                handler = wx.GetApp().getInsertionPluginManager().getHandler(self,
+                handler = GetApp().getInsertionPluginManager().getHandler(self,
                         exportType, key)
 
             if handler is not None:
@@ -2154,7 +2788,7 @@ class HtmlExporter(AbstractExporter):
             else:
                 # Try to find a generic handler for export type
                 # "wikidpad_language"
-                handler = wx.GetApp().getInsertionPluginManager().getHandler(self,
+                handler = GetApp().getInsertionPluginManager().getHandler(self,
                         "wikidpad_language", key)
                 if handler is not None:
                     try:
@@ -2322,6 +2956,9 @@ class HtmlExporter(AbstractExporter):
         if link.startswith("rel://"):
             pointRelative = True
             absUrl = self.wikiDocument.makeRelUrlAbsolute(link)
+            # Storage files are copied to the export destination at the end,
+            # so the image size must be read from the original file
+            srcUrl = absUrl
 
             # Relative URL
             if self.asHtmlPreview:
@@ -2352,7 +2989,7 @@ class HtmlExporter(AbstractExporter):
                         link = absUrl
 
         else:
-            absUrl = link
+            absUrl = srcUrl = link
 
         lowerLink = link.lower()
         
@@ -2458,7 +3095,7 @@ class HtmlExporter(AbstractExporter):
 
                 if width.isValid() and height.isValid() and \
                         (width.getUnit() == height.getUnit()):
-                    imgWidth, imgHeight = self._getImageDims(absUrl)
+                    imgWidth, imgHeight = self._getImageDims(srcUrl)
                     if imgWidth is not None:
                         if width.getUnit() == width.UNIT_FACTOR:
                             imgWidth = int(imgWidth * width.getValue())
@@ -2495,6 +3132,8 @@ class HtmlExporter(AbstractExporter):
                     # At least on Windows, wxWidgets has another
                     # opinion how a local file URL should look like
                     # than Python
+                    import wx
+
                     p = pathnameFromUrl(link)
                     link = wx.FileSystem.FileNameToURL(p)
                     
@@ -1,10 +1,6 @@
 
 import traceback
 
-import wx
-
-from pwiki.OptionsDialog import PluginOptionsPanel
-
 # This is a stub for the actual plugin located in
 # "mediaWikiParser/MediaWikiParser.py". The stub ensures that the real plugin is
 # only loaded if the language is actually used.
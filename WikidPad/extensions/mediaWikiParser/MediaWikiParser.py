@@ -9,12 +9,11 @@ import sys, traceback
 
 from textwrap import fill
 
-import wx
-
 import re
 from pwiki.WikiExceptions import *
 from pwiki import StringOps, Localization
 from pwiki.StringOps import revStr, HtmlStartTag, HtmlEmptyTag, HtmlEndTag
+from pwiki.ParseUtilities import AutoLinkRelaxMatcher
 
 sys.stderr = sys.stdout
 
@@ -1344,14 +1343,6 @@ ToDoREWithCapturing = re.compile(r"^([^:\s]+):[ \t]*(.+?)$",
 
 
 
-# For auto-link mode relax
-AutoLinkRelaxSplitRE = re.compile(r"[\W]+", re.IGNORECASE | re.UNICODE)
-
-AutoLinkRelaxJoinPAT = r"[\W]+"
-AutoLinkRelaxJoinFlags = re.IGNORECASE | re.UNICODE
-
-
-
 # For spell checking
 TextWordRE = re.compile(r"(?P<negative>[0-9]+|" + UrlPAT + r")|\b[\w']+",
         re.DOTALL | re.UNICODE | re.MULTILINE)
@@ -1562,9 +1553,8 @@ class _TheParser:
         Do some cleanup after main parsing.
         Not part of public API.
         """
-        autoLinkRelaxRE = None
         if formatDetails.autoLinkMode == "relax":
-            relaxList = formatDetails.wikiDocument.getAutoLinkRelaxInfo()
+            relaxMatcher = formatDetails.wikiDocument.getAutoLinkRelaxInfo()
 
             def recursAutoLink(ast):
                 newAstNodes = []
@@ -1576,54 +1566,38 @@ class _TheParser:
                     if node.name == "plainText":
                         text = node.text
                         start = node.pos
-                        
-                        threadstop.testValidThread()
-                        while text != "":
-                            # The foundWordText is the text as typed in the page
-                            # foundWord is the word as entered in database
-                            # These two may differ (esp. in whitespaces)
-                            foundPos = len(text)
-                            foundWord = None
-                            foundWordText = None
-                            
-                            # Search all regexes for the earliest match
-                            for regex, word in relaxList:
-                                match = regex.search(text)
-                                if match:
-                                    pos = match.start(0)
-                                    if pos < foundPos:
-                                        # Match is earlier than previous
-                                        foundPos = pos
-                                        foundWord = word
-                                        foundWordText = match.group(0)
-                                        if pos == 0:
-                                            # Can't find a better match -> stop loop
-                                            break
+                        prevEnd = 0
 
+                        threadstop.testValidThread()
+                        # The foundWordText is the text as typed in the page
+                        # foundWord is the word as entered in database
+                        # These two may differ (esp. in whitespaces)
+                        for foundStart, foundEnd, foundWord in \
+                                relaxMatcher.iterMatches(text):
                             # Add token for text before found word (if any)
-                            preText = text[:foundPos]
-                            if preText != "":
-                                newAstNodes.append(buildSyntaxNode(preText,
-                                        start, "plainText"))
-                
-                                start += len(preText)
-                                text = text[len(preText):]
-                            
-                            if foundWord is not None:
-                                wwNode = buildSyntaxNode(
-                                        [buildSyntaxNode(foundWordText, start, "word")],
-                                        start, "wikiWord")
-                                        
-                                wwNode.searchFragment = None
-                                wwNode.anchorLink = None
-                                wwNode.wikiWord = foundWord
-                                wwNode.titleNode = buildSyntaxNode(foundWordText, start, "plainText") # None
-
-                                newAstNodes.append(wwNode)
-
-                                inc = max(len(foundWordText), 1)
-                                start += inc
-                                text = text[inc:]
+                            if foundStart > prevEnd:
+                                newAstNodes.append(buildSyntaxNode(
+                                        text[prevEnd:foundStart],
+                                        start + prevEnd, "plainText"))
+
+                            foundWordText = text[foundStart:foundEnd]
+                            wordStart = start + foundStart
+                            wwNode = buildSyntaxNode(
+                                    [buildSyntaxNode(foundWordText, wordStart,
+                                    "word")], wordStart, "wikiWord")
+
+                            wwNode.searchFragment = None
+                            wwNode.anchorLink = None
+                            wwNode.wikiWord = foundWord
+                            wwNode.titleNode = buildSyntaxNode(foundWordText,
+                                    wordStart, "plainText") # None
+
+                            newAstNodes.append(wwNode)
+                            prevEnd = foundEnd
+
+                        if prevEnd < len(text):
+                            newAstNodes.append(buildSyntaxNode(text[prevEnd:],
+                                    start + prevEnd, "plainText"))
 
                         continue
 
@@ -2108,44 +2082,35 @@ class _TheHelper:
 
 
     @staticmethod
-    def _createAutoLinkRelaxWordEntryRE(word):
+    def buildAutoLinkRelaxInfo(wikiDocument):
         """
-        Get compiled regular expression for one word in autoLink "relax"
-        mode.
-
-        Not part of public API.
+        Build some cache info needed to process auto-links in "relax" mode.
+        This info will be given back in the formatDetails when calling
+        _TheParser.parse().
+        The implementation for this plugin creates a multi-pattern matcher
+        for all link terms, but this is not mandatory.
         """
-        # Split into parts of contiguous alphanumeric characters
-        parts = AutoLinkRelaxSplitRE.split(word)
-        # Filter empty parts
-        parts = [p for p in parts if p != ""]
-
-        # Instead of original non-alphanum characters allow arbitrary
-        # non-alphanum characters
-        pat = r"\b" + (AutoLinkRelaxJoinPAT.join(parts)) + r"\b"
-        regex = re.compile(pat, AutoLinkRelaxJoinFlags)
-
-        return regex
+        return AutoLinkRelaxMatcher(
+                wikiDocument.getWikiData().getAllProducedWikiLinks())
 
 
     @staticmethod
-    def buildAutoLinkRelaxInfo(wikiDocument):
+    def updateAutoLinkRelaxInfo(wikiDocument, relaxInfo, termChanges=None):
         """
-        Build some cache info needed to process auto-links in "relax" mode.
-        This info will be given back in the formatDetails when calling
-        _TheParser.parse().
-        The implementation for this plugin creates a list of regular
-        expressions and the related wiki words, but this is not mandatory.
+        Update the matcher created by buildAutoLinkRelaxInfo() after link
+        terms have changed. Only added and removed terms are processed.
+
+        termChanges -- tuple (added terms, removed terms) since the last
+                build or update or None if unknown, then the matcher is
+                compared to all link terms
         """
-        # Build up regular expression
-        # First fetch all wiki words
-        words = wikiDocument.getWikiData().getAllProducedWikiLinks()
+        if termChanges is None:
+            relaxInfo.updateWords(
+                    wikiDocument.getWikiData().getAllProducedWikiLinks())
+        else:
+            relaxInfo.changeWords(*termChanges)
 
-        # Sort longest words first
-        words.sort(key=lambda w: len(w), reverse=True)
-        
-        return [(_TheHelper._createAutoLinkRelaxWordEntryRE(w), w)
-                for w in words if w != ""]
+        return relaxInfo
 
 
     @staticmethod
@@ -2615,6 +2580,8 @@ class _TheHelper:
             editor.SetTargetEnd(endPos)
             editor.ReplaceTarget(filledText)
             editor.GotoPos(endPos)
+
+            import wx
             editor.scrollXY(0, editor.GetScrollPos(wx.VERTICAL))
 
 
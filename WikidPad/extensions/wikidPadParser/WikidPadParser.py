@@ -9,12 +9,11 @@ import sys, string, traceback
 
 from textwrap import fill
 
-import wx
-
 import re
 from pwiki.WikiExceptions import *
 from pwiki import StringOps, Localization
 from pwiki.StringOps import UPPERCASE, LOWERCASE, revStr
+from pwiki.ParseUtilities import AutoLinkRelaxMatcher
 
 sys.stderr = sys.stdout
 
@@ -1231,14 +1230,6 @@ ToDoREWithCapturing = re.compile(r"^([^:\s]+):[ \t]*(.+?)$",
 
 
 
-# For auto-link mode relax
-AutoLinkRelaxSplitRE = re.compile(r"[\W]+", re.IGNORECASE | re.UNICODE)
-
-AutoLinkRelaxJoinPAT = r"[\W]+"
-AutoLinkRelaxJoinFlags = re.IGNORECASE | re.UNICODE
-
-
-
 # For spell checking
 TextWordRE = re.compile(r"(?P<negative>[0-9]+|"+ UrlPAT + "|\b(?<!~)" +
         WikiWordCcPAT + r"\b)|\b[\w']+",
@@ -1424,6 +1415,16 @@ def _buildBaseDict(wikiDocument=None, formatDetails=None):
 # so changes may occur!
 
 
+# Text which may belong to a construct spanning multiple paragraphs
+_MULTI_PARAGRAPH_TOKEN_RE = re.compile(r"<<|>>|<%|%>|</?pre\b|</?body\b",
+        re.UNICODE)
+
+# Bold and italics may span multiple paragraphs as well. The start of them
+# may be found at a node border, so end of string is handled as non-space
+_ATTRIBUTION_START_RE = re.compile(r"\*(?!\s)|(?<!\w)_", re.UNICODE)
+
+
+
 class _TheParser:
     @staticmethod
     def reset():
@@ -1450,9 +1451,8 @@ class _TheParser:
         Do some cleanup after main parsing.
         Not part of public API.
         """
-        autoLinkRelaxRE = None
         if formatDetails.autoLinkMode == "relax":
-            relaxList = formatDetails.wikiDocument.getAutoLinkRelaxInfo()
+            relaxMatcher = formatDetails.wikiDocument.getAutoLinkRelaxInfo()
 
             def recursAutoLink(ast):
                 newAstNodes = []
@@ -1464,54 +1464,38 @@ class _TheParser:
                     if node.name == "plainText":
                         text = node.text
                         start = node.pos
-                        
-                        threadstop.testValidThread()
-                        while text != "":
-                            # The foundWordText is the text as typed in the page
-                            # foundWord is the word as entered in database
-                            # These two may differ (esp. in whitespaces)
-                            foundPos = len(text)
-                            foundWord = None
-                            foundWordText = None
-                            
-                            # Search all regexes for the earliest match
-                            for regex, word in relaxList:
-                                match = regex.search(text)
-                                if match:
-                                    pos = match.start(0)
-                                    if pos < foundPos:
-                                        # Match is earlier than previous
-                                        foundPos = pos
-                                        foundWord = word
-                                        foundWordText = match.group(0)
-                                        if pos == 0:
-                                            # Can't find a better match -> stop loop
-                                            break
+                        prevEnd = 0
 
+                        threadstop.testValidThread()
+                        # The foundWordText is the text as typed in the page
+                        # foundWord is the word as entered in database
+                        # These two may differ (esp. in whitespaces)
+                        for foundStart, foundEnd, foundWord in \
+                                relaxMatcher.iterMatches(text):
                             # Add token for text before found word (if any)
-                            preText = text[:foundPos]
-                            if preText != "":
-                                newAstNodes.append(buildSyntaxNode(preText,
-                                        start, "plainText"))
-                
-                                start += len(preText)
-                                text = text[len(preText):]
-                            
-                            if foundWord is not None:
-                                wwNode = buildSyntaxNode(
-                                        [buildSyntaxNode(foundWordText, start, "word")],
-                                        start, "wikiWord")
-                                        
-                                wwNode.searchFragment = None
-                                wwNode.anchorLink = None
-                                wwNode.wikiWord = foundWord
-                                wwNode.titleNode = buildSyntaxNode(foundWordText, start, "plainText") # None
-
-                                newAstNodes.append(wwNode)
-
-                                inc = max(len(foundWordText), 1)
-                                start += inc
-                                text = text[inc:]
+                            if foundStart > prevEnd:
+                                newAstNodes.append(buildSyntaxNode(
+                                        text[prevEnd:foundStart],
+                                        start + prevEnd, "plainText"))
+
+                            foundWordText = text[foundStart:foundEnd]
+                            wordStart = start + foundStart
+                            wwNode = buildSyntaxNode(
+                                    [buildSyntaxNode(foundWordText, wordStart,
+                                    "word")], wordStart, "wikiWord")
+
+                            wwNode.searchFragment = None
+                            wwNode.anchorLink = None
+                            wwNode.wikiWord = foundWord
+                            wwNode.titleNode = buildSyntaxNode(foundWordText,
+                                    wordStart, "plainText") # None
+
+                            newAstNodes.append(wwNode)
+                            prevEnd = foundEnd
+
+                        if prevEnd < len(text):
+                            newAstNodes.append(buildSyntaxNode(text[prevEnd:],
+                                    start + prevEnd, "plainText"))
 
                         continue
 
@@ -1559,6 +1543,74 @@ class _TheParser:
 
         return t
 
+    @staticmethod
+    def parseIncremental(intLanguageName, content, formatDetails, threadstop,
+            baseContent, basePageAst):
+        """
+        Optional. Parse  content  by reusing the nodes of  basePageAst  (the
+        AST of  baseContent  parsed with equivalent formatDetails) outside
+        of the changed region.
+
+        Returns tuple (pageAst, (start, baseEnd, end)) where
+        baseContent[start:baseEnd] was reparsed as content[start:end]
+        or None if content must be parsed by parse().
+        """
+        if len(content) == 0 or formatDetails.noFormat or \
+                formatDetails.autoLinkMode == "relax":
+            return None
+
+        # Find the lines touched by the change. If they contain parts of
+        # constructs which may span multiple paragraphs, the effect of the
+        # change isn't local
+        maxCommon = min(len(content), len(baseContent))
+        start = 0
+        while start < maxCommon and content[start] == baseContent[start]:
+            start += 1
+
+        suffixLen = 0
+        while suffixLen < maxCommon - start and \
+                content[-suffixLen - 1] == baseContent[-suffixLen - 1]:
+            suffixLen += 1
+
+        for t in (content, baseContent):
+            lineStart = t.rfind("\n", 0, start) + 1
+            lineEnd = t.find("\n", len(t) - suffixLen)
+            if lineEnd == -1:
+                lineEnd = len(t)
+
+            if _MULTI_PARAGRAPH_TOKEN_RE.search(t, lineStart, lineEnd):
+                return None
+
+            # Changed characters (or their neighbors) may start or end
+            # bold or italics
+            if "*" in t[max(0, start - 1):len(t) - suffixLen + 1] or \
+                    "_" in t[max(0, start - 1):len(t) - suffixLen + 1]:
+                return None
+
+        baseDict = _buildBaseDict(formatDetails=formatDetails)
+
+        def parseSegment(segment):
+            t = text.parseString(segment, parseAll=True, baseDict=baseDict,
+                    threadstop=threadstop)
+            return buildSyntaxNode(t, 0, "text")
+
+        result = reparseChangedRegion(basePageAst, baseContent, content,
+                parseSegment, threadstop)
+        if result is None:
+            return None
+
+        # A bold or italics start which wasn't closed up to the end of the
+        # reparsed region may now be closed by text after it
+        pageAst, (start, baseEnd, end) = result
+        for node in pageAst.sub:
+            if node.pos >= end:
+                break
+            if node.isTerminal() and _ATTRIBUTION_START_RE.search(node.text):
+                return None
+
+        return result
+
+
 THE_PARSER = _TheParser()
 
 
@@ -1990,44 +2042,35 @@ class _TheHelper:
 
 
     @staticmethod
-    def _createAutoLinkRelaxWordEntryRE(word):
+    def buildAutoLinkRelaxInfo(wikiDocument):
         """
-        Get compiled regular expression for one word in autoLink "relax"
-        mode.
-
-        Not part of public API.
+        Build some cache info needed to process auto-links in "relax" mode.
+        This info will be given back in the formatDetails when calling
+        _TheParser.parse().
+        The implementation for this plugin creates a multi-pattern matcher
+        for all link terms, but this is not mandatory.
         """
-        # Split into parts of contiguous alphanumeric characters
-        parts = AutoLinkRelaxSplitRE.split(word)
-        # Filter empty parts
-        parts = [p for p in parts if p != ""]
-
-        # Instead of original non-alphanum characters allow arbitrary
-        # non-alphanum characters
-        pat = r"\b" + (AutoLinkRelaxJoinPAT.join(parts)) + r"\b"
-        regex = re.compile(pat, AutoLinkRelaxJoinFlags)
-
-        return regex
+        return AutoLinkRelaxMatcher(
+                wikiDocument.getWikiData().getAllProducedWikiLinks())
 
 
     @staticmethod
-    def buildAutoLinkRelaxInfo(wikiDocument):
+    def updateAutoLinkRelaxInfo(wikiDocument, relaxInfo, termChanges=None):
         """
-        Build some cache info needed to process auto-links in "relax" mode.
-        This info will be given back in the formatDetails when calling
-        _TheParser.parse().
-        The implementation for this plugin creates a list of regular
-        expressions and the related wiki words, but this is not mandatory.
+        Update the matcher created by buildAutoLinkRelaxInfo() after link
+        terms have changed. Only added and removed terms are processed.
+
+        termChanges -- tuple (added terms, removed terms) since the last
+                build or update or None if unknown, then the matcher is
+                compared to all link terms
         """
-        # Build up regular expression
-        # First fetch all wiki words
-        words = wikiDocument.getWikiData().getAllProducedWikiLinks()
+        if termChanges is None:
+            relaxInfo.updateWords(
+                    wikiDocument.getWikiData().getAllProducedWikiLinks())
+        else:
+            relaxInfo.changeWords(*termChanges)
 
-        # Sort longest words first
-        words.sort(key=lambda w: len(w), reverse=True)
-        
-        return [(_TheHelper._createAutoLinkRelaxWordEntryRE(w), w)
-                for w in words if w != ""]
+        return relaxInfo
 
 
     @staticmethod
@@ -2570,6 +2613,8 @@ class _TheHelper:
             editor.SetTargetEnd(endPos)
             editor.ReplaceTarget(filledText)
             editor.GotoPos(endPos)
+
+            import wx
             editor.scrollXY(0, editor.GetScrollPos(wx.VERTICAL))
 
 
@@ -0,0 +1,175 @@
+"""
+Access to the application object and the main thread for the core modules
+(wiki document, pages, database backends, parsers and exporters).
+
+Normally the application is the wx.App of the GUI. A headless application
+(see HeadlessApp.py) can be installed instead by setHeadlessApp(). Then the
+core modules run without importing wx at all, wx is only imported on
+demand if no headless application is set.
+"""
+
+import sys, os, os.path, traceback, threading
+from inspect import getsourcefile
+
+import ExceptionLogger
+
+from Consts import CONFIG_FILENAME
+
+from . import SystemInfo
+
+
+
+_headlessApp = None
+
+
+def setHeadlessApp(app):
+    """
+    Install a headless application object (or None to use wx again).
+    Must be called before a wiki is opened.
+    """
+    global _headlessApp
+
+    _headlessApp = app
+
+
+def isHeadless():
+    """
+    Return True if a headless application is installed.
+    """
+    return _headlessApp is not None
+
+
+def GetApp():
+    """
+    Replacement for wx.GetApp()
+    """
+    if _headlessApp is not None:
+        return _headlessApp
+
+    import wx
+    return wx.GetApp()
+
+
+def isMainThread():
+    """
+    Replacement for wx.IsMainThread()
+    """
+    if _headlessApp is not None:
+        return threading.current_thread() is threading.main_thread()
+
+    import wx
+    return wx.IsMainThread()
+
+
+def isMainLoopRunning():
+    """
+    Return True if a GUI main loop is running which processes calls
+    sent by callAfter(). It is always False for a headless application.
+    """
+    if _headlessApp is not None:
+        return False
+
+    import wx
+    app = wx.GetApp()
+    return app is not None and app.IsMainLoopRunning()
+
+
+def callAfter(fct, *args, **kwargs):
+    """
+    Replacement for wx.CallAfter(). A headless application queues the call
+    until its processPendingCalls() is called in the main thread.
+    """
+    if _headlessApp is not None:
+        _headlessApp.callAfter(fct, *args, **kwargs)
+        return
+
+    import wx
+    wx.CallAfter(fct, *args, **kwargs)
+
+
+
+def _getUserConfigDir():
+    if _headlessApp is None:
+        try:
+            import wx
+            return wx.StandardPaths.Get().GetUserConfigDir()
+        except ImportError:
+            # Directories are searched before the headless application
+            # is created
+            pass
+
+    if SystemInfo.isWindows():
+        return os.environ.get("APPDATA", "")
+
+    return os.path.expanduser("~")
+
+
+def findDirs():
+    """
+    Returns tuple (wikiAppDir, globalConfigDir)
+    """
+    from os.path import dirname
+    # Not imported at module level because StringOps imports this module
+    # indirectly
+    from .StringOps import mbcsDec, pathEnc
+    
+    wikiAppDir = None
+    
+    if not wikiAppDir and not hasattr(sys, 'frozen'):
+        wikiAppDir = dirname(os.path.abspath(getsourcefile(lambda:0)))
+        # We are in WikidPad/lib/pwiki, go up two levels
+        wikiAppDir = dirname(dirname(wikiAppDir))
+        
+
+    isWindows = SystemInfo.isWindows()
+
+#     try:
+    if not wikiAppDir:
+        wikiAppDir = dirname(os.path.abspath(sys.argv[0]))
+
+    if not wikiAppDir:
+        wikiAppDir = r"C:\Program Files\WikidPad"
+        
+    globalConfigDir = None
+
+    # This allows to keep the program with config on an USB stick
+    if os.path.exists(pathEnc(os.path.join(wikiAppDir, CONFIG_FILENAME))):
+        globalConfigDir = wikiAppDir
+    elif os.path.exists(pathEnc(os.path.join(wikiAppDir, "." + CONFIG_FILENAME))):
+        globalConfigDir = wikiAppDir
+    else:
+        globalConfigDir = os.environ.get("HOME")
+        if not (globalConfigDir and os.path.exists(pathEnc(globalConfigDir))):
+            # Instead of checking USERNAME, the user config dir. is
+            # now used
+            globalConfigDir = _getUserConfigDir()
+            # For Windows the user config dir is "...\Application data"
+            # therefore we go down to "...\Application data\WikidPad"
+            if os.path.exists(pathEnc(globalConfigDir)) and isWindows:
+                try:
+                    realGlobalConfigDir = os.path.join(globalConfigDir,
+                            "WikidPad")
+                    if not os.path.exists(pathEnc(realGlobalConfigDir)):
+                        # If it doesn't exist, create the directory
+                        os.mkdir(pathEnc(realGlobalConfigDir))
+
+                    globalConfigDir = realGlobalConfigDir
+                except:
+                    traceback.print_exc()
+
+#     finally:
+#         pass
+
+    if not globalConfigDir:
+        globalConfigDir = wikiAppDir
+
+    # mbcs decoding
+    if wikiAppDir is not None:
+        wikiAppDir = mbcsDec(wikiAppDir, "replace")[0]
+
+    if globalConfigDir is not None:
+        globalConfigDir = mbcsDec(globalConfigDir, "replace")[0]
+        
+    ExceptionLogger.setLogDestDir(globalConfigDir)
+    
+    return (wikiAppDir, globalConfigDir)
@@ -0,0 +1,267 @@
+"""
+Command line actions of the headless application (see HeadlessApp.py):
+rebuild, export, search and stats on a wiki without GUI.
+
+Run as "python -m WikidPad --batch <action> ..." or "python WikidPadBatch.py
+<action> ...".
+"""
+
+import sys, os, os.path, time, traceback, argparse
+
+from .WikiExceptions import *
+
+from . import AppContext
+from .AppContext import findDirs
+from .StringOps import mbcsDec
+
+from .CmdLineAction import CmdLineAction
+
+
+
+class _BatchCmdLineAction(CmdLineAction):
+    """
+    Runs the export actions of CmdLineAction and reports problems
+    to stderr instead of a message box.
+    """
+    def showCmdLineUsage(self, pWiki, addRemark=""):
+        self.cmdLineError = True
+        sys.stderr.write(addRemark)
+
+
+def _createArgParser():
+    parser = argparse.ArgumentParser(prog="WikidPad --batch",
+            description="Run actions on a wiki without GUI")
+    parser.add_argument("--report-resources", action="store_true",
+            help="print startup time, run time and maximum memory usage "
+            "to stderr")
+    parser.add_argument("--allow-update", action="store_true",
+            help="update the database of the wiki to the current format "
+            "if necessary")
+
+    subParsers = parser.add_subparsers(dest="action")
+    subParsers.required = True
+
+    p = subParsers.add_parser("rebuild", help="rebuild the wiki database")
+    p.add_argument("wiki", help="path of the wiki configuration file")
+    p.add_argument("--only-dirty", action="store_true",
+            help="only update pages which are not up to date")
+    p.add_argument("--update-ext", action="store_true",
+            help="only update externally modified wiki files")
+
+    p = subParsers.add_parser("export", help="export the wiki or a part")
+    p.add_argument("wiki", help="path of the wiki configuration file")
+    p.add_argument("--what", choices=("page", "subtree", "wiki"),
+            default="wiki", help="what to export (default: wiki)")
+    p.add_argument("--type", dest="exportType", help="tag of the export type")
+    p.add_argument("--dest", help="path of destination directory for export")
+    p.add_argument("--page", action="append", default=[],
+            help="page to export (may be given multiple times)")
+    p.add_argument("--compfn", action="store_true",
+            help="use compatible filenames")
+    p.add_argument("--saved", help="name of saved export to run instead")
+
+    p = subParsers.add_parser("search", help="list pages matching a search")
+    p.add_argument("wiki", help="path of the wiki configuration file")
+    p.add_argument("query", help="search string")
+    p.add_argument("--mode", choices=("regex", "text", "boolean", "index"),
+            default="text", help="interpretation of the search string "
+            "(default: text)")
+    p.add_argument("--case-sensitive", action="store_true")
+    p.add_argument("--whole-word", action="store_true")
+
+    p = subParsers.add_parser("stats", help="show statistics of the wiki")
+    p.add_argument("wiki", help="path of the wiki configuration file")
+
+    return parser
+
+
+def _openWiki(app, wikiPath, allowUpdate):
+    """
+    Open wiki and return HeadlessMainControl for it or None on error
+    """
+    from . import WikiDocument
+    from .HeadlessApp import HeadlessMainControl
+
+    cfgPath, wikiWord = WikiDocument.splitConfigPathAndWord(
+            os.path.abspath(wikiPath))
+    if cfgPath is None:
+        sys.stderr.write(_("Wiki '%s' not found") % wikiPath + "\n")
+        return None
+
+    globalConfig = app.getGlobalConfig()
+    ignoreLock = globalConfig.getboolean("main", "wikiLockFile_ignore", False)
+    createLock = globalConfig.getboolean("main", "wikiLockFile_create", True)
+
+    try:
+        wikiDocument = WikiDocument.openWikiDocument(cfgPath, None, None,
+                ignoreLock, createLock)
+        frmcode, frmtext = wikiDocument.checkDatabaseFormat()
+        if frmcode == 2 or (frmcode == 1 and not allowUpdate):
+            sys.stderr.write(_("Error connecting to database in '%s'")
+                    % cfgPath + "\n" + frmtext + "\n")
+            wikiDocument.release()
+            return None
+
+        wikiDocument.connect()
+    except AppBaseException as e:
+        traceback.print_exc()
+        sys.stderr.write(str(e) + "\n")
+        return None
+
+    return HeadlessMainControl(app, wikiDocument)
+
+
+def _rebuildAction(mainControl, args):
+    if args.update_ext:
+        mainControl.updateExternallyModFiles()
+    else:
+        mainControl.rebuildWiki(True, onlyDirty=args.only_dirty)
+
+    return 0
+
+
+def _exportAction(mainControl, args):
+    cmdLine = _BatchCmdLineAction([])
+
+    if args.saved:
+        cmdLine.exportSaved = mbcsDec(args.saved, "replace")[0]
+    else:
+        cmdLine.exportWhat = args.what
+        cmdLine.exportType = args.exportType
+        cmdLine.exportDest = args.dest
+        cmdLine.exportCompFn = args.compfn
+        if args.page:
+            cmdLine.wikiWordsToOpen = tuple(args.page)
+        elif args.what != "wiki":
+            sys.stderr.write(_("Export of page or subtree needs --page") +
+                    "\n")
+            return 2
+
+    try:
+        cmdLine.exportAction(mainControl)
+    except ExportException as e:
+        sys.stderr.write(_("Error while exporting: %s") % str(e) + "\n")
+        return 1
+
+    return 1 if cmdLine.cmdLineError else 0
+
+
+def _searchAction(mainControl, args):
+    from .SearchAndReplace import SearchReplaceOperation
+
+    sarOp = SearchReplaceOperation()
+    sarOp.searchStr = args.query
+    sarOp.wikiWide = True
+    sarOp.caseSensitive = args.case_sensitive
+    sarOp.wholeWord = args.whole_word
+
+    if args.mode == "boolean":
+        sarOp.booleanOp = True
+    elif args.mode == "index":
+        sarOp.indexSearch = "default"
+    elif args.mode == "text":
+        sarOp.wildCard = "no"
+
+    for word in mainControl.getWikiDocument().searchWiki(sarOp, True):
+        print(word)
+
+    return 0
+
+
+def _statsAction(mainControl, args):
+    wikiDocument = mainControl.getWikiDocument()
+    wikiData = wikiDocument.getWikiData()
+
+    dirtyWords = wikiData.getWikiPageNamesForMetaDataState(
+            wikiDocument.getFinalMetaDataState(), ">")
+
+    stats = (
+            (_("Pages"), len(wikiDocument.getAllDefinedWikiPageNames())),
+            (_("Undefined words"), len(wikiData.getUndefinedWords())),
+            (_("Parentless pages"), len(wikiData.getParentlessWikiWords())),
+            (_("Attributes"), len(wikiDocument.getAttributeTriples(
+                    None, None, None))),
+            (_("Todos"), len(wikiDocument.getTodos())),
+            (_("Pages not up to date"), len(dirtyWords))
+        )
+
+    for title, value in stats:
+        print("%s: %i" % (title, value))
+
+    return 0
+
+
+_ACTIONS = {
+        "rebuild": _rebuildAction,
+        "export": _exportAction,
+        "search": _searchAction,
+        "stats": _statsAction
+    }
+
+
+def _getMaxRss():
+    """
+    Return maximum resident set size of the process in kB or None if
+    unknown.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        # Reported in bytes instead of kB
+        maxRss //= 1024
+
+    return maxRss
+
+
+def writeResourceReport(startTime, readyTime):
+    """
+    Write startup time, time of the actions and max. RSS to stderr. Also
+    used by the GUI start for option --report-resources.
+
+    startTime -- time.perf_counter() value when the process started
+    readyTime -- time.perf_counter() value when the wiki was opened
+    """
+    sys.stderr.write("Startup: %.3f s, action: %.3f s\n" %
+            (readyTime - startTime, time.perf_counter() - readyTime))
+    maxRss = _getMaxRss()
+    if maxRss is not None:
+        sys.stderr.write("Max. RSS: %i kB\n" % maxRss)
+
+
+def main(argv, startTime=None):
+    """
+    Run batch action given by argv (without program name) and return exit code.
+    startTime -- time.perf_counter() value when the process started or None
+    """
+    from .HeadlessApp import HeadlessApp
+
+    if startTime is None:
+        startTime = time.perf_counter()
+
+    args = _createArgParser().parse_args(argv)
+
+    wikiAppDir, globalConfigDir = findDirs()
+    app = HeadlessApp(wikiAppDir, globalConfigDir)
+    AppContext.setHeadlessApp(app)
+
+    mainControl = _openWiki(app, args.wiki, args.allow_update)
+    if mainControl is None:
+        return 1
+
+    readyTime = time.perf_counter()
+
+    try:
+        result = _ACTIONS[args.action](mainControl, args)
+        app.processPendingCalls()
+    finally:
+        mainControl.getWikiDocument().release()
+        app.processPendingCalls()
+
+    if args.report_resources:
+        writeResourceReport(startTime, readyTime)
+
+    return result
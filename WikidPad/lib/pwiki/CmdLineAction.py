@@ -1,6 +1,4 @@
-import sys, os, getopt, traceback
-
-import wx
+import sys, os, getopt, traceback, time
 
 from .WikiExceptions import *
 
@@ -20,10 +18,13 @@ class CmdLineAction:
     REBUILD_EXT = 1 # Update externally modified files
     REBUILD_FULL = 2 # Full rebuild
 
-    def __init__(self, sargs):
+    def __init__(self, sargs, startTime=None):
         """
         sargs -- stripped args (normally sys.args[1:])
+        startTime -- time.perf_counter() value when the process started,
+                used for --report-resources
         """
+        self.startTime = startTime
         self.wikiToOpen = None  # Path to wiki to open
                 # (interpreted by PersonalWikiFrame)
         self.wikiWordsToOpen = None  # Name of wiki words to open
@@ -47,6 +48,7 @@ class CmdLineAction:
         self.lastTabsSubCtrls = None  # Corresponding list of subcontrol names
                 # for each wikiword to open
         self.noRecent = False  # Do not modify history of recently opened wikis
+        self.reportResources = False  # Write startup time and memory to stderr
 
         if len(sargs) == 0:
             return
@@ -70,7 +72,8 @@ class CmdLineAction:
                     "export-type=", "export-dest=", "export-compfn",
                     "export-saved=", "continuous-export-saved=",
                     "anchor",
-                    "rebuild", "update-ext", "no-recent", "preview", "editor"])
+                    "rebuild", "update-ext", "no-recent", "preview", "editor",
+                    "report-resources"])
         except getopt.GetoptError:
             self.cmdLineError = True
             return
@@ -106,6 +109,8 @@ class CmdLineAction:
                 self.rebuild = self.REBUILD_EXT
             elif o == "--no-recent":                
                 self.noRecent = True
+            elif o == "--report-resources":
+                self.reportResources = True
             elif o == "--preview":
                 self._fillLastTabsSubCtrls(len(wikiWordsToOpen), "preview")
             elif o == "--editor":
@@ -177,10 +182,16 @@ class CmdLineAction:
         """
         Actions to do before the main frame is shown
         """
+        readyTime = time.perf_counter()
+
         self.rebuildAction(pWiki)
         self.exportAction(pWiki)
         self.continuousExportAction(pWiki)
 
+        if self.reportResources and self.startTime is not None:
+            from .BatchAction import writeResourceReport
+            writeResourceReport(self.startTime, readyTime)
+
         if self.showHelp:
             self.showCmdLineUsage(pWiki)
 
@@ -268,6 +279,7 @@ class CmdLineAction:
         if not continuousExport:
             wordList = pWiki.getWikiDocument().searchWiki(sarOp,
                     True)
+            self._allowExportProcessPool(exporter)
             try:
                 exporter.export(pWiki.getWikiDocument(), wordList,
                         etype, exportDest, self.exportCompFn, addOpt, None)
@@ -284,6 +296,16 @@ class CmdLineAction:
 
 
 
+    @staticmethod
+    def _allowExportProcessPool(exporter):
+        """
+        Exports from command line run unattended, so exporters which
+        support it may render pages in worker processes.
+        """
+        if hasattr(exporter, "setProcessPoolAllowed"):
+            exporter.setProcessPoolAllowed(True)
+
+
     def exportAction(self, pWiki):
         if not (self.exportWhat or self.exportType or self.exportDest or
                 self.exportSaved):
@@ -345,9 +367,11 @@ class CmdLineAction:
             exList = ", ".join([ei[1] for ei in exporterList])
             
             self.showCmdLineUsage(pWiki,
-                    _("Value for --export-type can be one of:\n%s") % exList) + "\n\n"
+                    _("Value for --export-type can be one of:\n%s") % exList +
+                    "\n\n")
             return
 
+        self._allowExportProcessPool(exporter)
         try:
             exporter.export(pWiki.getWikiDocument(), wordList,
                     self.exportType, self.exportDest, 
@@ -389,6 +413,8 @@ N_("""Options:
     --rebuild: rebuild the Wiki database
     --update-ext: update externally modified wiki files
     --no-recent: Do not record opened wikis in recently opened wikis list
+    --report-resources: Write startup time, time of command line actions and
+               max. memory use to stderr
     --preview: If no pages are given, all opened pages from previous session
                are opened in preview mode. Otherwise all pages given after that
                option are opened in preview mode.
@@ -400,6 +426,8 @@ N_("""Options:
         """
         Show dialog with addRemark and command line usage information.
         """
+        import wx
+
         wx.MessageBox(addRemark + _(self.USAGE), _("Usage information"),
                 style=wx.OK, parent=None)
 
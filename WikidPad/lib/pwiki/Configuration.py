@@ -5,7 +5,6 @@ import io
 # from os.path import *
 
 import codecs
-import wx
 
 from .MiscEvent import MiscEventSourceMixin
 from .WikiExceptions import *
@@ -99,6 +98,23 @@ class _AbstractConfiguration:
 
 
 
+class SnapshotConfiguration(_AbstractConfiguration):
+    """
+    Read-only configuration from a dictionary {(section, option): value},
+    e.g. a copy of the wiki configuration for worker processes
+    """
+    def __init__(self, settings):
+        self.settings = settings
+
+    def get(self, section, option, default=None):
+        result = self.settings.get((section, option))
+        if result is None:
+            return default
+
+        return result
+
+
+
 class SingleConfiguration(_AbstractConfiguration, MiscEventSourceMixin):
     """
     Wraps a single ConfigParser object
@@ -669,6 +685,8 @@ GLOBALDEFAULTS = {
     ("main", "html_toc_title"): "Table of Contents",  # title of table of contents
     ("main", "html_export_singlePage_sepLineCount"): "10",  # How many empty lines to separate
             # two wiki pages in a single HTML page
+    ("main", "html_export_continuous_updateDelay"): "1.0",  # Seconds to wait for further page
+            # updates before the file of a continuous "html_multi" export is written again
     ("main", "html_preview_renderer"): "0",  # 0: Internal wxWidgets; 1: IE; 2: Mozilla; 3: Webkit
     ("main", "html_preview_ieShowIframes"): "False",  # Show iframes with external sources inside IE preview?
     ("main", "html_preview_webkitViKeys"): "False",  # Allow shortcut keys of vi editor to move around in Webkit preview
@@ -834,6 +852,8 @@ GLOBALDEFAULTS = {
 
     ("main", "search_dontAllowCancel"): "False", # Iff true a running search can't be canceled
             # (advanced option to cure a problem on Mac OS)
+    ("main", "search_fileReadWorkerCount"): "4", # Number of threads reading page files ahead when searching
+            # a wiki with one file per page (Original Sqlite)
     ("main", "search_stripSpaces"): "False", # Iff True then leading and trailing spaces are
             # stripped from search text before searching
 
@@ -861,7 +881,21 @@ GLOBALDEFAULTS = {
             # than base and shift level
     ("main", "zombieCheck"): "True", # Check for already running processes? Only active if "single_process" is True
     ("main", "cpu_affinity"): "-1", # Assign process to a single CPU? -1: Use CPU affinity on startup; greater numbers denote a particular CPU
-
+    ("main", "rebuild_processCount"): "0", # Number of worker processes which parse pages when rebuilding a wiki.
+            # 0: Parse in main process; -1: One process per CPU
+    ("main", "export_processCount"): "-1", # Number of worker processes which render pages of
+            # an HTML export started from command line. 0: Render in main process; -1: One process per CPU
+    ("main", "pageAstCache_maxSize"): "32", # Maximum size in MB of the on-disk cache of parsed pages
+            # which is stored next to a wiki. 0: Cache disabled
+    ("main", "updateBatch_maxPages"): "200", # Maximum number of pages whose meta-data or search index data
+            # written by the background update is committed at once. 1: Commit after each page
+    ("main", "updateBatch_maxDelay"): "2.0", # Maximum time in seconds meta-data or search index data written by the
+            # background update stays uncommitted while the update is busy
+    ("main", "updateExecutor_workerCount"): "1", # Number of threads performing the background update
+            # of meta-data and search index. Jobs for the same page never run concurrently
+
+    ("main", "sqlite_driver"): "stdlib", # Implementation used to access the database of "sqlite" wikis.
+            # stdlib: sqlite3 module of Python; ctypes: WikidPad's own binding to the sqlite library
     ("main", "tempHandling_preferMemory"): "False", # Prefer to store temporary data in memory where this is possible?
     ("main", "tempHandling_tempMode"): "system", # Mode for storing of temporary data.
             # system: use system default temp dir; config: use config subdirectory; given: use directory given
@@ -887,6 +921,9 @@ WIKIDEFAULTS = {
             # full database for "compact sqlite")
             # If name is empty, defaults are used (original gadfly: "wikidb", original sqlite: "wikiovw.sli",
             # compact sqlite: "wiki.sli")
+    ("wiki_db", "db_accessMode"): "serialized", # How threads access the database. "serialized": one connection,
+            # all access serialized by one lock; "readers": read-only functions may use additional connections
+            # per thread while another thread writes (switches database to WAL journal mode)
 
     ("main", "wiki_name"): None,
     ("main", "wiki_wikiLanguage"): "wikidpad_default_2_0", # Internal name of wiki language of the wiki
@@ -897,6 +934,10 @@ WIKIDEFAULTS = {
     ("main", "indexSearch_enabled"): "False", # should the index search be enabled?
     ("main", "indexSearch_formatNo"): "1", # internal: Number of format of search index (only valid if index enabled)
             # if it doesn't match format number of this WikidPad version, index rebuild is needed
+    ("main", "indexSearch_backend"): "whoosh", # Where to keep the search index:
+            # "whoosh": separate index in subdirectory "indexsearch" of the wiki
+            # "fts5": SQLite FTS5 table inside the wiki database, whoosh is
+            # used if sqlite library or database backend don't support it
     ("main", "tabs_maxCharacters"): "0", # Maximum number of characters to show on a tab (0: inifinite)
     ("main", "template_pageNamesRE"): "^template/",  # Regular expression pattern for pages which should be seen as templates
             # Especially they will be listed in text editor context menu on new pages
@@ -952,6 +993,10 @@ WIKIDEFAULTS = {
     ("main", "wikiPageFiles_maxNameLength"): "120", # Maximum length of overall name of a wiki page file
     ("main", "wikiPageFiles_gracefulOutsideAddAndRemove"): "True",   # Handle missing wiki page files gracefully and try
             # to find existing files even if they are not in database.
+    ("main", "wikiPageFiles_watchExternalChanges"): "True",   # Watch wiki page files for changes by other programs
+            # (external editor, sync tools) and update meta-data of changed pages.
+    ("main", "wikiPageFiles_watchPollInterval"): "5.0",   # Seconds between scans of the wiki page files
+            # if the operating system can't report changes.
 
     ("main", "wikiPageFiles_writeFileMode"): "0", # How wiki page files are modified on saving?
             # 0: Safe: create temp file, delete target file, rename temp to target
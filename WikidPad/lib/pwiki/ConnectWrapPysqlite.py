@@ -9,7 +9,7 @@ needed in WikidPad.
 
 import sqlite3, traceback
 
-from wx import GetApp
+from .AppContext import GetApp
 
 from pwiki.WikiExceptions import *
 from .StringOps import utf8Enc
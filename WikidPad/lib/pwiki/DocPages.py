@@ -7,8 +7,6 @@ import os.path, re, struct, time, traceback, collections
 
 from .rtlibRepl import minidom
 
-import wx
-
 from .MiscEvent import MiscEventSourceMixin, KeyFunctionSinkAR
 
 import Consts
@@ -17,7 +15,8 @@ from .WikiExceptions import *
 from .StringOps import strToBool, fileContentToUnicode, lineendToInternal, \
         loadEntireTxtFile, writeEntireFile
 
-from . import Utilities
+from . import Utilities, AppContext
+from .AppContext import GetApp
 from .Utilities import DUMBTHREADSTOP, FunctionThreadStop, TimeoutRLock, \
         callInMainThread, callInMainThreadAsync
 
@@ -182,7 +181,12 @@ class DocPage(MiscEventSourceMixin):
             self.writeToDatabase(text, fireEvent=fireEvent)
 
 
-    def replaceLiveText(self, text, fireEvent=True):
+    def replaceLiveText(self, text, fireEvent=True, updateMetaData=True):
+        """
+        updateMetaData -- If False and page is not in an editor, the text is
+                written to the database without initiating the update
+                of meta-data. Caller must queue the update then.
+        """
         with self.textOperationLock:
             if self.isReadOnlyEffect():
                 return
@@ -196,7 +200,8 @@ class DocPage(MiscEventSourceMixin):
                 txtEditor.replaceText(text)
                 return
 
-            self.writeToDatabase(text, fireEvent=fireEvent)
+            self.writeToDatabase(text, fireEvent=fireEvent,
+                    updateMetaData=updateMetaData)
 
 
     def informEditorTextChanged(self, changer):
@@ -228,7 +233,7 @@ class DocPage(MiscEventSourceMixin):
 
 
     def createWikiLanguageHelper(self):
-        return wx.GetApp().createWikiLanguageHelper(self.getWikiLanguageName())
+        return GetApp().createWikiLanguageHelper(self.getWikiLanguageName())
 
 
     def getContent(self):
@@ -269,9 +274,10 @@ class DocPage(MiscEventSourceMixin):
         return (self.wikiDocument is None) or self.wikiDocument.isReadOnlyEffect()
 
 
-    def writeToDatabase(self, text=None, fireEvent=True):
+    def writeToDatabase(self, text=None, fireEvent=True, updateMetaData=True):
         """
-        Write current text to database and initiate update of meta-data.
+        Write current text to database and initiate update of meta-data
+        (if updateMetaData is True).
         """
         with self.textOperationLock:
             if self.isReadOnlyEffect():
@@ -282,7 +288,10 @@ class DocPage(MiscEventSourceMixin):
                 if text is None:
                     text = self.getLiveText()
                 self._save(text, fireEvent=fireEvent)
-                self.initiateUpdate(fireEvent=fireEvent)
+                if updateMetaData:
+                    self.initiateUpdate(fireEvent=fireEvent)
+            elif not updateMetaData:
+                return
             elif u:
                 self.initiateUpdate(fireEvent=fireEvent)
             else:
@@ -499,6 +508,14 @@ class AbstractWikiPage(DataCarryingPage):
         self.livePageBaseFormatDetails = None   # Cached format details on which the
                 # page-ast bases
 
+        # Tuple (text, pageAst, formatDetails, ccBlacklist, nccBlacklist)
+        # of the last built live page AST. It is used to reparse only the
+        # changed part of the text
+        self.incrementalParseBase = None
+        # Tuple (basePageAst, (start, baseEnd, end)) if livePageAst was
+        # built incrementally from basePageAst, None otherwise
+        self.livePageAstChange = None
+
         # List of words unknown to spellchecker
         self.liveSpellCheckerUnknownWords = None
 
@@ -738,7 +755,7 @@ class AbstractWikiPage(DataCarryingPage):
                 return globalAttrs[attrkey]
 
             option = "attributeDefault_" + attrkey
-            config = wx.GetApp().getGlobalConfig()
+            config = GetApp().getGlobalConfig()
             if config.isOptionAllowed("main", option):
                 return config.get("main", option, default)
             
@@ -806,7 +823,7 @@ class AbstractWikiPage(DataCarryingPage):
             paragraphMode = strToBool(self.getAttributeOrGlobal(
                     "paragraph_mode"), False)
                     
-            langHelper = wx.GetApp().createWikiLanguageHelper(
+            langHelper = GetApp().createWikiLanguageHelper(
                     self.wikiDocument.getWikiDefaultWikiLanguage())
 
             wikiLanguageDetails = langHelper.createWikiLanguageDetails(
@@ -853,6 +870,127 @@ class AbstractWikiPage(DataCarryingPage):
         return pageAst.iterDeepByName("todoEntry")
 
 
+    @staticmethod
+    def extractReferencesFromPageAst(pageAst, langHelper, basePage):
+        """
+        Return list of page names the wiki words, "page" insertions and
+        attributes with wiki word values in pageAst point to. The same
+        references are updated by WikiDocument.renameWikiWords().
+
+        basePage -- page on which the references are placed, needed to
+                resolve relative links
+        """
+        wikiDocument = basePage.getWikiDocument()
+        references = []
+        referenceSet = set()
+
+        def addReference(target):
+            if target not in referenceSet:
+                references.append(target)
+                referenceSet.add(target)
+
+        def addLinkReference(value):
+            if langHelper.checkForInvalidWikiLink(value, wikiDocument):
+                return
+            try:
+                addReference(langHelper.resolveWikiWordLink(value, basePage))
+            except ValueError:  # invalid link
+                pass
+
+        for node in pageAst.iterDeep():
+            if node.name == "wikiWord":
+                addReference(node.wikiWord)
+            elif node.name == "attribute":
+                if node.key in Consts.ATTRIBUTES_WITH_WIKIWORD_VALUES:
+                    for key, value in node.attrs:
+                        addLinkReference(value)
+            elif node.name == "insertion":
+                if node.key == "page":
+                    addLinkReference(node.value)
+
+        return references
+
+
+    # The following extraction functions are used by the in-process
+    # meta-data update of WikiPage and by the workers of the RebuildEngine
+    # so both store the same data
+
+    @staticmethod
+    def extractAttributesFromPageAst(pageAst, threadstop=DUMBTHREADSTOP):
+        """
+        Return dictionary {key: list of values} of the attributes in pageAst
+        (without the ones inside of todo entries).
+        """
+        attrs = {}
+        for node in AbstractWikiPage.extractAttributeNodesFromPageAst(pageAst):
+            for attrKey, attrValue in \
+                    (getattr(node, "attrs", []) + getattr(node, "props", [])):  # TODO remove "property"-compatibility
+                threadstop.testValidThread()
+                attrs.setdefault(attrKey, []).append(attrValue)
+
+        return attrs
+
+
+    @staticmethod
+    def extractTodosFromPageAst(pageAst, threadstop=DUMBTHREADSTOP):
+        """
+        Return list of tuples (todoKey, todoValue) of the todo entries in
+        pageAst, each todo only once.
+        """
+        todos = []
+        for node in AbstractWikiPage.extractTodoNodesFromPageAst(pageAst):
+            for todoKey, todoValueNode in node.todos:
+                threadstop.testValidThread()
+                todo = (todoKey, todoValueNode.getString())
+                if todo not in todos:
+                    todos.append(todo)
+
+        return todos
+
+
+    @staticmethod
+    def extractChildRelationsFromPageAst(pageAst, threadstop=DUMBTHREADSTOP):
+        """
+        Return list of tuples (toWord, pos) of the wiki words in pageAst,
+        each word only once with its first position.
+        """
+        childRelations = []
+        childRelationSet = set()
+        for node in pageAst.iterDeepByName("wikiWord"):
+            threadstop.testValidThread()
+            if node.wikiWord not in childRelationSet:
+                childRelations.append((node.wikiWord, node.pos))
+                childRelationSet.add(node.wikiWord)
+
+        return childRelations
+
+
+    @staticmethod
+    def extractHeadingTermsFromPageAst(pageAst, depth,
+            threadstop=DUMBTHREADSTOP):
+        """
+        Return list of tuples (title, pos) of the headings up to level depth
+        in pageAst which are used as match terms. pos is the end position
+        of the heading.
+        """
+        headingTerms = []
+        if depth <= 0:
+            return headingTerms
+
+        for node in pageAst.iterFlatByName("heading"):
+            threadstop.testValidThread()
+            if node.level > depth:
+                continue
+
+            title = node.getString()
+            if title.endswith("\n"):
+                title = title[:-1]
+
+            headingTerms.append((title, node.pos + node.strLength))
+
+        return headingTerms
+
+
     def _save(self, text, fireEvent=True):
         """
         Saves the content of current doc page.
@@ -921,6 +1059,11 @@ class AbstractWikiPage(DataCarryingPage):
                 text = self.getLiveText()
                 liveTextPlaceHold = self.liveTextPlaceHold
                 formatDetails = self.getFormatDetails()
+                # Only text as loaded from the database is worth caching.
+                # Once the page was parsed, later texts come from the editor
+                # and are parsed incrementally
+                useAstCache = self.saveDirtySince is None and \
+                        self.incrementalParseBase is None
 
                 pageAst = self.getLivePageAstIfAvailable()
 
@@ -937,11 +1080,33 @@ class AbstractWikiPage(DataCarryingPage):
                             lambda: origThreadstop.isValidThread() and 
                             liveTextPlaceHold is self.liveTextPlaceHold)
 
+            astChange = None
             if len(text) == 0:
                 pageAst = buildSyntaxNode([], 0)
             else:
-                pageAst = self.parseTextInContext(text, formatDetails=formatDetails,
-                        threadstop=threadstop)
+                pageAst = None
+                astCache = None
+                if useAstCache:
+                    astCache = self.wikiDocument.getPageAstCache()
+                cacheKey = None
+                if astCache is not None:
+                    cacheKey = astCache.buildKey(self, text, formatDetails)
+                    if cacheKey is not None:
+                        pageAst = astCache.get(cacheKey)
+
+                if pageAst is None:
+                    result = self._parseLiveTextIncrementally(text,
+                            formatDetails, threadstop)
+                    if result is not None:
+                        pageAst, changeRange = result
+                        astChange = (self.incrementalParseBase[1], changeRange)
+                    else:
+                        pageAst = self.parseTextInContext(text,
+                                formatDetails=formatDetails,
+                                threadstop=threadstop)
+
+                    if cacheKey is not None:
+                        astCache.put(cacheKey, pageAst)
 
             with self.textOperationLock:
                 threadstop.testValidThread()
@@ -949,6 +1114,10 @@ class AbstractWikiPage(DataCarryingPage):
                 self.livePageAst = pageAst
                 self.livePageBasePlaceHold = liveTextPlaceHold
                 self.livePageBaseFormatDetails = formatDetails
+                self.livePageAstChange = astChange
+                self.incrementalParseBase = (text, pageAst, formatDetails,
+                        self.wikiDocument.getCcWordBlacklist(),
+                        self.wikiDocument.getNccWordBlacklist())
 
 
         if self.isReadOnlyEffect():
@@ -964,6 +1133,58 @@ class AbstractWikiPage(DataCarryingPage):
             return pageAst
 
 
+    def _parseLiveTextIncrementally(self, text, formatDetails, threadstop):
+        """
+        Parse text by reparsing only the changed part of the text the
+        previous live page AST was built from, if the wiki language
+        supports it.
+        Returns tuple (pageAst, (start, baseEnd, end)) or None if text
+        must be parsed completely.
+        """
+        base = self.incrementalParseBase
+        if base is None:
+            return None
+
+        baseText, basePageAst, baseFormatDetails, baseCcBlacklist, \
+                baseNccBlacklist = base
+
+        # The blacklist sets are replaced, not modified, on change
+        if not formatDetails.isEquivTo(baseFormatDetails) or \
+                baseCcBlacklist is not self.wikiDocument.getCcWordBlacklist() or \
+                baseNccBlacklist is not self.wikiDocument.getNccWordBlacklist():
+            return None
+
+        parser = GetApp().createWikiParser(self.getWikiLanguageName())
+        try:
+            parseIncremental = getattr(parser, "parseIncremental", None)
+            if parseIncremental is None:
+                return None
+
+            result = parseIncremental(self.getWikiLanguageName(), text,
+                    formatDetails, threadstop, baseText, basePageAst)
+        finally:
+            GetApp().freeWikiParser(parser)
+
+        threadstop.testValidThread()
+
+        return result
+
+
+    def getLivePageAstChange(self, pageAst):
+        """
+        Return tuple (basePageAst, (start, baseEnd, end)) if  pageAst  is
+        the current live page AST and was built from  basePageAst  by
+        reparsing only the characters from start to end of the text
+        (from start to baseEnd in the text of basePageAst).
+        Return None otherwise.
+        """
+        with self.textOperationLock:
+            if pageAst is not self.livePageAst:
+                return None
+
+            return self.livePageAstChange
+
+
     def onModifiedSpellCheckerSession(self, miscevt):
         """
         Invalidate spell checker data when e.g. new words are added to
@@ -1070,7 +1291,7 @@ class AbstractWikiPage(DataCarryingPage):
 
         text: unistring with text
         """
-        parser = wx.GetApp().createWikiParser(self.getWikiLanguageName()) # TODO debug mode  , True
+        parser = GetApp().createWikiParser(self.getWikiLanguageName()) # TODO debug mode  , True
 
         if formatDetails is None:
             formatDetails = self.getFormatDetails()
@@ -1079,7 +1300,7 @@ class AbstractWikiPage(DataCarryingPage):
             pageAst = parser.parse(self.getWikiLanguageName(), text,
                     formatDetails, threadstop=threadstop)
         finally:
-            wx.GetApp().freeWikiParser(parser)
+            GetApp().freeWikiParser(parser)
 
         threadstop.testValidThread()
 
@@ -1348,7 +1569,7 @@ class WikiPage(AbstractWikiPage):
             # Check for "template" attribute
             parents = self.getParentRelationships()
             if len(parents) > 0:
-                langHelper = wx.GetApp().createWikiLanguageHelper(
+                langHelper = GetApp().createWikiLanguageHelper(
                         self.getWikiLanguageName())
 
                 templateSource = None
@@ -1442,7 +1663,7 @@ class WikiPage(AbstractWikiPage):
         Delete a page which doesn't really exist.
         Just sends an appropriate event.
         """
-        wx.CallAfter(self.fireMiscEventKeys,
+        AppContext.callAfter(self.fireMiscEventKeys,
                 ("pseudo-deleted page", "pseudo-deleted wiki page"))
 
 
@@ -1465,7 +1686,7 @@ class WikiPage(AbstractWikiPage):
             self.queueRemoveFromSearchIndex()   # TODO: Check for (dead-)locks
 
             if fireEvent:
-                wx.CallAfter(self.fireMiscEventKeys,
+                AppContext.callAfter(self.fireMiscEventKeys,
                         ("deleted page", "deleted wiki page"))
 
 
@@ -1488,8 +1709,8 @@ class WikiPage(AbstractWikiPage):
 
     def renameVersionData(self, newWord):
         """
-        This is called by WikiDocument during
-        WikiDocument.renameWikiWord() and shouldn't be called elsewhere.
+        This is called by the RenameEngine during
+        WikiDocument.renameWikiWords() and shouldn't be called elsewhere.
         """
         with self.textOperationLock:
             vo = self.getExistingVersionOverview()
@@ -1570,7 +1791,7 @@ class WikiPage(AbstractWikiPage):
             callInMainThread(editor.handleInvalidFileSignature, self)
 
         if fireEvent:
-            wx.CallAfter(self.fireMiscEventKeys,
+            AppContext.callAfter(self.fireMiscEventKeys,
                     ("checked file signature invalid",))
 
         return False
@@ -1630,25 +1851,7 @@ class WikiPage(AbstractWikiPage):
         if self.wikiDocument.isReadOnlyEffect():
             return True  # TODO Error?
 
-        langHelper = wx.GetApp().createWikiLanguageHelper(
-                self.getWikiLanguageName())
-
-        attrs = {}
-
-        def addAttribute(key, value):
-            threadstop.testValidThread()
-            values = attrs.get(key)
-            if not values:
-                values = []
-                attrs[key] = values
-            values.append(value)
-
-
-        attrNodes = self.extractAttributeNodesFromPageAst(pageAst)
-        for node in attrNodes:
-            for attrKey, attrValue in \
-                    (getattr(node, "attrs", []) + getattr(node, "props", [])):  # TODO remove "property"-compatibility
-                addAttribute(attrKey, attrValue)
+        attrs = self.extractAttributesFromPageAst(pageAst, threadstop)
 
         with self.textOperationLock:
             threadstop.testValidThread()
@@ -1690,73 +1893,27 @@ class WikiPage(AbstractWikiPage):
         if self.wikiDocument.isReadOnlyEffect():
             return True   # return True or False?
 
-        todos = []
-        childRelations = []
-        childRelationSet = set()
-
-        def addTodo(todoKey, todoValue):
-            threadstop.testValidThread()
-            todo = (todoKey, todoValue)
-            if todo not in todos:
-                todos.append(todo)
-
-        def addChildRelationship(toWord, pos):
-            threadstop.testValidThread()
-            if toWord not in childRelationSet:
-                childRelations.append((toWord, pos))
-                childRelationSet.add(toWord)
-
-        # Add todo entries
-        todoNodes = pageAst.iterDeepByName("todoEntry")
-        for node in todoNodes:
-            for todoKey, todoValueNode in node.todos:
-                addTodo(todoKey, todoValueNode.getString())
-
+        todos = self.extractTodosFromPageAst(pageAst, threadstop)
         threadstop.testValidThread()
 
-        # Add child relations
-        wwTokens = pageAst.iterDeepByName("wikiWord")
-        for t in wwTokens:
-            addChildRelationship(t.wikiWord, t.pos)
-
+        childRelations = self.extractChildRelationsFromPageAst(pageAst,
+                threadstop)
         threadstop.testValidThread()
-        
-        # Add aliases to match terms
-        matchTerms = []
 
-        ALIAS_TYPE = Consts.WIKIWORDMATCHTERMS_TYPE_EXPLICIT_ALIAS | \
-                Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK | \
-                Consts.WIKIWORDMATCHTERMS_TYPE_FROM_ATTRIBUTES
-
-        langHelper = wx.GetApp().createWikiLanguageHelper(
+        # Add references to other pages, needed when renaming them
+        langHelper = GetApp().createWikiLanguageHelper(
                 self.getWikiLanguageName())
-
-        for w, k, v in self.getWikiDocument().getAttributeTriples(
-                self.wikiPageName, "alias", None):
-            threadstop.testValidThread()
-            if not langHelper.checkForInvalidWikiLink(v,
-                                                      self.getWikiDocument()):
-#                 matchTerms.append((v, ALIAS_TYPE, self.wikiPageName, -1, -1))
-                matchTerms.append((langHelper.resolveWikiWordLink(v, self),
-                        ALIAS_TYPE, self.wikiPageName, -1, -1))
+        references = self.extractReferencesFromPageAst(pageAst, langHelper,
+                self)
+        threadstop.testValidThread()
 
         # Add headings to match terms if wanted
         depth = self.wikiDocument.getWikiConfig().getint(
                 "main", "headingsAsAliases_depth")
+        headingTerms = self.extractHeadingTermsFromPageAst(pageAst, depth,
+                threadstop)
 
-        if depth > 0:
-            HEADALIAS_TYPE = Consts.WIKIWORDMATCHTERMS_TYPE_FROM_CONTENT
-            for node in pageAst.iterFlatByName("heading"):
-                threadstop.testValidThread()
-                if node.level > depth:
-                    continue
-
-                title = node.getString()
-                if title.endswith("\n"):
-                    title = title[:-1]
-                
-                matchTerms.append((title, HEADALIAS_TYPE, self.wikiPageName,
-                        node.pos + node.strLength, 0))
+        matchTerms = self.buildMatchTerms(headingTerms, threadstop)
 
         with self.textOperationLock:
             threadstop.testValidThread()
@@ -1770,6 +1927,8 @@ class WikiPage(AbstractWikiPage):
             self.getWikiData().updateChildRelations(self.wikiPageName,
                     childRelations)
             threadstop.testValidThread()
+            self.getWikiData().updateReferences(self.wikiPageName, references)
+            threadstop.testValidThread()
             self.getWikiData().updateWikiWordMatchTerms(self.wikiPageName,
                     matchTerms)
             threadstop.testValidThread()
@@ -1813,52 +1972,157 @@ class WikiPage(AbstractWikiPage):
         return valid
 
 
-    def putIntoSearchIndex(self, threadstop=DUMBTHREADSTOP):
+    def _isRebuildResultCurrent(self, liveTextPlaceHold, formatDetails):
         """
-        Add or update the index for the given docPage
+        Called inside self.textOperationLock. Returns True if a result
+        computed by the rebuild engine from the live text with placeholder
+        liveTextPlaceHold and the given formatDetails is still valid.
+        """
+        return self.saveDirtySince is None and \
+                self.liveTextPlaceHold is liveTextPlaceHold and \
+                self.getFormatDetails().isEquivTo(formatDetails)
+
+
+    def refreshAttributesFromRebuildResult(self, attrs, liveTextPlaceHold,
+            formatDetails):
+        """
+        Counterpart of refreshAttributesFromPageAst() for results computed
+        by RebuildEngine in a worker process.
+
+        attrs -- dictionary {key: list of values}
+        liveTextPlaceHold -- placeholder of live text which was parsed
+        formatDetails -- format details used for parsing
         """
+        if self.wikiDocument.isReadOnlyEffect():
+            return True
+
         with self.textOperationLock:
-            threadstop.testValidThread()
+            self.attrs = None
 
-            if self.isInvalid() or not self.getWikiDocument().isSearchIndexEnabled():
-                return True  # Or false?
-            
-            liveTextPlaceHold = self.liveTextPlaceHold
-            content = self.getLiveText()
+        try:
+            self.getWikiData().updateAttributes(self.wikiPageName, attrs)
+        except WikiWordNotFoundException:
+            return False
+
+        with self.textOperationLock:
+            if self._isRebuildResultCurrent(liveTextPlaceHold, formatDetails):
+                self.getWikiData().setMetaDataState(self.wikiPageName,
+                        Consts.WIKIWORDMETADATA_STATE_ATTRSPROCESSED)
+                return True
+
+        return False
+
+
+    def refreshMainDbCacheFromRebuildResult(self, todos, childRelations,
+            headingTerms, references, liveTextPlaceHold, formatDetails,
+            fireEvent=True):
+        """
+        Counterpart of refreshMainDbCacheFromPageAst() for results computed
+        by RebuildEngine in a worker process.
+
+        todos -- list of (todoKey, todoValue) tuples
+        childRelations -- list of (toWord, pos) tuples
+        headingTerms -- list of (title, pos) tuples for headings to use as
+                match terms
+        references -- list of page names referenced by the page
+                (see extractReferencesFromPageAst())
+        liveTextPlaceHold -- placeholder of live text which was parsed
+        formatDetails -- format details used for parsing
+        """
+        if self.wikiDocument.isReadOnlyEffect():
+            return True
+
+        matchTerms = self.buildMatchTerms(headingTerms)
+
+        with self.textOperationLock:
+            self.todos = None
+            self.childRelations = None
+            self.childRelationSet = set()
 
-        writer = None
         try:
-            searchIdx = self.getWikiDocument().getSearchIndex()
-            writer = searchIdx.writer(timeout=Consts.DEADBLOCKTIMEOUT)
+            self.getWikiData().updateTodos(self.wikiPageName, todos)
+            self.getWikiData().updateChildRelations(self.wikiPageName,
+                    childRelations)
+            self.getWikiData().updateReferences(self.wikiPageName, references)
+            self.getWikiData().updateWikiWordMatchTerms(self.wikiPageName,
+                    matchTerms)
+        except WikiWordNotFoundException:
+            return False
+
+        valid = False
+        with self.textOperationLock:
+            if self._isRebuildResultCurrent(liveTextPlaceHold, formatDetails):
+                self.updateDirtySince = None
 
-            unifName = self.getUnifiedPageName()
+                self.getWikiData().setMetaDataState(self.wikiPageName,
+                        Consts.WIKIWORDMETADATA_STATE_SYNTAXPROCESSED)
+                valid = True
 
-            writer.delete_by_term("unifName", unifName)
-            
-            assert isinstance(content, str)
-                                    
-            writer.add_document(unifName=unifName,
-                    modTimestamp=self.getTimestamps()[0],
-                    content=content)
-        except:
-            if writer is not None:
-                writer.cancel()
-            raise
+        if fireEvent:
+            callInMainThreadAsync(self.fireMiscEventKeys,
+                    ("updated wiki page", "updated page"))
+
+        return valid
+
+
+    def buildMatchTerms(self, headingTerms, threadstop=DUMBTHREADSTOP):
+        """
+        Return list of match terms (matchTerm, type, wikiWord, firstcharpos,
+        charlength) for the "alias" attributes of the page as stored in the
+        database and the headings of headingTerms
+        (see extractHeadingTermsFromPageAst()).
+        """
+        ALIAS_TYPE = Consts.WIKIWORDMATCHTERMS_TYPE_EXPLICIT_ALIAS | \
+                Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK | \
+                Consts.WIKIWORDMATCHTERMS_TYPE_FROM_ATTRIBUTES
+
+        langHelper = GetApp().createWikiLanguageHelper(
+                self.getWikiLanguageName())
 
-        # Check within lock if data is current yet
+        matchTerms = []
+        for w, k, v in self.getWikiDocument().getAttributeTriples(
+                self.wikiPageName, "alias", None):
+            threadstop.testValidThread()
+            if not langHelper.checkForInvalidWikiLink(v,
+                                                      self.getWikiDocument()):
+                matchTerms.append((langHelper.resolveWikiWordLink(v, self),
+                        ALIAS_TYPE, self.wikiPageName, -1, -1))
+
+        HEADALIAS_TYPE = Consts.WIKIWORDMATCHTERMS_TYPE_FROM_CONTENT
+        for title, pos in headingTerms:
+            matchTerms.append((title, HEADALIAS_TYPE, self.wikiPageName,
+                    pos, 0))
+
+        return matchTerms
+
+
+    def putIntoSearchIndex(self, threadstop=DUMBTHREADSTOP):
+        """
+        Add or update the index for the given docPage
+        """
         with self.textOperationLock:
-            if self.isInvalid(): 
-                writer.cancel()
+            threadstop.testValidThread()
+
+            if self.isInvalid() or not self.getWikiDocument().isSearchIndexEnabled():
                 return True  # Or false?
 
-            if not liveTextPlaceHold is self.liveTextPlaceHold:
-                writer.cancel()
-                return False
-            else:
-                writer.commit()
+            if self.getWikiDocument().isFullTextIndexUsed():
+                # Index in database is updated together with the content
+                self.getWikiData().updateFullTextIndex(self.wikiPageName)
                 self.getWikiData().setMetaDataState(self.wikiPageName,
                         Consts.WIKIWORDMETADATA_STATE_INDEXED)
                 return True
+            
+            liveTextPlaceHold = self.liveTextPlaceHold
+            content = self.getLiveText()
+
+        assert isinstance(content, str)
+
+        # The batch writes the index and sets the meta-data state if
+        # the text is still current then
+        self.getWikiDocument().getSearchIndexWriteBatch().addPage(self,
+                liveTextPlaceHold, self.getTimestamps()[0], content)
+        return True
 
 
     def putIntoSearchIndexExtWriter(self, writer, threadstop=DUMBTHREADSTOP):
@@ -1897,21 +2161,11 @@ class WikiPage(AbstractWikiPage):
         if not self.getWikiDocument().isSearchIndexEnabled() or self.isInvalid():
             return
 
-        unifName = self.getUnifiedPageName()
-        
-        writer = None
-        
-        with self.textOperationLock:
-            try:
-                searchIdx = self.getWikiDocument().getSearchIndex()
-                writer = searchIdx.writer(timeout=Consts.DEADBLOCKTIMEOUT)
-                writer.delete_by_term("unifName", unifName)
-            except:
-                if writer is not None:
-                    writer.cancel()
-                raise
-    
-            writer.commit()
+        if self.getWikiDocument().isFullTextIndexUsed():
+            # Entry was removed together with the content
+            return
+
+        self.getWikiDocument().getSearchIndexWriteBatch().removePage(self)
 
 
     def queueRemoveFromSearchIndex(self):
@@ -2362,7 +2616,7 @@ class WikiPage(AbstractWikiPage):
         if self.isReadOnlyEffect():
             return
 
-        langHelper = wx.GetApp().createWikiLanguageHelper(
+        langHelper = GetApp().createWikiLanguageHelper(
                 self.wikiDocument.getWikiDefaultWikiLanguage())
         
         attr = langHelper.createAttributeFromComponents(key, value, self)
@@ -2426,7 +2680,7 @@ class FunctionalPage(DataCarryingPage):
 
 
     def _loadGlobalPage(self, subtag):
-        tbLoc = os.path.join(wx.GetApp().getGlobalConfigSubDir(),
+        tbLoc = os.path.join(GetApp().getGlobalConfigSubDir(),
                 "[%s].wiki" % subtag)
         try:
             tbContent = loadEntireTxtFile(tbLoc)
@@ -2527,7 +2781,7 @@ class FunctionalPage(DataCarryingPage):
 
 
     def _saveGlobalPage(self, text, subtag):
-        tbLoc = os.path.join(wx.GetApp().getGlobalConfigSubDir(),
+        tbLoc = os.path.join(GetApp().getGlobalConfigSubDir(),
                 "[%s].wiki" % subtag)
 
         writeEntireFile(tbLoc, text, True)
@@ -2594,7 +2848,7 @@ class FunctionalPage(DataCarryingPage):
                 if self.funcTag.startswith("wiki/"):
                     evtSource = self
                 else:
-                    evtSource = wx.GetApp()
+                    evtSource = GetApp()
     
                 if self.funcTag in ("global/TextBlocks", "wiki/TextBlocks"):
                     # The text blocks for the text blocks submenu was updated
@@ -2659,7 +2913,7 @@ class FunctionalPage(DataCarryingPage):
                         return globalAttrs[attrkey]
 
         option = "attributeDefault_" + attrkey
-        config = wx.GetApp().getGlobalConfig()
+        config = GetApp().getGlobalConfig()
         if config.isOptionAllowed("main", option):
             return config.get("main", option, default)
 
@@ -11,6 +11,8 @@ from .wxHelper import GUI_ID, getTextFromClipboard, WindowUpdateLocker
 
 from . import StringOps
 
+from .StyleRuns import StyleCollector
+
 from .SystemInfo import isOSX
 
 
@@ -23,50 +25,6 @@ def bytelenSct(us):
 
 
 
-class StyleCollector(StringOps.SnippetCollector):
-    """
-    Helps to collect the style bytes needed to set the syntax coloring in
-    Scintilla editor component
-    """
-    def __init__(self, defaultStyleNo, text, bytelenSct, startCharPos=0):   
-        super(StyleCollector, self).__init__(b"")
-        self.defaultStyleNo = defaultStyleNo
-        self.text = text
-        self.bytelenSct = bytelenSct
-        self.charPos = startCharPos
-
-
-    def bindStyle(self, targetCharPos, targetLength, styleNo):
-        if targetCharPos < 0:
-            return
-        
-        if targetCharPos < self.charPos:
-            # Due to some unknown reason we had overlapping styles and
-            # must remove some bytes
-            bytestylelen = self.bytelenSct(self.text[targetCharPos:self.charPos])
-            self.drop(bytestylelen)
-        else:
-            # There is possibly a gap between end of last style and current one
-            # -> fill it with default style
-            bytestylelen = self.bytelenSct(self.text[self.charPos:targetCharPos])
-            self.append(bytes((self.defaultStyleNo,)) * bytestylelen)
-
-        self.charPos = targetCharPos + targetLength
-            
-        bytestylelen = self.bytelenSct(self.text[targetCharPos:self.charPos])
-        self.append(bytes((styleNo,)) * bytestylelen)
-
-    def value(self):
-        if self.charPos < len(self.text):
-            bytestylelen = self.bytelenSct(self.text[self.charPos:len(self.text)])
-            self.append(bytes((self.defaultStyleNo,)) * bytestylelen)
-
-        return super(StyleCollector, self).value()
-
-
-
-
-
 class EnhancedScintillaControl(wx.stc.StyledTextCtrl):
     def __init__(self, parent, ID):
         wx.stc.StyledTextCtrl.__init__(self, parent, ID, style=wx.WANTS_CHARS | wx.TE_PROCESS_ENTER)
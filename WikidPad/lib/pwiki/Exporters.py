@@ -11,11 +11,8 @@ import shutil
 
 # from . import urllib_red as urllib
 
-import wx
 from .rtlibRepl import minidom
 
-from .wxHelper import XrcControls, GUI_ID, wxKeyFunctionSink
-
 import Consts
 from .WikiExceptions import WikiWordNotFoundException, ExportException
 from .ParseUtilities import getFootnoteAnchorDict
@@ -277,6 +274,8 @@ class TextExporter(AbstractExporter):
         if not "raw_files" in exportTypes:
             return ()
 
+        import wx.xrc
+
         res = wx.xrc.XmlResource.Get()
         textPanel = res.LoadPanel(guiparent, "ExportSubText") # .ctrls.additOptions
 
@@ -332,6 +331,8 @@ class TextExporter(AbstractExporter):
         if addoptpanel is None:
             return (1,)
         else:
+            from .wxHelper import XrcControls
+
             ctrls = XrcControls(addoptpanel)
             
             # Which encoding:
@@ -345,6 +346,8 @@ class TextExporter(AbstractExporter):
         Shows content of addOpt in the addoptpanel (must not be None).
         This function is only called if getAddOptVersion() != -1.
         """
+        from .wxHelper import XrcControls
+
         ctrls = XrcControls(addoptpanel)
         ctrls.chTextEncoding.SetSelection(addOpt[0])
 
@@ -417,30 +420,6 @@ class TextExporter(AbstractExporter):
                 continue
 
 
-class MultiPageTextAddOptPanel(wx.Panel):
-    def __init__(self, parent):
-#         p = wx.PrePanel()
-#         self.PostCreate(p)
-        
-        wx.Panel.__init__(self)
-
-        res = wx.xrc.XmlResource.Get()
-        res.LoadPanel(self, parent, "ExportSubMultipageText")
-        
-        self.ctrls = XrcControls(self)
-        
-        self.Bind(wx.EVT_CHOICE, self.OnFileVersionChoice, id=GUI_ID.chFileVersion)
-
-
-    def OnFileVersionChoice(self, evt):
-        enabled = evt.GetSelection() > 0
-        
-        self.ctrls.cbWriteWikiFuncPages.Enable(enabled)
-        self.ctrls.cbWriteSavedSearches.Enable(enabled)
-        self.ctrls.cbWriteVersionData.Enable(enabled)
-
-
-
 class _SeparatorFoundException(Exception): pass
 
 class _SeparatorWatchUtf8Writer(utf8Writer):
@@ -630,6 +609,8 @@ class MultiPageTextExporter(AbstractExporter):
         if not "multipage_text" in exportTypes:
             return ()
 
+        from .ExportersGui import MultiPageTextAddOptPanel
+
         optPanel = MultiPageTextAddOptPanel(guiparent)
         return (
             ("multipage_text", optPanel),
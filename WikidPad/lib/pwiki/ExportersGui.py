@@ -0,0 +1,32 @@
+"""
+GUI panels of the exporters in Exporters.py. They are kept separate so that
+the exporters can be used without wxPython (e.g. by the batch entry point).
+"""
+
+import wx, wx.xrc
+
+from .wxHelper import XrcControls, GUI_ID
+
+
+
+class MultiPageTextAddOptPanel(wx.Panel):
+    def __init__(self, parent):
+#         p = wx.PrePanel()
+#         self.PostCreate(p)
+        
+        wx.Panel.__init__(self)
+
+        res = wx.xrc.XmlResource.Get()
+        res.LoadPanel(self, parent, "ExportSubMultipageText")
+        
+        self.ctrls = XrcControls(self)
+        
+        self.Bind(wx.EVT_CHOICE, self.OnFileVersionChoice, id=GUI_ID.chFileVersion)
+
+
+    def OnFileVersionChoice(self, evt):
+        enabled = evt.GetSelection() > 0
+        
+        self.ctrls.cbWriteWikiFuncPages.Enable(enabled)
+        self.ctrls.cbWriteSavedSearches.Enable(enabled)
+        self.ctrls.cbWriteVersionData.Enable(enabled)
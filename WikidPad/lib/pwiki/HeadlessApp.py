@@ -0,0 +1,348 @@
+"""
+Application object for running WikidPad without GUI (e.g. batch rebuild,
+export and search from the command line). It provides the part of the
+MainApp.App interface needed by the wiki document, the parsers and the
+exporters (configuration, plugin registry for wiki languages, exporters
+and insertions, collator) without importing wx.
+
+The object must be installed by AppContext.setHeadlessApp() before other
+modules of the application are imported.
+"""
+
+import sys, os, os.path, traceback, collections
+from functools import reduce
+
+from Consts import CONFIG_FILENAME, CONFIG_GLOBALS_DIRNAME
+
+from .MiscEvent import MiscEventSourceMixin
+
+from .WikiExceptions import *
+from . import Configuration, Localization, SystemInfo
+from .StringOps import pathEnc
+
+
+
+class _HeadlessIconCache:
+    """
+    Provides the lookup of icon files of wxHelper.IconCache (used e.g.
+    by the HTML exporter) without creating bitmaps.
+    """
+    def __init__(self, iconDir):
+        self.iconDir = iconDir
+        self.iconPathCache = None
+
+    def lookupIconPath(self, iconname):
+        """
+        Returns the path to icon file of the requested icon or None if
+        icon is unknown.
+        """
+        if self.iconPathCache is None:
+            self.iconPathCache = {}
+            try:
+                for fn in os.listdir(self.iconDir):
+                    if fn.endswith(".gif"):
+                        self.iconPathCache[fn[:-4]] = os.path.join(
+                                self.iconDir, fn)
+            except OSError:
+                traceback.print_exc()
+
+        return self.iconPathCache.get(iconname)
+
+
+
+class HeadlessApp(MiscEventSourceMixin):
+    def __init__(self, wikiAppDir, globalConfigDir):
+        MiscEventSourceMixin.__init__(self)
+
+        self.sqliteInitFlag = False   # Read and modified only by WikiData classes
+        self.wikiAppDir = wikiAppDir
+        self.globalConfigDir = globalConfigDir
+
+        # Calls queued by AppContext.callAfter()
+        self.pendingCalls = collections.deque()
+
+        self.globalConfigSubDir = os.path.join(self.globalConfigDir,
+                CONFIG_GLOBALS_DIRNAME)
+        if not os.path.exists(pathEnc(self.globalConfigSubDir)):
+            self.globalConfigSubDir = os.path.join(self.globalConfigDir,
+                    "." + CONFIG_GLOBALS_DIRNAME)
+
+        self.defaultGlobalConfigDict = Configuration.GLOBALDEFAULTS.copy()
+        self.defaultWikiConfigDict = Configuration.WIKIDEFAULTS.copy()
+        self.wikiConfigFallthroughDict = Configuration.WIKIFALLTHROUGH.copy()
+
+        # Global configuration is only read, a missing configuration file
+        # isn't created as the GUI does
+        self.globalConfig = self.createGlobalConfiguration()
+        self.globalConfig.createEmptyConfig(None)
+        for fileName in (CONFIG_FILENAME, "." + CONFIG_FILENAME):
+            globalConfigLoc = os.path.join(self.globalConfigDir, fileName)
+            if os.path.exists(pathEnc(globalConfigLoc)):
+                try:
+                    self.globalConfig.loadConfig(globalConfigLoc)
+                except Configuration.Error:
+                    traceback.print_exc()
+                break
+
+        self.globalConfig.setWriteAccessDenied(True)
+
+        self.iconCache = _HeadlessIconCache(os.path.join(self.wikiAppDir,
+                "icons"))
+        self.collator = None
+
+        self.reloadPlugins()
+        self._rereadGlobalConfig()
+
+
+    def reloadPlugins(self):
+        """
+        Load the application-wide plugins. Plugins which need wx (GUI
+        functions, options panels, ...) are skipped if wx isn't available.
+        """
+        from .PluginManager import PluginManager, InsertionPluginManager
+
+        dirs = ( os.path.join(self.wikiAppDir, 'extensions'),
+                os.path.join(self.wikiAppDir, 'user_extensions'),
+                os.path.join(self.globalConfigSubDir, 'user_extensions') )
+
+        self.pluginManager = PluginManager(dirs, systemDirIdx=0,
+                ignoreMissingModules=("wx",))
+
+        describeInsertionApi = self.pluginManager.registerSimplePluginAPI(
+                ("InsertionByKey", 1), ("describeInsertionKeys",))
+
+        registerOptionsApi = self.pluginManager.registerSimplePluginAPI(
+                ("Options", 1), ("registerOptions",))
+
+        describeWikiLanguageApi = self.pluginManager.registerSimplePluginAPI(
+                ("WikiParser", 1), ("describeWikiLanguage",))
+
+        self.describeExportersApi = self.pluginManager.registerSimplePluginAPI(
+                ("Exporters", 1), ("describeExportersV01",))
+
+        self.pluginManager.loadPlugins([ 'KeyBindings.py',
+                'EvalLibrary.py'] )
+
+        registerOptionsApi.registerOptions(1, self)
+
+        insertionDescriptions = reduce(lambda a, b: a+list(b),
+                describeInsertionApi.describeInsertionKeys(1, self), [])
+
+        self.insertionPluginManager = InsertionPluginManager(
+                insertionDescriptions)
+
+        wikiLanguageDescriptions = reduce(lambda a, b: a+list(b),
+                describeWikiLanguageApi.describeWikiLanguage(1, self), [])
+
+        self.wikiLanguageDescDict = dict(( (item[0], item)
+                for item in wikiLanguageDescriptions ))
+
+
+    def _rereadGlobalConfig(self):
+        collationOrder = self.globalConfig.get("main", "collation_order")
+        collationUppercaseFirst = self.globalConfig.getboolean("main",
+                "collation_uppercaseFirst")
+
+        if collationUppercaseFirst:
+            collationCaseMode = Localization.CASEMODE_UPPER_FIRST
+        else:
+            collationCaseMode = Localization.CASEMODE_UPPER_INSIDE
+
+        try:
+            self.collator = Localization.getCollatorByString(collationOrder,
+                    collationCaseMode)
+        except:
+            try:
+                self.collator = Localization.getCollatorByString("Default",
+                        collationCaseMode)
+            except:
+                self.collator = Localization.getCollatorByString("C",
+                        collationCaseMode)
+
+
+    def callAfter(self, fct, *args, **kwargs):
+        self.pendingCalls.append((fct, args, kwargs))
+
+
+    def processPendingCalls(self):
+        """
+        Run the calls queued by AppContext.callAfter() (the replacement for
+        the event loop of the GUI). Must be called in the main thread.
+        """
+        while self.pendingCalls:
+            fct, args, kwargs = self.pendingCalls.popleft()
+            try:
+                fct(*args, **kwargs)
+            except:
+                traceback.print_exc()
+
+
+    def getWikiLanguageDescription(self, intLanguageName):
+        """
+        Returns the parser description tuple as provided by a WikiParser plugin
+        or None if intLanguageName not found.
+        """
+        return self.wikiLanguageDescDict.get(intLanguageName)
+
+    def listWikiLanguageDescriptions(self):
+        """
+        Return list of internal names of all available wiki languages
+        """
+        return list(self.wikiLanguageDescDict.values())
+
+    def createWikiParser(self, intLanguageName, debugMode=False):
+        desc = self.getWikiLanguageDescription(intLanguageName)
+        if desc is None:
+            return None
+        return desc[2](intLanguageName, debugMode)
+
+    def freeWikiParser(self, parser):
+        pass
+
+    def getUserDefaultWikiLanguage(self):
+        return "wikidpad_default_2_0"
+
+    def createWikiLanguageHelper(self, intLanguageName, debugMode=False):
+        desc = self.getWikiLanguageDescription(intLanguageName)
+        if desc is None:
+            return None
+        return desc[4](intLanguageName, debugMode)
+
+    def freeWikiLanguageHelper(self, helper):
+        pass
+
+    def getGlobalConfigSubDir(self):
+        return self.globalConfigSubDir
+
+    def getGlobalConfigDir(self):
+        return self.globalConfigDir
+
+    def getGlobalConfig(self):
+        return self.globalConfig
+
+    def getWikiAppDir(self):
+        return self.wikiAppDir
+
+    def isInPortableMode(self):
+        return self.globalConfigDir == self.wikiAppDir
+
+    def getIconCache(self):
+        return self.iconCache
+
+    def getCollator(self):
+        return self.collator
+
+    def getInsertionPluginManager(self):
+        return self.insertionPluginManager
+
+    def createGlobalConfiguration(self):
+        return Configuration.SingleConfiguration(
+                self.getDefaultGlobalConfigDict())
+
+    def createWikiConfiguration(self):
+        return Configuration.SingleConfiguration(
+                self.getDefaultWikiConfigDict(), self.wikiConfigFallthroughDict)
+
+    def createCombinedConfiguration(self):
+        return Configuration.CombinedConfiguration(
+                self.createGlobalConfiguration(), self.createWikiConfiguration())
+
+    def getDefaultGlobalConfigDict(self):
+        return self.defaultGlobalConfigDict
+
+    def getDefaultWikiConfigDict(self):
+        return self.defaultWikiConfigDict
+
+    def getWikiConfigFallthroughDict(self):
+        return self.wikiConfigFallthroughDict
+
+    # "Options" plugins register their panels for the options dialog,
+    # there is none without GUI
+
+    def addGlobalPluginOptionsDlgPanel(self, factory, title):
+        pass
+
+    def addOptionsDlgPanel(self, factory, title):
+        pass
+
+    def addWikiWikiLangOptionsDlgPanel(self, factory, title):
+        pass
+
+    def addWikiPluginOptionsDlgPanel(self, factory, title):
+        pass
+
+
+
+class HeadlessMainControl:
+    """
+    Provides the part of the PersonalWikiFrame interface which is used by
+    exporters and by CmdLineAction for an opened wiki.
+    """
+    def __init__(self, app, wikiDocument):
+        self.app = app
+        self.wikiDocument = wikiDocument
+        self.wikiName = wikiDocument.getWikiName()
+        self.wikiAppDir = app.getWikiAppDir()
+        self.evalLib = None
+
+        self.configuration = app.createCombinedConfiguration()
+        self.configuration.setGlobalConfig(app.getGlobalConfig())
+        self.configuration.setWikiConfig(wikiDocument.getWikiConfig())
+
+    def getConfig(self):
+        return self.configuration
+
+    def getWikiDocument(self):
+        return self.wikiDocument
+
+    def getWikiData(self):
+        return self.wikiDocument.getWikiData()
+
+    def getWikiConfigPath(self):
+        return self.wikiDocument.getWikiConfigPath()
+
+    def getCollator(self):
+        return self.app.getCollator()
+
+    def isReadOnlyWiki(self):
+        return self.wikiDocument.isReadOnlyEffect()
+
+    def rebuildWiki(self, skipConfirm=False, onlyDirty=False):
+        progressHandler = StreamProgressHandler(_("Rebuilding wiki"))
+        self.wikiDocument.rebuildWiki(progressHandler, onlyDirty=onlyDirty)
+
+    def updateExternallyModFiles(self):
+        self.wikiDocument.initiateExtWikiFileUpdate()
+
+
+
+class StreamProgressHandler:
+    """
+    Progress handler (same protocol as wxHelper.ProgressHandler) which
+    writes the progress to a stream, by default sys.stderr.
+    """
+    def __init__(self, title, stream=None, reportPercentStep=10):
+        self.title = title
+        self.stream = stream if stream is not None else sys.stderr
+        self.reportPercentStep = reportPercentStep
+        self.sum = 0
+        self.lastPercent = -1
+
+    def open(self, sum):
+        self.sum = sum
+        self.lastPercent = -1
+        self.stream.write(self.title + "\n")
+
+    def update(self, step, msg):
+        if self.sum > 0:
+            percent = (step * 100 // self.sum) // self.reportPercentStep * \
+                    self.reportPercentStep
+            if percent > self.lastPercent:
+                self.lastPercent = percent
+                self.stream.write("  %3i%%  %s\n" % (percent, msg))
+                self.stream.flush()
+
+        return True
+
+    def close(self):
+        self.stream.flush()
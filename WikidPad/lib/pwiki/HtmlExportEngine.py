@@ -0,0 +1,562 @@
+"""
+Export engine which renders the pages of an HTML export in a pool of worker
+processes. It is used for unattended exports started from the command line.
+
+The main process reads text, attributes and parents of the pages and sends
+them to the workers. When the pool is started, the workers get a read-only
+snapshot of the other data the exporter needs (configuration, link term
+table, "export" and "short_hint" attributes, file names of the pages).
+Workers parse and render the pages. For "html_single" they write the page
+files directly, for "html_multi" they return the HTML of the page which is
+then written by the main process. Table of contents and CSS files are
+created by the main process as well.
+
+Pages using features which need the running application (e.g. insertions)
+are rendered by the main process.
+"""
+
+import sys, os, os.path, traceback, collections
+
+import multiprocessing, concurrent.futures
+
+from .AppContext import GetApp
+
+from .WikiExceptions import *
+
+from .Utilities import DUMBTHREADSTOP
+from . import Configuration, Localization
+
+from .Configuration import SnapshotConfiguration
+from .WorkerSnapshot import SnapshotWikiDocument, SnapshotWikiPage, \
+        WorkerState, importModuleFromFile, getFormatKey, getParserModuleInfo, \
+        getAppSnapshot, initWorker, getWorkerState
+
+from .WikiDocument import WikiDocument
+from .ImageDims import ImageDimsCache
+
+
+
+# ---------- Worker side ----------
+
+class _ExportSnapshotFileStorage:
+    def __init__(self, storagePath):
+        self.storagePath = storagePath
+
+    def getStoragePath(self):
+        return self.storagePath
+
+
+class _ExportSnapshotWikiDocument(SnapshotWikiDocument):
+    """
+    Provides the part of the WikiDocument interface which is used by the
+    exporter while rendering a page.
+    """
+    def __init__(self, intLanguageName, snapshot, workerState):
+        SnapshotWikiDocument.__init__(self, intLanguageName, snapshot)
+        self.workerState = workerState
+        self.wikiName = snapshot["wikiName"]
+        self.wikiConfigPath = snapshot["wikiConfigPath"]
+        self.dataDir = snapshot["dataDir"]
+        self.fileStorage = _ExportSnapshotFileStorage(snapshot["storagePath"])
+        self.globalAttrs = snapshot["globalAttrs"]
+        self.pageNameByLinkTerm = snapshot["pageNameByLinkTerm"]
+        self.exportAttrs = snapshot["exportAttrs"]
+        self.shortHints = snapshot["shortHints"]
+        self.imageDimsCachePath = snapshot["imageDimsCachePath"]
+        self.imageDimsCache = None
+
+        if snapshot["resolveCaseNormed"]:
+            self.pageNameByLowerTerm = {}
+            for term in sorted(self.pageNameByLinkTerm):
+                self.pageNameByLowerTerm.setdefault(term.lower(),
+                        self.pageNameByLinkTerm[term])
+        else:
+            self.pageNameByLowerTerm = None
+
+        # {wikiWord: _ExportSnapshotWikiPage} of pages currently rendered
+        self.pages = {}
+
+    makeRelUrlAbsolute = WikiDocument.makeRelUrlAbsolute
+
+    def getWikiName(self):
+        return self.wikiName
+
+    def getWikiConfigPath(self):
+        return self.wikiConfigPath
+
+    def getWikiPath(self):
+        return os.path.dirname(self.wikiConfigPath)
+
+    def getDataDir(self):
+        return self.dataDir
+
+    def getFileStorage(self):
+        return self.fileStorage
+
+    def getImageDimsCache(self):
+        """
+        Open the image dimensions cache of the main process on first use.
+        New entries are written immediately as the worker process ends
+        without notice.
+        """
+        if self.imageDimsCache is None and self.imageDimsCachePath is not None:
+            self.imageDimsCache = ImageDimsCache(self.imageDimsCachePath,
+                    flushCount=1)
+            self.imageDimsCache.open()
+
+        return self.imageDimsCache
+
+    def getGlobalAttributes(self):
+        return self.globalAttrs
+
+    def getWikiPageNameForLinkTerm(self, word):
+        result = self.pageNameByLinkTerm.get(word)
+        if result is None and self.pageNameByLowerTerm is not None and \
+                word is not None:
+            result = self.pageNameByLowerTerm.get(word.lower())
+
+        return result
+
+    def isDefinedWikiLinkTerm(self, word):
+        return self.getWikiPageNameForLinkTerm(word) is not None
+
+    def getWikiPage(self, wikiWord):
+        """
+        Return page currently rendered or a page which only provides the
+        "export" attribute for other pages.
+        """
+        page = self.pages.get(wikiWord)
+        if page is not None:
+            return page
+
+        pageName = self.getWikiPageNameForLinkTerm(wikiWord)
+        if pageName is None:
+            raise WikiWordNotFoundException(
+                    _("Word '%s' not in wiki") % wikiWord)
+
+        page = self.pages.get(pageName)
+        if page is not None:
+            return page
+
+        attrs = {}
+        if pageName in self.exportAttrs:
+            attrs["export"] = [self.exportAttrs[pageName]]
+
+        return _ExportSnapshotWikiPage(self, pageName, attrs=attrs)
+
+    def getAttributeTriples(self, word, key, value):
+        if key != "short_hint" or word is None or value is not None:
+            raise RenderInMainProcessException()
+
+        hint = self.shortHints.get(word)
+        if hint is None:
+            return []
+
+        return [(word, key, hint)]
+
+
+class _ExportSnapshotWikiPage(SnapshotWikiPage):
+    """
+    Page with the data sent by the main process for rendering.
+    """
+    __slots__ = ("text", "formatKey", "attrs", "parents", "pageAst",
+            "formatDetails")
+
+    def __init__(self, wikiDocument, wikiWord, text=None, formatKey=None,
+            attrs=None, parents=None):
+        SnapshotWikiPage.__init__(self, wikiDocument, wikiWord)
+        self.text = text
+        self.formatKey = formatKey
+        self.attrs = attrs if attrs is not None else {}
+        self.parents = parents
+        self.pageAst = None
+        self.formatDetails = None
+
+    def _checkRenderData(self):
+        if self.text is None:
+            # Only attributes of this page are known
+            raise RenderInMainProcessException()
+
+    def getUnifiedPageName(self):
+        return "wikipage/" + self.wikiWord
+
+    def getWikiLanguageName(self):
+        return self.wikiDocument.getWikiDefaultWikiLanguage()
+
+    def getAttributes(self):
+        return self.attrs
+
+    def getAttributeOrGlobal(self, attrkey, default=None):
+        if attrkey in self.attrs:
+            return self.attrs[attrkey][-1]
+
+        globalAttrs = self.wikiDocument.getGlobalAttributes()
+        attrkey = "global." + attrkey
+        if attrkey in globalAttrs:
+            return globalAttrs[attrkey]
+
+        return self.wikiDocument.workerState.globalConfig.get("main",
+                "attributeDefault_" + attrkey, default)
+
+    def getParentRelationships(self):
+        self._checkRenderData()
+        return self.parents
+
+    def getLiveText(self):
+        self._checkRenderData()
+        return self.text
+
+    def getFormatDetails(self):
+        self._checkRenderData()
+        if self.formatDetails is None:
+            self.formatDetails = self.wikiDocument.workerState\
+                    .createFormatDetails(self, self.formatKey)
+
+        return self.formatDetails
+
+    def getLivePageAst(self):
+        if self.pageAst is None:
+            self.pageAst = self.wikiDocument.workerState.parser.parse(
+                    self.getWikiLanguageName(), self.getLiveText(),
+                    self.getFormatDetails(), DUMBTHREADSTOP)
+
+        return self.pageAst
+
+
+class _SnapshotMainControl:
+    """
+    Provides the part of the PersonalWikiFrame interface which is used
+    by the exporter.
+    """
+    def __init__(self, wikiDocument, snapshot, globalConfig):
+        self.wikiDocument = wikiDocument
+        self.wikiName = snapshot["wikiName"]
+        self.wikiAppDir = snapshot["wikiAppDir"]
+        self.config = globalConfig
+
+        collationOrder, collationCaseMode = snapshot["collation"]
+        try:
+            self.collator = Localization.getCollatorByString(collationOrder,
+                    collationCaseMode)
+        except:
+            self.collator = Localization.getCollatorByString("C",
+                    collationCaseMode)
+
+    def getConfig(self):
+        return self.config
+
+    def getWikiDocument(self):
+        return self.wikiDocument
+
+    def getCollator(self):
+        return self.collator
+
+
+class _ExportWorkerState(WorkerState):
+    def __init__(self, moduleName, moduleFile, intLanguageName, snapshot):
+        WorkerState.__init__(self, moduleName, moduleFile, intLanguageName,
+                snapshot)
+
+        self.globalConfig = SnapshotConfiguration(snapshot["globalConfig"])
+        self.wikiDocument = _ExportSnapshotWikiDocument(intLanguageName,
+                snapshot, self)
+
+        exporterModule = importModuleFromFile(snapshot["exporterModuleName"],
+                snapshot["exporterModuleFile"])
+        exporterClass = getattr(exporterModule, snapshot["exporterClassName"])
+
+        self.exporter = exporterClass(_SnapshotMainControl(self.wikiDocument,
+                snapshot, self.globalConfig))
+        self.exporter.prepareWorkerExport(self.wikiDocument,
+                **snapshot["jobData"])
+
+
+    def renderPage(self, wikiWord, text, formatKey, attrs, parents):
+        page = _ExportSnapshotWikiPage(self.wikiDocument, wikiWord, text,
+                formatKey, attrs, parents)
+
+        self.wikiDocument.pages[wikiWord] = page
+        self.exporter.referencedStorageFiles = set()
+        try:
+            rendered = self.exporter.renderPageInWorker(wikiWord)
+        finally:
+            del self.wikiDocument.pages[wikiWord]
+
+        return (rendered, list(self.exporter.referencedStorageFiles))
+
+
+def _renderPages(payload):
+    """
+    Render a chunk of pages. payload is a list of tuples
+    (wikiWord, text, formatKey, attrs, parents). Returns a list with
+    a tuple (rendered, referencedStorageFiles) or None for each page.
+    None means that the page must be rendered by the main process.
+    """
+    results = []
+    for args in payload:
+        try:
+            results.append(getWorkerState().renderPage(*args))
+        except RenderInMainProcessException:
+            results.append(None)
+        except Exception:
+            traceback.print_exc()
+            results.append(None)
+
+    return results
+
+
+
+# ---------- Main side ----------
+
+class HtmlExportEngine:
+    """
+    Renders the pages of an export in a process pool. Use
+    createForExporter() to create it.
+    """
+    # Number of pages sent to a worker at once
+    CHUNK_SIZE = 20
+
+    # Number of chunks per process which may be waiting for processing.
+    # Limits memory usage for page texts and results
+    PENDING_CHUNKS_PER_PROCESS = 4
+
+    def __init__(self, exporter, processCount, moduleName, moduleFile):
+        self.exporter = exporter
+        self.wikiDocument = exporter.getWikiDocument()
+        self.processCount = processCount
+        self.moduleName = moduleName
+        self.moduleFile = moduleFile
+
+        self.poolBroken = False
+
+
+    @staticmethod
+    def getConfiguredProcessCount():
+        """
+        Return number of worker processes as set in the global configuration.
+        """
+        processCount = GetApp().getGlobalConfig().getint("main",
+                "export_processCount", -1)
+        if processCount < 0:
+            processCount = os.cpu_count() or 1
+
+        return processCount
+
+
+    @staticmethod
+    def createForExporter(exporter, pageCount):
+        """
+        Return an HtmlExportEngine for the job set in exporter or None if
+        pages should be rendered in the main process (disabled by
+        configuration, too few pages, or wiki language or exporter not
+        usable in worker processes).
+        """
+        processCount = HtmlExportEngine.getConfiguredProcessCount()
+        if processCount < 1 or pageCount < HtmlExportEngine.CHUNK_SIZE * 2:
+            return None
+
+        exporterModule = sys.modules.get(type(exporter).__module__)
+        if getattr(exporterModule, "__file__", None) is None or \
+                not hasattr(exporter, "renderPageInWorker"):
+            return None
+
+        moduleInfo = getParserModuleInfo(exporter.getWikiDocument())
+        if moduleInfo is None:
+            return None
+
+        return HtmlExportEngine(exporter, processCount, *moduleInfo)
+
+
+    def _buildSnapshot(self):
+        wikiDocument = self.wikiDocument
+        wikiData = wikiDocument.getWikiData()
+        wikiConfig = wikiDocument.getWikiConfig()
+        mainControl = self.exporter.getMainControl()
+        config = mainControl.getConfig()
+
+        wikiSettings = {}
+        for section, option in wikiConfig.configDefaults.keys():
+            try:
+                wikiSettings[(section, option)] = wikiConfig.get(section,
+                        option)
+            except Exception:
+                pass
+
+        # Combined global and wiki configuration as seen by the exporter
+        settings = {}
+        for section, option in list(Configuration.GLOBALDEFAULTS.keys()) + \
+                list(Configuration.WIKIDEFAULTS.keys()):
+            try:
+                settings[(section, option)] = config.get(section, option)
+            except Exception:
+                pass
+
+        pageNameByLinkTerm = {}
+        for term in wikiData.getAllProducedWikiLinks():
+            pageName = wikiDocument.getWikiPageNameForLinkTerm(term)
+            if pageName is not None:
+                pageNameByLinkTerm[term] = pageName
+
+        # Last value of the attributes of each page
+        exportAttrs = {}
+        for word, key, value in wikiDocument.getAttributeTriples(None,
+                "export", None):
+            exportAttrs[word] = value
+
+        shortHints = {}
+        for word, key, value in wikiDocument.getAttributeTriples(None,
+                "short_hint", None):
+            shortHints[word] = value
+
+        imageDimsCache = wikiDocument.getImageDimsCache()
+        if imageDimsCache is not None:
+            # Make entries available to the workers
+            imageDimsCache.flush()
+            imageDimsCachePath = imageDimsCache.path
+        else:
+            imageDimsCachePath = None
+
+        globalConfig = GetApp().getGlobalConfig()
+        if globalConfig.getboolean("main", "collation_uppercaseFirst"):
+            collationCaseMode = Localization.CASEMODE_UPPER_FIRST
+        else:
+            collationCaseMode = Localization.CASEMODE_UPPER_INSIDE
+
+        exporterType = type(self.exporter)
+
+        snapshot = getAppSnapshot()
+        snapshot.update({
+                "config": wikiSettings,
+                "ccWordBlacklist": set(wikiDocument.getCcWordBlacklist()),
+                "nccWordBlacklist": set(wikiDocument.getNccWordBlacklist()),
+                "linkTerms": list(pageNameByLinkTerm.keys()),
+
+                "globalConfig": settings,
+                "collation": (globalConfig.get("main", "collation_order"),
+                    collationCaseMode),
+                "wikiName": wikiDocument.getWikiName(),
+                "wikiConfigPath": wikiDocument.getWikiConfigPath(),
+                "dataDir": wikiDocument.getDataDir(),
+                "storagePath": wikiDocument.getFileStorage().getStoragePath(),
+                "globalAttrs": dict(wikiData.getGlobalAttributes()),
+                "pageNameByLinkTerm": pageNameByLinkTerm,
+                "resolveCaseNormed": bool(getattr(wikiData,
+                    "resolveCaseNormed", False)),
+                "exportAttrs": exportAttrs,
+                "shortHints": shortHints,
+                "imageDimsCachePath": imageDimsCachePath,
+
+                "exporterModuleName": exporterType.__module__,
+                "exporterModuleFile": sys.modules[exporterType.__module__]\
+                    .__file__,
+                "exporterClassName": exporterType.__name__,
+                "jobData": self.exporter.getWorkerJobData()
+            })
+
+        return snapshot
+
+
+    def _createExecutor(self):
+        if self.poolBroken:
+            return None
+
+        try:
+            return concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.processCount,
+                    mp_context=multiprocessing.get_context(),
+                    initializer=initWorker,
+                    initargs=(__name__, "_ExportWorkerState",
+                        self.moduleName, self.moduleFile,
+                        self.wikiDocument.getWikiDefaultWikiLanguage(),
+                        self._buildSnapshot()))
+        except Exception:
+            traceback.print_exc()
+            self.poolBroken = True
+            return None
+
+
+    def _readPage(self, wikiWord):
+        """
+        Return tuple (wikiWord, text, formatKey, attrs, parents) to send
+        to a worker or None if page can't be read.
+        """
+        try:
+            wikiPage = self.wikiDocument.getWikiPage(wikiWord)
+            with wikiPage.textOperationLock:
+                text = wikiPage.getLiveText()
+                formatKey = getFormatKey(wikiPage.getFormatDetails())
+                attrs = dict((key, list(values)) for key, values in
+                        wikiPage.getAttributes().items())
+
+            parents = list(wikiPage.getParentRelationships())
+            return (wikiWord, text, formatKey, attrs, parents)
+        except (WikiWordNotFoundException, AttributeError):
+            # Page doesn't exist or isn't a normal wiki page
+            return None
+
+
+    def iterRenderedPages(self, wikiWords):
+        """
+        Render pages of sequence  wikiWords  in the pool and yield tuples
+        (wikiWord, rendered) in the original order. rendered is the
+        result of the renderPageInWorker() method of the exporter or None
+        if the page must be rendered by the main process. Referenced
+        storage files reported by the workers are added to the exporter.
+        """
+        executor = self._createExecutor()
+        maxPending = self.processCount * self.PENDING_CHUNKS_PER_PROCESS
+        pending = collections.deque()
+
+        def takeFirst():
+            chunk, future = pending.popleft()
+            results = None
+            if future is not None:
+                try:
+                    results = future.result()
+                except Exception:
+                    # Pool is broken (worker died or data not transferable)
+                    traceback.print_exc()
+                    self.poolBroken = True
+
+            if results is None:
+                results = [None] * len(chunk)
+
+            referencedStorageFiles = self.exporter.referencedStorageFiles
+            for wikiWord, result in zip(chunk, results):
+                if result is None:
+                    yield (wikiWord, None)
+                    continue
+
+                rendered, storageFiles = result
+                if referencedStorageFiles is not None:
+                    referencedStorageFiles.update(storageFiles)
+
+                yield (wikiWord, rendered)
+
+        try:
+            for i in range(0, len(wikiWords), self.CHUNK_SIZE):
+                chunk = wikiWords[i:i + self.CHUNK_SIZE]
+                payload = [self._readPage(wikiWord) for wikiWord in chunk]
+
+                if self.poolBroken or executor is None or None in payload:
+                    # Unreadable pages are handled by the main process
+                    # which reports the error
+                    future = None
+                else:
+                    try:
+                        future = executor.submit(_renderPages, payload)
+                    except Exception:
+                        traceback.print_exc()
+                        self.poolBroken = True
+                        future = None
+
+                pending.append((chunk, future))
+
+                while len(pending) >= maxPending:
+                    yield from takeFirst()
+
+            while pending:
+                yield from takeFirst()
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=not self.poolBroken)
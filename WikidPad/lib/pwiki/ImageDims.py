@@ -0,0 +1,417 @@
+"""
+Dimensions of images for the HTML export.
+
+The width and height are read from the header of PNG, GIF, BMP and JPEG
+files, the image itself isn't decoded. Results are stored in a small SQLite
+database next to the wiki. Entries for local files are validated by
+modification time and size of the file, entries for remote URLs by the
+ETag or Last-Modified header of the server (a conditional request avoids
+the download if the image is unchanged).
+"""
+
+import os, os.path, traceback, threading, struct, sqlite3
+import urllib.request, urllib.error
+
+from .ConnectWrapPysqlite import ConnectWrapSyncCommit
+from .StringOps import pathnameFromUrl
+
+
+
+# Increment if format of stored data changes
+_FORMAT_NO = 1
+
+# Maximum number of bytes read from a stream which can't seek to find the
+# frame header of a JPEG file (it may follow large metadata segments)
+MAX_JPEG_SCAN = 256 * 1024
+
+
+def _readExactly(stream, count):
+    data = stream.read(count)
+    while len(data) < count:
+        more = stream.read(count - len(data))
+        if not more:
+            break
+        data += more
+
+    return data
+
+
+def _skip(stream, count):
+    """
+    Skip count bytes of stream. Returns False if end of stream reached.
+    """
+    try:
+        if stream.seekable():
+            stream.seek(count, os.SEEK_CUR)
+            return True
+    except (AttributeError, OSError):
+        pass
+
+    return len(_readExactly(stream, count)) == count
+
+
+def _readJpegDims(stream):
+    """
+    Scan the segments of a JPEG file (after the SOI marker) for the start
+    of frame segment. Only the segment headers are read.
+    """
+    scanned = 2
+    while scanned < MAX_JPEG_SCAN:
+        data = _readExactly(stream, 2)
+        if len(data) < 2:
+            return None
+
+        # Fill bytes 0xff may precede a marker
+        while data[0] == 0xff and data[1] == 0xff:
+            data = data[1:] + _readExactly(stream, 1)
+            if len(data) < 2:
+                return None
+
+        if data[0] != 0xff:
+            return None
+
+        marker = data[1]
+        scanned += 2
+
+        if marker == 0x01 or 0xd0 <= marker <= 0xd8:
+            # Markers without segment
+            continue
+
+        if marker in (0xd9, 0xda):
+            # End of image or start of scan without frame header
+            return None
+
+        data = _readExactly(stream, 2)
+        if len(data) < 2:
+            return None
+        length = struct.unpack(">H", data)[0]
+        if length < 2:
+            return None
+
+        if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+            # Start of frame: precision, height, width
+            data = _readExactly(stream, 5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack(">HH", data[1:5])
+            return width, height
+
+        if not _skip(stream, length - 2):
+            return None
+
+        scanned += length
+
+    return None
+
+
+def readImageDims(stream):
+    """
+    Return tuple (width, height) of the image in binary stream or None
+    if the format is unknown or the header is damaged. Reads only the header
+    of the image (for JPEG the headers of the segments until the frame
+    header).
+    """
+    head = _readExactly(stream, 26)
+
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        if len(head) < 24 or head[12:16] != b"IHDR":
+            return None
+        return struct.unpack(">II", head[16:24])
+
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        if len(head) < 10:
+            return None
+        return struct.unpack("<HH", head[6:10])
+
+    if head.startswith(b"BM"):
+        if len(head) < 26:
+            return None
+        dibHeaderSize = struct.unpack("<I", head[14:18])[0]
+        if dibHeaderSize == 12:
+            # OS/2 BITMAPCOREHEADER
+            return struct.unpack("<HH", head[18:22])
+        width, height = struct.unpack("<ii", head[18:26])
+        # Negative height means top-down bitmap
+        return abs(width), abs(height)
+
+    if head.startswith(b"\xff\xd8"):
+        # Put back what was read after the start of image marker
+        return _readJpegDims(_PrependedStream(head[2:], stream))
+
+    return None
+
+
+
+class _PrependedStream:
+    """
+    Read-only stream which returns data before continuing with the
+    wrapped stream.
+    """
+    def __init__(self, data, stream):
+        self.data = data
+        self.stream = stream
+
+    def read(self, count):
+        if self.data:
+            result = self.data[:count]
+            self.data = self.data[count:]
+            if len(result) < count:
+                result += self.stream.read(count - len(result))
+            return result
+
+        return self.stream.read(count)
+
+    def seekable(self):
+        try:
+            return self.stream.seekable()
+        except AttributeError:
+            return False
+
+    def seek(self, offset, whence):
+        # Only relative seeks are used
+        if offset <= len(self.data):
+            self.data = self.data[offset:]
+        else:
+            offset -= len(self.data)
+            self.data = b""
+            self.stream.seek(offset, whence)
+
+
+
+class ImageDimsCache:
+    """
+    Thread-safe on-disk cache of image dimensions. New entries are written
+    in batches.
+    """
+    def __init__(self, path, flushCount=50):
+        """
+        path -- path of the SQLite database file
+        flushCount -- number of new entries before they are written
+        """
+        self.path = path
+        self.flushCount = flushCount
+        self.lock = threading.RLock()
+        self.connWrap = None
+
+        # Entries not yet written {key: (validator, width, height)}
+        self.pendingPuts = {}
+
+
+    def open(self):
+        with self.lock:
+            try:
+                self._open()
+            except (IOError, OSError, sqlite3.Error):
+                traceback.print_exc()
+                # Cache is damaged or unreadable -> start new one
+                self._closeConnection()
+                try:
+                    if os.path.exists(self.path):
+                        os.unlink(self.path)
+                    self._open()
+                except (IOError, OSError, sqlite3.Error):
+                    traceback.print_exc()
+                    self._closeConnection()
+
+
+    def _open(self):
+        # Worker processes of the HTML export may use the same file
+        self.connWrap = ConnectWrapSyncCommit(sqlite3.connect(self.path,
+                timeout=10, check_same_thread=False))
+        # It is only a cache, so speed is more important than durability
+        self.connWrap.execSql("pragma synchronous = off")
+        self.connWrap.execSql("create table if not exists settings("
+                "key text primary key not null, value text not null)")
+        self.connWrap.execSql("create table if not exists imagedims("
+                "key text primary key not null, "
+                "validator text not null, "
+                "width integer not null, "
+                "height integer not null)")
+
+        formatNo = self.connWrap.execSqlQuerySingleItem(
+                "select value from settings where key = 'formatNo'")
+        if formatNo != str(_FORMAT_NO):
+            self.connWrap.execSql("delete from imagedims")
+            self.connWrap.execSql("insert or replace into settings(key, value) "
+                    "values ('formatNo', ?)", (str(_FORMAT_NO),))
+
+        self.connWrap.commit()
+
+
+    def _closeConnection(self):
+        if self.connWrap is not None:
+            try:
+                self.connWrap.close()
+            except sqlite3.Error:
+                traceback.print_exc()
+            self.connWrap = None
+
+
+    def close(self):
+        with self.lock:
+            if self.connWrap is None:
+                return
+            try:
+                self.flush()
+            finally:
+                self._closeConnection()
+
+
+    def isOpen(self):
+        return self.connWrap is not None
+
+
+    def getEntry(self, key):
+        """
+        Return tuple (validator, width, height) for key or None.
+        """
+        with self.lock:
+            entry = self.pendingPuts.get(key)
+            if entry is not None:
+                return entry
+
+            if self.connWrap is None:
+                return None
+
+            try:
+                row = self.connWrap.execSqlQuery("select validator, width, "
+                        "height from imagedims where key = ?", (key,))
+            except sqlite3.Error:
+                traceback.print_exc()
+                return None
+
+            if len(row) == 0:
+                return None
+
+            return tuple(row[0])
+
+
+    def get(self, key, validator):
+        """
+        Return tuple (width, height) for key if stored with the same
+        validator, otherwise None.
+        """
+        entry = self.getEntry(key)
+        if entry is None or entry[0] != validator:
+            return None
+
+        return entry[1], entry[2]
+
+
+    def put(self, key, validator, width, height):
+        with self.lock:
+            if self.connWrap is None:
+                return
+
+            self.pendingPuts[key] = (validator, width, height)
+            if len(self.pendingPuts) >= self.flushCount:
+                self.flush()
+
+
+    def flush(self):
+        """
+        Write pending entries.
+        """
+        with self.lock:
+            if self.connWrap is None or not self.pendingPuts:
+                return
+
+            pendingPuts = self.pendingPuts
+            self.pendingPuts = {}
+
+            try:
+                self.connWrap.getCursor().executemany("insert or replace "
+                        "into imagedims(key, validator, width, height) "
+                        "values (?, ?, ?, ?)", [(key,) + entry for key, entry
+                        in pendingPuts.items()])
+                self.connWrap.commit()
+            except sqlite3.Error:
+                traceback.print_exc()
+                try:
+                    self.connWrap.rollback()
+                except sqlite3.Error:
+                    pass
+
+
+    def clear(self):
+        with self.lock:
+            self.pendingPuts = {}
+            if self.connWrap is None:
+                return
+            try:
+                self.connWrap.execSql("delete from imagedims")
+                self.connWrap.commit()
+            except sqlite3.Error:
+                traceback.print_exc()
+
+
+
+def _getFileImageDims(absUrl, cache):
+    path = pathnameFromUrl(absUrl)
+    stat = os.stat(path)
+    key = "file:" + os.path.normcase(os.path.abspath(path))
+    validator = "%i:%i" % (stat.st_mtime_ns, stat.st_size)
+
+    if cache is not None:
+        dims = cache.get(key, validator)
+        if dims is not None:
+            return dims
+
+    with open(path, "rb") as imgFile:
+        dims = readImageDims(imgFile)
+
+    if dims is not None and cache is not None:
+        cache.put(key, validator, dims[0], dims[1])
+
+    return dims
+
+
+def _getUrlImageDims(absUrl, cache):
+    entry = cache.getEntry(absUrl) if cache is not None else None
+
+    request = urllib.request.Request(absUrl)
+    if entry is not None:
+        validator = entry[0]
+        if validator.startswith("etag:"):
+            request.add_header("If-None-Match", validator[5:])
+        elif validator.startswith("lastmod:"):
+            request.add_header("If-Modified-Since", validator[8:])
+
+    try:
+        response = urllib.request.urlopen(request)
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and entry is not None:
+            # Not modified
+            return entry[1], entry[2]
+        raise
+
+    try:
+        dims = readImageDims(response)
+
+        # Only the ETag (or date of modification) makes the entry reusable
+        etag = response.headers.get("ETag")
+        lastModified = response.headers.get("Last-Modified")
+    finally:
+        response.close()
+
+    if dims is not None and cache is not None:
+        if etag:
+            cache.put(absUrl, "etag:" + etag, dims[0], dims[1])
+        elif lastModified:
+            cache.put(absUrl, "lastmod:" + lastModified, dims[0], dims[1])
+
+    return dims
+
+
+def getImageDims(absUrl, cache=None):
+    """
+    Return tuple (width, height) of image at absolute URL absUrl or None
+    if the format isn't supported by readImageDims().
+    cache -- ImageDimsCache or None
+
+    Raises IOError if image can't be read.
+    """
+    if absUrl.startswith("file:"):
+        return _getFileImageDims(absUrl, cache)
+    else:
+        return _getUrlImageDims(absUrl, cache)
@@ -3,7 +3,7 @@ This is a Linux specific file for handling some operations not provided
 by the OS-independent wxPython library.
 """
 
-import ctypes, os, traceback, multiprocessing
+import ctypes, os, struct, traceback, multiprocessing
 from ctypes import c_int, c_uint, c_long, c_ulong, c_ushort, c_char, c_char_p, \
         c_wchar_p, c_byte, byref, create_string_buffer, create_unicode_buffer, \
         c_void_p, string_at, sizeof, Structure   # , WindowsError
@@ -29,6 +29,19 @@ except:
     sched_getaffinity = None
 
 
+try:
+    inotify_init1 = libc.inotify_init1
+    inotify_add_watch = libc.inotify_add_watch
+    inotify_add_watch.argtypes = [c_int, c_char_p, c_uint]
+except:
+    import ExceptionLogger
+    ExceptionLogger.logOptionalComponentException(
+            "Link to inotify_init1() in LinuxHacks.py")
+
+    inotify_init1 = None
+    inotify_add_watch = None
+
+
 # int sched_setaffinity(pid_t pid, size_t cpusetsize,
 #                       cpu_set_t *mask);
 
@@ -147,3 +160,64 @@ def getCpuCount():
         return 0
 
 
+
+# Based on "sys/inotify.h", see e.g. http://linux.die.net/man/7/inotify
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# struct inotify_event { int wd; uint32_t mask, cookie, len; char name[]; }
+_INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+
+
+def createInotifyWatch(dirPath, mask):
+    """
+    Create an inotify instance which watches directory  dirPath  for events
+    in  mask  (combination of IN_* flags). Returns file descriptor of the
+    instance or None if inotify is not supported.
+    Read events from the descriptor with readInotifyEvents() and close it
+    with os.close().
+    """
+    if inotify_init1 is None:
+        return None
+
+    fd = inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if fd < 0:
+        return None
+
+    if inotify_add_watch(fd, os.fsencode(dirPath), mask) < 0:
+        os.close(fd)
+        return None
+
+    return fd
+
+
+def readInotifyEvents(fd):
+    """
+    Read available events from inotify file descriptor  fd. Returns list
+    of tuples (mask, name) with name as unicode filename (may be empty).
+    """
+    try:
+        data = os.read(fd, 65536)
+    except BlockingIOError:
+        return []
+
+    result = []
+    pos = 0
+    while pos + _INOTIFY_EVENT_HEADER.size <= len(data):
+        wd, mask, cookie, nameLen = _INOTIFY_EVENT_HEADER.unpack_from(data, pos)
+        pos += _INOTIFY_EVENT_HEADER.size
+        name = data[pos:pos + nameLen].rstrip(b"\0")
+        pos += nameLen
+        result.append((mask, os.fsdecode(name)))
+
+    return result
+
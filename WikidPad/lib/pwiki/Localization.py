@@ -9,9 +9,7 @@ from .rtlibRepl import minidom
 
 from .StringOps import utf8Enc, loadEntireFile, writeEntireFile, pathEnc
 
-from . import Utilities
-
-import wx
+from . import Utilities, AppContext
 
 
 CASEMODE_UPPER_INSIDE = 0   # Sort upper case inside like aAbBcC
@@ -38,7 +36,8 @@ _lastLocStr = None
 
 def setLocale(locStr):
     """
-    Sets locale simultaneously in Python/C-runtime and wxPython/wxWidgets
+    Sets locale simultaneously in Python/C-runtime and wxPython/wxWidgets.
+    Without GUI (headless application) only the Python/C-runtime locale is set.
     """
     global _wx_locale, _lastLocStr
     
@@ -51,14 +50,19 @@ def setLocale(locStr):
             if locStr == "":
                 oldPyLoc = locale.setlocale(locale.LC_ALL)
         
-                wx_locale = wx.Locale(wx.LANGUAGE_DEFAULT)
+                if not AppContext.isHeadless():
+                    import wx
+                    wx_locale = wx.Locale(wx.LANGUAGE_DEFAULT)
+
                 locale.setlocale(locale.LC_ALL, "")
             else:
                 oldPyLoc = locale.setlocale(locale.LC_ALL)
         
-                langInfo = wx.Locale.FindLanguageInfo(locStr)
-                if langInfo is not None:
-                    wx_locale = wx.Locale(langInfo.Language)
+                if not AppContext.isHeadless():
+                    import wx
+                    langInfo = wx.Locale.FindLanguageInfo(locStr)
+                    if langInfo is not None:
+                        wx_locale = wx.Locale(langInfo.Language)
         
                 locale.setlocale(locale.LC_ALL, locStr)
                     
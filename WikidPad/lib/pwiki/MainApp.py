@@ -3,7 +3,6 @@
 
 import sys, os, traceback, os.path, socket, locale
 from functools import reduce
-from inspect import getsourcefile
 
 # To generate dependency for py2exe
 if not True:
@@ -30,82 +29,10 @@ from . import SystemInfo, Utilities, Localization
 from . import WindowLayout
 from .CmdLineAction import CmdLineAction
 
+# findDirs() is imported from here by WikidPadStarter
+from .AppContext import findDirs
 
 
-# For wx.GetOsVersion()
-wxWINDOWS_NT = SystemInfo.wxWINDOWS_NT
-wxWIN95 = SystemInfo.wxWIN95
-
-
-
-def findDirs():
-    """
-    Returns tuple (wikiAppDir, globalConfigDir)
-    """
-    from os.path import dirname
-    
-    wikiAppDir = None
-    
-    if not wikiAppDir and not hasattr(sys, 'frozen'):
-        wikiAppDir = dirname(os.path.abspath(getsourcefile(lambda:0)))
-        # We are in WikidPad/lib/pwiki, go up two levels
-        wikiAppDir = dirname(dirname(wikiAppDir))
-        
-
-    isWindows = (wx.GetOsVersion()[0] == wxWIN95) or \
-            (wx.GetOsVersion()[0] == wxWINDOWS_NT)
-
-#     try:
-    if not wikiAppDir:
-        wikiAppDir = dirname(os.path.abspath(sys.argv[0]))
-
-    if not wikiAppDir:
-        wikiAppDir = r"C:\Program Files\WikidPad"
-        
-    globalConfigDir = None
-
-    # This allows to keep the program with config on an USB stick
-    if os.path.exists(pathEnc(os.path.join(wikiAppDir, CONFIG_FILENAME))):
-        globalConfigDir = wikiAppDir
-    elif os.path.exists(pathEnc(os.path.join(wikiAppDir, "." + CONFIG_FILENAME))):
-        globalConfigDir = wikiAppDir
-    else:
-        globalConfigDir = os.environ.get("HOME")
-        if not (globalConfigDir and os.path.exists(pathEnc(globalConfigDir))):
-            # Instead of checking USERNAME, the user config dir. is
-            # now used
-            globalConfigDir = wx.StandardPaths.Get().GetUserConfigDir()
-            # For Windows the user config dir is "...\Application data"
-            # therefore we go down to "...\Application data\WikidPad"
-            if os.path.exists(pathEnc(globalConfigDir)) and isWindows:
-                try:
-                    realGlobalConfigDir = os.path.join(globalConfigDir,
-                            "WikidPad")
-                    if not os.path.exists(pathEnc(realGlobalConfigDir)):
-                        # If it doesn't exist, create the directory
-                        os.mkdir(pathEnc(realGlobalConfigDir))
-
-                    globalConfigDir = realGlobalConfigDir
-                except:
-                    traceback.print_exc()
-
-#     finally:
-#         pass
-
-    if not globalConfigDir:
-        globalConfigDir = wikiAppDir
-
-    # mbcs decoding
-    if wikiAppDir is not None:
-        wikiAppDir = mbcsDec(wikiAppDir, "replace")[0]
-
-    if globalConfigDir is not None:
-        globalConfigDir = mbcsDec(globalConfigDir, "replace")[0]
-        
-    ExceptionLogger.setLogDestDir(globalConfigDir)
-    
-    return (wikiAppDir, globalConfigDir)
-
 
 _defRedirect = (wx.Platform == '__WXMSW__' or wx.Platform == '__WXMAC__')
 
@@ -118,6 +45,10 @@ class App(wx.App, MiscEventSourceMixin):
         # Hack for Windows to allow installation in non-ascii path
         sys.prefix = mbcsDec(sys.prefix)[0]
 
+        # time.perf_counter() value when process started, see
+        # CmdLineAction.reportResources
+        self.startTime = kwargs.pop("startTime", None)
+
         MiscEventSourceMixin.__init__(self)
 
         wx.App.__init__(self, *args, **kwargs)
@@ -213,7 +144,7 @@ class App(wx.App, MiscEventSourceMixin):
 
         splash = None
         
-        cmdLine = CmdLineAction(sys.argv[1:])
+        cmdLine = CmdLineAction(sys.argv[1:], self.startTime)
         if not cmdLine.exitFinally and self.globalConfig.getboolean("main",
                 "startup_splashScreen_show", True):
             bitmap = wx.Bitmap(os.path.join(self.wikiAppDir, "icons/pwiki.ico"))
@@ -2,8 +2,6 @@
 
 import weakref, traceback
 
-import wx
-
 class MiscEventSourceMixin:
     """
     Mixin class to handle misc events
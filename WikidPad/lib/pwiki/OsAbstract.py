@@ -3,15 +3,15 @@ OS abstraction
 """
 
 import os, shutil, os.path, re, traceback
-import wx
 
-from . import SystemInfo
+from . import SystemInfo, AppContext
 from .StringOps import mbcsEnc, urlQuote, pathnameFromUrl, pathEnc
 
 
-# WindowsHacks for some OS specials
+# WindowsHacks for some OS specials (they need wx, so the plain Python
+# functions are used by a headless application)
 
-if SystemInfo.isWindows():
+if SystemInfo.isWindows() and not AppContext.isHeadless():
     try:
         from . import WindowsHacks
     except:
@@ -32,13 +32,16 @@ except:
     LinuxHacks = None
 
 
-try:
-    from . import GtkHacks
-except:
-    import ExceptionLogger
-    ExceptionLogger.logOptionalComponentException(
-            "Initialize GTK hacks in OsAbstract.py")
+if AppContext.isHeadless():
     GtkHacks = None
+else:
+    try:
+        from . import GtkHacks
+    except:
+        import ExceptionLogger
+        ExceptionLogger.logOptionalComponentException(
+                "Initialize GTK hacks in OsAbstract.py")
+        GtkHacks = None
 
 
 
@@ -56,6 +59,7 @@ else:
 
         startPath = mainControl.getConfig().get("main", "fileLauncher_path", "")
         if startPath == "":
+            import wx
             wx.LaunchDefaultBrowser(link)
             return
 
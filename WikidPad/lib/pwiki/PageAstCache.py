@@ -0,0 +1,389 @@
+"""
+Persistent cache of parsed page ASTs.
+
+The ASTs are stored zlib-compressed and pickled in a small SQLite database
+next to the wiki. The key of an entry is a hash of the page text together
+with a fingerprint of everything else the parser result depends on (wiki
+language and its details, format details, page name, CamelCase blacklists).
+Entries are evicted in least-recently-used order when the size of the
+cache exceeds its limit.
+"""
+
+import sys, os, os.path, traceback, threading, hashlib, pickle, zlib, io, \
+        sqlite3
+
+import Consts
+
+from . import WikiPyparsing
+from .ConnectWrapPysqlite import ConnectWrapSyncCommit
+
+
+
+# Increment if format of stored data or key changes
+_FORMAT_NO = 1
+
+
+def getWikiLanguageDetailsFingerprint(wikiLanguageDetails):
+    """
+    Return a string which is equal for two WikiLanguageDetails objects if
+    they produce the same ASTs. The plugin may provide it by
+    a getFingerprint() method, otherwise it is built from the slots of
+    the object.
+    """
+    getFingerprint = getattr(wikiLanguageDetails, "getFingerprint", None)
+    if getFingerprint is not None:
+        return getFingerprint()
+
+    try:
+        languageName = wikiLanguageDetails.getWikiLanguageName()
+    except (AttributeError, NotImplementedError):
+        languageName = None
+
+    values = []
+    for cls in type(wikiLanguageDetails).__mro__:
+        for slot in getattr(cls, "__slots__", ()):
+            if slot in ("__weakref__", "__dict__", "wikiDocument"):
+                continue
+            values.append((slot, getattr(wikiLanguageDetails, slot, None)))
+
+    return repr((languageName, type(wikiLanguageDetails).__name__, values))
+
+
+
+class _RestrictedUnpickler(pickle.Unpickler):
+    """
+    The cache file lives next to the wiki and may come from elsewhere
+    together with it. Therefore only the classes AST nodes consist of
+    are allowed: the node classes of WikiPyparsing and classes defined
+    in the allowed (parser) modules themselves. Dotted names (which would
+    allow to reach e.g. functions of modules imported by a parser module)
+    and anything which isn't a class are refused.
+    """
+    def __init__(self, data, allowedModules):
+        pickle.Unpickler.__init__(self, io.BytesIO(data))
+        self.allowedModules = allowedModules
+
+    def find_class(self, module, name):
+        if module == "pwiki.WikiPyparsing" and \
+                name in ("NonTerminalNode", "TerminalNode"):
+            return getattr(WikiPyparsing, name)
+
+        if module in self.allowedModules and "." not in name:
+            # Only look into modules already loaded, never import one
+            cls = getattr(sys.modules.get(module), name, None)
+            if isinstance(cls, type) and cls.__module__ == module:
+                return cls
+
+        raise pickle.UnpicklingError("Class %s.%s not allowed in AST cache" %
+                (module, name))
+
+
+
+class PageAstCache:
+    """
+    Thread-safe on-disk cache of page ASTs. New entries and the recency
+    of used entries are written in batches.
+    """
+    # Number of pending writes (new entries and usages) before flushing
+    FLUSH_COUNT = 100
+
+    def __init__(self, path, maxSize):
+        """
+        path -- path of the SQLite database file
+        maxSize -- maximum size in bytes of the stored ASTs
+        """
+        self.path = path
+        self.maxSize = maxSize
+        self.lock = threading.RLock()
+        self.connWrap = None
+
+        # Modules from which classes may be unpickled (modules of parsers)
+        self.allowedModules = set()
+
+        # Entries not yet written {key: (data, lastUsed)}
+        self.pendingPuts = {}
+        # Usages of entries not yet written {key: lastUsed}
+        self.pendingUsages = {}
+        self.totalSize = 0
+        # Counter to order entries by last usage
+        self.lastUsedCounter = 0
+
+        # Cached blacklist fingerprint and the blacklist objects it belongs to
+        self.blacklistFingerprint = None
+        self.blacklistFingerprintBase = (None, None)
+
+        self.hitCount = 0
+        self.missCount = 0
+
+
+    def open(self):
+        with self.lock:
+            try:
+                self._open()
+            except (IOError, OSError, sqlite3.Error):
+                traceback.print_exc()
+                # Cache is damaged or unreadable -> start new one
+                self._closeConnection()
+                try:
+                    if os.path.exists(self.path):
+                        os.unlink(self.path)
+                    self._open()
+                except (IOError, OSError, sqlite3.Error):
+                    traceback.print_exc()
+                    self._closeConnection()
+
+
+    def _open(self):
+        self.connWrap = ConnectWrapSyncCommit(sqlite3.connect(self.path,
+                check_same_thread=False))
+        # It is only a cache, so speed is more important than durability
+        self.connWrap.execSql("pragma synchronous = off")
+        self.connWrap.execSql("create table if not exists settings("
+                "key text primary key not null, value text not null)")
+        self.connWrap.execSql("create table if not exists pageasts("
+                "key text primary key not null, "
+                "data blob not null, "
+                "size integer not null, "
+                "lastused integer not null)")
+        self.connWrap.execSql("create index if not exists pageasts_lastused "
+                "on pageasts(lastused)")
+
+        formatNo = self.connWrap.execSqlQuerySingleItem(
+                "select value from settings where key = 'formatNo'")
+        if formatNo != str(_FORMAT_NO):
+            self.connWrap.execSql("delete from pageasts")
+            self.connWrap.execSql("insert or replace into settings(key, value) "
+                    "values ('formatNo', ?)", (str(_FORMAT_NO),))
+
+        self.connWrap.commit()
+        self.totalSize = self.connWrap.execSqlQuerySingleItem(
+                "select sum(size) from pageasts", default=0) or 0
+        self.lastUsedCounter = self.connWrap.execSqlQuerySingleItem(
+                "select max(lastused) from pageasts", default=0) or 0
+
+
+    def _nextLastUsed(self):
+        self.lastUsedCounter += 1
+        return self.lastUsedCounter
+
+
+    def _closeConnection(self):
+        if self.connWrap is not None:
+            try:
+                self.connWrap.close()
+            except sqlite3.Error:
+                traceback.print_exc()
+            self.connWrap = None
+
+
+    def close(self):
+        with self.lock:
+            if self.connWrap is None:
+                return
+            try:
+                self.flush()
+            finally:
+                self._closeConnection()
+
+
+    def isOpen(self):
+        return self.connWrap is not None
+
+
+    def _getBlacklistFingerprint(self, wikiDocument):
+        ccBlacklist = wikiDocument.getCcWordBlacklist()
+        nccBlacklist = wikiDocument.getNccWordBlacklist()
+
+        # The blacklist sets are replaced, not modified, on change
+        baseCc, baseNcc = self.blacklistFingerprintBase
+        if baseCc is not ccBlacklist or baseNcc is not nccBlacklist:
+            h = hashlib.sha1()
+            for bl in (ccBlacklist, nccBlacklist):
+                for word in sorted(bl):
+                    h.update(word.encode("utf-8", "surrogatepass") + b"\n")
+                h.update(b"\0")
+
+            self.blacklistFingerprint = h.hexdigest()
+            self.blacklistFingerprintBase = (ccBlacklist, nccBlacklist)
+
+        return self.blacklistFingerprint
+
+
+    def buildKey(self, docPage, text, formatDetails):
+        """
+        Return key for the AST of text parsed with formatDetails in the
+        context of docPage or None if it can't be cached.
+        """
+        if formatDetails.autoLinkMode == "relax":
+            # Result depends on all link terms of the wiki
+            return None
+
+        pageName = docPage.getWikiWord()
+        if pageName is None:
+            # Functional page
+            return None
+
+        wikiDocument = docPage.getWikiDocument()
+
+        fingerprint = repr((Consts.VERSION_STRING, docPage.getWikiLanguageName(),
+                pageName, formatDetails.noFormat, formatDetails.withCamelCase,
+                formatDetails.autoLinkMode, formatDetails.paragraphMode,
+                getWikiLanguageDetailsFingerprint(
+                    formatDetails.wikiLanguageDetails),
+                self._getBlacklistFingerprint(wikiDocument)))
+
+        h = hashlib.sha1(fingerprint.encode("utf-8", "surrogatepass"))
+        h.update(b"\0")
+        h.update(text.encode("utf-8", "surrogatepass"))
+
+        return h.hexdigest()
+
+
+    def allowModule(self, moduleName):
+        """
+        Allow classes of module moduleName (normally the module of a wiki
+        parser) in stored ASTs.
+        """
+        self.allowedModules.add(moduleName)
+
+
+    def get(self, key):
+        """
+        Return cached AST for key or None.
+        """
+        with self.lock:
+            if self.connWrap is None:
+                return None
+
+            entry = self.pendingPuts.get(key)
+            if entry is not None:
+                data = entry[0]
+            else:
+                try:
+                    data = self.connWrap.execSqlQuerySingleItem(
+                            "select data from pageasts where key = ?", (key,))
+                except sqlite3.Error:
+                    traceback.print_exc()
+                    data = None
+
+            if data is None:
+                self.missCount += 1
+                return None
+
+            self.hitCount += 1
+            self.pendingUsages[key] = self._nextLastUsed()
+            self._flushIfNeeded()
+
+        try:
+            return _RestrictedUnpickler(zlib.decompress(data),
+                    self.allowedModules).load()
+        except Exception:
+            traceback.print_exc()
+            return None
+
+
+    def put(self, key, pageAst):
+        try:
+            data = zlib.compress(pickle.dumps(pageAst,
+                    pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            # E.g. node with unpicklable content, the AST isn't cached then
+            traceback.print_exc()
+            return
+
+        with self.lock:
+            if self.connWrap is None:
+                return
+
+            self.pendingPuts[key] = (data, self._nextLastUsed())
+            self._flushIfNeeded()
+
+
+    def _flushIfNeeded(self):
+        if len(self.pendingPuts) + len(self.pendingUsages) >= self.FLUSH_COUNT:
+            self.flush()
+
+
+    def flush(self):
+        """
+        Write pending entries and usages and evict entries if necessary.
+        """
+        with self.lock:
+            if self.connWrap is None:
+                return
+
+            pendingPuts = self.pendingPuts
+            pendingUsages = self.pendingUsages
+            self.pendingPuts = {}
+            self.pendingUsages = {}
+
+            try:
+                for key, (data, lastUsed) in pendingPuts.items():
+                    oldSize = self.connWrap.execSqlQuerySingleItem(
+                            "select size from pageasts where key = ?", (key,),
+                            default=0)
+                    self.connWrap.execSql("insert or replace into pageasts("
+                            "key, data, size, lastused) values (?, ?, ?, ?)",
+                            (key, sqlite3.Binary(data), len(data), lastUsed))
+                    self.totalSize += len(data) - (oldSize or 0)
+
+                self.connWrap.getCursor().executemany("update pageasts "
+                        "set lastused = ? where key = ?",
+                        [(lastUsed, key) for key, lastUsed in
+                        pendingUsages.items() if key not in pendingPuts])
+
+                if self.totalSize > self.maxSize:
+                    self._evict()
+
+                self.connWrap.commit()
+            except sqlite3.Error:
+                traceback.print_exc()
+                try:
+                    self.connWrap.rollback()
+                    self.totalSize = self.connWrap.execSqlQuerySingleItem(
+                            "select sum(size) from pageasts", default=0) or 0
+                except sqlite3.Error:
+                    pass
+
+
+    def _evict(self):
+        """
+        Remove least recently used entries until the cache is reduced
+        to 80% of its maximum size.
+        """
+        targetSize = self.maxSize * 0.8
+        toDelete = []
+        for key, size in self.connWrap.execSqlQuery("select key, size "
+                "from pageasts order by lastused"):
+            if self.totalSize <= targetSize:
+                break
+            toDelete.append((key,))
+            self.totalSize -= size
+
+        self.connWrap.getCursor().executemany(
+                "delete from pageasts where key = ?", toDelete)
+
+
+    def clear(self):
+        with self.lock:
+            self.pendingPuts = {}
+            self.pendingUsages = {}
+            if self.connWrap is None:
+                return
+
+            try:
+                self.connWrap.execSql("delete from pageasts")
+                self.connWrap.commit()
+                self.totalSize = 0
+            except sqlite3.Error:
+                traceback.print_exc()
+
+
+    def getStatistics(self):
+        """
+        Return dictionary with statistics about cache usage.
+        """
+        with self.lock:
+            return {"hits": self.hitCount, "misses": self.missCount,
+                    "size": self.totalSize, "maxSize": self.maxSize,
+                    "pending": len(self.pendingPuts)}
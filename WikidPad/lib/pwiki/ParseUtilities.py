@@ -1,4 +1,4 @@
-import re
+import re, threading
 
 class _DummmyWikiLanguageDetails:
     """
@@ -116,6 +116,186 @@ def getFootnoteAnchorDict(pageAst):
 #     return result
 
 
+# For auto-link mode relax: contiguous alphanumeric characters
+_AUTOLINK_RELAX_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class AutoLinkRelaxMatcher:
+    """
+    Multi-pattern matcher for autoLink "relax" mode.
+
+    Each link term is split into its parts of contiguous alphanumeric
+    characters and stored in a trie keyed by the lowercased parts. A text
+    matches a term if the same parts follow each other in the text separated
+    by arbitrary non-alphanumeric characters and at word boundaries (the same
+    rules as the former one regular expression per term).
+
+    The trie is searched once per text so the cost doesn't grow with the
+    number of link terms. Terms can be added and removed incrementally.
+    Changes hold the lock, readers (the parsers) don't need to lock.
+    """
+    __slots__ = ("__weakref__", "_root", "_words", "_lock")
+
+    def __init__(self, words=()):
+        # Each trie node is a dictionary {lowercased part: child node},
+        # key None holds the tuple of terms ending at this node, best first
+        self._root = {}
+        self._words = set()
+        self._lock = threading.Lock()
+        self.updateWords(words)
+
+
+    @staticmethod
+    def _splitWord(word):
+        return [m.group(0).lower()
+                for m in _AUTOLINK_RELAX_TOKEN_RE.finditer(word)]
+
+
+    def __len__(self):
+        return len(self._words)
+
+    def __contains__(self, word):
+        return word in self._words
+
+
+    def addWord(self, word):
+        """
+        Add a single link term. Terms without any alphanumeric character
+        are ignored.
+        """
+        with self._lock:
+            self._addWord(word)
+
+
+    def removeWord(self, word):
+        """
+        Remove a single link term if present.
+        """
+        with self._lock:
+            self._removeWord(word)
+
+
+    def changeWords(self, addedWords, removedWords):
+        """
+        Remove the terms of iterable  removedWords  and add the terms of
+        iterable  addedWords , e.g. the link terms of a changed page.
+        """
+        with self._lock:
+            for word in removedWords:
+                self._removeWord(word)
+            for word in addedWords:
+                self._addWord(word)
+
+
+    def updateWords(self, words):
+        """
+        Bring matcher in sync with iterable  words  by adding and removing
+        only the difference to the current set of terms.
+        """
+        words = set(w for w in words if w != "")
+        with self._lock:
+            for word in self._words - words:
+                self._removeWord(word)
+            for word in words - self._words:
+                self._addWord(word)
+
+
+    def _addWord(self, word):
+        # Lock must be held by caller
+        if word in self._words:
+            return
+
+        parts = self._splitWord(word)
+        if len(parts) == 0:
+            return
+
+        self._words.add(word)
+
+        node = self._root
+        for part in parts:
+            child = node.get(part)
+            if child is None:
+                child = {}
+                node[part] = child
+            node = child
+
+        # Longest term first, like the former list of regexes sorted
+        # by length
+        node[None] = tuple(sorted(node.get(None, ()) + (word,),
+                key=lambda w: (-len(w), w)))
+
+
+    def _removeWord(self, word):
+        # Lock must be held by caller
+        if word not in self._words:
+            return
+        self._words.discard(word)
+
+        path = []
+        node = self._root
+        for part in self._splitWord(word):
+            path.append((node, part))
+            node = node[part]
+
+        words = tuple(w for w in node[None] if w != word)
+        if len(words) > 0:
+            node[None] = words
+            return
+
+        del node[None]
+        # Prune nodes which became empty
+        for parent, part in reversed(path):
+            if len(parent[part]) > 0:
+                break
+            del parent[part]
+
+
+    def iterMatches(self, text):
+        """
+        Iterate over non-overlapping matches in  text  as tuples
+        (start, end, word) where text[start:end] is the text as typed in the
+        page and word is the link term as stored in the database. The
+        earliest match is taken first, at the same position the longest
+        term wins.
+        """
+        tokens = [(m.start(), m.end(), m.group(0).lower())
+                for m in _AUTOLINK_RELAX_TOKEN_RE.finditer(text)]
+        root = self._root
+        lenTokens = len(tokens)
+
+        i = 0
+        while i < lenTokens:
+            node = root.get(tokens[i][2])
+            if node is None:
+                i += 1
+                continue
+
+            foundWord = None
+            foundEnd = i
+            j = i
+            while True:
+                words = node.get(None)
+                if words is not None and (foundWord is None or
+                        len(words[0]) > len(foundWord)):
+                    foundWord = words[0]
+                    foundEnd = j
+
+                j += 1
+                if j == lenTokens:
+                    break
+                node = node.get(tokens[j][2])
+                if node is None:
+                    break
+
+            if foundWord is None:
+                i += 1
+                continue
+
+            yield tokens[i][0], tokens[foundEnd][1], foundWord
+            i = foundEnd + 1
+
+
+
 _RE_LINE_INDENT = re.compile(r"^[ \t]*")
 
 class BasicLanguageHelper:
@@ -216,6 +396,17 @@ class BasicLanguageHelper:
         raise InternalError()
 
 
+    @staticmethod
+    def updateAutoLinkRelaxInfo(wikiDocument, relaxInfo):
+        """
+        Bring cache info previously created by buildAutoLinkRelaxInfo()
+        up to date after link terms have changed and return it (or a new
+        info object). Optional, if missing buildAutoLinkRelaxInfo() is
+        called again.
+        """
+        raise InternalError()
+
+
     @staticmethod
     def createWikiLinkPathObject(*args, **kwargs):
         raise InternalError()
@@ -5467,14 +5467,22 @@ camelCaseWordsEnabled: false;a=[camelCaseWordsEnabled: false]\\n
                 if "changed state" in miscEvt:
                     # Update executor started/stopped/ran empty/was filled
                     if miscEvt.get("isRunning"):
-                        jobCount = miscEvt.get("jobCount")
+                        jobCount = miscEvt.get("jobCount") + \
+                                miscEvt.get("runningJobCount", 0)
                     else:
                         jobCount = 0
                      
                     if jobCount > 0:
-                        self.updateStatusMessage(
-                                _("Performing background jobs..."),
-                                key="jobInfo", duration=300000)
+                        jobsPerSecond = miscEvt.get("jobsPerSecond")
+                        if jobsPerSecond:
+                            msg = _("Performing background jobs "
+                                    "(%i left, %.1f per second)...") % \
+                                    (jobCount, jobsPerSecond)
+                        else:
+                            msg = _("Performing background jobs...")
+
+                        self.updateStatusMessage(msg, key="jobInfo",
+                                duration=300000)
                     else:
                         self.dropStatusMessageByKey("jobInfo")
 
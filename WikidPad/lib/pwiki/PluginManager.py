@@ -3,7 +3,7 @@
 from zipimport import zipimporter
 import sys, traceback, os.path
 
-import wx
+from .AppContext import GetApp
 
 from .StringOps import mbcsEnc
 from functools import reduce
@@ -213,12 +213,18 @@ class PluginAPIAggregation:
 
 class PluginManager:
     """manages all PluginAPIs and plugins."""
-    def __init__(self, directories, systemDirIdx=-1):
+    def __init__(self, directories, systemDirIdx=-1, ignoreMissingModules=()):
+        """
+        ignoreMissingModules -- Names of top level modules/packages.
+                Plugins which can't be loaded because one of them is missing
+                are skipped silently (e.g. "wx" for a headless application)
+        """
         self.pluginAPIs = {}  # Dictionary {<type name>:<verReg dict>}
                 # where verReg dict is list of tuples (<version No>:<PluginAPI instance>)
         self.plugins = {}  
         self.directories = directories
         self.systemDirIdx = systemDirIdx
+        self.ignoreMissingModules = frozenset(ignoreMissingModules)
         
     def registerSimplePluginAPI(self, descriptor, functions):
         api = SimplePluginAPI(descriptor, functions)
@@ -372,6 +378,10 @@ class PluginManager:
                         setattr(package, moduleName, module)
                         if hasattr(module, "WIKIDPAD_PLUGIN"):
                             self.registerPlugin(module)
+                except ImportError as e:
+                    if (e.name or "").split(".")[0] not in \
+                            self.ignoreMissingModules:
+                        traceback.print_exc()
                 except:
                     traceback.print_exc()
             del sys.path[-1]
@@ -598,7 +608,7 @@ class InsertionPluginManager:
             else:
                 key, etlist, factory = keyDesc
                 try:
-                    obj = factory(wx.GetApp())
+                    obj = factory(GetApp())
                 except:
                     traceback.print_exc()
                     obj = None
@@ -639,7 +649,7 @@ def getExporterClasses(mainControl):
     
     # TODO: Cache?
     return reduce(lambda a, b: a+list(b),
-            wx.GetApp().describeExportersApi.describeExportersV01(mainControl),
+            GetApp().describeExportersApi.describeExportersV01(mainControl),
             list(Exporters.describeExportersV01(mainControl)))
 
 #     classIds = set()
@@ -763,7 +773,7 @@ def getPrintTypeDict(mainControl):
     result = {}
 
     # External plugins can overwrite internal exporter types
-    for c in wx.GetApp().describePrints(mainControl):
+    for c in GetApp().describePrints(mainControl):
         for tnt in c.getPrintTypes(mainControl):
             tname, tnameHr = tnt[:2]
             result[tname] = (c, tname, tnameHr)
@@ -0,0 +1,460 @@
+"""
+Rebuild engine which parses the pages of a wiki in a pool of worker processes.
+
+The main process reads the live text of the pages and sends it to the
+workers. They return compact results (attributes, todos, child relations,
+references and headings to use as match terms) instead of page ASTs. All
+database writes are done by the main process in batched transactions,
+attributes of all pages are written before the syntax data of any page.
+
+The worker processes have no access to the wiki. They get a snapshot of the
+data the parser needs (configuration, CamelCase blacklists, link terms for
+auto-link "relax" mode) when the pool is started (see WorkerSnapshot.py).
+"""
+
+import os, traceback, collections
+
+import multiprocessing, concurrent.futures
+
+from .AppContext import GetApp
+
+from .WikiExceptions import *
+
+from .Utilities import DUMBTHREADSTOP
+from .WorkerSnapshot import SnapshotWikiPage, WorkerState, getFormatKey, \
+        getParserModuleInfo, getAppSnapshot, initWorker, getWorkerState
+
+from .DocPages import WikiPage, AliasWikiPage
+
+
+
+# ---------- Worker side ----------
+
+class _RebuildWorkerState(WorkerState):
+    def __init__(self, moduleName, moduleFile, intLanguageName, snapshot):
+        WorkerState.__init__(self, moduleName, moduleFile, intLanguageName,
+                snapshot)
+        self.headingsAsAliasesDepth = snapshot["headingsAsAliasesDepth"]
+
+
+    def parsePage(self, wikiWord, text, formatKey):
+        page = SnapshotWikiPage(self.wikiDocument, wikiWord)
+        formatDetails = self.createFormatDetails(page, formatKey)
+
+        pageAst = self.parser.parse(self.intLanguageName, text,
+                formatDetails, DUMBTHREADSTOP)
+
+        return extractRebuildResultFromPageAst(pageAst,
+                self.headingsAsAliasesDepth, self.langHelper, page)
+
+
+def _parsePages(payload):
+    """
+    Parse a chunk of pages. payload is a list of tuples
+    (wikiWord, text, formatKey). Returns a list with a result tuple
+    (see extractRebuildResultFromPageAst()) or None for each page.
+    """
+    workerState = getWorkerState()
+    results = []
+    for wikiWord, text, formatKey in payload:
+        try:
+            results.append(workerState.parsePage(wikiWord, text, formatKey))
+        except Exception:
+            traceback.print_exc()
+            results.append(None)
+
+    return results
+
+
+def extractRebuildResultFromPageAst(pageAst, headingsAsAliasesDepth,
+        langHelper, basePage):
+    """
+    Return tuple (attrs, todos, childRelations, headingTerms, references)
+    with the data WikiPage.refreshAttributesFromPageAst() and
+    WikiPage.refreshMainDbCacheFromPageAst() would store for pageAst.
+    Uses the same extraction functions of WikiPage as these.
+    """
+    attrs = WikiPage.extractAttributesFromPageAst(pageAst)
+    todos = WikiPage.extractTodosFromPageAst(pageAst)
+    childRelations = WikiPage.extractChildRelationsFromPageAst(pageAst)
+    references = WikiPage.extractReferencesFromPageAst(pageAst, langHelper,
+            basePage)
+    headingTerms = WikiPage.extractHeadingTermsFromPageAst(pageAst,
+            headingsAsAliasesDepth)
+
+    return (attrs, todos, childRelations, headingTerms, references)
+
+
+
+# ---------- Main side ----------
+
+class _RebuildJob:
+    """
+    State of a single page during rebuild on the main side
+    """
+    __slots__ = ("wikiWord", "wikiPage", "text", "liveTextPlaceHold",
+            "formatDetails", "result", "failed")
+
+    def __init__(self, wikiWord, wikiPage):
+        self.wikiWord = wikiWord
+        self.wikiPage = wikiPage
+        self.text = None
+        self.liveTextPlaceHold = None
+        self.formatDetails = None
+        self.result = None
+        # True if page couldn't be retrieved or read, it is skipped then
+        self.failed = False
+
+    def readPage(self):
+        """
+        Retrieve live text and format details. Returns the format key to
+        send to the worker.
+        """
+        wikiPage = self.wikiPage
+        with wikiPage.textOperationLock:
+            self.text = wikiPage.getLiveText()
+            self.liveTextPlaceHold = wikiPage.liveTextPlaceHold
+            self.formatDetails = wikiPage.getFormatDetails()
+
+        return getFormatKey(self.formatDetails)
+
+
+class RebuildEngine:
+    """
+    Rebuilds attributes and syntax data (todos, relations, match terms)
+    of pages with a process pool. Use createForWikiDocument() to create it.
+    """
+    # Number of pages sent to a worker at once
+    CHUNK_SIZE = 20
+
+    # Number of pages after which database changes are committed
+    COMMIT_BATCH_SIZE = 500
+
+    # Number of chunks per process which may be waiting for processing.
+    # Limits memory usage for page texts
+    PENDING_CHUNKS_PER_PROCESS = 4
+
+    def __init__(self, wikiDocument, processCount, moduleName, moduleFile):
+        self.wikiDocument = wikiDocument
+        self.processCount = processCount
+        self.moduleName = moduleName
+        self.moduleFile = moduleFile
+
+        self.headingsAsAliasesDepth = wikiDocument.getWikiConfig().getint(
+                "main", "headingsAsAliases_depth", 0)
+        self.langHelper = GetApp().createWikiLanguageHelper(
+                wikiDocument.getWikiDefaultWikiLanguage())
+
+        self.poolBroken = False
+        self.uncommittedCount = 0
+
+
+    @staticmethod
+    def getConfiguredProcessCount():
+        """
+        Return number of worker processes as set in the global configuration.
+        """
+        processCount = GetApp().getGlobalConfig().getint("main",
+                "rebuild_processCount", 0)
+        if processCount < 0:
+            processCount = os.cpu_count() or 1
+
+        return processCount
+
+
+    @staticmethod
+    def createForWikiDocument(wikiDocument, pageCount):
+        """
+        Return a RebuildEngine for wikiDocument or None if pages should
+        be rebuilt sequentially in the main process (disabled by
+        configuration, too few pages, or wiki language not usable in
+        worker processes).
+        """
+        processCount = RebuildEngine.getConfiguredProcessCount()
+        if processCount < 1 or pageCount < RebuildEngine.CHUNK_SIZE * 2 or \
+                wikiDocument.isReadOnlyEffect():
+            return None
+
+        moduleInfo = getParserModuleInfo(wikiDocument)
+        if moduleInfo is None:
+            return None
+
+        return RebuildEngine(wikiDocument, processCount, *moduleInfo)
+
+
+    def _buildSnapshot(self, linkTerms):
+        wikiDocument = self.wikiDocument
+        wikiConfig = wikiDocument.getWikiConfig()
+
+        config = {}
+        for section, option in wikiConfig.configDefaults.keys():
+            try:
+                config[(section, option)] = wikiConfig.get(section, option)
+            except Exception:
+                pass
+
+        snapshot = getAppSnapshot()
+        snapshot.update({
+                "config": config,
+                "ccWordBlacklist": set(wikiDocument.getCcWordBlacklist()),
+                "nccWordBlacklist": set(wikiDocument.getNccWordBlacklist()),
+                "linkTerms": list(linkTerms),
+                "headingsAsAliasesDepth": self.headingsAsAliasesDepth
+            })
+
+        return snapshot
+
+
+    def _createExecutor(self, linkTerms):
+        if self.poolBroken:
+            return None
+
+        try:
+            return concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.processCount,
+                    mp_context=multiprocessing.get_context(),
+                    initializer=initWorker,
+                    initargs=(__name__, "_RebuildWorkerState",
+                        self.moduleName, self.moduleFile,
+                        self.wikiDocument.getWikiDefaultWikiLanguage(),
+                        self._buildSnapshot(linkTerms)))
+        except Exception:
+            traceback.print_exc()
+            self.poolBroken = True
+            return None
+
+
+    def _iterParsedJobs(self, jobs, linkTerms):
+        """
+        Parse the pages of jobs in the pool and yield each job with its
+        result set in the original order. The result of a job is None
+        if it couldn't be parsed by a worker. Jobs whose page can't be read
+        are marked as failed.
+        """
+        executor = self._createExecutor(linkTerms)
+        maxPending = self.processCount * self.PENDING_CHUNKS_PER_PROCESS
+        pending = collections.deque()
+
+        def takeFirst():
+            chunk, parseJobs, future = pending.popleft()
+            if future is not None:
+                try:
+                    results = future.result()
+                except Exception:
+                    # Pool is broken (worker died or data not transferable)
+                    traceback.print_exc()
+                    self.poolBroken = True
+                    results = [None] * len(parseJobs)
+            else:
+                results = [None] * len(parseJobs)
+
+            for job, result in zip(parseJobs, results):
+                job.result = result
+
+            for job in chunk:
+                job.text = None
+
+            return chunk
+
+        try:
+            for i in range(0, len(jobs), self.CHUNK_SIZE):
+                chunk = jobs[i:i + self.CHUNK_SIZE]
+                parseJobs = []
+                payload = []
+                for job in chunk:
+                    if job.failed:
+                        continue
+
+                    try:
+                        formatKey = job.readPage()
+                        pageAst = self._getCachedPageAst(job)
+                        if pageAst is not None:
+                            job.result = extractRebuildResultFromPageAst(
+                                    pageAst, self.headingsAsAliasesDepth,
+                                    self.langHelper, job.wikiPage)
+                            continue
+                    except:
+                        traceback.print_exc()
+                        job.failed = True
+                        continue
+
+                    parseJobs.append(job)
+                    payload.append((job.wikiWord, job.text, formatKey))
+
+                if not payload:
+                    future = None
+                elif self.poolBroken or executor is None:
+                    future = None
+                else:
+                    try:
+                        future = executor.submit(_parsePages, payload)
+                    except Exception:
+                        traceback.print_exc()
+                        self.poolBroken = True
+                        future = None
+
+                pending.append((chunk, parseJobs, future))
+
+                while len(pending) >= maxPending:
+                    for job in takeFirst():
+                        yield job
+
+            while pending:
+                for job in takeFirst():
+                    yield job
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=not self.poolBroken)
+
+
+    def _getCachedPageAst(self, job):
+        """
+        Return AST of job from the PageAstCache or None.
+        """
+        astCache = self.wikiDocument.getPageAstCache()
+        if astCache is None or len(job.text) == 0:
+            return None
+
+        cacheKey = astCache.buildKey(job.wikiPage, job.text, job.formatDetails)
+        if cacheKey is None:
+            return None
+
+        return astCache.get(cacheKey)
+
+
+    def _commitBatch(self, force=False):
+        self.uncommittedCount += 1
+        if force or self.uncommittedCount >= self.COMMIT_BATCH_SIZE:
+            self.wikiDocument.getWikiData().commit()
+            self.uncommittedCount = 0
+
+
+    def _parseInMainProcess(self, job):
+        """
+        Fallback if worker couldn't process the page
+        """
+        pageAst = job.wikiPage.getLivePageAst()
+        job.liveTextPlaceHold = job.wikiPage.livePageBasePlaceHold
+        job.formatDetails = job.wikiPage.livePageBaseFormatDetails
+
+        return extractRebuildResultFromPageAst(pageAst,
+                self.headingsAsAliasesDepth, self.langHelper, job.wikiPage)
+
+
+    def rebuildAttributesAndSyntax(self, wikiWords, progresshandler, step):
+        """
+        Do the "attributes" and "syntax" steps of
+        WikiDocument.rebuildWiki(). Calls progresshandler.update() once
+        per page and step, beginning with step. Returns the next step number.
+        """
+        wikiDocument = self.wikiDocument
+        wikiData = wikiDocument.getWikiData()
+
+        jobs = []
+        for wikiWord in wikiWords:
+            job = _RebuildJob(wikiWord, None)
+            try:
+                wikiPage = wikiDocument._getWikiPageNoErrorNoCache(wikiWord)
+                if isinstance(wikiPage, AliasWikiPage):
+                    # This should never be an alias page, so fetch the
+                    # real underlying page
+                    # This can only happen if there is a real page with
+                    # the same name as an alias
+                    wikiPage = WikiPage(wikiDocument, wikiWord)
+                job.wikiPage = wikiPage
+            except:
+                traceback.print_exc()
+                job.failed = True
+
+            jobs.append(job)
+
+        # Step one: Attributes. There may be attributes which define how the
+        #   rest has to be interpreted, therefore they are all written
+        #   before the syntax step.
+        for job in self._iterParsedJobs(jobs,
+                wikiData.getAllProducedWikiLinks()):
+            progresshandler.update(step, _("Update attributes of %s") %
+                    job.wikiWord)
+            if not job.failed:
+                try:
+                    if job.result is None:
+                        job.result = self._parseInMainProcess(job)
+
+                    wikiData.refreshFileSignatureForWikiPageName(job.wikiWord)
+                    job.wikiPage.refreshAttributesFromRebuildResult(
+                            job.result[0], job.liveTextPlaceHold,
+                            job.formatDetails)
+                except:
+                    traceback.print_exc()
+                    job.result = None
+
+            self._commitBatch()
+            step += 1
+
+        self._commitBatch(force=True)
+        wikiData.updateCachedGlobalAttrs()
+
+        # Step two: Syntax. Pages are parsed again only if the attributes
+        #   changed their format details or the auto-link terms may
+        #   have changed by new aliases.
+        linkTerms = set(wikiData.getAllProducedWikiLinks())
+        for job in jobs:
+            if job.failed:
+                continue
+            try:
+                linkTerms.update(matchTerm[0] for matchTerm in
+                        job.wikiPage.buildMatchTerms(()))
+            except:
+                traceback.print_exc()
+
+        reparseJobs = []
+        for job in jobs:
+            if job.failed:
+                continue
+            try:
+                formatDetails = job.wikiPage.getFormatDetails()
+            except:
+                traceback.print_exc()
+                job.failed = True
+                continue
+
+            if job.result is None or job.formatDetails is None or \
+                    not formatDetails.isEquivTo(job.formatDetails) or \
+                    formatDetails.autoLinkMode == "relax":
+                job.result = None
+                reparseJobs.append(job)
+
+        # Reparsed jobs are yielded in the same order as they appear in jobs
+        reparsedIter = self._iterParsedJobs(reparseJobs, linkTerms)
+        reparseIdx = 0
+        try:
+            for job in jobs:
+                progresshandler.update(step, _("Update syntax of %s") %
+                        job.wikiWord)
+                try:
+                    if reparseIdx < len(reparseJobs) and \
+                            reparseJobs[reparseIdx] is job:
+                        reparseIdx += 1
+                        next(reparsedIter)
+
+                    if not job.failed:
+                        if job.result is None:
+                            job.result = self._parseInMainProcess(job)
+
+                        attrs, todos, childRelations, headingTerms, \
+                                references = job.result
+                        job.wikiPage.refreshMainDbCacheFromRebuildResult(todos,
+                                childRelations, headingTerms, references,
+                                job.liveTextPlaceHold, job.formatDetails)
+                except:
+                    traceback.print_exc()
+
+                job.result = None
+                self._commitBatch()
+                step += 1
+        finally:
+            reparsedIter.close()
+
+        self._commitBatch(force=True)
+
+        return step
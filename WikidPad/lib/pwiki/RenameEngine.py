@@ -0,0 +1,330 @@
+"""
+Rename engine which renames a set of wiki pages at once.
+
+The renames and the resulting modifications of page texts (new titles,
+updated references) are written in one database transaction. The pages
+which may refer to the renamed pages are determined before renaming and
+each of them is parsed once to update the references to all old page names
+together. If the transaction fails, the previous page texts are written
+back before the rollback because page files aren't part of it. The update
+executor is paused meanwhile and the meta-data update of all modified
+pages is queued at once after the transaction.
+"""
+
+import re, traceback
+
+from .AppContext import GetApp
+
+import Consts
+from Consts import ModifyText
+from .WikiExceptions import *
+
+from .SearchAndReplace import SearchReplaceOperation
+
+
+
+class RenameEngine:
+    """
+    Renames pages of a wiki document and updates references to them.
+    Used by WikiDocument.renameWikiWords().
+    """
+    def __init__(self, wikiDocument):
+        self.wikiDocument = wikiDocument
+        self.langHelper = GetApp().createWikiLanguageHelper(
+                wikiDocument.getWikiDefaultWikiLanguage())
+        # List of tuples (page, previous live text) of pages modified
+        # inside the transaction
+        self.replacedTexts = []
+
+
+    def checkRenames(self, renameSeq):
+        """
+        Raise WikiDataException if one of the renames in renameSeq
+        (sequence of tuples (word, toWord), processed in this order) isn't
+        possible. A name freed by a previous rename may be reused.
+        """
+        wikiDocument = self.wikiDocument
+        freedWords = set()
+        takenWords = set()
+
+        for word, toWord in renameSeq:
+            errMsg = self.langHelper.checkForInvalidWikiWord(toWord,
+                    wikiDocument)
+            if errMsg:
+                raise WikiDataException(
+                        _("%r is an invalid wiki word. %s") % (toWord, errMsg))
+
+            if toWord in takenWords or (toWord not in freedWords and
+                    wikiDocument.isDefinedWikiLinkTerm(toWord)):
+                raise WikiDataException(
+                        _("Cannot rename %r to %r, %r already exists.") %
+                        (word, toWord, toWord))
+
+            freedWords.add(word)
+            takenWords.discard(word)
+            takenWords.add(toWord)
+
+
+    def renameWikiWords(self, renameSeq, modifyText=ModifyText.advanced):
+        """
+        Rename pages and update references to them.
+
+        renameSeq -- sequence of tuples (word, toWord), renames are done
+                in this order
+        modifyText -- see WikiDocument.renameWikiWords()
+        """
+        wikiDocument = self.wikiDocument
+        renameDict = dict(renameSeq)
+
+        self.checkRenames(renameSeq)
+
+        wordPages = []
+        wordTitles = []
+        for word, toWord in renameSeq:
+            wordPages.append(self._getSavedWordPage(word))
+
+            # TODO: Replace always?
+            # Check if replacing previous title of page with new one
+            wordTitle = wikiDocument.getWikiPageTitle(word)
+            if wordTitle is not None:
+                wordTitle = wikiDocument.formatPageTitle(wordTitle) + "\n"
+            wordTitles.append(wordTitle)
+
+        # Pages to modify are searched before renaming with the old names
+        if modifyText == ModifyText.advanced:
+            updateWords = self._findPagesThatReferenceWords(renameDict)
+            # Links in renamed pages are resolved relative to their new
+            # names, so check them in any case
+            updateWords.update(renameDict.values())
+        elif modifyText == ModifyText.simple:
+            updateWords = self._findPagesThatContainWords(renameDict)
+        else:
+            updateWords = ()
+
+        wikiData = wikiDocument.getWikiData()
+        self.replacedTexts = []
+
+        # The update executor must not commit in the middle of the
+        # transaction
+        executorWasRunning = wikiDocument._pauseUpdateExecutor()
+        try:
+            # commit anything pending so we can rollback on error
+            wikiData.commit()
+            try:
+                modifiedPages = self._renamePages(renameSeq, wordTitles)
+
+                if modifyText == ModifyText.advanced:
+                    modifiedPages += self._updateReferences(updateWords,
+                            renameDict)
+                elif modifyText == ModifyText.simple:
+                    modifiedPages += self._replaceWords(updateWords,
+                            renameDict)
+
+                wikiData.commit()
+            except:
+                # Page files (original_sqlite) aren't restored by the
+                # rollback, so write the previous texts first
+                self._restoreTexts()
+                wikiData.rollback()
+                self._restorePageDict(renameSeq, wordPages)
+                raise
+
+            self._finishRenames(renameSeq, wordPages)
+
+            # One refresh for all modified pages, each page only once
+            wikiDocument.pushUpdatePages(dict.fromkeys(modifiedPages))
+        finally:
+            if executorWasRunning:
+                wikiDocument.getUpdateExecutor().start()
+
+
+    def _getSavedWordPage(self, word):
+        """
+        Return page of word to rename, create it if not existing. The page
+        is saved because renaming works on the database content.
+        """
+        wikiDocument = self.wikiDocument
+        try:
+            wordPage = wikiDocument.getWikiPage(word)
+        except WikiWordNotFoundException:
+            # create page first
+            wordPage = wikiDocument.createWikiPage(word)
+            wordPage.writeToDatabase()
+
+        if wordPage.getDirty()[0]:
+            wordPage.writeToDatabase()
+
+        return wordPage
+
+
+    def _findPagesThatReferenceWords(self, renameDict):
+        """
+        Return set of current names of pages which (might) refer to an old
+        page name. Must be called before renaming.
+        """
+        words = self.wikiDocument._findPagesThatReferenceWords(renameDict)
+        return set(renameDict.get(word, word) for word in words)
+
+
+    def _findPagesThatContainWords(self, renameDict):
+        """
+        Return set of current names of pages which contain an old page name
+        literally. Must be called before renaming.
+        """
+        sarOp = SearchReplaceOperation()
+        sarOp.wikiWide = True
+        sarOp.wildCard = 'regex'
+        sarOp.caseSensitive = True
+        sarOp.searchStr = "|".join(r"\b" + re.escape(word) + r"\b"
+                for word in renameDict)
+
+        words = self.wikiDocument.searchWiki(sarOp)
+        return set(renameDict.get(word, word) for word in words)
+
+
+    def _renamePages(self, renameSeq, wordTitles):
+        """
+        Rename pages in database and replace titles of renamed pages.
+        Called inside the transaction. Returns list of renamed pages.
+        """
+        wikiDocument = self.wikiDocument
+        wikiData = wikiDocument.getWikiData()
+
+        wikiData.renameWords(renameSeq)
+        for word, toWord in renameSeq:
+            # remove from .getWikiPage() cache
+            wikiDocument.wikiPageDict.pop(word, None)
+
+        toWordPages = []
+        for (word, toWord), wordTitle in zip(renameSeq, wordTitles):
+            toWordPage = wikiDocument.getWikiPage(toWord)
+            toWordPages.append(toWordPage)
+            # Update the match terms which need synchronous updating
+            toWordPage.refreshSyncUpdateMatchTerms()
+            wikiData.setMetaDataState(toWord,
+                    Consts.WIKIWORDMETADATA_STATE_DIRTY)
+
+            if wordTitle is None:
+                continue
+
+            content = toWordPage.getLiveText()
+            if content.startswith(wordTitle):
+                # Replace previous title with new one
+                toWikiWordTitle = wikiDocument.formatPageTitle(
+                        wikiDocument.getWikiPageTitle(toWord))
+                content = toWikiWordTitle + "\n" + content[len(wordTitle):]
+                self._replaceLiveText(toWordPage, content)
+
+        return toWordPages
+
+
+    def _updateReferences(self, words, renameDict):
+        """
+        Update links, attribute and insertion values which refer to old
+        page names in the pages of words. Called inside the transaction.
+        Returns list of modified pages.
+        """
+        wikiDocument = self.wikiDocument
+        modifiedPages = []
+
+        for word in words:
+            page = wikiDocument.getWikiPage(word)
+            text = wikiDocument._updateWikiWordReferences(page, renameDict,
+                    self.langHelper)
+
+            if text != page.getLiveText():
+                self._replaceLiveText(page, text)
+                modifiedPages.append(page)
+
+        return modifiedPages
+
+
+    def _replaceWords(self, words, renameDict):
+        """
+        Replace all occurrences of old page names by the new ones in the
+        pages of words. Called inside the transaction. Returns list of
+        modified pages.
+        """
+        # Longest names first so a name isn't replaced inside a longer one
+        oldWords = sorted(renameDict, key=len, reverse=True)
+        wordRe = re.compile("|".join(r"\b" + re.escape(word) + r"\b"
+                for word in oldWords))
+
+        modifiedPages = []
+        for word in words:
+            page = self.wikiDocument.getWikiPage(word)
+            text = page.getLiveTextNoTemplate()
+            if text is None:
+                continue
+
+            newText = wordRe.sub(lambda match: renameDict[match.group(0)],
+                    text)
+            if newText != text:
+                self._replaceLiveText(page, newText)
+                modifiedPages.append(page)
+
+        return modifiedPages
+
+
+    def _replaceLiveText(self, page, text):
+        """
+        Replace live text of page inside the transaction and remember the
+        previous one for _restoreTexts().
+        """
+        self.replacedTexts.append((page, page.getLiveText()))
+        page.replaceLiveText(text, updateMetaData=False)
+
+
+    def _restoreTexts(self):
+        """
+        Called if the transaction failed, before the rollback. Writes the
+        previous texts of the modified pages back.
+        """
+        for page, text in reversed(self.replacedTexts):
+            try:
+                page.replaceLiveText(text, updateMetaData=False)
+            except Exception:
+                traceback.print_exc()
+
+        self.replacedTexts = []
+
+
+    def _restorePageDict(self, renameSeq, wordPages):
+        """
+        Called after the rollback. Drops the page objects of the new names
+        from the .getWikiPage() cache and puts the ones of the old names
+        back.
+        """
+        wikiPageDict = self.wikiDocument.wikiPageDict
+        for word, toWord in renameSeq:
+            wikiPageDict.pop(toWord, None)
+
+        for (word, toWord), wordPage in zip(renameSeq, wordPages):
+            wikiPageDict[word] = wordPage
+
+
+    def _finishRenames(self, renameSeq, wordPages):
+        """
+        Called after the transaction was committed. Renames version data
+        and wiki configuration (if the root page was renamed) and informs
+        the old page objects.
+        """
+        wikiDocument = self.wikiDocument
+
+        versionedNames = set(wikiDocument.getDataBlockUnifNamesStartingWith(
+                "versioning/overview/"))
+
+        for (word, toWord), wordPage in zip(renameSeq, wordPages):
+            if word == wikiDocument.getWikiName():
+                wikiDocument._renameWikiConfig(toWord)
+
+            if "versioning/overview/" + wordPage.getUnifiedPageName() in \
+                    versionedNames:
+                wordPage.renameVersionData(toWord)
+
+            wordPage.queueRemoveFromSearchIndex()
+            # informRenamedWikiPage sends an event that will (if the page
+            # is opened in an editor) cause docPagePresenter to save and
+            # unload the page, and then load `toWord`. This requires
+            # wordPage to be already saved.
+            wordPage.informRenamedWikiPage(toWord)
@@ -1,6 +1,11 @@
 import re, traceback
 
-import wx
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+from .AppContext import GetApp
 
 from .WikiExceptions import *
 
@@ -15,6 +20,74 @@ from . import SearchAndReplaceBoolLang
 Unknown = object()  # Abstract third truth value constant
 
 
+
+def _literalPrefilter(text, caseSensitive):
+    """
+    Return prefilter condition requiring literal  text . Parts with the
+    replacement character U+FFFD are left out because it can come
+    from decoding invalid bytes of the stored content.
+    """
+    conditions = [("literal", part, caseSensitive)
+            for part in text.split("\ufffd") if part != ""]
+
+    if len(conditions) == 0:
+        return None
+    elif len(conditions) == 1:
+        return conditions[0]
+    else:
+        return ("and", conditions)
+
+
+def _regexPrefilter(items, caseSensitive):
+    """
+    Return prefilter condition for the items of a regular expression
+    parsed by sre_parse or None.
+    """
+    conditions = []
+    run = []
+
+    for op, av in items:
+        if op == sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        elif op == sre_parse.AT:
+            # Zero-width, literal run continues
+            continue
+
+        if len(run) > 0:
+            conditions.append(_literalPrefilter("".join(run), caseSensitive))
+            run = []
+
+        if op == sre_parse.SUBPATTERN:
+            group, addFlags, delFlags, sub = av
+            if addFlags or delFlags:
+                # May change case sensitivity
+                continue
+            conditions.append(_regexPrefilter(sub, caseSensitive))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) or \
+                op == getattr(sre_parse, "POSSESSIVE_REPEAT", None):
+            minCount, maxCount, sub = av
+            if minCount > 0:
+                conditions.append(_regexPrefilter(sub, caseSensitive))
+        elif op == sre_parse.BRANCH:
+            alternatives = [_regexPrefilter(sub, caseSensitive)
+                    for sub in av[1]]
+            if None not in alternatives:
+                conditions.append(("or", alternatives))
+
+    if len(run) > 0:
+        conditions.append(_literalPrefilter("".join(run), caseSensitive))
+
+    conditions = [c for c in conditions if c is not None]
+
+    if len(conditions) == 0:
+        return None
+    elif len(conditions) == 1:
+        return conditions[0]
+    else:
+        return ("and", conditions)
+
+
 class AbstractSearchNode:
     """
     Base class for all search nodes of the search tree
@@ -60,6 +133,18 @@ class AbstractSearchNode:
         Should return True in case of doubt.
         """
         return True
+
+    def getContentPrefilter(self):
+        """
+        Returns a condition the text must fulfill for testWikiPage() to
+        return True or None if there is none. It is used by the database
+        to skip pages before calling testWikiPage().
+        A condition is one of the tuples
+            ("literal", <substring>, <case sensitive?>)
+            ("and", [<condition>, ...])
+            ("or", [<condition>, ...])
+        """
+        return None
         
 
 #     def testText(self, text):
@@ -767,6 +852,17 @@ class AndSearchNode(AbstractAndOrSearchNode):
             
         return Unknown
 
+    def getContentPrefilter(self):
+        conditions = [c for c in (self.left.getContentPrefilter(),
+                self.right.getContentPrefilter()) if c is not None]
+
+        if len(conditions) == 0:
+            return None
+        elif len(conditions) == 1:
+            return conditions[0]
+        else:
+            return ("and", conditions)
+
 
 class OrSearchNode(AbstractAndOrSearchNode):
     """
@@ -790,6 +886,14 @@ class OrSearchNode(AbstractAndOrSearchNode):
 
         return Unknown
 
+    def getContentPrefilter(self):
+        left = self.left.getContentPrefilter()
+        right = self.right.getContentPrefilter()
+        if left is None or right is None:
+            return None
+
+        return ("or", [left, right])
+
 
 
 class RegexTextNode(AbstractContentSearchNode):
@@ -825,6 +929,15 @@ class RegexTextNode(AbstractContentSearchNode):
     def testWikiPage(self, word, text):
         return bool(self.rePattern.search(text))
 
+    def getContentPrefilter(self):
+        try:
+            items = sre_parse.parse(self.rePattern.pattern, self.rePattern.flags)
+        except Exception:
+            return None
+
+        return _regexPrefilter(items,
+                not (self.rePattern.flags & re.IGNORECASE))
+
 #     def testText(self, text):
 #         return bool(self.rePattern.search(text))
 
@@ -878,6 +991,9 @@ class SimpleStrNode(AbstractContentSearchNode):
     def testWikiPage(self, word, text):
         return text.find(self.subStr) != -1
 
+    def getContentPrefilter(self):
+        return _literalPrefilter(self.subStr, True)
+
 
 #     def testText(self, text):
 #         return text.find(self.subStr) != -1
@@ -1207,6 +1323,88 @@ class SimpleHtmlFormatter:
 
 
 
+def _ftsString(text):
+    return '"%s"' % text.replace('"', '""')
+
+
+def whooshQueryToFts5(q):
+    """
+    Translate whoosh query object q to a query string for an SQLite FTS5
+    full text index. Returns None if the query can't match anything.
+
+    Only the "content" field is indexed. Wildcards inside a term are
+    reduced to a prefix query, so such a search may find more pages than
+    with the whoosh index. A negation is only possible together with
+    at least one positive term.
+    """
+    from whoosh import query
+
+    if isinstance(q, (query.Term, query.MultiTerm, query.Phrase)):
+        if q.fieldname != "content":
+            return None
+
+        if isinstance(q, query.Phrase):
+            return _ftsString(" ".join(q.words))
+        elif isinstance(q, query.Prefix):
+            return _ftsString(q.text) + "*"
+        elif isinstance(q, query.Wildcard):
+            prefix = re.split(r"[*?]", q.text, 1)[0]
+            if prefix == "":
+                return None
+            return _ftsString(prefix) + "*"
+        elif isinstance(q, (query.Term, query.ExpandingTerm)):
+            return _ftsString(q.text)
+        else:
+            return None
+
+    elif isinstance(q, (query.AndNot, query.AndMaybe, query.Otherwise)):
+        a = whooshQueryToFts5(q.a)
+        if isinstance(q, query.AndNot):
+            b = whooshQueryToFts5(q.b)
+            if a is None or b is None:
+                return a
+            return "(%s) NOT (%s)" % (a, b)
+        elif isinstance(q, query.Otherwise) and a is None:
+            return whooshQueryToFts5(q.b)
+        else:
+            return a
+
+    elif isinstance(q, (query.And, query.Require)):
+        positives = []
+        negatives = []
+        for sub in q.subqueries:
+            if isinstance(sub, query.Not):
+                sub = whooshQueryToFts5(sub.query)
+                if sub is not None:
+                    negatives.append(sub)
+            else:
+                sub = whooshQueryToFts5(sub)
+                if sub is None:
+                    return None
+                positives.append(sub)
+
+        if len(positives) == 0:
+            return None
+
+        result = " AND ".join(["(%s)" % sub for sub in positives])
+        for sub in negatives:
+            result = "(%s) NOT (%s)" % (result, sub)
+
+        return result
+
+    elif isinstance(q, (query.Or, query.DisjunctionMax)):
+        subs = [whooshQueryToFts5(sub) for sub in q.subqueries
+                if not isinstance(sub, query.Not)]
+        subs = [sub for sub in subs if sub is not None]
+        if len(subs) == 0:
+            return None
+
+        return " OR ".join(["(%s)" % sub for sub in subs])
+
+    return None
+
+
+
 
 # ----------------------------------------------------------------------
 
@@ -1339,6 +1537,17 @@ class ListWikiPagesOperation:
         return self.searchOpTree.isTextNeededForTest()
 
 
+    def getContentPrefilter(self):
+        """
+        Returns condition the text must fulfill for testWikiPage() to
+        return True or None, see AbstractSearchNode.getContentPrefilter().
+        """
+        if self.searchOpTree is None:
+            return None
+
+        return self.searchOpTree.getContentPrefilter()
+
+
     def testWikiPageByDocPage(self, docPage):
         return self.testWikiPage(docPage.getWikiWord(), docPage.getLiveText())
 
@@ -1795,6 +2004,14 @@ class SearchReplaceOperation:
         return q
 
 
+    def getFullTextIndexQuery(self, wikiDocument):
+        """
+        Return query string for the SQLite FTS5 full text index or None
+        if nothing can be found.
+        """
+        return whooshQueryToFts5(self.getWhooshIndexQuery(wikiDocument))
+
+
     def hasWhooshHighlighting(self):
         """
         Return True iff call to highlightWhooshIndexFound() would work.
@@ -1934,6 +2151,17 @@ class SearchReplaceOperation:
                 self.searchOpTree.isTextNeededForTest()
 
 
+    def getContentPrefilter(self):
+        """
+        Returns condition the text must fulfill for testWikiPage() to
+        return True or None, see AbstractSearchNode.getContentPrefilter().
+        """
+        if self.searchOpTree is None:
+            self.rebuildSearchOpTree()
+
+        return self.searchOpTree.getContentPrefilter()
+
+
     def testWikiPageByDocPage(self, docPage):
         return self.testWikiPage(docPage.getWikiWord(), docPage.getLiveText())
 
@@ -1985,7 +2213,7 @@ def stripSearchString(searchStr):
     Strip leading and trailing spaces from a search string if appropriate
     option is set.
     """
-    if wx.GetApp().getGlobalConfig().getboolean("main", "search_stripSpaces",
+    if GetApp().getGlobalConfig().getboolean("main", "search_stripSpaces",
             True):
         return searchStr.strip(" ")
     else:
@@ -17,8 +17,6 @@ import urllib.request, urllib.parse, urllib.error, urllib.parse, cgi
 
 from codecs import BOM_UTF8, BOM_UTF16_BE, BOM_UTF16_LE
 
-import wx
-
 import re as _re # import pwiki.srePersistent as reimport pwiki.srePersistent as _re
 from .WikiExceptions import *
 from Consts import BYTETYPES
@@ -453,8 +451,15 @@ def getFileSignatureBlock(filename, timeCoarsening=None):
     (e.g. NTFS uses 100ns, FAT uses 2s for mod. time) the file would be seen as
     dirty and cache data would be rebuild without need without coarsening.
     """
-    statinfo = os.stat(pathEnc(filename))
-    
+    return getFileSignatureBlockFromStat(os.stat(pathEnc(filename)),
+            timeCoarsening)
+
+
+def getFileSignatureBlockFromStat(statinfo, timeCoarsening=None):
+    """
+    Same as getFileSignatureBlock() but for an already retrieved result
+    of os.stat() (or os.DirEntry.stat()).
+    """
     if timeCoarsening is None or timeCoarsening <= 0:
         return pack(">BQd", 0, statinfo.st_size, statinfo.st_mtime)
     
@@ -0,0 +1,169 @@
+"""
+Style bytes for the syntax coloring of the Scintilla editor component.
+
+StyleCollector stores the styles as runs of equal style bytes and creates
+the style bytes only once at the end. The other functions work on whole
+byte strings in C (bytes.translate(), comparison of slices) instead of
+looping over single bytes in Python.
+
+This module doesn't need wx.
+"""
+
+
+
+class StyleCollector:
+    """
+    Helps to collect the style bytes needed to set the syntax coloring in
+    Scintilla editor component
+    """
+    def __init__(self, defaultStyleNo, text, bytelenSct, startCharPos=0):
+        self.defaultStyleNo = defaultStyleNo
+        self.text = text
+        self.bytelenSct = bytelenSct
+        self.charPos = startCharPos
+
+        # List of runs [byte length, style number], neighbouring runs have
+        # different styles
+        self.runs = []
+        self.length = 0
+
+
+    def _append(self, byteLength, styleNo):
+        if byteLength == 0:
+            return
+
+        self.length += byteLength
+        if self.runs and self.runs[-1][1] == styleNo:
+            self.runs[-1][0] += byteLength
+        else:
+            self.runs.append([byteLength, styleNo])
+
+
+    def _drop(self, byteLength):
+        """
+        Remove last  byteLength  style bytes
+        """
+        assert self.length >= byteLength
+
+        self.length -= byteLength
+        while byteLength > 0:
+            run = self.runs[-1]
+            if byteLength < run[0]:
+                run[0] -= byteLength
+                break
+
+            byteLength -= run[0]
+            del self.runs[-1]
+
+
+    def bindStyle(self, targetCharPos, targetLength, styleNo):
+        if targetCharPos < 0:
+            return
+
+        if targetCharPos < self.charPos:
+            # Due to some unknown reason we had overlapping styles and
+            # must remove some bytes
+            self._drop(self.bytelenSct(self.text[targetCharPos:self.charPos]))
+        else:
+            # There is possibly a gap between end of last style and current one
+            # -> fill it with default style
+            self._append(self.bytelenSct(self.text[self.charPos:targetCharPos]),
+                    self.defaultStyleNo)
+
+        self.charPos = targetCharPos + targetLength
+
+        self._append(self.bytelenSct(self.text[targetCharPos:self.charPos]),
+                styleNo)
+
+
+    def _finish(self):
+        if self.charPos < len(self.text):
+            self._append(self.bytelenSct(self.text[self.charPos:]),
+                    self.defaultStyleNo)
+            self.charPos = len(self.text)
+
+
+    def getStyleRanges(self):
+        """
+        Return list of tuples (byteStart, byteEnd, styleNo) for all runs
+        not having the default style.
+        """
+        self._finish()
+
+        result = []
+        pos = 0
+        for byteLength, styleNo in self.runs:
+            if styleNo != self.defaultStyleNo:
+                result.append((pos, pos + byteLength, styleNo))
+            pos += byteLength
+
+        return result
+
+
+    def value(self):
+        self._finish()
+
+        result = bytearray((self.defaultStyleNo,)) * self.length
+        pos = 0
+        for byteLength, styleNo in self.runs:
+            if styleNo != self.defaultStyleNo:
+                result[pos:pos + byteLength] = bytes((styleNo,)) * byteLength
+            pos += byteLength
+
+        return bytes(result)
+
+
+
+# Translation tables to set bits in style bytes, cached by bit mask
+_orTables = {}
+
+
+def orStyleRanges(stylebytes, styleRanges):
+    """
+    Return stylebytes with the bits of styleNo set in each range of
+    styleRanges (as returned by StyleCollector.getStyleRanges()), e.g. to
+    add the indicator bits of spell checking to the syntax styling.
+    """
+    result = bytearray(stylebytes)
+    for start, end, styleNo in styleRanges:
+        table = _orTables.get(styleNo)
+        if table is None:
+            table = bytes(i | styleNo for i in range(256))
+            _orTables[styleNo] = table
+
+        result[start:end] = result[start:end].translate(table)
+
+    return bytes(result)
+
+
+def getDiffRange(a, b):
+    """
+    a, b -- byte strings of same length
+    Return tuple (start, end) of the smallest range outside of which
+    a and b are equal or None if they are equal.
+    """
+    if a == b:
+        return None
+
+    length = len(a)
+
+    # Binary search for the longest equal prefix and suffix. Comparing
+    # slices is done by memcmp which is much faster than a loop in Python
+    equal, differing = 0, length
+    while differing - equal > 1:
+        mid = (equal + differing) // 2
+        if a[:mid] == b[:mid]:
+            equal = mid
+        else:
+            differing = mid
+    start = equal
+
+    equal, differing = 0, length - start
+    while differing - equal > 1:
+        mid = (equal + differing) // 2
+        if a[length - mid:] == b[length - mid:]:
+            equal = mid
+        else:
+            differing = mid
+
+    return (start, length - equal)
@@ -1,20 +1,7 @@
-import os, traceback
+import sys, os, traceback
 
-import wx
-
-
-# Bug workaround: In wxPython 2.6 these constants weren't defined
-#    in 2.8 they are defined under a different name and with different values
-
-try:
-    wxWINDOWS_NT = wx.OS_WINDOWS_NT
-except AttributeError:
-    wxWINDOWS_NT = 18   # For wx.GetOsVersion()
-    
-try:
-    wxWIN95 = wx.OS_WINDOWS_9X
-except AttributeError:
-    wxWIN95 = 20   # For wx.GetOsVersion(), this includes also Win 98 and ME
+# The platform is determined from Python, not by wx.GetOsVersion(), so
+# that the module can be used without wxPython (headless application)
 
 
 # Placed here to avoid circular dependency with StringOps
@@ -28,7 +15,7 @@ def isOSX():
     """
     Return if running on Mac OSX
     """
-    return '__WXMAC__' in wx.PlatformInfo
+    return sys.platform == "darwin"
     
 def isLinux():
     """
@@ -40,8 +27,7 @@ def isLinux():
         return False
 
 
-_ISWIN9x = wx.GetOsVersion()[0] == wxWIN95
-_ISWINNT = wx.GetOsVersion()[0] == wxWINDOWS_NT
+_ISWINNT = sys.platform == "win32"
 
 def isWin9x():
     """
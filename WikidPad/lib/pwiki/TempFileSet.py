@@ -4,9 +4,8 @@ Temporary file management
 import sys, os, os.path, traceback, tempfile, urllib.request, urllib.parse, urllib.error
 from codecs import BOM_UTF8    # , BOM_UTF16_BE, BOM_UTF16_LE
 
-import wx
-
 from Consts import BYTETYPES
+from .AppContext import GetApp
 from .StringOps import urlFromPathname, relativeFilePath, escapeHtml, pathEnc, \
         lineendToOs
 
@@ -310,6 +309,7 @@ def getRelativeUrl(relativeTo, fullPath, pythonUrl=False):
 #             return escapeHtml(u"file:" + urllib.pathname2url(fullPath))
             return "file:" + urlFromPathname(fullPath)
         else:
+            import wx
             return wx.FileSystem.FileNameToURL(fullPath)
 
     relPath = relativeFilePath(relativeTo, fullPath)
@@ -318,6 +318,7 @@ def getRelativeUrl(relativeTo, fullPath, pythonUrl=False):
 #             return escapeHtml(u"file:" + urllib.pathname2url(fullPath))
             return "file:" + urlFromPathname(fullPath)
         else:
+            import wx
             return wx.FileSystem.FileNameToURL(fullPath)
 
     return urlFromPathname(relPath)
@@ -328,12 +329,12 @@ def getDefaultTempFilePath():
     Return default temp directory depending on global configuration settings.
     May return None for system default temp dir.
     """
-    globalConfig = wx.GetApp().getGlobalConfig()
+    globalConfig = GetApp().getGlobalConfig()
     tempMode = globalConfig.get("main", "tempHandling_tempMode",
             "system")
 
     if tempMode == "auto":
-        if wx.GetApp().isInPortableMode():
+        if GetApp().isInPortableMode():
             tempMode = "config"
         else:
             tempMode = "system"
@@ -341,7 +342,7 @@ def getDefaultTempFilePath():
     if tempMode == "given":
         return globalConfig.get("main", "tempHandling_tempDir", "")
     elif tempMode == "config":
-        return wx.GetApp().getGlobalConfigSubDir()
+        return GetApp().getGlobalConfigSubDir()
     else:   # tempMode == u"system"
         return None
 
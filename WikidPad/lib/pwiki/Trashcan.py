@@ -6,8 +6,6 @@ from calendar import timegm
 
 from .rtlibRepl import minidom
 
-import wx
-
 from .WikiExceptions import *
 import Consts
 
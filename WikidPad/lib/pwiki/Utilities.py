@@ -4,13 +4,11 @@ import sys, threading, traceback, collections, heapq, functools, logging
 # from _thread import allocate_lock as _allocate_lock
 from time import time as _time, sleep as _sleep
 
-import wx
-
 from Consts import DEADBLOCKTIMEOUT
 from .WikiExceptions import NotCurrentThreadException, \
         DeadBlockPreventionTimeOutError, InternalError
 
-from . import MiscEvent
+from . import MiscEvent, AppContext
 
 
 # ---------- Thread handling and task execution ----------
@@ -148,7 +146,7 @@ class SingleThreadExecutor(BasicThreadStop, MiscEvent.MiscEventSourceMixin):
         debuglog("SingleThreadExecutor starting")
         with self.dequeCondition:
             self.paused = False
-            if self.thread is not None and self.thread.isAlive():
+            if self.thread is not None and self.thread.is_alive():
                 return
 
             self.prepare()
@@ -161,6 +159,13 @@ class SingleThreadExecutor(BasicThreadStop, MiscEvent.MiscEventSourceMixin):
             self._fireStateChange(True)
 
 
+    def isExecutorThread(self):
+        """
+        Returns True if the calling thread executes the jobs.
+        """
+        return threading.currentThread() is self.thread
+
+
     def getDeque(self, idx=0):
         if self.deques is None:
             return None
@@ -217,6 +222,12 @@ class SingleThreadExecutor(BasicThreadStop, MiscEvent.MiscEventSourceMixin):
     def _inactiveIncDoneJobCount(self):
         pass
     
+    def isPaused(self):
+        """
+        Returns True if pause() was called and start() not yet.
+        """
+        return self.paused
+
     def resetDoneJobCount(self):
         self.doneJobCount = 0
 
@@ -233,7 +244,7 @@ class SingleThreadExecutor(BasicThreadStop, MiscEvent.MiscEventSourceMixin):
     def _fireStateChange(self, running=None):
         if running is None:
             # Detect self
-            running = self.thread is not None and self.thread.isAlive()
+            running = self.thread is not None and self.thread.is_alive()
 
         callInMainThreadAsync(self.fireMiscEventProps, {"changed state": True,
             "isRunning": running, "jobCount": self.getJobCount()})
@@ -305,7 +316,7 @@ class SingleThreadExecutor(BasicThreadStop, MiscEvent.MiscEventSourceMixin):
         a DeadBlockPreventionTimeOutError is raised.
         Returns result from fct(...) or throws exception thrown by fct()
         """
-        if threading.currentThread() is self.thread:
+        if self.isExecutorThread():
             return fct(*args, **kwargs)
             
         if self.deques is None:
@@ -377,7 +388,7 @@ class SingleThreadExecutor(BasicThreadStop, MiscEvent.MiscEventSourceMixin):
 
         If the queues are empty, executor stops in each case.
         """
-        if self.thread is None or not self.thread.isAlive():
+        if self.thread is None or not self.thread.is_alive():
             return
 
         with self.dequeCondition:
@@ -394,7 +405,7 @@ class SingleThreadExecutor(BasicThreadStop, MiscEvent.MiscEventSourceMixin):
 
         self.thread.join(120)  # TODO: Replace by constant
 
-        if self.thread.isAlive():
+        if self.thread.is_alive():
             raise DeadBlockPreventionTimeOutError()
 
         debuglog("SingleThreadExecutor ending, thread terminated",
@@ -414,7 +425,7 @@ class SingleThreadExecutor(BasicThreadStop, MiscEvent.MiscEventSourceMixin):
         with self.dequeCondition:
             thread = self.thread
             
-            if thread is None or not thread.isAlive():
+            if thread is None or not thread.is_alive():
                 return False
 
             self.paused = True
@@ -423,7 +434,7 @@ class SingleThreadExecutor(BasicThreadStop, MiscEvent.MiscEventSourceMixin):
         if wait:
             thread.join(120)  # TODO: Replace by constant
     
-            if thread.isAlive():
+            if thread.is_alive():
                 raise DeadBlockPreventionTimeOutError()
 
             self.thread = None
@@ -432,8 +443,273 @@ class SingleThreadExecutor(BasicThreadStop, MiscEvent.MiscEventSourceMixin):
 
 
 
+class MultiThreadExecutor(SingleThreadExecutor):
+    """
+    Variant of SingleThreadExecutor which runs jobs in workerCount threads.
+
+    Jobs are taken from the deques in the same priority order as by
+    SingleThreadExecutor. jobKeysFunction(idx, fct, args) may return
+    a sequence of keys for a job in queue idx. Jobs with a common key never
+    run at the same time, so they run in the order in which
+    SingleThreadExecutor would run them. Jobs without keys may run
+    concurrently with any other job.
+    """
+
+    # Time span in seconds over which throughput is measured
+    THROUGHPUT_SPAN = 10.0
+
+    # Minimal time in seconds between two "changed state" events sent while
+    # jobs are processed
+    STATE_CHANGE_INTERVAL = 1.0
+
+    def __init__(self, dequeCount=1, daemon=False, workerCount=2,
+            jobKeysFunction=None):
+        SingleThreadExecutor.__init__(self, dequeCount, daemon)
+
+        self.workerCount = workerCount
+        self.jobKeysFunction = jobKeysFunction
+        self.threads = []
+        self.stopWorkers = False
+
+        # Keys of currently running jobs
+        self.runningKeys = set()
+        self.runningJobCount = 0
+
+        # Finishing times of jobs during last THROUGHPUT_SPAN seconds
+        self.doneTimes = collections.deque()
+        self.lastStateChangeTime = 0.0
+
+
+    def isExecutorThread(self):
+        return threading.current_thread() in self.threads
+
+
+    def start(self):
+        debuglog("MultiThreadExecutor starting")
+        with self.dequeCondition:
+            self.paused = False
+            self.stopWorkers = False
+            if len(self.threads) >= self.workerCount:
+                return
+
+            self.prepare()
+
+            while len(self.threads) < self.workerCount:
+                thread = threading.Thread(target=self._runWorker)
+                thread.daemon = self.daemon
+                self.threads.append(thread)
+                thread.start()
+
+            debuglog("MultiThreadExecutor threads created",
+                    len(self.threads), self.daemon)
+            self._fireStateChange(True)
+
+
+    def getRunningJobCount(self):
+        return self.runningJobCount
+
+
+    def getThroughput(self):
+        """
+        Returns number of jobs per second done during the last
+        THROUGHPUT_SPAN seconds.
+        """
+        with self.dequeCondition:
+            self._dropOldDoneTimes(_time())
+            return len(self.doneTimes) / self.THROUGHPUT_SPAN
+
+
+    def _dropOldDoneTimes(self, now):
+        limit = now - self.THROUGHPUT_SPAN
+        while len(self.doneTimes) > 0 and self.doneTimes[0] < limit:
+            self.doneTimes.popleft()
+
+
+    def _fireStateChange(self, running=None):
+        if running is None:
+            running = len(self.threads) > 0
+
+        callInMainThreadAsync(self.fireMiscEventProps, {"changed state": True,
+            "isRunning": running, "jobCount": self.getJobCount(),
+            "runningJobCount": self.runningJobCount,
+            "workerCount": self.workerCount,
+            "jobsPerSecond": self.getThroughput()})
+
+
+    def _getJobKeys(self, idx, job):
+        fct = job[0]
+        if self.jobKeysFunction is None or \
+                fct is SingleThreadExecutor.ENDOBJECT:
+            return frozenset()
+
+        keys = self.jobKeysFunction(idx, fct, job[1])
+        if not keys:
+            return frozenset()
+
+        return frozenset(keys)
+
+
+    def _getNextJob(self):
+        """
+        Returns tuple (job, keys) of the next job which can run now or
+        (None, None). Called inside the lock.
+        """
+        if self.paused:
+            return ((SingleThreadExecutor.PAUSEOBJECT, None, None, None, None,
+                        False), frozenset())
+
+        for idx, deque in enumerate(self.deques):
+            # New jobs are appended left, so the oldest job is rightmost
+            for pos in range(len(deque) - 1, -1, -1):
+                job = deque[pos]
+                keys = self._getJobKeys(idx, job)
+                if not keys.isdisjoint(self.runningKeys):
+                    continue
+
+                del deque[pos]
+                return (job, keys)
+
+        return (None, None)
+
+
+    def _removeWorker(self):
+        """
+        Called inside the lock by a worker thread which terminates.
+        """
+        try:
+            self.threads.remove(threading.current_thread())
+        except ValueError:
+            pass
+
+        if len(self.threads) == 0:
+            self._fireStateChange(False)
+
+
+    def _runWorker(self):
+        while True:
+            with self.dequeCondition:
+                while True:
+                    if self.deques is None or self.stopWorkers:
+                        # Executor terminated
+                        self._removeWorker()
+                        return
+
+                    job, keys = self._getNextJob()
+                    if job is None:
+                        if self.runningJobCount == 0:
+                            self._fireStateChange(True)
+                        self.dequeCondition.wait()
+                        continue
+
+                    fct = job[0]
+                    if fct is SingleThreadExecutor.ENDOBJECT:
+                        # Running jobs may push new jobs which must be
+                        # processed before the threads can end
+                        if self.getJobCount() == 0 and \
+                                self.runningJobCount == 0:
+                            self.stopWorkers = True
+                            self.dequeCondition.notify_all()
+                            self._removeWorker()
+                            return
+
+                        self.deques[-1].appendleft(job)
+                        self.dequeCondition.wait()
+                        continue
+                    elif fct is SingleThreadExecutor.PAUSEOBJECT:
+                        # Keep the deques as they are, start() resumes
+                        self._removeWorker()
+                        return
+
+                    break
+
+                self.runningKeys.update(keys)
+                self.runningJobCount += 1
+
+            fct, args, kwargs, event, retObj, tstop = job
+            if tstop:
+                kwargs["threadstop"] = self
+
+            try:
+                retObj.setResult(fct(*args, **kwargs))
+                self.incDoneJobCount()
+            except Exception as e:
+                traceback.print_exc() # ?
+                retObj.setException(e)
+            finally:
+                if event is not None:
+                    event.set()
+
+                with self.dequeCondition:
+                    self.runningKeys.difference_update(keys)
+                    self.runningJobCount -= 1
+
+                    now = _time()
+                    self.doneTimes.append(now)
+                    self._dropOldDoneTimes(now)
+                    if now - self.lastStateChangeTime >= \
+                            self.STATE_CHANGE_INTERVAL:
+                        self.lastStateChangeTime = now
+                        self._fireStateChange(True)
+
+                    # Waiting workers may run jobs with the released keys now
+                    self.dequeCondition.notify_all()
+
+
+    def end(self, hardEnd=False):
+        """
+        Wait (up to 120 seconds per thread) to end the running jobs.
+        See SingleThreadExecutor.end().
+        """
+        with self.dequeCondition:
+            threads = list(self.threads)
+            if len(threads) == 0:
+                return
+
+            if hardEnd:
+                self.deques = None
+            else:
+                self.deques[-1].appendleft(
+                        (SingleThreadExecutor.ENDOBJECT, None, None, None, None,
+                        False))
+            self.dequeCondition.notify_all()
+
+        debuglog("MultiThreadExecutor ending, joining threads", len(threads))
+
+        for thread in threads:
+            thread.join(120)  # TODO: Replace by constant
+
+            if thread.is_alive():
+                raise DeadBlockPreventionTimeOutError()
+
+        debuglog("MultiThreadExecutor ending, threads terminated")
+
+
+    def pause(self, wait=False):
+        """
+        Stops after current jobs but keeps the queue so that it can resume
+        later by call to start(). See SingleThreadExecutor.pause().
+        """
+        with self.dequeCondition:
+            threads = list(self.threads)
+            if len(threads) == 0:
+                return False
+
+            self.paused = True
+            self.dequeCondition.notify_all()
+
+        if wait:
+            for thread in threads:
+                thread.join(120)  # TODO: Replace by constant
+
+                if thread.is_alive():
+                    raise DeadBlockPreventionTimeOutError()
+
+        return True
+
+
+
 def callInMainThread(fct, *args, **kwargs):
-    if wx.IsMainThread() or not wx.GetApp().IsMainLoopRunning():
+    if AppContext.isMainThread() or not AppContext.isMainLoopRunning():
         return fct(*args, **kwargs)
     
     returnOb = ExecutionResult()
@@ -450,7 +726,7 @@ def callInMainThread(fct, *args, **kwargs):
             event.set()
 
     event.clear()
-    wx.CallAfter(_mainRun, *args, **kwargs)
+    AppContext.callAfter(_mainRun, *args, **kwargs)
 #     print "--callInMainThread7", repr(fct)
 #     wx.SafeYield()  # Good idea?
     event.wait(DEADBLOCKTIMEOUT)
@@ -473,7 +749,7 @@ def mainThreadFunc(fct):
 
 
 def callInMainThreadAsync(fct, *args, **kwargs):
-    if wx.IsMainThread() or not wx.GetApp().IsMainLoopRunning():
+    if AppContext.isMainThread() or not AppContext.isMainLoopRunning():
         return fct(*args, **kwargs)
     def _mainRun(*args, **kwargs):
         try:
@@ -481,7 +757,7 @@ def callInMainThreadAsync(fct, *args, **kwargs):
         except Exception as e:
             traceback.print_exc()
 
-    wx.CallAfter(_mainRun, *args, **kwargs)
+    AppContext.callAfter(_mainRun, *args, **kwargs)
 
 
 
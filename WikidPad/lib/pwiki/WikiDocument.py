@@ -5,18 +5,19 @@
 
 
 from weakref import WeakValueDictionary
-import os, os.path, time, shutil, traceback, configparser
+import os, os.path, time, shutil, traceback, configparser, threading
 # from collections import deque
 
 import re
 
-from wx import GetApp
+from .AppContext import GetApp
 
 import Consts
-from Consts import ModifyText
+from Consts import ModifyText, ATTRIBUTES_WITH_WIKIWORD_VALUES
 from pwiki.WikiExceptions import *
 
-from .Utilities import TimeoutRLock, SingleThreadExecutor, DUMBTHREADSTOP
+from .Utilities import TimeoutRLock, SingleThreadExecutor, \
+        MultiThreadExecutor, DUMBTHREADSTOP
 
 from .MiscEvent import MiscEventSourceMixin
 
@@ -24,18 +25,21 @@ from . import ParseUtilities
 from . import StringOps
 from .StringOps import mbcsDec, re_sub_escape, pathEnc, pathDec, \
         unescapeWithRe, strToBool, pathnameFromUrl, urlFromPathname, \
-        relativeFilePath, getFileSignatureBlock
+        relativeFilePath, getFileSignatureBlock, getFileSignatureBlockFromStat
 from .DocPages import DocPage, WikiPage, FunctionalPage, AliasWikiPage
+from .RebuildEngine import RebuildEngine
+from .RenameEngine import RenameEngine
+from .PageAstCache import PageAstCache
+from .ImageDims import ImageDimsCache
+from .WriteBatch import MetaDataWriteBatch, SearchIndexWriteBatch
+from .WikiFileWatcher import createWikiFileWatcher, scanWikiPageFiles
 # from ..timeView.Versioning import VersionOverview
 
 from .timeView.WikiWideHistory import WikiWideHistory
 
-from . import AttributeHandling
-from .AttributeHandling import ATTRIBUTES_WITH_WIKIWORD_VALUES
-
 from .SearchAndReplace import SearchReplaceOperation
 
-from . import SpellChecker
+from . import AppContext
 from . import Trashcan
 
 from .wikidata import DbBackendUtils, FileStorage
@@ -254,23 +258,157 @@ class WikiDataSynchronizedFunction:
 #             print traceback.print_stack()
 #             print 
 
-        with self.proxyAccessLock:
+        self.proxy.acquireAccessLock()
+        try:
 #         self.proxy.accessLockStackTrace = traceback.extract_stack()
+            if self.proxy.isReadersMode():
+                # Remember that this thread may have uncommitted changes
+                self.proxy.uncommittedThreadIds.add(threading.get_ident())
+
+            return self.callFunction(*args, **kwargs)
+        finally:
+            self.proxyAccessLock.release()
+
+
+class WikiDataSynchronizedReadFunction(WikiDataSynchronizedFunction):
+    """
+    Function which only reads from the database. In "readers" access mode
+    it runs on a read connection of the calling thread instead of waiting
+    if another thread holds the lock. If the read connection fails (e.g.
+    because it waited longer than Consts.READCONNECTIONTIMEOUT for a lock)
+    the function waits for the lock and runs on the main connection.
+    """
+    def __call__(self, *args, **kwargs):
+        proxy = self.proxy
+        if not proxy.isReadersMode():
+            proxy.acquireAccessLock()
+        elif not self.proxyAccessLock.acquire(False):
+            if threading.get_ident() not in proxy.uncommittedThreadIds:
+                proxy.countReadConnectionCall()
+                try:
+                    return proxy.wikiData.callWithReadConnection(
+                            self.callFunction, *args, **kwargs)
+                except DbReadAccessError:
+                    proxy.countReadConnectionFallback()
+
+            # Thread must see its own uncommitted changes or read connection
+            # failed, so wait for lock
+            proxy.acquireAccessLock()
+
+        try:
+            return self.callFunction(*args, **kwargs)
+        finally:
+            self.proxyAccessLock.release()
+
+
+class WikiDataSynchronizedTransactionEndFunction(WikiDataSynchronizedFunction):
+    """
+    Function like commit() or rollback() after which no thread has
+    uncommitted changes anymore.
+    """
+    def __call__(self, *args, **kwargs):
+        self.proxy.acquireAccessLock()
+        try:
             return self.callFunction(*args, **kwargs)
+        finally:
+            self.proxy.uncommittedThreadIds.clear()
+            self.proxyAccessLock.release()
 
 
 class WikiDataSynchronizedProxy:
     """
-    Proxy class for synchronized access to a WikiData instance
+    Proxy class for synchronized access to a WikiData instance.
+
+    By default all calls are serialized by one lock. If the WikiData
+    instance reports "readers" as access mode, the functions listed in its
+    READ_ONLY_METHODS run on per-thread read connections while another
+    thread holds the lock. Writers stay serialized.
     """
+    _TRANSACTION_END_METHODS = frozenset(("commit", "rollback", "vacuum",
+            "close"))
+
     def __init__(self, wikiData):
         self.wikiData = wikiData
         self.proxyAccessLock = TimeoutRLock(Consts.DEADBLOCKTIMEOUT)
 #         self.accessLockStackTrace = None
+        self.readOnlyMethods = getattr(wikiData, "READ_ONLY_METHODS",
+                frozenset())
+
+        # Thread ids of threads which called writing functions since
+        # last commit or rollback
+        self.uncommittedThreadIds = set()
+
+        # Statistics about lock contention
+        self.statisticsLock = threading.Lock()
+        self.lockAcquisitionCount = 0
+        self.lockContentionCount = 0
+        self.lockWaitTimeSum = 0.0
+        self.lockWaitTimeMax = 0.0
+        self.readConnectionCallCount = 0
+        self.readConnectionFallbackCount = 0
+
+
+    def isReadersMode(self):
+        return len(self.readOnlyMethods) > 0 and \
+                self.wikiData.getAccessMode() == "readers"
+
+
+    def acquireAccessLock(self):
+        """
+        Acquire proxy lock and count how long the caller had to wait.
+        """
+        lock = self.proxyAccessLock
+        if lock.acquire(False):
+            self.lockAcquisitionCount += 1
+            return
+
+        startTime = time.time()
+        lock.acquire()
+        waitTime = time.time() - startTime
+
+        # Lock is held now so statistics can be updated safely
+        self.lockAcquisitionCount += 1
+        self.lockContentionCount += 1
+        self.lockWaitTimeSum += waitTime
+        self.lockWaitTimeMax = max(self.lockWaitTimeMax, waitTime)
+
+
+    def countReadConnectionCall(self):
+        with self.statisticsLock:
+            self.readConnectionCallCount += 1
+
+
+    def countReadConnectionFallback(self):
+        with self.statisticsLock:
+            self.readConnectionFallbackCount += 1
+
+
+    def getAccessStatistics(self):
+        """
+        Return dictionary with statistics about contention of the proxy lock.
+        Times are in seconds.
+        """
+        return {
+                "access mode": "readers" if self.isReadersMode()
+                        else "serialized",
+                "lock acquisitions": self.lockAcquisitionCount,
+                "lock contentions": self.lockContentionCount,
+                "lock wait time sum": self.lockWaitTimeSum,
+                "lock wait time max": self.lockWaitTimeMax,
+                "read connection calls": self.readConnectionCallCount,
+                "read connection fallbacks": self.readConnectionFallbackCount
+            }
 
 
     def __getattr__(self, attr):
-        result = WikiDataSynchronizedFunction(self, self.proxyAccessLock,
+        if attr in self.readOnlyMethods:
+            fctClass = WikiDataSynchronizedReadFunction
+        elif attr in self._TRANSACTION_END_METHODS:
+            fctClass = WikiDataSynchronizedTransactionEndFunction
+        else:
+            fctClass = WikiDataSynchronizedFunction
+
+        result = fctClass(self, self.proxyAccessLock,
                 getattr(self.wikiData, attr))
                 
         self.__dict__[attr] = result
@@ -298,6 +436,12 @@ class WikiDocument(MiscEventSourceMixin):
     # Update executor queue for index search update
     UEQUEUE_INDEX = 2
 
+    # Update executor job key of jobs which may write the search index
+    UEJOBKEY_SEARCH_INDEX = ("search index",)
+
+    # Maximum number of cached page counts, see getWikiPageCountsWithin()
+    PAGE_COUNT_CACHE_SIZE = 5000
+
     def __init__(self, wikiConfigFilename, dbtype, wikiLangName, ignoreLock=False,
             createLock=True, recoveryMode=False):
         MiscEventSourceMixin.__init__(self)
@@ -404,7 +548,18 @@ class WikiDocument(MiscEventSourceMixin):
         wikiData = wikiDataFactory(self, dataDir, self.getWikiTempDir())
 
         self.baseWikiData = wikiData
+        # Link terms of wiki data which can be read without locking
+        self.linkTermIndex = self._getLinkTermIndex(wikiData)
         self.autoLinkRelaxInfo = None
+        # LinkTermSnapshot taken when autoLinkRelaxInfo was built or
+        # updated, None if unknown
+        self.autoLinkRelaxSnapshot = None
+        # True iff link terms may have changed since autoLinkRelaxInfo
+        # was built or updated
+        self.autoLinkRelaxInfoStale = False
+        # Dictionary (stampType, startTime, bucketLength) -> number of pages,
+        # cleared if a page is modified, created, renamed or deleted
+        self.pageCountCache = {}
 
         # Set of camelcase words not to see as wiki words
         self.ccWordBlacklist = None
@@ -420,7 +575,27 @@ class WikiDocument(MiscEventSourceMixin):
         wikiData.setResolveCaseNormed(wikiConfig.getboolean("main",
                     "wiki_linkResolve_caseInsensitive", False))
 
-        self.updateExecutor = SingleThreadExecutor(4)
+        globalConfig = GetApp().getGlobalConfig()
+        workerCount = globalConfig.getint("main", "updateExecutor_workerCount",
+                1)
+        if workerCount > 1:
+            self.updateExecutor = MultiThreadExecutor(4,
+                    workerCount=workerCount,
+                    jobKeysFunction=self._getUpdateJobKeys)
+        else:
+            self.updateExecutor = SingleThreadExecutor(4)
+
+        batchMaxPages = max(1, globalConfig.getint("main",
+                "updateBatch_maxPages", 200))
+        batchMaxDelay = globalConfig.getfloat("main", "updateBatch_maxDelay",
+                2.0)
+        self.metaDataWriteBatch = MetaDataWriteBatch(self, batchMaxPages,
+                batchMaxDelay)
+        self.searchIndexWriteBatch = SearchIndexWriteBatch(self,
+                batchMaxPages, batchMaxDelay)
+        # Watches wiki page files of a "filePerPage" wiki, see
+        # _startWikiFileWatcher()
+        self.wikiFileWatcher = None
         self.pageRetrievingLock = TimeoutRLock(Consts.DEADBLOCKTIMEOUT)
         self.wikiWideHistory = WikiWideHistory(self)
         
@@ -436,10 +611,65 @@ class WikiDocument(MiscEventSourceMixin):
         self.dbtype = wikidhName
 
         self.whooshIndex = None
+        self.pageAstCache = None
+        self.imageDimsCache = None
+        # Created by connect()
+        self.trashcan = None
 
         self.refCount = 1
 
 
+    def _openPageAstCache(self):
+        """
+        Open the on-disk cache of page ASTs if enabled.
+        """
+        maxSize = GetApp().getGlobalConfig().getint("main",
+                "pageAstCache_maxSize", 0)
+        if maxSize <= 0 or self.isReadOnlyEffect():
+            return
+
+        cache = PageAstCache(os.path.join(self.getWikiPath(),
+                "pageastcache.sqlite"), maxSize * 1024 * 1024)
+        cache.open()
+        if not cache.isOpen():
+            return
+
+        parser = GetApp().createWikiParser(self.getWikiDefaultWikiLanguage())
+        if parser is not None:
+            cache.allowModule(type(parser).__module__)
+            GetApp().freeWikiParser(parser)
+
+        self.pageAstCache = cache
+
+
+    def getPageAstCache(self):
+        """
+        Return the PageAstCache or None if not available.
+        """
+        return self.pageAstCache
+
+
+    def _openImageDimsCache(self):
+        """
+        Open the on-disk cache of image dimensions used by the HTML export.
+        """
+        if self.isReadOnlyEffect():
+            return
+
+        cache = ImageDimsCache(os.path.join(self.getWikiPath(),
+                "imagedimscache.sqlite"))
+        cache.open()
+        if cache.isOpen():
+            self.imageDimsCache = cache
+
+
+    def getImageDimsCache(self):
+        """
+        Return the ImageDimsCache or None if not available.
+        """
+        return self.imageDimsCache
+
+
     def checkDatabaseFormat(self):
         """
         Returns a pair (<frmcode>, <plain text>) where frmcode is an integer
@@ -467,7 +697,10 @@ class WikiDocument(MiscEventSourceMixin):
         # TODO: Only initialize on demand
         self.onlineSpellCheckerSession = None
         
-        if not self.recoveryMode:
+        if not self.recoveryMode and not AppContext.isHeadless():
+            # Spell checker is only needed by the GUI and imports wx
+            from . import SpellChecker
+
             if SpellChecker.isSpellCheckSupported():
                 self.onlineSpellCheckerSession = \
                         SpellChecker.SpellCheckerSession(self)
@@ -521,28 +754,20 @@ class WikiDocument(MiscEventSourceMixin):
                     traceback.print_exc() # TODO: Notify user?
 
         if not self.recoveryMode:
-            if self.isSearchIndexEnabled() and self.getWikiConfig().getint(
-                    "main", "indexSearch_formatNo", 1) != Consts.SEARCHINDEX_FORMAT_NO:
-                # Search index rebuild needed
-                # Remove old search index and lower meta data state.
-                # The following pushDirtyMetaDataUpdate() will start rebuilding
-    
-                wikiData = self.getWikiData()
-    
-                wikiData.commit()
-                finalState = Consts.WIKIWORDMETADATA_STATE_SYNTAXPROCESSED
-    
-                for wikiWord in wikiData.getWikiPageNamesForMetaDataState(
-                        finalState, "<"):
-                    wikiData.setMetaDataState(wikiWord, finalState)
-    
-                wikiData.commit()
-                self.removeSearchIndex()
-    
+            if self.isSearchIndexEnabled():
+                self._updateSearchIndexBackend()
+
             self.pushDirtyMetaDataUpdate()
 
+        if not self.recoveryMode:
+            self._openPageAstCache()
+            self._openImageDimsCache()
+
         self.updateExecutor.start()
 
+        if not self.recoveryMode:
+            self._startWikiFileWatcher()
+
 
 #         if not self.isReadOnlyEffect():
 #             words = self.getWikiData().getWikiPageNamesForMetaDataState(0)
@@ -550,13 +775,117 @@ class WikiDocument(MiscEventSourceMixin):
 #                 self.updateExecutor.executeAsync(1, self._runDatabaseUpdate,
 #                         word)
 
+    def _updateSearchIndexBackend(self):
+        """
+        Called if search index is enabled. Creates the full text index in
+        the database if it should be used or checks if the whoosh index
+        must be rebuilt.
+        """
+        wikiData = self.getWikiData()
+
+        if self.isFullTextIndexUsed():
+            if not wikiData.isFullTextIndexEnabled():
+                # Remove a whoosh index, it isn't kept up to date anymore.
+                # The full text index is complete after creation
+                self.removeSearchIndex()
+                wikiData.setFullTextIndexEnabled(True)
+
+        elif self.getWikiConfig().getint("main", "indexSearch_formatNo", 1) != \
+                Consts.SEARCHINDEX_FORMAT_NO:
+            # Search index rebuild needed
+            # Remove old search index and lower meta data state.
+            # The following pushDirtyMetaDataUpdate() will start rebuilding
+
+            wikiData.commit()
+            finalState = Consts.WIKIWORDMETADATA_STATE_SYNTAXPROCESSED
+
+            for wikiWord in wikiData.getWikiPageNamesForMetaDataState(
+                    finalState, "<"):
+                wikiData.setMetaDataState(wikiWord, finalState)
+
+            wikiData.commit()
+            self.removeSearchIndex()
+
+
+    def _runPageUpdate(self, page, step=-1, threadstop=DUMBTHREADSTOP):
+        """
+        Run  page.runDatabaseUpdate()  in the update executor and add the
+        page to the write batch if meta-data was written.
+        """
+        with page.textOperationLock:
+            liveTextPlaceHold = page.liveTextPlaceHold
+
+        result = page.runDatabaseUpdate(step=step, threadstop=threadstop)
+        if result is not False:
+            self.metaDataWriteBatch.addPage(page, liveTextPlaceHold)
+        else:
+            self.metaDataWriteBatch.flushIfDue()
+
+        return result
+
+
+    def _getUpdateJobKeys(self, idx, fct, args):
+        """
+        Called by a MultiThreadExecutor as update executor to retrieve the
+        keys of a job. Jobs with a common key don't run concurrently:
+        Jobs for the same page and jobs which may write the search index.
+
+        Called inside the lock of the executor, so it must not access
+        the database.
+        """
+        keys = []
+
+        if fct == self._runDatabaseUpdate:
+            keys.append(args[0])
+        elif fct == self._runPageUpdate:
+            keys.append(args[0].getWikiWord())
+            # Step -1 puts page into search index as well
+            if self.isSearchIndexEnabled():
+                keys.append(self.UEJOBKEY_SEARCH_INDEX)
+        else:
+            page = getattr(fct, "__self__", None)
+            if isinstance(page, DocPage):
+                keys.append(page.getWikiWord())
+
+        if idx == self.UEQUEUE_INDEX:
+            keys.append(self.UEJOBKEY_SEARCH_INDEX)
+
+        return keys
+
+
+    def _endUpdateExecutor(self):
+        """
+        Stop update executor after the current job and commit meta-data
+        and search index data it has written.
+        """
+        self.updateExecutor.end(hardEnd=True)
+        self.searchIndexWriteBatch.flush()
+        self.metaDataWriteBatch.flush()
+
+
+    def _pauseUpdateExecutor(self):
+        """
+        Pause update executor after the current job and commit meta-data
+        and search index data it has written. The queued jobs are kept.
+        Returns True if the executor was running, then the caller must
+        call self.updateExecutor.start() to resume.
+        """
+        updateExecutor = self.updateExecutor
+        wasRunning = not updateExecutor.isPaused() and \
+                updateExecutor.pause(wait=True)
+        self.searchIndexWriteBatch.flush()
+        self.metaDataWriteBatch.flush()
+
+        return wasRunning
+
+
     def _runDatabaseUpdate(self, word, step, threadstop=DUMBTHREADSTOP):
         time.sleep(0.1)
         try:
-            page = self.getWikiPage(word)
+            page = self.getWikiPage(word).getNonAliasPage()
 
             if step == Consts.WIKIWORDMETADATA_STATE_ATTRSPROCESSED:
-                if page.runDatabaseUpdate(step=step, threadstop=threadstop):
+                if self._runPageUpdate(page, step=step, threadstop=threadstop):
                     if self.isSearchIndexEnabled():
                         self.updateExecutor.executeAsyncWithThreadStop(
                                 self.UEQUEUE_INDEX,
@@ -565,9 +894,9 @@ class WikiDocument(MiscEventSourceMixin):
 
             elif step == Consts.WIKIWORDMETADATA_STATE_SYNTAXPROCESSED:
                 if self.isSearchIndexEnabled():
-                    page.runDatabaseUpdate(step=step, threadstop=threadstop)
+                    self._runPageUpdate(page, step=step, threadstop=threadstop)
             else:   # should be: step == Consts.WIKIWORDMETADATA_STATE_DIRTY:
-                if page.runDatabaseUpdate(step=step, threadstop=threadstop):
+                if self._runPageUpdate(page, step=step, threadstop=threadstop):
                     self.updateExecutor.executeAsyncWithThreadStop(1,
                             self._runDatabaseUpdate, word,
                             Consts.WIKIWORDMETADATA_STATE_ATTRSPROCESSED)
@@ -608,7 +937,8 @@ class WikiDocument(MiscEventSourceMixin):
 
         if self.refCount <= 0:
             self.refCount = 0
-            self.updateExecutor.end(hardEnd=True)  # TODO Inform user as this may take some time
+            self._stopWikiFileWatcher()
+            self._endUpdateExecutor()  # TODO Inform user as this may take some time
 
             if self.trashcan is not None:
                 self.trashcan.writeOverview()
@@ -631,11 +961,20 @@ class WikiDocument(MiscEventSourceMixin):
                 self.wikiData.close()
                 self.wikiData = None
                 self.baseWikiData = None
+                self.linkTermIndex = None
             
             if self.whooshIndex is not None:
                 self.whooshIndex.close()
                 self.whooshIndex = None
 
+            if self.pageAstCache is not None:
+                self.pageAstCache.close()
+                self.pageAstCache = None
+
+            if self.imageDimsCache is not None:
+                self.imageDimsCache.close()
+                self.imageDimsCache = None
+
             GetApp().getMiscEvent().removeListener(self)
 
             del _openDocuments[self.getWikiConfig().getConfigPath()]
@@ -910,11 +1249,25 @@ class WikiDocument(MiscEventSourceMixin):
 
 
     def pushUpdatePage(self, page):
-        self.updateExecutor.executeAsyncWithThreadStop(0, page.runDatabaseUpdate)
+        self.updateExecutor.executeAsyncWithThreadStop(0, self._runPageUpdate,
+                page)
+
+
+    def pushUpdatePages(self, pages):
+        """
+        Queue update of meta-data for all pages at once
+        """
+        with self.updateExecutor.getDequeCondition():
+            for page in pages:
+                self.pushUpdatePage(page)
 
 
     def getUpdateExecutor(self):
         return self.updateExecutor
+
+
+    def getSearchIndexWriteBatch(self):
+        return self.searchIndexWriteBatch
         
         
     def pushDirtyMetaDataUpdate(self):
@@ -1005,7 +1358,7 @@ class WikiDocument(MiscEventSourceMixin):
         """
         check if a word is a valid wikiword (page name or alias)
         """
-        return self.wikiData.isDefinedWikiLinkTerm(wikiWord)
+        return bool(self.getWikiPageNameForLinkTerm(wikiWord))
 
 
     # For plugin compatibility
@@ -1322,7 +1675,11 @@ class WikiDocument(MiscEventSourceMixin):
             return True  # TODO Error message?
 
         wikiData = self.getWikiData()
-        
+
+        if wikiData.checkCapability("filePerPage") == 1:
+            self._checkWikiPageFilesAndMarkDirty()
+            return
+
         proxyAccessLock = getattr(wikiData, "proxyAccessLock", None)
         if proxyAccessLock is not None:
             proxyAccessLock.acquire()
@@ -1342,8 +1699,111 @@ class WikiDocument(MiscEventSourceMixin):
 
 
 
+    def _checkWikiPageFilesAndMarkDirty(self, fileNames=None):
+        """
+        For "filePerPage" wikis only. Compare the wiki page files (all or
+        only those in  fileNames ) with the file signatures in the database
+        and mark meta-data of changed pages dirty.
+
+        The directory is scanned outside of the WikiData lock, the
+        comparison is done in one step inside.
+
+        Returns tuple (changedWords, addedFileNames, removedWords).
+        """
+        wikiData = self.getWikiData()
+        dirPath, suffix = wikiData.getWikiPageFilesLocation()
+
+        diskSigs = dict((fileName, self.getFileSignatureBlockFromStat(st))
+                for fileName, st in scanWikiPageFiles(dirPath, suffix,
+                fileNames).items())
+
+        proxyAccessLock = getattr(wikiData, "proxyAccessLock", None)
+        if proxyAccessLock is not None:
+            proxyAccessLock.acquire()
+        try:
+            changed, added, removed = wikiData.getChangedFileSignatures(
+                    diskSigs, fileNames)
+            wikiData.refreshFileSignaturesAndMarkDirty(changed)
+
+            changedWords = [word for word, fileSig in changed]
+            for word in changedWords:
+                wikiPage = self.wikiPageDict.get(word)
+                if wikiPage is not None:
+                    wikiPage.markTextChanged()
+        finally:
+            if proxyAccessLock is not None:
+                proxyAccessLock.release()
+
+        return (changedWords, added, removed)
+
+
+    def _startWikiFileWatcher(self):
+        """
+        Start watching the wiki page files for changes by other programs
+        if wiki is a writable "filePerPage" wiki and watching is enabled.
+        """
+        if self.wikiFileWatcher is not None or self.isReadOnlyEffect():
+            return
+
+        wikiData = self.getWikiData()
+        if wikiData.checkCapability("filePerPage") != 1:
+            return
+
+        wikiConfig = self.getWikiConfig()
+        if not wikiConfig.getboolean("main",
+                "wikiPageFiles_watchExternalChanges", True):
+            return
+
+        dirPath, suffix = wikiData.getWikiPageFilesLocation()
+        self.wikiFileWatcher = createWikiFileWatcher(dirPath, suffix,
+                self._onWikiPageFilesChanged,
+                pollInterval=wikiConfig.getfloat("main",
+                "wikiPageFiles_watchPollInterval", 5.0))
+        self.wikiFileWatcher.start()
+
+
+    def _stopWikiFileWatcher(self):
+        if self.wikiFileWatcher is not None:
+            self.wikiFileWatcher.stop()
+            self.wikiFileWatcher = None
+
+
+    def _onWikiPageFilesChanged(self, fileNames):
+        """
+        Called by the wikiFileWatcher in its thread with set of changed
+        file names or None if all files must be checked.
+        """
+        self.updateExecutor.executeAsync(1,
+                self._updateExternallyChangedWikiPageFiles, fileNames)
+
+
+    def _updateExternallyChangedWikiPageFiles(self, fileNames):
+        """
+        Called in update executor. Mark pages whose files were changed
+        externally as dirty and queue them for update. Added or removed
+        files update the list of pages.
+        """
+        if self.isReadOnlyEffect():
+            return
+
+        changedWords, added, removed = \
+                self._checkWikiPageFilesAndMarkDirty(fileNames)
+
+        if len(added) > 0 or len(removed) > 0:
+            wikiData = self.getWikiData()
+            wikiData.refreshWikiPageLinkTerms(deleteFully=True)
+            # New pages are also dirty
+            changedWords = wikiData.getWikiPageNamesForMetaDataState(
+                    Consts.WIKIWORDMETADATA_STATE_DIRTY)
+
+        for word in changedWords:
+            self.updateExecutor.executeAsyncWithThreadStop(1,
+                    self._runDatabaseUpdate, word,
+                    Consts.WIKIWORDMETADATA_STATE_DIRTY)
+
+
     def initiateFullUpdate(self, progresshandler):
-        self.updateExecutor.end(hardEnd=True)
+        self._endUpdateExecutor()
         self.getWikiData().refreshWikiPageLinkTerms()
 
         # get all of the wikiWords
@@ -1394,7 +1854,7 @@ class WikiDocument(MiscEventSourceMixin):
             # Nothing to do
             return
             
-        self.updateExecutor.end(hardEnd=True)
+        self._endUpdateExecutor()
         try:
             self.getWikiData().refreshWikiPageLinkTerms(deleteFully=True)
             self.checkFileSignatureForAllWikiPageNamesAndMarkDirty()
@@ -1403,6 +1863,61 @@ class WikiDocument(MiscEventSourceMixin):
             self.updateExecutor.start()
 
 
+    def _rebuildAttributesAndSyntaxSequential(self, wikiWords,
+            progresshandler, step):
+        """
+        Steps two and three of rebuildWiki(), processed in this thread.
+        Returns the next step number.
+        """
+        # Step two: update attributes. There may be attributes which
+        #   define how the rest has to be interpreted, therefore they
+        #   must be processed first.
+        for wikiWord in wikiWords:
+            progresshandler.update(step, _("Update attributes of %s") %
+                    wikiWord)
+            try:
+                wikiPage = self._getWikiPageNoErrorNoCache(wikiWord)
+                if isinstance(wikiPage, AliasWikiPage):
+                    # This should never be an alias page, so fetch the
+                    # real underlying page
+                    # This can only happen if there is a real page with
+                    # the same name as an alias
+                    wikiPage = WikiPage(self, wikiWord)
+
+                wikiPage.refreshSyncUpdateMatchTerms()
+                pageAst = wikiPage.getLivePageAst()
+
+                self.getWikiData().refreshFileSignatureForWikiPageName(
+                        wikiWord)
+                wikiPage.refreshAttributesFromPageAst(pageAst)
+            except:
+                traceback.print_exc()
+
+            step += 1
+
+        # Step three: update the rest of the syntax (todos, relations)
+        for wikiWord in wikiWords:
+            progresshandler.update(step, _("Update syntax of %s") % wikiWord)
+            try:
+                wikiPage = self._getWikiPageNoErrorNoCache(wikiWord)
+                if isinstance(wikiPage, AliasWikiPage):
+                    # This should never be an alias page, so fetch the
+                    # real underlying page
+                    # This can only happen if there is a real page with
+                    # the same name as an alias
+                    wikiPage = WikiPage(self, wikiWord)
+
+                pageAst = wikiPage.getLivePageAst()
+
+                wikiPage.refreshMainDbCacheFromPageAst(pageAst)
+            except:
+                traceback.print_exc()
+
+            step += 1
+
+        return step
+
+
     def rebuildWiki(self, progresshandler, onlyDirty):
         """
         Rebuild  the wiki
@@ -1410,7 +1925,7 @@ class WikiDocument(MiscEventSourceMixin):
         progresshandler -- Object, fulfilling the
             PersonalWikiFrame.GuiProgressHandler protocol
         """
-        self.updateExecutor.end(hardEnd=True)
+        self._endUpdateExecutor()
         self.getWikiData().refreshWikiPageLinkTerms()
 
         if onlyDirty:
@@ -1463,53 +1978,38 @@ class WikiDocument(MiscEventSourceMixin):
             self.getWikiData().setDbSettingsValue(
                     "syncWikiWordMatchtermsUpToDate", "1")
 
-            # Step two: update attributes. There may be attributes which
-            #   define how the rest has to be interpreted, therefore they
-            #   must be processed first.
-            for wikiWord in wikiWords:
-                progresshandler.update(step, _("Update attributes of %s") %
-                        wikiWord)
-                try:
-                    wikiPage = self._getWikiPageNoErrorNoCache(wikiWord)
-                    if isinstance(wikiPage, AliasWikiPage):
-                        # This should never be an alias page, so fetch the
-                        # real underlying page
-                        # This can only happen if there is a real page with
-                        # the same name as an alias
-                        wikiPage = WikiPage(self, wikiWord)
-
-                    wikiPage.refreshSyncUpdateMatchTerms()
-                    pageAst = wikiPage.getLivePageAst()
-
-                    self.getWikiData().refreshFileSignatureForWikiPageName(
-                            wikiWord)
-                    wikiPage.refreshAttributesFromPageAst(pageAst)
-                except:
-                    traceback.print_exc()
+            # Steps two and three: update attributes, then the rest of the
+            #   syntax (todos, relations)
+            rebuildEngine = RebuildEngine.createForWikiDocument(self,
+                    len(wikiWords))
+            if rebuildEngine is not None:
+                step = rebuildEngine.rebuildAttributesAndSyntax(wikiWords,
+                        progresshandler, step)
+            else:
+                step = self._rebuildAttributesAndSyntaxSequential(wikiWords,
+                        progresshandler, step)
 
-                step += 1
+            if self.isFullTextIndexUsed():
+                # Step four: update index, here the full text index in the
+                #   database. Pages are refilled at once in a full rebuild
+                wikiData = self.getWikiData()
+                if not onlyDirty:
+                    wikiData.rebuildFullTextIndex()
 
-            # Step three: update the rest of the syntax (todos, relations)
-            for wikiWord in wikiWords:
-                progresshandler.update(step, _("Update syntax of %s") % wikiWord)
-                try:
-                    wikiPage = self._getWikiPageNoErrorNoCache(wikiWord)
-                    if isinstance(wikiPage, AliasWikiPage):
-                        # This should never be an alias page, so fetch the
-                        # real underlying page
-                        # This can only happen if there is a real page with
-                        # the same name as an alias
-                        wikiPage = WikiPage(self, wikiWord)
+                for wikiWord in wikiWords:
+                    progresshandler.update(step, _("Update index of %s") % wikiWord)
+                    try:
+                        if onlyDirty:
+                            wikiData.updateFullTextIndex(wikiWord)
 
-                    pageAst = wikiPage.getLivePageAst()
+                        wikiData.setMetaDataState(wikiWord,
+                                Consts.WIKIWORDMETADATA_STATE_INDEXED)
+                    except:
+                        traceback.print_exc()
 
-                    wikiPage.refreshMainDbCacheFromPageAst(pageAst)
-                except:
-                    traceback.print_exc()
+                    step += 1
 
-                step += 1
-            
-            if self.isSearchIndexEnabled():
+            elif self.isSearchIndexEnabled():
                 # Step four: update index
                 
                 writer = self.getSearchIndex().writer(
@@ -1755,101 +2255,47 @@ class WikiDocument(MiscEventSourceMixin):
         references to `word` with `toWord` (modify text).
         
         This function will update the page's title.
+        """
+        self.renameWikiWords({word: toWord}, ModifyText.off)
+
 
-        Note: `word` page should already be saved before renaming!
+    def _renameWikiConfig(self, toWord):
         """
-#         print u"WikiDataManager.renameWikiWord: %r -> %r" % (word, toWord)
+        Called by the RenameEngine after the root page was renamed to
+        `toWord`. Renames the wiki configuration file accordingly.
+        """
+        wikiConfig = self.getWikiConfig()
+        wikiConfig.set("main", "wiki_name", toWord)
+        wikiConfig.set("main", "last_wiki_word", toWord)
+        wikiConfig.save()
 
-        langHelper = GetApp().createWikiLanguageHelper(
-            self.getWikiDefaultWikiLanguage())
-        errMsg = langHelper.checkForInvalidWikiWord(toWord, self)
-        if errMsg:
-            raise WikiDataException(
-                _("%r is an invalid wiki word. %s") % (toWord, errMsg))
-        if self.isDefinedWikiLinkTerm(toWord):
-            raise WikiDataException(
-                    _("Cannot rename %r to %r, %r already exists.") %
-                    (word, toWord, toWord))
-        try:
-            wordPage = self.getWikiPage(word)
-        except WikiWordNotFoundException:
-            # create page first
-            wordPage = self.createWikiPage(word)
-            wordPage.writeToDatabase()
+        wikiConfigPath = wikiConfig.getConfigPath()
+        # Unload wiki configuration file
+        wikiConfig.loadConfig(None)
 
-        wikiData = self.getWikiData()
+        # Rename config file
+        renamedConfigPath = os.path.join(os.path.dirname(wikiConfigPath),
+                                         "%s.wiki" % toWord)
+        os.rename(wikiConfigPath, renamedConfigPath)
 
-        # TODO: Replace always?
-        # Check if replacing previous title of page with new one
-        wordTitle = self.getWikiPageTitle(word)
-        if wordTitle is not None:
-            wordTitle = self.formatPageTitle(wordTitle) + "\n"
-
-        # if the root was renamed we have a little more to do
-        if word == self.getWikiName():
-            wikiConfig = self.getWikiConfig()
-            wikiConfig.set("main", "wiki_name", toWord)
-            wikiConfig.set("main", "last_wiki_word", toWord)
-            wikiConfig.save()
+        # Load it again
+        wikiConfig.loadConfig(renamedConfigPath)
+        self.wikiName = toWord
 
-            wikiConfigPath = wikiConfig.getConfigPath()
-            # Unload wiki configuration file
-            wikiConfig.loadConfig(None)
-
-            # Rename config file
-            renamedConfigPath = os.path.join(os.path.dirname(wikiConfigPath),
-                                             "%s.wiki" % toWord)
-            os.rename(wikiConfigPath, renamedConfigPath)
-
-            # Load it again
-            wikiConfig.loadConfig(renamedConfigPath)
-            self.wikiName = toWord
-
-            # todo (pvh): ?! race condition here
-            #
-            # When renaming root, sometimes (and sometimes not) config.get()
-            # raises UnknownOptionException.
-            #
-            # It looks like unloading and loading the configuration again
-            # like this is not thread safe: another thread (e.g., refreshing
-            # of meta data) might try to read when config is unloaded, but not
-            # yet loaded again?!
-
-            # Update dict of open documents (= wiki data managers)
-            global _openDocuments
-            del _openDocuments[wikiConfigPath]
-            _openDocuments[renamedConfigPath] = self
-
-        # rename page
-        if wordPage.getDirty()[0]:
-            wordPage.writeToDatabase()
-
-        assert not wordPage.getDirty()[0]  # page should already be saved before renaming!
-        wikiData.renameWord(word, toWord)
-        wordPage.renameVersionData(toWord)
-        wordPage.queueRemoveFromSearchIndex()
-        wordPage.informRenamedWikiPage(toWord)
-        # informRenamedWikiPage sends an event that will (if the page is opened
-        # in an editor) cause docPagePresenter to save and unload the page, and
-        # then load `toWord`. This requires wordPage to be already saved.
-        # Otherwise, it would be saved now, before being unloaded, but using the
-        # old name, and hence recreating the page with the old name. Therefore,
-        # save pages in the renameSeq loop (in PersonalWikiFrame.renameWikiWord)
-        # after each iteration when updating links.
-        del self.wikiPageDict[word]  # remove from .getWikiPage() cache
-
-        # Now we modify the page heading
-        toWordPage = self.getWikiPage(toWord)
-        # But first update the match terms which need synchronous updating
-        toWordPage.refreshSyncUpdateMatchTerms()
-        wikiData.setMetaDataState(toWord, Consts.WIKIWORDMETADATA_STATE_DIRTY)
-        content = toWordPage.getLiveText()
-        if wordTitle is not None and content.startswith(wordTitle):
-            # Replace previous title with new one
-            toWikiWordTitle = self.formatPageTitle(self.getWikiPageTitle(toWord))
-            content = toWikiWordTitle + "\n" + content[len(wordTitle):]
-            toWordPage.replaceLiveText(content)
-        toWordPage.initiateUpdate()
+        # todo (pvh): ?! race condition here
+        #
+        # When renaming root, sometimes (and sometimes not) config.get()
+        # raises UnknownOptionException.
+        #
+        # It looks like unloading and loading the configuration again
+        # like this is not thread safe: another thread (e.g., refreshing
+        # of meta data) might try to read when config is unloaded, but not
+        # yet loaded again?!
+
+        # Update dict of open documents (= wiki data managers)
+        global _openDocuments
+        del _openDocuments[wikiConfigPath]
+        _openDocuments[renamedConfigPath] = self
 
 
     def renameWikiWords(self, renameDict, modifyText=ModifyText.advanced):
@@ -1886,58 +2332,49 @@ class WikiDocument(MiscEventSourceMixin):
                 references and should only be used if you can not use
                 `ModifyText.advanced`.
 
+        Pages are renamed in the order of `renameDict`. All renames and
+        text modifications are done in one database transaction by the
+        RenameEngine, nothing is renamed if one of the renames isn't
+        possible.
+
         Note: renaming requires the pages to be already saved, so save
         pages before renaming.
         """
 #         print u'WikiDataManager.renameWikiWords renameDict = %r' % renameDict
 
-        # 1. rename all pages
-        for oldPageName, newPageName in renameDict.items():
-            self.renameWikiWord(oldPageName, newPageName)
+        RenameEngine(self).renameWikiWords(list(renameDict.items()),
+                modifyText)
 
-        if modifyText == ModifyText.off:
-            return
 
-        # 2. update text of all affected pages, i.e., all pages with
-        #    references to the old page names
+    def _findPagesThatReferenceWords(self, words):
+        """Return set of page names of pages that have (or might have)
+        references to any of the page names in `words`.
 
-#         print u"(Candidate) pages with text to update = %r" % to_update
+        Uses the reverse references stored by the wiki data. Pages whose
+        meta-data isn't processed yet are always returned because their
+        references are unknown. Called by the RenameEngine before renaming.
+        """
+        wikiData = self.getWikiData()
+        if wikiData.checkCapability("reference index") is None:
+            ans = set()
+            for word in words:
+                ans |= self._findPagesThatReferenceWord(word)
+            return ans
 
-        if modifyText == ModifyText.advanced:
-            to_update = set()
-            for oldPageName in renameDict:
-                to_update |= self._findPagesThatReferenceWord(oldPageName)
+        ans = wikiData.getReferringWikiPageNames(words)
+        ans.update(wikiData.getWikiPageNamesForMetaDataState(
+                Consts.WIKIWORDMETADATA_STATE_SYNTAXPROCESSED, ">"))
 
-            langHelper = GetApp().createWikiLanguageHelper(
-                self.getWikiDefaultWikiLanguage())
-            for wikiword in to_update:
-                page = self.getWikiPage(wikiword)
-                text = self._updateWikiWordReferences(page, renameDict,
-                                                      langHelper)
-                page.replaceLiveText(text)
-
-        elif modifyText == ModifyText.simple:
-            # We have to search the wiki files and replace the old words with the new
-            sarOp = SearchReplaceOperation()
-            sarOp.wikiWide = True
-            sarOp.wildCard = 'regex'
-            sarOp.caseSensitive = True
-            sarOp.searchStr = "|".join(r"\b" + re.escape(ww) + r"\b"
-                    for ww in renameDict)
-            
-            for wikiword in self.searchWiki(sarOp):
-                page = self.getWikiPage(wikiword)
-                for oldPageName, newPageName in renameDict.items():
-                    text = self._searchAndReplaceWikiWordReferences(
-                        page, oldPageName, newPageName)
-                    if text is not None:
-                        page.replaceLiveText(text)
+        return set(word for word in ans if self.isDefinedWikiPageName(word))
 
 
     def _findPagesThatReferenceWord(self, word):
         """Return set of page names of pages that have (or might have)
         references to `word`. References include wiki words, links,
         attribute and insertion values.
+
+        Slow fallback for wiki data implementations without the
+        "reference index" capability.
         """
         # -- parents of word
         wikiData = self.getWikiData()
@@ -1991,13 +2428,35 @@ class WikiDocument(MiscEventSourceMixin):
         Get regular expressions and words used to operate autoLink function in 
         "relax" mode
         """
-        if self.autoLinkRelaxInfo is None:
+        relaxInfo = self.autoLinkRelaxInfo
+        if relaxInfo is None or self.autoLinkRelaxInfoStale:
             langHelper = GetApp().createWikiLanguageHelper(
                     self.getWikiDefaultWikiLanguage())
+            self.autoLinkRelaxInfoStale = False
 
-            self.autoLinkRelaxInfo = langHelper.buildAutoLinkRelaxInfo(self)
+            # Taken before the link terms are read so no later change
+            # is missed
+            snapshot = None
+            if self.linkTermIndex is not None:
+                snapshot = self.linkTermIndex.getSnapshot()
 
-        return self.autoLinkRelaxInfo
+            updateFct = getattr(langHelper, "updateAutoLinkRelaxInfo", None)
+            if relaxInfo is None or updateFct is None:
+                relaxInfo = langHelper.buildAutoLinkRelaxInfo(self)
+            else:
+                # Apply only the changed link terms if they are known
+                termChanges = None
+                if snapshot is not None and \
+                        self.autoLinkRelaxSnapshot is not None:
+                    termChanges = snapshot.getTermChangesSince(
+                            self.autoLinkRelaxSnapshot)
+
+                relaxInfo = updateFct(self, relaxInfo, termChanges)
+
+            self.autoLinkRelaxInfo = relaxInfo
+            self.autoLinkRelaxSnapshot = snapshot
+
+        return relaxInfo
 
 
     _TITLE_SPLIT_RE1 = re.compile(r"([" + StringOps.UPPERCASE + r"]+)" + 
@@ -2067,8 +2526,11 @@ class WikiDocument(MiscEventSourceMixin):
     
                     threadstop.testValidThread()
     
-                # Now search database
-                resultSet = self.getWikiData().search(sarOp, exclusionSet)
+                # Now search database. For "filePerPage" wikis the page
+                # files are read while the iterator is consumed here,
+                # outside of the WikiData lock
+                resultSet = set(self.getWikiData().iterSearch(sarOp,
+                        exclusionSet, threadstop=threadstop))
                 threadstop.testValidThread()
                 resultSet |= preResultSet
                 if applyOrdering:
@@ -2087,6 +2549,18 @@ class WikiDocument(MiscEventSourceMixin):
             if not self.isSearchIndexEnabled():
                 return []
 
+            if self.isFullTextIndexUsed():
+                ftsQuery = sarOp.getFullTextIndexQuery(self)
+                if ftsQuery is None:
+                    return []
+
+                result = self.getWikiData().searchFullTextIndex(ftsQuery)
+                threadstop.testValidThread()
+                return result
+
+            # Let search see pages waiting in the batch
+            self.searchIndexWriteBatch.flush()
+
             q = sarOp.getWhooshIndexQuery(self)
             s = self.getSearchIndex().searcher()
             threadstop.testValidThread()
@@ -2133,6 +2607,20 @@ class WikiDocument(MiscEventSourceMixin):
         return self.getWikiConfig().getboolean("main", "indexSearch_enabled",
                 False)
 
+    def isFullTextIndexUsed(self):
+        """
+        Returns True if the search index is an SQLite FTS5 table inside
+        the wiki database instead of a separate whoosh index. Falls back
+        to whoosh if the database doesn't support it.
+        """
+        if not self.isSearchIndexEnabled() or self.getWikiConfig().get("main",
+                "indexSearch_backend", "whoosh") != "fts5":
+            return False
+
+        wikiData = self.getWikiData()
+        return wikiData is not None and \
+                wikiData.checkCapability("fulltext index") is not None
+
     def isSearchIndexPresent(self):
         import whoosh.index
 
@@ -2145,6 +2633,7 @@ class WikiDocument(MiscEventSourceMixin):
         
         p = self.updateExecutor.pause(wait=True)
         self.updateExecutor.clearDeque(self.UEQUEUE_INDEX)
+        self.searchIndexWriteBatch.clear()
         self.updateExecutor.start()
 
         if self.whooshIndex is not None:
@@ -2157,6 +2646,11 @@ class WikiDocument(MiscEventSourceMixin):
             # Warning!!! rmtree() is very dangerous, don't make a mistake here!
             shutil.rmtree(indexPath, ignore_errors=True)
 
+        wikiData = self.getWikiData()
+        if wikiData.checkCapability("fulltext index") is not None and \
+                wikiData.isFullTextIndexEnabled():
+            wikiData.setFullTextIndexEnabled(False)
+
         self.getWikiConfig().set("main", "indexSearch_formatNo", "0")
 
 
@@ -2315,6 +2809,35 @@ class WikiDocument(MiscEventSourceMixin):
                 endTime)
 
 
+    def getWikiPageCountsWithin(self, stampType, startTime, bucketLength,
+            bucketCount):
+        """
+        Return list of numbers of wiki pages per time span as described in
+        WikiData.getWikiPageCountsWithin(). The counts are cached, only
+        the spans not in the cache are queried.
+        """
+        cache = self.pageCountCache
+        keys = [(stampType, startTime + i * bucketLength, bucketLength)
+                for i in range(bucketCount)]
+        result = [cache.get(key) for key in keys]
+        missing = [i for i, count in enumerate(result) if count is None]
+
+        if missing:
+            if len(cache) + len(missing) > self.PAGE_COUNT_CACHE_SIZE:
+                cache.clear()
+            first, last = missing[0], missing[-1]
+
+            counts = self.getWikiData().getWikiPageCountsWithin(stampType,
+                    startTime + first * bucketLength, bucketLength,
+                    last + 1 - first)
+
+            for i, count in enumerate(counts, first):
+                result[i] = count
+                cache[keys[i]] = count
+
+        return result
+
+
     def getWikiPageNamesModifiedLastDays(self, days):
         """
         Return wiki words modified during the last number of days.
@@ -2355,11 +2878,28 @@ class WikiDocument(MiscEventSourceMixin):
         self.nccWordBlacklist = bls
 
 
+    @staticmethod
+    def _getLinkTermIndex(wikiData):
+        getLinkTermIndex = getattr(wikiData, "getLinkTermIndex", None)
+        if getLinkTermIndex is None:
+            return None
+
+        return getLinkTermIndex()
+
+
     def getWikiPageNameForLinkTerm(self, word):
         """
         Resolve links to wiki words. Returns None if it can't be resolved
         """
         # TODO: Resolve properly in caseless mode
+        linkTermIndex = self.linkTermIndex
+        if linkTermIndex is not None:
+            # Current snapshot of the link terms can be used without
+            # acquiring the lock of the wiki data proxy
+            snapshot = linkTermIndex.getSnapshot()
+            if snapshot is not None:
+                return snapshot.getWikiPageNameForLinkTerm(word)
+
         return self.getWikiData().getWikiPageNameForLinkTerm(word)
 
     
@@ -2418,6 +2958,8 @@ class WikiDocument(MiscEventSourceMixin):
         if not builtins:
             return self.getWikiData().getAttributeNamesStartingWith(beg)
         
+        from . import AttributeHandling
+
         biKeys = [k for k in AttributeHandling.getBuiltinKeys() if k.startswith(beg)]
         
         if len(biKeys) == 0:
@@ -2438,6 +2980,8 @@ class WikiDocument(MiscEventSourceMixin):
         if not builtins:
             return self.getWikiData().getDistinctAttributeValues(key)
         
+        from . import AttributeHandling
+
         biVals = AttributeHandling.getBuiltinValuesForKey(key)
         if biVals is None or len(biVals) == 0:
             # Nothing to add
@@ -2488,7 +3032,9 @@ class WikiDocument(MiscEventSourceMixin):
             
         self.wikiData = None
         self.baseWikiData = None
+        self.linkTermIndex = None
         self.autoLinkRelaxInfo = None
+        self.autoLinkRelaxSnapshot = None
 
         wikiDataFactory, createWikiDbFunc = DbBackendUtils.getHandler(self.dbtype)
         if wikiDataFactory is None:
@@ -2499,6 +3045,7 @@ class WikiDocument(MiscEventSourceMixin):
         wikiData = wikiDataFactory(self, self.dataDir, self.getWikiTempDir())
 
         self.baseWikiData = wikiData
+        self.linkTermIndex = self._getLinkTermIndex(wikiData)
         self.wikiData = WikiDataSynchronizedProxy(self.baseWikiData)
         
         self.wikiData.connect()
@@ -2517,6 +3064,7 @@ class WikiDocument(MiscEventSourceMixin):
         
         if wikiConfig.getboolean("main",
                 "indexSearch_enabled", False):
+            self._updateSearchIndexBackend()
             self.pushDirtyMetaDataUpdate()
         else:
             if strToBool(miscevt.get("old config settings")
@@ -2557,19 +3105,30 @@ class WikiDocument(MiscEventSourceMixin):
         It calls StringOps.getFileSignatureBlock with the time coarsening
         given in the wiki options.
         """
-        
+        return getFileSignatureBlock(filename,
+                self._getFileSignatureTimeCoarsening())
+
+
+    def getFileSignatureBlockFromStat(self, statinfo):
+        """
+        Same as getFileSignatureBlock() but for an already retrieved result
+        of os.stat(), used for scanning whole directories.
+        """
+        return getFileSignatureBlockFromStat(statinfo,
+                self._getFileSignatureTimeCoarsening())
+
+
+    def _getFileSignatureTimeCoarsening(self):
         coarseStr = self.getWikiConfig().get("main",
                 "fileSignature_timeCoarsening", "0")
 
         try:
             if "." in coarseStr:
-                coarsening = float(coarseStr)
+                return float(coarseStr)
             else:
-                coarsening = int(coarseStr)
+                return int(coarseStr)
         except ValueError:
-            coarsening = None
-            
-        return getFileSignatureBlock(filename, coarsening)
+            return None
 
 
 
@@ -2598,20 +3157,23 @@ class WikiDocument(MiscEventSourceMixin):
 
             if miscevt.has_key_in(("deleted wiki page", "renamed wiki page",
                     "pseudo-deleted wiki page")):
-                self.autoLinkRelaxInfo = None
+                self.autoLinkRelaxInfoStale = True
+                self.pageCountCache.clear()
                 attrs = miscevt.getProps().copy()
                 attrs["wikiPage"] = miscevt.getSource()
                 self.fireMiscEventProps(attrs)
                 miscevt.getSource().queueRemoveFromSearchIndex()  # TODO: Check for possible failure!!!
                 # TODO: Add new on rename
             elif "updated wiki page" in miscevt:
-                self.autoLinkRelaxInfo = None
+                self.autoLinkRelaxInfoStale = True
+                self.pageCountCache.clear()
                 attrs = miscevt.getProps().copy()
                 attrs["wikiPage"] = miscevt.getSource()
                 self.fireMiscEventProps(attrs)
 #                 miscevt.getSource().putIntoSearchIndex()
             elif "saving new wiki page" in miscevt:            
-                self.autoLinkRelaxInfo = None
+                self.autoLinkRelaxInfoStale = True
+                self.pageCountCache.clear()
 #                 miscevt.getSource().putIntoSearchIndex()
             elif "reread cc blacklist needed" in miscevt:
                 self._updateCcWordBlacklist()
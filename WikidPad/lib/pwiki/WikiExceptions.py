@@ -96,6 +96,8 @@ class InternalError(AppBaseException): pass
 
 
 class ExportException(AppBaseException): pass
+# Page can't be rendered in a worker process of the HtmlExportEngine
+class RenderInMainProcessException(ExportException): pass
 class ImportException(AppBaseException): pass
 
 # See Serialization.py
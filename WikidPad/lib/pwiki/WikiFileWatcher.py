@@ -0,0 +1,233 @@
+"""
+Watches the directory of the wiki page files of a "filePerPage" wiki
+(Original Sqlite backend) for changes made outside of WikidPad
+(external editor, sync tools, version control).
+
+Changes are reported to a callback function in the watcher thread as set of
+file names. On Linux inotify is used, otherwise (or if inotify fails) the
+directory is polled.
+"""
+
+import os, os.path, select, stat, threading, traceback
+
+from .StringOps import longPathEnc, pathDec
+
+try:
+    from . import LinuxHacks
+except:
+    LinuxHacks = None
+
+
+
+def scanWikiPageFiles(dirPath, suffix, fileNames=None):
+    """
+    Return dictionary {fileName: stat result} of the regular files in
+    directory  dirPath  whose names end with  suffix. The directory is read
+    with one os.scandir() pass.
+
+    fileNames -- If not None, only stat these files instead of scanning
+            the directory. Missing files are left out.
+    """
+    result = {}
+
+    if fileNames is not None:
+        for fileName in fileNames:
+            try:
+                st = os.stat(longPathEnc(os.path.join(dirPath, fileName)))
+            except OSError:
+                continue
+
+            if stat.S_ISREG(st.st_mode):
+                result[fileName] = st
+
+        return result
+
+    with os.scandir(longPathEnc(dirPath)) as it:
+        for entry in it:
+            fileName = pathDec(entry.name)
+            if not fileName.endswith(suffix):
+                continue
+            try:
+                if entry.is_file():
+                    result[fileName] = entry.stat()
+            except OSError:
+                pass  # Removed meanwhile
+
+    return result
+
+
+
+class AbstractWikiFileWatcher:
+    """
+    Watches files with name ending in  suffix  in directory  dirPath.
+
+    changedFct -- Called in watcher thread with set of names of added,
+            changed or removed files. The set may be None if changes
+            were lost and all files must be checked.
+    """
+    def __init__(self, dirPath, suffix, changedFct):
+        self.dirPath = dirPath
+        self.suffix = suffix
+        self.changedFct = changedFct
+        self.stopEvent = threading.Event()
+        self.thread = None
+
+
+    def start(self):
+        if self.thread is not None:
+            return
+
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target=self._runWatcher)
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def stop(self):
+        """
+        Stop watcher thread and wait for it.
+        """
+        thread = self.thread
+        if thread is None:
+            return
+
+        self.stopEvent.set()
+        if thread is not threading.current_thread():
+            thread.join()
+
+        self.thread = None
+
+
+    def _reportChanges(self, fileNames):
+        if self.stopEvent.is_set():
+            return
+        try:
+            self.changedFct(fileNames)
+        except:
+            traceback.print_exc()
+
+
+    def _runWatcher(self):
+        raise NotImplementedError
+
+
+
+class PollingWikiFileWatcher(AbstractWikiFileWatcher):
+    """
+    Scans the directory every  interval  seconds and compares size and
+    modification time of the files with the previous scan.
+    """
+    def __init__(self, dirPath, suffix, changedFct, interval=5.0):
+        AbstractWikiFileWatcher.__init__(self, dirPath, suffix, changedFct)
+        self.interval = interval
+
+
+    def _scanDirectory(self):
+        """
+        Returns dictionary {fileName: (size, modification time)}.
+        """
+        return dict((fileName, (st.st_size, st.st_mtime)) for fileName, st in
+                scanWikiPageFiles(self.dirPath, self.suffix).items())
+
+
+    def _runWatcher(self):
+        try:
+            previous = self._scanDirectory()
+        except OSError:
+            traceback.print_exc()
+            return
+
+        while not self.stopEvent.wait(self.interval):
+            try:
+                current = self._scanDirectory()
+            except OSError:
+                traceback.print_exc()
+                continue
+
+            changed = set(name for name, sig in current.items()
+                    if previous.get(name) != sig)
+            changed.update(name for name in previous if name not in current)
+            previous = current
+
+            if changed:
+                self._reportChanges(changed)
+
+
+
+class InotifyWikiFileWatcher(AbstractWikiFileWatcher):
+    """
+    Uses Linux inotify. Events are collected until no further event arrived
+    for  settleTime  seconds, so a file written in multiple steps
+    (temporary file, rename) is reported once.
+    """
+    EVENT_MASK = 0
+
+    if LinuxHacks is not None:
+        EVENT_MASK = LinuxHacks.IN_CLOSE_WRITE | LinuxHacks.IN_ATTRIB | \
+                LinuxHacks.IN_MOVED_FROM | LinuxHacks.IN_MOVED_TO | \
+                LinuxHacks.IN_DELETE | LinuxHacks.IN_DELETE_SELF | \
+                LinuxHacks.IN_MOVE_SELF
+
+    def __init__(self, dirPath, suffix, changedFct, settleTime=0.2):
+        AbstractWikiFileWatcher.__init__(self, dirPath, suffix, changedFct)
+        self.settleTime = settleTime
+        self.fd = LinuxHacks.createInotifyWatch(dirPath, self.EVENT_MASK)
+
+
+    def isValid(self):
+        """
+        Returns False if inotify could not be initialized.
+        """
+        return self.fd is not None
+
+
+    def stop(self):
+        AbstractWikiFileWatcher.stop(self)
+        if self.fd is not None and self.thread is None:
+            # Never started
+            os.close(self.fd)
+            self.fd = None
+
+
+    def _runWatcher(self):
+        # Files changed since last report. If None, report is needed
+        # but it is unknown which files changed.
+        pending = set()
+        try:
+            while not self.stopEvent.is_set():
+                timeout = self.settleTime if pending != set() else 0.5
+                readable = select.select([self.fd], [], [], timeout)[0]
+
+                if not readable:
+                    if pending != set():
+                        self._reportChanges(pending)
+                        pending = set()
+                    continue
+
+                for mask, name in LinuxHacks.readInotifyEvents(self.fd):
+                    if mask & LinuxHacks.IN_Q_OVERFLOW:
+                        pending = None
+                    elif mask & (LinuxHacks.IN_DELETE_SELF |
+                            LinuxHacks.IN_MOVE_SELF | LinuxHacks.IN_IGNORED):
+                        # Directory is gone, nothing left to watch
+                        self._reportChanges(None)
+                        return
+                    elif pending is not None and name.endswith(self.suffix):
+                        pending.add(name)
+        finally:
+            os.close(self.fd)
+            self.fd = None
+
+
+
+def createWikiFileWatcher(dirPath, suffix, changedFct, pollInterval=5.0):
+    """
+    Create (but don't start) the best available watcher for the platform.
+    """
+    if LinuxHacks is not None:
+        watcher = InotifyWikiFileWatcher(dirPath, suffix, changedFct)
+        if watcher.isValid():
+            return watcher
+
+    return PollingWikiFileWatcher(dirPath, suffix, changedFct,
+            interval=pollInterval)
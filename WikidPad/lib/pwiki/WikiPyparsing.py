@@ -99,7 +99,7 @@ __all__ = [
 'htmlComment', 'javaStyleComment', 'keepOriginalText', 'line', 'lineEnd', 'lineStart', 'lineno',
 'matchOnlyAtCol', 'matchPreviousExpr', 'matchPreviousLiteral',    # 'makeHTMLTags', 'makeXMLTags'
 'nestedExpr', 'nullDebugAction', 'nums', 'oneOf', 'opAssoc', 'operatorPrecedence', 'printables',
-'punc8bit', 'pythonStyleComment', 'quotedString', 'removeQuotes', 'replaceHTMLEntity',
+'punc8bit', 'pythonStyleComment', 'quotedString', 'removeQuotes', 'reparseChangedRegion', 'replaceHTMLEntity',
 'replaceWith', 'restOfLine', 'sglQuotedString', 'srange', 'stringEnd',
 'stringStart', 'traceParseAction', 'unicodeString', 'upcaseTokens', 'withAttribute',
 'indentedBlock', 'originalTextFor',
@@ -397,6 +397,15 @@ class NonTerminalNode(SyntaxNode):
         self._calcedStrLength = -1 # sum(t.strLength for t in sub)
 
 
+    # Default pickling can't be used because strLength is a property here
+    def __getstate__(self):
+        return (self.pos, self.name, self.sub, self.__dict__)
+
+    def __setstate__(self, state):
+        self.pos, self.name, self.sub, d = state
+        self.__dict__.update(d)
+
+
     def __repr__(self):
         if self.__dict__:
             return "NonTerminalNode" + repr((self.pos, self.strLength, self.name, self.sub, self.__dict__))
@@ -646,6 +655,24 @@ class NonTerminalNode(SyntaxNode):
         return ret
 
 
+    def cloneDeepShifted(self, delta, memo=None):
+        """
+        Return deep copy with all positions moved by delta. Nodes referenced
+        by attributes are copied as well (or replaced by their already made
+        copy if they are subnodes).
+        memo -- dictionary {id(original node): copy}
+        """
+        if memo is None:
+            memo = {}
+
+        ret = NonTerminalNode(None, self.pos + delta, self.name)
+        memo[id(self)] = ret
+        ret.sub = [n.cloneDeepShifted(delta, memo) for n in self.sub]
+        ret.__dict__ = _cloneDictShifted(self.__dict__, delta, memo)
+
+        return ret
+
+
     def _pprintRecurs(self, ind, inc, result):
         if self.__dict__:
             result.append(" " * ind + "NtNode(%s, %s, %s, %s, " %
@@ -721,6 +748,14 @@ class TerminalNode(SyntaxNode):
         self.strLength = len(text)
 
 
+    def __getstate__(self):
+        return (self.pos, self.strLength, self.name, self.text, self.__dict__)
+
+    def __setstate__(self, state):
+        self.pos, self.strLength, self.name, self.text, d = state
+        self.__dict__.update(d)
+
+
     def __repr__(self):
         if self.__dict__:
             return "TerminalNode" + repr((self.pos, self.strLength, self.name, self.text, self.__dict__))
@@ -779,6 +814,21 @@ class TerminalNode(SyntaxNode):
         return ret
 
 
+    def cloneDeepShifted(self, delta, memo=None):
+        """
+        Return copy with position moved by delta, see
+        NonTerminalNode.cloneDeepShifted()
+        """
+        if memo is None:
+            memo = {}
+
+        ret = TerminalNode(self.text, self.pos + delta, self.name)
+        memo[id(self)] = ret
+        ret.__dict__ = _cloneDictShifted(self.__dict__, delta, memo)
+
+        return ret
+
+
 
     def copy(self):
         return TerminalNode(self.text, self.pos, self.name)
@@ -786,6 +836,171 @@ class TerminalNode(SyntaxNode):
 
 
 
+
+def _cloneDictShifted(d, delta, memo):
+    """
+    Copy attribute dictionary d of a node for
+    SyntaxNode.cloneDeepShifted().
+    """
+    def cloneValue(value):
+        if isinstance(value, SyntaxNode):
+            ret = memo.get(id(value))
+            if ret is None:
+                ret = value.cloneDeepShifted(delta, memo)
+            return ret
+        elif isinstance(value, list):
+            return [cloneValue(v) for v in value]
+        elif isinstance(value, tuple):
+            return tuple(cloneValue(v) for v in value)
+        else:
+            return value
+
+    return dict((k, cloneValue(v)) for k, v in d.items())
+
+
+def _isReparseBoundary(text, pos):
+    """
+    True iff a top level node starting at pos in text can be the first node
+    of an independently reparsed segment. This is the case at the beginning
+    of the text and at the beginning of a non-indented line after an empty
+    line.
+    """
+    if pos == 0:
+        return True
+
+    return text[pos - 2:pos] == "\n\n" and pos < len(text) and \
+            not text[pos].isspace()
+
+
+def reparseChangedRegion(oldAst, oldText, newText, parseSegment,
+        threadstop=DUMBTHREADSTOP):
+    """
+    Build AST for newText from oldAst (the AST of oldText) by reparsing only
+    the top level nodes around the changed part of the text.
+    The reparsed segment starts and ends at boundaries as defined by
+    _isReparseBoundary(). To verify that the parser resynchronizes after
+    the changed region, the segment includes one more unchanged paragraph
+    which must be parsed to the same top level nodes as before.
+
+    oldAst -- root node of AST of oldText, all top level nodes must be
+        direct children of it
+    parseSegment -- function taking a string and returning its AST
+        root node. The positions of the nodes are relative to the string.
+
+    Returns tuple (newAst, (start, oldEnd, newEnd)) where the characters
+    oldText[start:oldEnd] were replaced by newText[start:newEnd] and
+    all nodes of newAst outside this range are equal to the ones in
+    oldAst (moved by newEnd - oldEnd after the range).
+    Returns None if an incremental parse isn't possible, the caller must
+    parse the full text then.
+    """
+    if not isinstance(oldAst, NonTerminalNode) or len(oldAst.sub) == 0 or \
+            oldAst.strLength != len(oldText):
+        return None
+
+    # Find changed region
+    maxCommon = min(len(oldText), len(newText))
+    start = 0
+    while start < maxCommon and oldText[start] == newText[start]:
+        start += 1
+
+    if start == len(oldText) == len(newText):
+        # Nothing changed
+        return (oldAst, (start, start, start))
+
+    suffixLen = 0
+    while suffixLen < maxCommon - start and \
+            oldText[-suffixLen - 1] == newText[-suffixLen - 1]:
+        suffixLen += 1
+
+    changeOldEnd = len(oldText) - suffixLen
+    delta = len(newText) - len(oldText)
+
+    nodes = oldAst.sub
+
+    # Index of first node to reparse: last boundary node beginning before
+    # the change (its first character and the one before stay unchanged)
+    startIdx = 0
+    for i, node in enumerate(nodes):
+        if node.pos >= start:
+            break
+        if _isReparseBoundary(oldText, node.pos):
+            startIdx = i
+
+    segStart = nodes[startIdx].pos
+
+    # Index of first boundary node after change (including preceding
+    # empty line) and of the boundary node after this one. The nodes in
+    # between are the overlap used to verify the result
+    endIdx = None
+    overlapEndIdx = len(nodes)
+    for i in range(startIdx + 1, len(nodes)):
+        node = nodes[i]
+        if node.pos - 2 < changeOldEnd or \
+                not _isReparseBoundary(oldText, node.pos):
+            continue
+        if endIdx is None:
+            endIdx = i
+        else:
+            overlapEndIdx = i
+            break
+
+    if endIdx is None or overlapEndIdx == len(nodes):
+        # Reparse up to the end, no verification needed
+        segText = newText[segStart:]
+    else:
+        segText = newText[segStart:nodes[overlapEndIdx].pos + delta]
+
+    if len(segText) == 0:
+        return None
+
+    threadstop.testValidThread()
+    segNodes = parseSegment(segText).sub
+
+    if endIdx is None or overlapEndIdx == len(nodes):
+        newSub = nodes[:startIdx] + \
+                [n.cloneDeepShifted(segStart) for n in segNodes]
+        return (buildSyntaxNode(newSub, 0, oldAst.name),
+                (segStart, len(oldText), len(newText)))
+
+    # Drop the node(s) marking end of segment
+    while segNodes and segNodes[-1].strLength == 0:
+        segNodes = segNodes[:-1]
+
+    # Find first reparsed node of overlap and compare overlap nodes
+    relEndPos = nodes[endIdx].pos + delta - segStart
+    for segEndIdx, node in enumerate(segNodes):
+        if node.pos >= relEndPos:
+            break
+    else:
+        return None
+
+    overlapNodes = segNodes[segEndIdx:]
+    if segNodes[segEndIdx].pos != relEndPos or \
+            len(overlapNodes) != overlapEndIdx - endIdx:
+        return None
+
+    for segNode, oldNode in zip(overlapNodes, nodes[endIdx:overlapEndIdx]):
+        if segNode.name != oldNode.name or \
+                segNode.pos + segStart - delta != oldNode.pos or \
+                segNode.strLength != oldNode.strLength:
+            return None
+
+    threadstop.testValidThread()
+
+    newSub = nodes[:startIdx] + \
+            [n.cloneDeepShifted(segStart) for n in segNodes[:segEndIdx]]
+
+    if delta == 0:
+        newSub += nodes[endIdx:]
+    else:
+        newSub += [n.cloneDeepShifted(delta) for n in nodes[endIdx:]]
+
+    return (buildSyntaxNode(newSub, 0, oldAst.name),
+            (segStart, nodes[endIdx].pos, nodes[endIdx].pos + delta))
+
+
+
 class ParsingState:
     """
     State object handed to action callbacks with additional information
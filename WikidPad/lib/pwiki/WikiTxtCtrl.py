@@ -35,7 +35,10 @@ from .SystemInfo import isOSX, isLinux, isWindows
 
 from .ParseUtilities import getFootnoteAnchorDict
 
+from .WikiPyparsing import buildSyntaxNode
+
 from .EnhancedScintillaControl import StyleCollector
+from .StyleRuns import orStyleRanges, getDiffRange
 
 from .SearchableScintillaControl import SearchableScintillaControl
 
@@ -1761,6 +1764,12 @@ class WikiTxtCtrl(SearchableScintillaControl):
     def clearStylingCache(self):
         self.stylebytes = None
         self.foldingseq = None
+        # Tuple (pageAst, stylebytes) with the syntax highlighting (without
+        # spell checking) currently applied to the editor
+        self.tokenStyling = None
+        # Tuple (pageAst, stylebytes) with the complete styling (including
+        # spell checking) currently applied to the editor
+        self.fullStyling = None
 #         self.pageAst = None
 
 
@@ -1773,14 +1782,28 @@ class WikiTxtCtrl(SearchableScintillaControl):
 
 
 
-    def storeStylingAndAst(self, stylebytes, foldingseq, styleMask=0xff):
+    def storeStylingAndAst(self, stylebytes, foldingseq, styleMask=0xff,
+            styleRange=None, tokenStyling=None):
+        """
+        styleRange -- if not None, tuple (start, end) of the byte range
+            of stylebytes which differs from the currently applied styling
+        tokenStyling -- tuple (pageAst, stylebytes without spell checking)
+            for the styling to apply
+        """
         self.stylebytes = stylebytes
 #         self.pageAst = pageAst
         self.foldingseq = foldingseq
 
         def putStyle():
             if stylebytes:
-                self.applyStyling(stylebytes, styleMask)
+                if self.applyStyling(stylebytes, styleMask, styleRange):
+                    if tokenStyling is not None:
+                        self.tokenStyling = tokenStyling
+                        if styleMask == 0xff:
+                            self.fullStyling = (tokenStyling[0], stylebytes)
+                else:
+                    self.tokenStyling = None
+                    self.fullStyling = None
 
             if foldingseq:
                 self.applyFolding(foldingseq)
@@ -1810,7 +1833,23 @@ class WikiTxtCtrl(SearchableScintillaControl):
                 else:
                     break
 
-            stylebytes = self.processTokens(text, pageAst, threadstop)
+            styleRange = None
+            tokenStyling = None
+            astChange = None
+            if isinstance(docPage, DocPages.AbstractWikiPage):
+                astChange = docPage.getLivePageAstChange(pageAst)
+
+            if astChange is not None:
+                result = self.processTokensIncrementally(text, pageAst,
+                        astChange, threadstop)
+                if result is not None:
+                    stylebytes, styleRange = result
+                else:
+                    stylebytes = self.processTokens(text, pageAst, threadstop)
+            else:
+                stylebytes = self.processTokens(text, pageAst, threadstop)
+
+            tokenStyling = (pageAst, stylebytes)
 
             threadstop.testValidThread()
 
@@ -1827,28 +1866,33 @@ class WikiTxtCtrl(SearchableScintillaControl):
                 # Show intermediate syntax highlighting results before spell check
                 # if we are in asynchronous mode
                 if not threadstop is DUMBTHREADSTOP:
-                    self.storeStylingAndAst(stylebytes, foldingseq, styleMask=0x1f)
+                    self.storeStylingAndAst(stylebytes, foldingseq,
+                            styleMask=0x1f, styleRange=styleRange,
+                            tokenStyling=tokenStyling)
 
                 scTokens = docPage.getSpellCheckerUnknownWords(threadstop=threadstop)
 
                 threadstop.testValidThread()
 
                 if scTokens.getChildrenCount() > 0:
-                    spellStyleBytes = self.processSpellCheckTokens(text, scTokens,
-                            threadstop)
+                    spellStyleRanges = self.processSpellCheckTokens(text,
+                            scTokens, threadstop)
 
                     threadstop.testValidThread()
 
-                    # TODO: Faster? How?
-                    stylebytes = "".join([chr(a | b)
-                            for a, b in zip(stylebytes, spellStyleBytes)]
-                            ).encode("raw_unicode_escape")
+                    stylebytes = orStyleRanges(stylebytes, spellStyleRanges)
 
-                    self.storeStylingAndAst(stylebytes, None, styleMask=0xff)
+                if astChange is not None:
+                    styleRange = self.getChangedStyleRange(stylebytes,
+                            styleRange, astChange[0])
                 else:
-                    self.storeStylingAndAst(stylebytes, None, styleMask=0xff)
+                    styleRange = None
+
+                self.storeStylingAndAst(stylebytes, None, styleMask=0xff,
+                        styleRange=styleRange, tokenStyling=tokenStyling)
             else:
-                self.storeStylingAndAst(stylebytes, foldingseq, styleMask=0xff)
+                self.storeStylingAndAst(stylebytes, foldingseq, styleMask=0xff,
+                        styleRange=styleRange, tokenStyling=tokenStyling)
 
         except NotCurrentThreadException:
             return
@@ -1922,10 +1966,13 @@ class WikiTxtCtrl(SearchableScintillaControl):
 
 
 
-    def processTokens(self, text, pageAst, threadstop):
+    def processTokens(self, text, pageAst, threadstop, startCharPos=0):
+        """
+        Return style bytes for text from startCharPos to end of text.
+        """
         wikiDoc = self.presenter.getWikiDocument()
         stylebytes = StyleCollector(FormatTypes.Default,
-                text, self.bytelenSct)
+                text, self.bytelenSct, startCharPos)
 
         def process(pageAst, stack):
             for node in pageAst.iterFlatNamed():
@@ -1991,14 +2038,86 @@ class WikiTxtCtrl(SearchableScintillaControl):
         return stylebytes.value()
 
 
+    def processTokensIncrementally(self, text, pageAst, astChange, threadstop):
+        """
+        Build style bytes for pageAst by processing only the tokens of the
+        reparsed range and taking the rest from the currently applied
+        styling.
+        astChange -- tuple (basePageAst, (start, baseEnd, end)) as returned
+            by DocPages.AbstractWikiPage.getLivePageAstChange()
+        Returns tuple (stylebytes, (byteStart, byteEnd)) with the byte
+        range which was styled anew or None if the styling of basePageAst
+        isn't available.
+        """
+        basePageAst, (start, baseEnd, end) = astChange
+        tokenStyling = self.tokenStyling
+        if tokenStyling is None or tokenStyling[0] is not basePageAst:
+            return None
+
+        baseStylebytes = tokenStyling[1]
+        byteStart = self.bytelenSct(text[:start])
+        byteSuffixLen = self.bytelenSct(text[end:])
+        if byteStart + byteSuffixLen > len(baseStylebytes):
+            return None
+
+        rangeAst = buildSyntaxNode([node for node in pageAst.sub
+                if start <= node.pos < end], start, "text")
+
+        rangeStylebytes = self.processTokens(text[:end], rangeAst, threadstop,
+                startCharPos=start)
+
+        stylebytes = baseStylebytes[:byteStart] + rangeStylebytes + \
+                baseStylebytes[len(baseStylebytes) - byteSuffixLen:]
+
+        return (stylebytes, (byteStart, byteStart + len(rangeStylebytes)))
+
+
+    def getChangedStyleRange(self, stylebytes, styleRange, basePageAst):
+        """
+        Return tuple (start, end) with the byte range of stylebytes (including
+        spell checking) which differs from the styling of the editor or None
+        if the whole styling must be applied.
+        styleRange -- byte range styled anew by processTokensIncrementally()
+            or None
+        basePageAst -- page AST the incremental styling was based on
+        """
+        fullStyling = self.fullStyling
+        if styleRange is None or fullStyling is None or \
+                fullStyling[0] is not basePageAst:
+            return None
+
+        # Outside of styleRange the editor still has the styling of
+        # basePageAst (Scintilla moves the styles with the text)
+        baseStylebytes = fullStyling[1]
+        start, end = styleRange
+        suffixLen = len(stylebytes) - end
+        if start + suffixLen > len(baseStylebytes):
+            return None
+
+        diffRange = getDiffRange(stylebytes[:start], baseStylebytes[:start])
+        if diffRange is not None:
+            start = diffRange[0]
+
+        diffRange = getDiffRange(stylebytes[end:],
+                baseStylebytes[len(baseStylebytes) - suffixLen:])
+        if diffRange is not None:
+            end += diffRange[1]
+
+        return (start, end)
+
+
     def processSpellCheckTokens(self, text, scTokens, threadstop):
+        """
+        Return list of tuples (byteStart, byteEnd, indicatorMask) for the
+        unknown words.
+        """
         stylebytes = StyleCollector(0, text, self.bytelenSct)
         for node in scTokens:
             threadstop.testValidThread()
             stylebytes.bindStyle(node.pos, node.strLength,
                     wx.stc.STC_INDIC2_MASK)
 
-        return stylebytes.value()
+        return stylebytes.getStyleRanges()
 
 
     def getFoldingNodeDict(self):
@@ -2108,17 +2227,38 @@ class WikiTxtCtrl(SearchableScintillaControl):
         return foldingseq
 
 
-    def applyStyling(self, stylebytes, styleMask=0xff):
-        if len(stylebytes) == self.GetLength():
+    def applyStyling(self, stylebytes, styleMask=0xff, styleRange=None):
+        """
+        styleRange -- if not None, tuple (start, end). Only this byte range
+            of stylebytes is applied, the remaining styling in the editor
+            must already be equal to stylebytes.
+        Returns True iff styling was applied.
+        """
+        if len(stylebytes) != self.GetLength():
+            return False
+
+        if styleRange is None:
             self.StartStyling(0, styleMask)
             self.SetStyleBytes(len(stylebytes), stylebytes)
+        else:
+            start, end = styleRange
+            self.StartStyling(start, styleMask)
+            self.SetStyleBytes(end - start, stylebytes[start:end])
+
+        return True
 
     def applyFolding(self, foldingseq):
         if foldingseq and self.getFoldingActive() and \
                 len(foldingseq) == self.GetLineCount():
+            # Setting the level is slow, so only set changed ones
+            changed = False
             for ln in range(len(foldingseq)):
-                self.SetFoldLevel(ln, foldingseq[ln])
-            self.repairFoldingVisibility()
+                if self.GetFoldLevel(ln) != foldingseq[ln]:
+                    self.SetFoldLevel(ln, foldingseq[ln])
+                    changed = True
+
+            if changed:
+                self.repairFoldingVisibility()
 
 
     def unfoldAll(self):
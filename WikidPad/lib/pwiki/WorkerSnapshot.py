@@ -0,0 +1,249 @@
+"""
+Snapshot of the wiki data the parser needs, used in worker processes of the
+RebuildEngine and the HtmlExportEngine.
+
+The worker processes have no access to the wiki. The main process sends
+a snapshot (a dictionary with configuration, CamelCase blacklists, link
+terms for auto-link "relax" mode and data of the particular engine) when
+the pool is started. The parser module is imported in the worker from its
+file as plugin modules can't always be imported by name.
+
+A worker runs with a headless application (see HeadlessApp.py), also if
+the main process runs the GUI, so it never needs wx. Worker processes are
+initialized by initWorker() of this module because it can be imported
+before the translation functions are installed (e.g. in a process
+started by "spawn").
+"""
+
+import sys, os, os.path, importlib, importlib.util, types
+
+from . import AppContext
+from .AppContext import GetApp
+
+from . import ParseUtilities
+from .Configuration import SnapshotConfiguration
+
+
+
+class SnapshotWikiDocument:
+    """
+    Provides the part of the WikiDocument interface which is used by the
+    parser while parsing a page.
+    """
+    def __init__(self, intLanguageName, snapshot):
+        self.intLanguageName = intLanguageName
+        self.wikiConfig = SnapshotConfiguration(snapshot["config"])
+        self.ccWordBlacklist = snapshot["ccWordBlacklist"]
+        self.nccWordBlacklist = snapshot["nccWordBlacklist"]
+        self.linkTerms = snapshot["linkTerms"]
+        self.autoLinkRelaxInfo = None
+
+    def getWikiConfig(self):
+        return self.wikiConfig
+
+    def getWikiDefaultWikiLanguage(self):
+        return self.intLanguageName
+
+    def getCcWordBlacklist(self):
+        return self.ccWordBlacklist
+
+    def getNccWordBlacklist(self):
+        return self.nccWordBlacklist
+
+    def getAutoLinkRelaxInfo(self):
+        if self.autoLinkRelaxInfo is None:
+            self.autoLinkRelaxInfo = ParseUtilities.AutoLinkRelaxMatcher(
+                    self.linkTerms)
+
+        return self.autoLinkRelaxInfo
+
+
+class SnapshotWikiPage:
+    """
+    Base page for resolving relative links while parsing in a worker.
+    """
+    __slots__ = ("wikiDocument", "wikiWord")
+
+    def __init__(self, wikiDocument, wikiWord):
+        self.wikiDocument = wikiDocument
+        self.wikiWord = wikiWord
+
+    def getWikiDocument(self):
+        return self.wikiDocument
+
+    def getWikiWord(self):
+        return self.wikiWord
+
+
+def getAppSnapshot():
+    """
+    Return the part of a snapshot initWorker() needs to install
+    the application in a worker process.
+    """
+    app = GetApp()
+    return {"wikiAppDir": app.getWikiAppDir(),
+            "globalConfigDir": app.getGlobalConfigDir()}
+
+
+# WorkerState object of the worker process, set by initWorker()
+_workerState = None
+
+
+def initWorker(stateModuleName, stateClassName, moduleName, moduleFile,
+        intLanguageName, snapshot):
+    """
+    Initializer of a worker process. Installs the translation functions
+    (set by WikidPadStarter in the main process) and a headless application
+    and creates the worker state. If the process was forked from the GUI
+    the headless application replaces the wx application which mustn't be
+    used there.
+
+    stateModuleName, stateClassName -- module and name of the WorkerState
+            subclass of the engine. The module is imported here as it needs
+            the translation functions.
+    """
+    global _workerState
+
+    import builtins
+    if not hasattr(builtins, "_"):
+        builtins._ = builtins.N_ = lambda s: s
+
+    if not AppContext.isHeadless():
+        from .HeadlessApp import HeadlessApp
+
+        AppContext.setHeadlessApp(HeadlessApp(snapshot["wikiAppDir"],
+                snapshot["globalConfigDir"]))
+
+    stateClass = getattr(importlib.import_module(stateModuleName),
+            stateClassName)
+    _workerState = stateClass(moduleName, moduleFile, intLanguageName,
+            snapshot)
+
+
+def getWorkerState():
+    """
+    Return the WorkerState object of the worker process.
+    """
+    return _workerState
+
+
+def importModuleFromFile(moduleName, fileName):
+    """
+    Import module moduleName from fileName. Plugin modules live in
+    packages created artificially by the PluginManager so they can't always
+    be imported by name in a fresh worker process. Missing parent packages
+    are created the same way.
+    """
+    module = sys.modules.get(moduleName)
+    if module is not None:
+        return module
+
+    parts = moduleName.split(".")
+    directory = os.path.dirname(os.path.abspath(fileName))
+    dirs = []
+    for i in range(len(parts) - 1):
+        dirs.insert(0, directory)
+        directory = os.path.dirname(directory)
+
+    # Names of modules put into sys.modules by this call. They are removed
+    # again if an import fails so a later call doesn't find a half
+    # initialized module
+    addedNames = []
+    try:
+        for i in range(1, len(parts)):
+            packageName = ".".join(parts[:i])
+            if packageName in sys.modules:
+                continue
+
+            packageDir = dirs[i - 1]
+            initFile = os.path.join(packageDir, "__init__.py")
+            if os.path.isfile(initFile):
+                spec = importlib.util.spec_from_file_location(packageName,
+                        initFile, submodule_search_locations=[packageDir])
+                package = importlib.util.module_from_spec(spec)
+                sys.modules[packageName] = package
+                addedNames.append(packageName)
+                spec.loader.exec_module(package)
+            else:
+                package = types.ModuleType(packageName)
+                package.__path__ = [packageDir]
+                sys.modules[packageName] = package
+                addedNames.append(packageName)
+
+        spec = importlib.util.spec_from_file_location(moduleName, fileName)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[moduleName] = module
+        addedNames.append(moduleName)
+        spec.loader.exec_module(module)
+    except:
+        for name in addedNames:
+            sys.modules.pop(name, None)
+        raise
+
+    return module
+
+
+class WorkerState:
+    """
+    State of a worker process: parser and language helper of the wiki
+    language and the snapshot of the wiki document.
+    """
+    def __init__(self, moduleName, moduleFile, intLanguageName, snapshot):
+        module = importModuleFromFile(moduleName, moduleFile)
+
+        self.intLanguageName = intLanguageName
+        self.parser = module.parserFactory(intLanguageName, False)
+        self.langHelper = module.languageHelperFactory(intLanguageName, False)
+        self.wikiDocument = SnapshotWikiDocument(intLanguageName, snapshot)
+
+
+    def createFormatDetails(self, page, formatKey):
+        """
+        Rebuild format details from the format key (see getFormatKey()).
+        """
+        withCamelCase, autoLinkMode, paragraphMode = formatKey
+
+        return ParseUtilities.WikiPageFormatDetails(
+                withCamelCase=withCamelCase,
+                wikiDocument=self.wikiDocument,
+                basePage=page,
+                autoLinkMode=autoLinkMode,
+                paragraphMode=paragraphMode,
+                wikiLanguageDetails=self.langHelper.createWikiLanguageDetails(
+                    self.wikiDocument, page))
+
+
+def getFormatKey(formatDetails):
+    """
+    Return the picklable part of a WikiPageFormatDetails object which
+    is needed by the worker to rebuild it.
+    """
+    return (formatDetails.withCamelCase, formatDetails.autoLinkMode,
+            formatDetails.paragraphMode)
+
+
+def getParserModuleInfo(wikiDocument):
+    """
+    Return tuple (moduleName, moduleFile) of the module providing the parser
+    of the wiki language of wikiDocument or None if the module can't be
+    used in worker processes.
+    """
+    parser = GetApp().createWikiParser(
+            wikiDocument.getWikiDefaultWikiLanguage())
+    if parser is None:
+        return None
+
+    try:
+        moduleName = type(parser).__module__
+        module = sys.modules.get(moduleName)
+    finally:
+        GetApp().freeWikiParser(parser)
+
+    moduleFile = getattr(module, "__file__", None)
+
+    if moduleFile is None or \
+            not hasattr(module, "parserFactory") or \
+            not hasattr(module, "languageHelperFactory"):
+        return None
+
+    return (moduleName, moduleFile)
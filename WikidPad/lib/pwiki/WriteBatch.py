@@ -0,0 +1,228 @@
+"""
+Write-behind batching of the data written by the background update.
+
+The update executor of a WikiDocument refreshes meta-data (attributes,
+todos, child relations, match terms) and the search index page by page.
+Instead of ending each page in its own transaction, the writes of many
+pages are committed together.
+"""
+
+import time, threading
+
+import Consts
+
+
+
+class AbstractWriteBatch:
+    """
+    Collects pending writes of pages and commits them together if the
+    batch holds maxPages pages, if its oldest write is older than maxDelay
+    seconds or if the update executor has nothing else to do.
+    """
+    def __init__(self, wikiDocument, maxPages=200, maxDelay=2.0):
+        self.wikiDocument = wikiDocument
+        self.maxPages = maxPages
+        self.maxDelay = maxDelay
+
+        self.lock = threading.RLock()
+        # Dictionary {key: data}, meaning of key and data depends on subclass
+        self.pending = {}
+        self.firstPendingTime = None
+        self.flushQueued = False
+
+
+    def getPendingCount(self):
+        with self.lock:
+            return len(self.pending)
+
+
+    def _addPending(self, key, data, replace=True):
+        """
+        Add data to the batch and commit if it is due.
+
+        replace -- If False, keep data of an already pending entry with
+                same key
+        """
+        with self.lock:
+            if len(self.pending) == 0:
+                self.firstPendingTime = time.time()
+
+            if replace:
+                self.pending[key] = data
+            else:
+                self.pending.setdefault(key, data)
+
+            self.flushIfDue()
+
+
+    def flushIfDue(self):
+        """
+        Commit batch if it is full or too old. Otherwise ensure that it is
+        committed when the update executor becomes idle.
+        """
+        with self.lock:
+            if len(self.pending) == 0:
+                return
+
+            if len(self.pending) >= self.maxPages or \
+                    time.time() - self.firstPendingTime >= self.maxDelay:
+                self.flush()
+                return
+
+            if self.flushQueued:
+                return
+
+            # The last queue is only processed if all other queues are empty
+            updateExecutor = self.wikiDocument.getUpdateExecutor()
+            self.flushQueued = True
+            updateExecutor.executeAsync(updateExecutor.dequeCount - 1,
+                    self.flush)
+
+
+    def clear(self):
+        """
+        Discard pending writes.
+        """
+        with self.lock:
+            self.pending = {}
+            self.firstPendingTime = None
+
+
+    def flush(self):
+        """
+        Commit pending writes. The calling thread must not hold the
+        textOperationLock of a page.
+        """
+        with self.lock:
+            self.flushQueued = False
+            pending = self.pending
+            self.pending = {}
+            self.firstPendingTime = None
+
+            if len(pending) == 0:
+                return
+
+            self._writePending(pending)
+
+
+    def _writePending(self, pending):
+        """
+        Called inside the lock to write and commit the pending dictionary.
+        """
+        raise NotImplementedError
+
+
+
+class MetaDataWriteBatch(AbstractWriteBatch):
+    """
+    Collects pages whose meta-data was written by the update executor of
+    a WikiDocument and commits them in one transaction.
+
+    A page is only marked as processed in the database if its live text
+    was unchanged at that time. Until the batch is committed the live text
+    may change though, so before committing the meta-data state of each
+    such page is set back to dirty in the same transaction and the page is
+    queued for update again.
+    """
+    def addPage(self, wikiPage, liveTextPlaceHold):
+        """
+        Called in the update executor thread after meta-data of  wikiPage
+        was written.
+
+        liveTextPlaceHold -- placeholder of the live text when the update
+                started
+        """
+        # If a page is updated multiple times in one batch, the oldest
+        # placeholder is kept. If any of the updates worked on outdated
+        # text the page must be processed again.
+        self._addPending(wikiPage.getWikiWord(),
+                (wikiPage, liveTextPlaceHold), replace=False)
+
+
+    def _writePending(self, pending):
+        wikiData = self.wikiDocument.getWikiData()
+        stalePages = []
+
+        for word, (wikiPage, liveTextPlaceHold) in pending.items():
+            with wikiPage.textOperationLock:
+                if wikiPage.liveTextPlaceHold is liveTextPlaceHold:
+                    continue
+
+                wikiData.setMetaDataState(word,
+                        Consts.WIKIWORDMETADATA_STATE_DIRTY)
+                stalePages.append(wikiPage)
+
+        wikiData.commit()
+
+        for wikiPage in stalePages:
+            wikiPage.initiateUpdate()
+
+
+
+class SearchIndexWriteBatch(AbstractWriteBatch):
+    """
+    Collects pages to add to or remove from the whoosh search index and
+    writes them with one index writer.
+
+    Pages whose live text changed since they were added to the batch are
+    skipped, they are indexed again when the new text is processed.
+    The meta-data state of a page is set to indexed only after the writer
+    was committed successfully.
+    """
+    def addPage(self, wikiPage, liveTextPlaceHold, modTimestamp, content):
+        """
+        Add or update  wikiPage  in index.
+
+        liveTextPlaceHold -- placeholder of the live text  content
+        """
+        self._addPending(wikiPage.getUnifiedPageName(),
+                (wikiPage, liveTextPlaceHold, modTimestamp, content))
+
+
+    def removePage(self, wikiPage):
+        """
+        Remove  wikiPage  from index.
+        """
+        self._addPending(wikiPage.getUnifiedPageName(),
+                (wikiPage, None, None, None))
+
+
+    def _writePending(self, pending):
+        searchIdx = self.wikiDocument.getSearchIndex()
+        if searchIdx is None:
+            # Index was disabled meanwhile
+            return
+
+        writer = searchIdx.writer(timeout=Consts.DEADBLOCKTIMEOUT)
+        indexedPages = []
+        try:
+            for unifName, (wikiPage, liveTextPlaceHold, modTimestamp,
+                    content) in pending.items():
+                if content is None:
+                    writer.delete_by_term("unifName", unifName)
+                    continue
+
+                with wikiPage.textOperationLock:
+                    if wikiPage.isInvalid() or \
+                            not liveTextPlaceHold is wikiPage.liveTextPlaceHold:
+                        continue
+
+                writer.delete_by_term("unifName", unifName)
+                writer.add_document(unifName=unifName,
+                        modTimestamp=modTimestamp, content=content)
+                indexedPages.append((wikiPage, liveTextPlaceHold))
+        except:
+            writer.cancel()
+            raise
+
+        writer.commit()
+
+        wikiData = self.wikiDocument.getWikiData()
+        for wikiPage, liveTextPlaceHold in indexedPages:
+            with wikiPage.textOperationLock:
+                if wikiPage.isInvalid() or \
+                        not liveTextPlaceHold is wikiPage.liveTextPlaceHold:
+                    continue
+
+                wikiData.setMetaDataState(wikiPage.getWikiWord(),
+                        Consts.WIKIWORDMETADATA_STATE_INDEXED)
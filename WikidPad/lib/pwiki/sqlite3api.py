@@ -2,8 +2,18 @@
 
 # This module does currently not support date and time handling
 
+# Two drivers implement the Connection and Cursor interface of this module:
+# "ctypes" uses the thin ctypes binding SqliteThin3, "stdlib" uses the
+# sqlite3 module of the Python standard library (implemented in C). The driver
+# is chosen by connect().
 
-import re
+
+import re, traceback
+
+try:
+    import sqlite3 as _stdsqlite
+except ImportError:
+    _stdsqlite = None
 
 from . import SqliteThin3
 
@@ -62,6 +72,15 @@ class NotSupportedError(DatabaseError):
     pass
 
 
+# Commands which start a transaction if none is active
+_TRANSACTION_START_COMMANDS = frozenset(("insert", "update", "delete",
+        "replace", "create", "drop"))
+
+# Commands which may run inside a transaction, all others commit it first
+_IN_TRANSACTION_COMMANDS = _TRANSACTION_START_COMMANDS | \
+        frozenset(("select", "begin", "commit", "rollback"))
+
+
 # Modes for type detection:
 TYPEDET_NONE = 0    # No automatic detection
 TYPEDET_FIRST = 1   # Use types of first retrieved row
@@ -73,6 +92,11 @@ TYPEDET_FIRST = 1   # Use types of first retrieved row
 
 
 class Connection:
+    """
+    Connection of the "ctypes" driver
+    """
+    driver = "ctypes"
+
     def __init__(self, dsn, *params, **keywords):
         self.thinConn = None
         self.thinConn = SqliteThin3.SqliteDb3(dsn, self._errHandler)
@@ -214,6 +238,13 @@ class Connection:
         self.thinConn.create_function(funcname, nArg, func, textRep)
         self.clearStmtCache()
         
+    def setBusyTimeout(self, ms):
+        """
+        Wait up to  ms  milliseconds for locks held by other connections
+        before failing with a "database is locked" error.
+        """
+        self.thinConn.busy_timeout(ms)
+
     def setAutoCommit(self, v=True, silent=False):
         if v and not self._autoCommit and not silent:
             self.commit()
@@ -229,23 +260,42 @@ class Connection:
       
             
 # For convenience:            
-            
-Connection.Warning = Warning
-Connection.Error = Error
-Connection.InterfaceError = InterfaceError
-Connection.DatabaseError = DatabaseError
-Connection.ReadOnlyDbError = ReadOnlyDbError
-Connection.DataError = DataError
-Connection.OperationalError = OperationalError
-Connection.IntegrityError = IntegrityError
-Connection.InternalError = InternalError
-Connection.ProgrammingError = ProgrammingError
-Connection.NotSupportedError = NotSupportedError
 
+_EXCEPTION_CLASSES = (Warning, Error, InterfaceError, DatabaseError,
+        ReadOnlyDbError, DataError, OperationalError, IntegrityError,
+        InternalError, ProgrammingError, NotSupportedError)
+
+for _cls in _EXCEPTION_CLASSES:
+    setattr(Connection, _cls.__name__, _cls)
+
+
+
+
+# Driver used by connect() if no driver is given
+DEFAULT_DRIVER = "stdlib"
+
+
+def getAvailableDrivers():
+    if _stdsqlite is None:
+        return ("ctypes",)
 
+    return ("stdlib", "ctypes")
 
 
 def connect(dsn, *params, **keywords):
+    """
+    Open connection to database file dsn.
+
+    Keyword parameters:
+    driver -- "stdlib" or "ctypes", None for DEFAULT_DRIVER. If the stdlib
+            driver isn't available, the ctypes driver is used
+    cursorfactory -- Cursor class for the ctypes driver
+    """
+    driver = keywords.pop("driver", None) or DEFAULT_DRIVER
+
+    if driver == "stdlib" and _stdsqlite is not None:
+        return StdlibConnection(dsn)
+
     return Connection(dsn, *params, **keywords)
 
 
@@ -316,17 +366,7 @@ class Cursor:
                 colfct = self.conn.colfct
                 
             cmd = sql.lstrip().split(" ",1)[0].lower()
-            
-            if not self.conn._autoCommit:
-                if self.conn.thinConn.get_autocommit():
-                    if cmd in ("insert", "update", "delete", "replace",
-                            "create", "drop"):
-                        self.conn.begin()
-                else:
-                    if cmd not in ("select", "begin", "commit", "rollback",
-                            "insert", "update", "delete", "replace", "create",
-                            "drop"):
-                        self.conn.commit()
+            self._prepareTransaction(cmd)
             
             self.stmt = self.conn.prepare(sql)
             self.stmtsql = sql
@@ -385,13 +425,83 @@ class Cursor:
             raise Error("Trying to access a closed cursor")
 
 
-    def executemany(self, sql, seq_of_parameters, *params, **keywords):
+    def _prepareTransaction(self, cmd):
         """
-        Simple implementation
+        Start or commit transaction before a statement with command verb
+        cmd is executed
         """
-        for pars in seq_of_parameters:
-            self.execute(sql, pars, *params, **keywords)
-            
+        if not self.conn._autoCommit:
+            if self.conn.thinConn.get_autocommit():
+                if cmd in _TRANSACTION_START_COMMANDS:
+                    self.conn.begin()
+            else:
+                if cmd not in _IN_TRANSACTION_COMMANDS:
+                    self.conn.commit()
+
+
+    def executemany(self, sql, seq_of_parameters, bindfct=None, colfct=None,
+            **keywords):
+        """
+        Prepare sql once and execute it for each sequence of parameters in
+        seq_of_parameters. Result rows (if any) are discarded.
+        """
+        self._reset()
+
+        try:
+            if bindfct is None:
+                bindfct = self.conn.bindfct
+
+            cmd = sql.lstrip().split(" ",1)[0].lower()
+            self._prepareTransaction(cmd)
+
+            self.stmt = self.conn.prepare(sql)
+            self.stmtsql = sql
+            stmt = self.stmt[0]
+            changes = 0
+
+            # Bind functions by (parameter number, type of value)
+            bindFcts = {}
+
+            try:
+                for parameters in seq_of_parameters:
+                    for parno, data in enumerate(parameters, 1):
+                        key = (parno, type(data))
+                        fct = bindFcts.get(key)
+                        if fct is None:
+                            if bindfct is None:
+                                fct = SqliteThin3.find_bindfct(data)
+                            else:
+                                fct = bindfct(stmt, parno, data)
+                            if fct is None:
+                                raise TypeError("sqlite3api: Type %s can't be "
+                                        "bound" % repr(type(data)))
+                            bindFcts[key] = fct
+
+                        fct(stmt, parno, data)
+
+                    stmt.step()
+                    stmt.reset()
+                    changes += self.conn.thinConn.changes()
+            finally:
+                # Statement no longer needed here
+                self.conn.putStmtBack(self.stmtsql, self.stmt)
+                self.stmt = None
+                self.stmtsql = None
+
+            # After schema change clear stmt cache            
+            if cmd in ("create", "drop", "vacuum", "pragma"):
+                self.conn.clearStmtCache()
+            elif cmd in ("insert", "update", "delete", "replace"):
+                self.rowcount = changes
+
+        except AttributeError:
+            if not self.stmt is None:
+                self.stmt[0].close()  
+                self.stmt = None
+
+            raise Error("Trying to access a closed cursor")
+
+
     def fetchone(self):
         """
         Does not throw an error if no result set produced.
@@ -544,6 +654,425 @@ class Cursor:
         raise AttributeError("No attribute %s in sqlite3api.Cursor" % attr)
             
 
+# ----------  Driver "stdlib"  ----------
+
+def _textFactory(data):
+    """
+    Decode text columns like the ctypes driver does.
+    """
+    return str(data, "utf-8", "surrogateescape")
+
+
+def _bytesToParam(data):
+    # The ctypes driver binds bytes as text
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data
+
+
+_PARAM_CONVERTS = {
+        bytes: _bytesToParam,
+        Binary: lambda b: b.data
+    }
+
+
+def _convertParams(parameters):
+    """
+    Return parameters with values converted so that the sqlite3 module
+    binds them with the same types as the ctypes driver.
+    """
+    for p in parameters:
+        if type(p) in _PARAM_CONVERTS:
+            break
+    else:
+        return parameters
+
+    return [_PARAM_CONVERTS[type(p)](p) if type(p) in _PARAM_CONVERTS else p
+            for p in parameters]
+
+
+def _convertStdlibError(e):
+    """
+    Return exception of this module for exception e of the sqlite3 module.
+    """
+    msg = str(e)
+    errCode = getattr(e, "sqlite_errorcode", None)
+    if errCode is not None:
+        if errCode & 0xff == SqliteThin3.SQLITE_READONLY:
+            return ReadOnlyDbError("Sqlite DB read-only error [%i]" % errCode)
+        msg += " [%i]" % errCode
+
+    return globals().get(e.__class__.__name__, Error)(msg)
+
+
+
+class _StdlibValue:
+    """
+    Argument of a user-defined function with the interface of
+    SqliteThin3._Value
+    """
+    def __init__(self, value):
+        self.value = value
+
+    def value_text(self):
+        value = self.value
+        if type(value) is str:
+            return value.encode("utf-8", "surrogateescape")
+        if value is None:
+            return b""
+        if type(value) is bytes:
+            return value
+
+        return str(value).encode("ascii")
+
+    value_blob = value_text
+
+    def value_bytes(self):
+        return len(self.value_text())
+
+    def value_int(self):
+        try:
+            return int(self.value or 0)
+        except ValueError:
+            return 0
+
+    value_int64 = value_int
+
+    def value_double(self):
+        try:
+            return float(self.value or 0)
+        except ValueError:
+            return 0.0
+
+    def value_type(self):
+        value = self.value
+        if value is None:
+            return SQLITE_NULL
+        if type(value) is int:
+            return SQLITE_INTEGER
+        if type(value) is float:
+            return SQLITE_FLOAT
+        if type(value) is str:
+            return SQLITE_TEXT
+
+        return SQLITE_BLOB
+
+    def value_null(self):
+        return None
+
+
+
+class _StdlibContext:
+    """
+    Result of a user-defined function with the interface of
+    SqliteThin3._Context
+    """
+    def __init__(self):
+        self.result = None
+
+    def result_blob(self, data):
+        if isinstance(data, Binary):
+            data = data.data
+        self.result = bytes(data)
+
+    def result_text(self, data):
+        if type(data) is not str:
+            data = str(data, "utf-8", "replace")
+        self.result = data
+
+    def result_null(self, data=None):
+        self.result = None
+
+    def result_double(self, data):
+        self.result = float(data)
+
+    def result_int(self, data):
+        self.result = int(data)
+
+    result_int64 = result_int
+
+
+
+class StdlibConnection:
+    """
+    Connection of the "stdlib" driver. Behaves like Connection: sqlite itself
+    runs in autocommit mode, transactions are started by Cursor.execute() for
+    modifying statements.
+
+    Strings containing surrogates can be read (they are decoded like in the
+    ctypes driver) but not bound as parameters.
+    """
+    driver = "stdlib"
+
+    def __init__(self, dsn):
+        try:
+            # timeout=0: no busy waiting by default, see setBusyTimeout()
+            self.dbConn = _stdsqlite.connect(dsn, timeout=0,
+                    isolation_level=None, check_same_thread=False)
+        except _stdsqlite.Error as e:
+            raise _convertStdlibError(e)
+
+        self.dbConn.text_factory = _textFactory
+        self._autoCommit = False
+
+
+    def _getDbConn(self):
+        if self.dbConn is None:
+            raise Error("Trying to access a closed connection")
+
+        return self.dbConn
+
+
+    def _execute(self, sql):
+        try:
+            self._getDbConn().execute(sql)
+        except _stdsqlite.Error as e:
+            raise _convertStdlibError(e)
+
+
+    def close(self):
+        if self.dbConn is None:
+            return
+
+        try:
+            self.dbConn.close()
+        except _stdsqlite.Error as e:
+            raise _convertStdlibError(e)
+        finally:
+            self.dbConn = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except:
+            pass
+
+    def clearStmtCache(self):
+        # The sqlite3 module updates its statement cache itself
+        pass
+
+    def inTransaction(self):
+        return self._getDbConn().in_transaction
+
+    def begin(self):
+        self._execute("begin")
+
+    def commit(self):
+        if self.inTransaction():
+            self._execute("commit")
+
+    def rollback(self):
+        if self.inTransaction():
+            self._execute("rollback")
+
+    def cursor(self):
+        return StdlibCursor(self)
+
+
+    def setBindFctFinder(self, fct):
+        # Values are always bound by their type
+        pass
+
+    def setColumnFctFinder(self, fct):
+        # Columns are always retrieved by their type
+        pass
+
+
+    def createFunction(self, funcname, nArg, func,
+            textRep=SqliteThin3.SQLITE_UTF8):
+        """
+        Register user-defined function. func is called as
+        func(context, values) like in the ctypes driver.
+        """
+        def callFunc(*args):
+            context = _StdlibContext()
+            try:
+                func(context, [_StdlibValue(a) for a in args])
+            except:
+                traceback.print_exc()
+                return None
+
+            return context.result
+
+        try:
+            self._getDbConn().create_function(funcname, nArg, callFunc)
+        except _stdsqlite.Error as e:
+            raise _convertStdlibError(e)
+
+
+    def setBusyTimeout(self, ms):
+        """
+        Wait up to  ms  milliseconds for locks held by other connections
+        before failing with a "database is locked" error.
+        """
+        self._execute("pragma busy_timeout = %i" % ms)
+
+    def setAutoCommit(self, v=True, silent=False):
+        if v and not self._autoCommit and not silent:
+            self.commit()
+
+        self._autoCommit = v
+
+    def getAutoCommit(self):
+        return self._autoCommit
+
+
+for _cls in _EXCEPTION_CLASSES:
+    setattr(StdlibConnection, _cls.__name__, _cls)
+
+
+
+class StdlibCursor:
+    """
+    Cursor of the "stdlib" driver
+    """
+    def __init__(self, conn):
+        """
+        conn -- underlying StdlibConnection
+        """
+        self.conn = conn
+        self.dbCursor = conn._getDbConn().cursor()
+        self.arraysize = 50
+
+
+    def _getDbCursor(self):
+        if self.dbCursor is None:
+            raise Error("Trying to access a closed cursor")
+
+        return self.dbCursor
+
+
+    def close(self):
+        if self.dbCursor is not None:
+            try:
+                self.dbCursor.close()
+            except _stdsqlite.Error:
+                pass
+            self.dbCursor = None
+
+        self.conn = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except:
+            pass
+
+
+    def _prepareTransaction(self, sql):
+        """
+        Start or commit transaction before sql is executed in the same way
+        as Cursor.execute() of the ctypes driver.
+        """
+        conn = self.conn
+        if conn._autoCommit:
+            return
+
+        cmd = sql.lstrip().split(" ", 1)[0].lower()
+        if not conn.inTransaction():
+            if cmd in _TRANSACTION_START_COMMANDS:
+                conn.begin()
+        elif cmd not in _IN_TRANSACTION_COMMANDS:
+            conn.commit()
+
+
+    def execute(self, sql, parameters=None, bindfct=None, colfct=None,
+            **keywords):
+        """
+        bindfct, colfct and keyword "typeDetect" are ignored, values are
+        always converted by their type.
+        """
+        dbCursor = self._getDbCursor()
+        self._prepareTransaction(sql)
+
+        try:
+            if parameters:
+                dbCursor.execute(sql, _convertParams(parameters))
+            else:
+                dbCursor.execute(sql)
+        except _stdsqlite.Error as e:
+            raise _convertStdlibError(e)
+
+
+    def executemany(self, sql, seq_of_parameters, *params, **keywords):
+        dbCursor = self._getDbCursor()
+        self._prepareTransaction(sql)
+
+        try:
+            dbCursor.executemany(sql,
+                    (_convertParams(pars) for pars in seq_of_parameters))
+        except _stdsqlite.Error as e:
+            raise _convertStdlibError(e)
+
+
+    def fetchone(self):
+        """
+        Does not throw an error if no result set produced.
+        """
+        try:
+            return self._getDbCursor().fetchone()
+        except _stdsqlite.Error as e:
+            raise _convertStdlibError(e)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            size = self.arraysize
+
+        try:
+            return self._getDbCursor().fetchmany(size)
+        except _stdsqlite.Error as e:
+            raise _convertStdlibError(e)
+
+    def fetchall(self):
+        try:
+            return self._getDbCursor().fetchall()
+        except _stdsqlite.Error as e:
+            raise _convertStdlibError(e)
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+
+        return row
+
+    def __iter__(self):
+        return self
+
+
+    def setinputsizes(self, sizes):
+        "Dummy"
+        pass
+
+    def setoutputsize(self, size, column=None):
+        "Dummy"
+        pass
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def begin(self):
+        self.conn.begin()
+
+
+    @property
+    def description(self):
+        return self._getDbCursor().description
+
+    @property
+    def rowcount(self):
+        return self._getDbCursor().rowcount
+
+    @property
+    def lastrowid(self):
+        return self._getDbCursor().lastrowid
+
+
+
 _GLOB_ESCAPE_RE = re.compile(r"([\[\]\*\?])")
 
 def escapeForGlob(s):
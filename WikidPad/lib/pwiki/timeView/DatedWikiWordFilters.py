@@ -1,7 +1,7 @@
 # import hotshot
 # _prof = hotshot.Profile("hotshot.prf")
 
-import os, traceback, abc
+import os, traceback, abc, time
 
 import wx
 
@@ -96,15 +96,15 @@ class DatedWikiWordFilterBase(metaclass=abc.ABCMeta):
         if len(wtList) == 0:
             return []
 
-        days = [self._getDayFromTimeT(wt[1]) for wt in wtList]
+        # Only the first time of each day is converted to wx.DateTime
+        result = []
+        lastDate = None
 
-        result = [days[0]]
-        lastDay = days[0]        
-        
-        for d in days[1:]:
-            if lastDay != d:
-                result.append(d)
-                lastDay = d
+        for wt in wtList:
+            date = time.localtime(float(wt[1]))[:3]
+            if lastDate != date:
+                result.append(self._getDayFromTimeT(wt[1]))
+                lastDate = date
 
         return result
 
@@ -144,6 +144,14 @@ class DatedWikiWordFilterModified(DatedWikiWordFilterBase):
         return wikiDocument.getWikiPageNamesModifiedWithin(startTime,
                 endTime)
 
+    def getMassWikiWordCountForDays(self, startDay, count):
+        wikiDocument = self.getWikiDocument()
+        if wikiDocument is None:
+            return [0] * count
+
+        return wikiDocument.getWikiPageCountsWithin(0, startDay.GetTicks(),
+                86400 * self.getDayResolution(), count)
+
     def getMinMaxDay(self):
         return self._getMinMaxDaysFromTimeT(
                 self.getWikiDocument().getWikiData().getTimeMinMax(0))
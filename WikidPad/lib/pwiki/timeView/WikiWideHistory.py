@@ -1,8 +1,6 @@
 import traceback, time
 from calendar import timegm
 
-import wx
-
 from ..rtlibRepl import minidom
 
 import Consts
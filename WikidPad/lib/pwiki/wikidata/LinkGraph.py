@@ -0,0 +1,309 @@
+"""
+In-memory copy of the link graph of a wiki, used by the WikiData
+implementations to answer transitive queries (sub-tree, path to parent,
+parentless and undefined words) without repeated SQL round trips.
+"""
+
+import threading
+
+import Consts
+
+
+
+class LinkGraph:
+    """
+    Holds the page names, the child relations (table "wikirelations") and
+    the link match terms (entries of "wikiwordmatchterms" with type
+    Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK) of a wiki.
+
+    The graph is filled by build() and then kept up to date by the
+    WikiData whenever relations, match terms or pages are written.
+    Operations which change many entries at once (rename, rebuild,
+    rollback) just invalidate the graph so it is built again when needed.
+
+    Link terms are resolved exactly (not case-normed), page names
+    have precedence over aliases.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.invalidate()
+
+
+    def invalidate(self):
+        with self.lock:
+            self.valid = False
+            self.pageNames = set()
+            # {word: list of relations in insertion order}
+            self.childrenByWord = {}
+            # {relation: {word: None}} (ordered set of words linking to relation)
+            self.sourcesByTerm = {}
+            # {word: list of (matchterm, type)} for link match terms only
+            self.matchTermsByWord = {}
+            # {matchterm: set of words}
+            self.wordsByTerm = {}
+
+
+    def isValid(self):
+        return self.valid
+
+
+    def build(self, pageNames, relations, matchTerms):
+        """
+        pageNames -- iterable of all page names
+        relations -- iterable of tuples (word, relation)
+        matchTerms -- iterable of tuples (matchterm, type, word), only
+                entries with type & Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK
+                are used
+        """
+        with self.lock:
+            self.invalidate()
+            self.pageNames.update(pageNames)
+
+            for word, relation in relations:
+                self._addRelation(word, relation)
+
+            for matchTerm, typ, word in matchTerms:
+                self._addMatchTerm(word, matchTerm, typ)
+
+            self.valid = True
+
+
+    def _addRelation(self, word, relation):
+        children = self.childrenByWord.setdefault(word, [])
+        sources = self.sourcesByTerm.setdefault(relation, {})
+        if word in sources:
+            return
+
+        children.append(relation)
+        sources[word] = None
+
+
+    def _addMatchTerm(self, word, matchTerm, typ):
+        if not typ & Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK:
+            return
+
+        self.matchTermsByWord.setdefault(word, []).append((matchTerm, typ))
+        self.wordsByTerm.setdefault(matchTerm, set()).add(word)
+
+
+    def _removeMatchTerms(self, word, keepFct):
+        kept = []
+        for matchTerm, typ in self.matchTermsByWord.pop(word, ()):
+            if keepFct(typ):
+                kept.append((matchTerm, typ))
+                continue
+
+            words = self.wordsByTerm.get(matchTerm)
+            if words is None:
+                continue
+            words.discard(word)
+            if len(words) == 0:
+                del self.wordsByTerm[matchTerm]
+
+        if kept:
+            self.matchTermsByWord[word] = kept
+
+
+    # ---------- Incremental updates ----------
+
+    def updateChildRelations(self, word, relations):
+        """
+        Replace child relations of  word  by sequence of relation terms.
+        """
+        with self.lock:
+            if not self.valid:
+                return
+            self._deleteChildRelations(word)
+            for relation in relations:
+                self._addRelation(word, relation)
+
+
+    def deleteChildRelations(self, word):
+        with self.lock:
+            if not self.valid:
+                return
+            self._deleteChildRelations(word)
+
+
+    def _deleteChildRelations(self, word):
+        for relation in self.childrenByWord.pop(word, ()):
+            sources = self.sourcesByTerm.get(relation)
+            if sources is None:
+                continue
+            sources.pop(word, None)
+            if len(sources) == 0:
+                del self.sourcesByTerm[relation]
+
+
+    def updateMatchTerms(self, word, matchTerms, syncUpdate=False):
+        """
+        Replace match terms of  word  which were created in the same
+        kind of update (see WikiData.updateWikiWordMatchTerms()).
+
+        matchTerms -- sequence of tuples (matchterm, type, word, ...)
+        """
+        with self.lock:
+            if not self.valid:
+                return
+            self._deleteMatchTerms(word, syncUpdate)
+            for t in matchTerms:
+                self._addMatchTerm(word, t[0], t[1])
+
+
+    def deleteMatchTerms(self, word, syncUpdate=False):
+        with self.lock:
+            if not self.valid:
+                return
+            self._deleteMatchTerms(word, syncUpdate)
+
+
+    def _deleteMatchTerms(self, word, syncUpdate):
+        syncFlag = Consts.WIKIWORDMATCHTERMS_TYPE_SYNCUPDATE
+        if syncUpdate:
+            self._removeMatchTerms(word, lambda typ: not typ & syncFlag)
+        else:
+            self._removeMatchTerms(word, lambda typ: typ & syncFlag)
+
+
+    def addPage(self, word):
+        with self.lock:
+            if not self.valid:
+                return
+            self.pageNames.add(word)
+
+
+    def removePage(self, word):
+        """
+        Remove page name. Relations and match terms of the page are
+        deleted separately.
+        """
+        with self.lock:
+            if not self.valid:
+                return
+            self.pageNames.discard(word)
+
+
+    # ---------- Queries ----------
+
+    def resolveLinkTerm(self, term):
+        """
+        Return page name for link term or None if term is undefined.
+        """
+        with self.lock:
+            return self._resolveLinkTerm(term)
+
+
+    def _resolveLinkTerm(self, term):
+        if term in self.pageNames:
+            return term
+
+        words = self.wordsByTerm.get(term)
+        if not words:
+            return None
+
+        return min(words)
+
+
+    def _isDefinedLinkTerm(self, term):
+        return term in self.pageNames or term in self.wordsByTerm
+
+
+    def getAllSubWords(self, words, level=-1):
+        """
+        Return page names  words  and all their children, grandchildren,
+        etc. in depth-first order. Children are resolved to page names,
+        undefined children and self-references are left out.
+
+        level -- maximum depth, -1 for unlimited
+        """
+        with self.lock:
+            checkList = [(w, 0) for w in reversed(words)]
+            resultSet = set()
+            result = []
+
+            while len(checkList) > 0:
+                toCheck, chLevel = checkList.pop()
+                if toCheck in resultSet:
+                    continue
+
+                result.append(toCheck)
+                resultSet.add(toCheck)
+
+                if level > -1 and chLevel >= level:
+                    continue  # Don't go deeper
+
+                children = [(self._resolveLinkTerm(c), chLevel + 1)
+                        for c in self.childrenByWord.get(toCheck, ())
+                        if c != toCheck and self._isDefinedLinkTerm(c)]
+                children.reverse()
+                checkList += children
+
+            return result
+
+
+    def findBestPath(self, word, toWord):
+        """
+        Breadth-first search for the shortest path from  word  to  toWord
+        going through the parents. Relations are followed by exact term
+        (no alias resolution).
+
+        Returns list [toWord, ..., word] or [word] if word == toWord or []
+        if there is no path.
+        """
+        if word == toWord:
+            return [word]
+
+        with self.lock:
+            # {parent: child on the path to word}
+            childByParent = {}
+            current = [word]
+
+            while len(current) > 0:
+                following = []
+                for child in current:
+                    for parent in self.sourcesByTerm.get(child, ()):
+                        if parent in childByParent:
+                            continue
+                        childByParent[parent] = child
+                        following.append(parent)
+
+                if toWord in childByParent:
+                    result = [toWord]
+                    crumb = toWord
+                    while crumb != word:
+                        crumb = childByParent[crumb]
+                        result.append(crumb)
+
+                    return result
+
+                current = following
+
+            return []
+
+
+    def getParentlessWords(self):
+        """
+        Return page names which are not linked from another page by name
+        or by one of their link match terms.
+        """
+        with self.lock:
+            linked = set()
+            for matchTerm, words in self.wordsByTerm.items():
+                sources = self.sourcesByTerm.get(matchTerm)
+                if not sources:
+                    continue
+                for word in words:
+                    if len(sources) > 1 or word not in sources:
+                        linked.add(word)
+
+            return [w for w in self.pageNames if w not in linked]
+
+
+    def getUndefinedWords(self):
+        """
+        Return relation terms which are neither page names nor link
+        match terms.
+        """
+        with self.lock:
+            return [t for t in self.sourcesByTerm
+                    if not self._isDefinedLinkTerm(t)]
@@ -0,0 +1,373 @@
+"""
+In-memory index of the link terms (page names and link match terms) of
+a wiki, used by the WikiData implementations to resolve links without
+SQL queries.
+
+The index publishes its state as immutable LinkTermSnapshot objects.
+Readers (parser, syntax highlighting, exporters) take the current
+snapshot without locking. Changes of single pages or match terms create
+a new snapshot which shares the dictionaries of the previous one and
+holds the changed terms in small delta dictionaries.
+"""
+
+import threading
+
+import Consts
+
+
+
+class LinkTermSnapshot:
+    """
+    State of the LinkTermIndex at one version. Never modified after
+    creation so any thread may use it without locking.
+    """
+    __slots__ = ("version", "resolveCaseNormed", "terms", "termsDelta",
+            "normTerms", "normTermsDelta")
+
+    def __init__(self, version, resolveCaseNormed, terms, normTerms,
+            termsDelta=None, normTermsDelta=None):
+        """
+        terms -- dictionary {link term: page name}
+        normTerms -- dictionary {lowercase match term: page name}
+        termsDelta, normTermsDelta -- changes to apply to terms and
+                normTerms, {term: page name or None if term was removed}
+        """
+        self.version = version
+        self.resolveCaseNormed = resolveCaseNormed
+        self.terms = terms
+        self.normTerms = normTerms
+        self.termsDelta = termsDelta if termsDelta is not None else {}
+        self.normTermsDelta = normTermsDelta if normTermsDelta is not None \
+                else {}
+
+
+    def getWikiPageNameForLinkTerm(self, term):
+        """
+        Return page name for link term or None if term is undefined.
+        """
+        delta = self.termsDelta
+        if term in delta:
+            word = delta[term]
+        else:
+            word = self.terms.get(term)
+
+        if word is None and self.resolveCaseNormed:
+            normTerm = term.lower()
+            delta = self.normTermsDelta
+            if normTerm in delta:
+                word = delta[normTerm]
+            else:
+                word = self.normTerms.get(normTerm)
+
+        return word
+
+
+    def _hasTerm(self, term):
+        delta = self.termsDelta
+        if term in delta:
+            return delta[term] is not None
+
+        return term in self.terms
+
+
+    def getTermChangesSince(self, oldSnapshot):
+        """
+        Return tuple (added terms, removed terms) of the link terms (see
+        keys()) which changed since the older snapshot  oldSnapshot  of the
+        same index. Returns None if the changes are unknown because the
+        index was built again or the deltas were merged meanwhile.
+        """
+        if self.terms is not oldSnapshot.terms:
+            return None
+
+        added = []
+        removed = []
+        for term in set(self.termsDelta).union(oldSnapshot.termsDelta):
+            present = self._hasTerm(term)
+            if present != oldSnapshot._hasTerm(term):
+                if present:
+                    added.append(term)
+                else:
+                    removed.append(term)
+
+        return (added, removed)
+
+
+    def keys(self):
+        """
+        Return list of all link terms. Not affected by resolveCaseNormed.
+        """
+        if not self.termsDelta:
+            return list(self.terms)
+
+        result = set(self.terms)
+        for term, word in self.termsDelta.items():
+            if word is None:
+                result.discard(term)
+            else:
+                result.add(term)
+
+        return list(result)
+
+
+
+class LinkTermIndex:
+    """
+    Holds the page names and the link match terms (entries of
+    "wikiwordmatchterms" with type Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK)
+    of a wiki and publishes the resolution of link terms as
+    LinkTermSnapshot.
+
+    The index is filled by build() and then kept up to date by the WikiData
+    whenever pages or match terms are written. Operations which change
+    many entries at once (rename, rebuild, rollback) invalidate it so it is
+    built again when needed.
+
+    Page names have precedence over aliases. If an alias belongs to more
+    than one page, the smallest page name is taken.
+    """
+    # Maximum number of entries in the delta dictionaries of a snapshot,
+    # if exceeded the deltas are merged into new full dictionaries
+    MAX_DELTA_SIZE = 1000
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = 0
+        self.resolveCaseNormed = False
+        self.invalidate()
+
+
+    def invalidate(self):
+        with self.lock:
+            self.snapshot = None
+            self.pageNames = set()
+            # {matchterm: {word: count}}
+            self.wordsByTerm = {}
+            # {lowercase matchterm: {word: count}}
+            self.wordsByNormTerm = {}
+            # {word: list of (matchterm, type)} for link match terms only
+            self.matchTermsByWord = {}
+
+
+    def getSnapshot(self):
+        """
+        Return current LinkTermSnapshot or None if the index must be
+        built. Doesn't need a lock.
+        """
+        return self.snapshot
+
+
+    def build(self, rows):
+        """
+        Build the index and return the new snapshot.
+
+        rows -- iterable of tuples (word, matchterm, type) for all link
+                match terms and page names, type is -1 for page names
+        """
+        with self.lock:
+            self.invalidate()
+
+            for word, matchTerm, typ in rows:
+                if typ == -1:
+                    self.pageNames.add(word)
+                else:
+                    self._addMatchTerm(word, matchTerm, typ)
+
+            terms = {}
+            for term, words in self.wordsByTerm.items():
+                terms[term] = min(words)
+            for word in self.pageNames:
+                terms[word] = word
+
+            normTerms = {}
+            for normTerm, words in self.wordsByNormTerm.items():
+                normTerms[normTerm] = min(words)
+
+            self.version += 1
+            self.snapshot = LinkTermSnapshot(self.version,
+                    self.resolveCaseNormed, terms, normTerms)
+
+            return self.snapshot
+
+
+    def setResolveCaseNormed(self, resolveCaseNormed):
+        with self.lock:
+            self.resolveCaseNormed = resolveCaseNormed
+            snapshot = self.snapshot
+            if snapshot is None:
+                return
+
+            self.version += 1
+            self.snapshot = LinkTermSnapshot(self.version, resolveCaseNormed,
+                    snapshot.terms, snapshot.normTerms, snapshot.termsDelta,
+                    snapshot.normTermsDelta)
+
+
+    @staticmethod
+    def _addCount(countDict, key, word):
+        words = countDict.setdefault(key, {})
+        words[word] = words.get(word, 0) + 1
+
+
+    @staticmethod
+    def _removeCount(countDict, key, word):
+        words = countDict.get(key)
+        if words is None or word not in words:
+            return
+        if words[word] > 1:
+            words[word] -= 1
+            return
+
+        del words[word]
+        if len(words) == 0:
+            del countDict[key]
+
+
+    def _addMatchTerm(self, word, matchTerm, typ):
+        if not typ & Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK:
+            return False
+
+        self.matchTermsByWord.setdefault(word, []).append((matchTerm, typ))
+        self._addCount(self.wordsByTerm, matchTerm, word)
+        self._addCount(self.wordsByNormTerm, matchTerm.lower(), word)
+        return True
+
+
+    def _removeMatchTerms(self, word, keepFct):
+        """
+        Remove match terms of word for which keepFct(type) returns False.
+        Returns list of removed match terms.
+        """
+        removed = []
+        kept = []
+        for matchTerm, typ in self.matchTermsByWord.pop(word, ()):
+            if keepFct(typ):
+                kept.append((matchTerm, typ))
+                continue
+
+            self._removeCount(self.wordsByTerm, matchTerm, word)
+            self._removeCount(self.wordsByNormTerm, matchTerm.lower(), word)
+            removed.append(matchTerm)
+
+        if kept:
+            self.matchTermsByWord[word] = kept
+
+        return removed
+
+
+    def _resolve(self, term):
+        if term in self.pageNames:
+            return term
+
+        words = self.wordsByTerm.get(term)
+        if not words:
+            return None
+
+        return min(words)
+
+
+    def _resolveNorm(self, normTerm):
+        words = self.wordsByNormTerm.get(normTerm)
+        if not words:
+            return None
+
+        return min(words)
+
+
+    def _publish(self, changedTerms):
+        """
+        Create new snapshot after the resolution of changedTerms may have
+        changed.
+        """
+        snapshot = self.snapshot
+
+        termsDelta = dict(snapshot.termsDelta)
+        normTermsDelta = dict(snapshot.normTermsDelta)
+        for term in changedTerms:
+            termsDelta[term] = self._resolve(term)
+            normTerm = term.lower()
+            normTermsDelta[normTerm] = self._resolveNorm(normTerm)
+
+        self.version += 1
+
+        if len(termsDelta) + len(normTermsDelta) <= self.MAX_DELTA_SIZE:
+            self.snapshot = LinkTermSnapshot(self.version,
+                    self.resolveCaseNormed, snapshot.terms, snapshot.normTerms,
+                    termsDelta, normTermsDelta)
+            return
+
+        # Merge deltas into new dictionaries, the old ones may still be
+        # used by readers
+        terms = dict(snapshot.terms)
+        for term, word in termsDelta.items():
+            if word is None:
+                terms.pop(term, None)
+            else:
+                terms[term] = word
+
+        normTerms = dict(snapshot.normTerms)
+        for normTerm, word in normTermsDelta.items():
+            if word is None:
+                normTerms.pop(normTerm, None)
+            else:
+                normTerms[normTerm] = word
+
+        self.snapshot = LinkTermSnapshot(self.version, self.resolveCaseNormed,
+                terms, normTerms)
+
+
+    # ---------- Incremental updates ----------
+
+    def addPage(self, word):
+        with self.lock:
+            if self.snapshot is None or word in self.pageNames:
+                return
+            self.pageNames.add(word)
+            self._publish((word,))
+
+
+    def removePage(self, word):
+        """
+        Remove page name. Match terms of the page are deleted separately.
+        """
+        with self.lock:
+            if self.snapshot is None or word not in self.pageNames:
+                return
+            self.pageNames.discard(word)
+            self._publish((word,))
+
+
+    def updateMatchTerms(self, word, matchTerms, syncUpdate=False):
+        """
+        Replace match terms of  word  which were created in the same
+        kind of update (see WikiData.updateWikiWordMatchTerms()).
+
+        matchTerms -- sequence of tuples (matchterm, type, word, ...)
+        """
+        with self.lock:
+            if self.snapshot is None:
+                return
+            changedTerms = self._deleteMatchTerms(word, syncUpdate)
+            for t in matchTerms:
+                if self._addMatchTerm(word, t[0], t[1]):
+                    changedTerms.append(t[0])
+
+            if changedTerms:
+                self._publish(changedTerms)
+
+
+    def deleteMatchTerms(self, word, syncUpdate=False):
+        with self.lock:
+            if self.snapshot is None:
+                return
+            changedTerms = self._deleteMatchTerms(word, syncUpdate)
+            if changedTerms:
+                self._publish(changedTerms)
+
+
+    def _deleteMatchTerms(self, word, syncUpdate):
+        syncFlag = Consts.WIKIWORDMATCHTERMS_TYPE_SYNCUPDATE
+        if syncUpdate:
+            return self._removeMatchTerms(word, lambda typ: not typ & syncFlag)
+        else:
+            return self._removeMatchTerms(word, lambda typ: typ & syncFlag)
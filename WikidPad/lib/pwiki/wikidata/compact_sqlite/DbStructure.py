@@ -28,6 +28,9 @@ class ConnectWrapBase:
     Connection (and Cursor)-Wrapper to simplify some operations.
     Base class to versions with synchronous and asynchronous commit.
     """
+    # Number of rows execSqlQueryIter() retrieves at once
+    QUERY_ITER_FETCH_SIZE = 500
+
     def __init__(self, connection):
         self.__dict__["dbConn"] = connection
         self.__dict__["dbCursor"] = connection.cursor()
@@ -66,18 +69,39 @@ class ConnectWrapBase:
         return self.dbCursor.fetchall()
 
 
-    def execSqlQueryIter(self, sql, params=None):
+    def execSqlQueryIter(self, sql, params=None, fetchSize=None):
         """
         utility method, executes the sql, returns an iterator
-        over the query results. Has problems, only intended for recovery mode
+        over the query results. The rows are retrieved in blocks of at most
+        fetchSize rows (None: QUERY_ITER_FETCH_SIZE) from an own cursor, so
+        other statements may be executed on the connection while iterating.
         """
-        ## print "execSqlQuery sql", sql, repr(params)
-        if params:
-            self.dbCursor.execute(sql, params, typeDetect=sqlite.TYPEDET_FIRST)
-        else:
-            self.dbCursor.execute(sql, typeDetect=sqlite.TYPEDET_FIRST)
+        if fetchSize is None:
+            fetchSize = self.QUERY_ITER_FETCH_SIZE
+
+        cursor = self.dbConn.cursor()
+        try:
+            if params:
+                cursor.execute(sql, params, typeDetect=sqlite.TYPEDET_FIRST)
+            else:
+                cursor.execute(sql, typeDetect=sqlite.TYPEDET_FIRST)
+        except:
+            cursor.close()
+            raise
 
-        return iter(self.dbCursor)
+        return self._iterCursor(cursor, fetchSize)
+
+
+    @staticmethod
+    def _iterCursor(cursor, fetchSize):
+        try:
+            while True:
+                rows = cursor.fetchmany(fetchSize)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
 
 
     def execSqlQuerySingleColumn(self, sql, params=None):
@@ -185,7 +209,7 @@ class ConnectWrapAsyncCommit(ConnectWrapBase):
         try:
             if not self.commitNeeded:
                 return
-            if self.commitTimer is not None and self.commitTimer.isAlive():
+            if self.commitTimer is not None and self.commitTimer.is_alive():
                 return
             t = threading.Timer(0.6, self._timerCommit)
             self.commitTimer = t
@@ -214,7 +238,7 @@ class ConnectWrapAsyncCommit(ConnectWrapBase):
         """
         self.accessLock.acquire()
         try:
-            if self.commitTimer is not None and self.commitTimer.isAlive():
+            if self.commitTimer is not None and self.commitTimer.is_alive():
                 self.commitTimer.cancel()
             self.dbConn.commit()
             self.commitNeeded = False
@@ -225,7 +249,7 @@ class ConnectWrapAsyncCommit(ConnectWrapBase):
     def rollback(self):
         self.accessLock.acquire()
         try:    
-            if self.commitTimer is not None and self.commitTimer.isAlive():
+            if self.commitTimer is not None and self.commitTimer.is_alive():
                 self.commitTimer.cancel()
             self.dbConn.rollback()
             self.commitNeeded = False
@@ -239,7 +263,7 @@ class ConnectWrapAsyncCommit(ConnectWrapBase):
         This function is not secured by a lock as it is only called
         by other functions.
         """
-        if self.commitTimer is not None and self.commitTimer.isAlive():
+        if self.commitTimer is not None and self.commitTimer.is_alive():
             self.commitTimer.cancel()
 
             if not self.commitNeeded:
@@ -352,8 +376,8 @@ class ConnectWrapAsyncCommit(ConnectWrapBase):
 
 
 
-VERSION_DB = 9
-VERSION_WRITECOMPAT = 9
+VERSION_DB = 10
+VERSION_WRITECOMPAT = 10
 VERSION_READCOMPAT = 9
 
 
@@ -450,6 +474,12 @@ TABLE_DEFINITIONS = {
         ("charlength", t.imo)  # Length of the todo
         ),
 
+
+    "wikiwordrefs": (     # Cache
+        ("word", t.t),
+        ("target", t.t)  # Resolved page name of link, insertion or attribute
+        ),
+
     
     "search_views": (     # Deleted since 2.0alpha1. For updating format only 
         ("title", t.pt),
@@ -496,6 +526,7 @@ MAIN_TABLES = (
     "wikirelations",
     "wikiwordattrs",
     "todos",
+    "wikiwordrefs",
 #     "search_views",
     "settings",
     "wikiwordmatchterms",
@@ -533,6 +564,8 @@ def rebuildIndices(connwrap):
     connwrap.execSqlNoError("drop index wikirelations_relation")    
     connwrap.execSqlNoError("drop index wikiwordattrs_word")
     connwrap.execSqlNoError("drop index wikiwordattrs_keyvalue")
+    connwrap.execSqlNoError("drop index wikiwordrefs_word")
+    connwrap.execSqlNoError("drop index wikiwordrefs_target")
     connwrap.execSqlNoError("drop index changelog_word")
     connwrap.execSqlNoError("drop index headversion_pkey")
     connwrap.execSqlNoError("drop index datablocks_unifiedname")
@@ -547,6 +580,8 @@ def rebuildIndices(connwrap):
     connwrap.execSqlNoError("create index wikirelations_relation on wikirelations(relation)")
     connwrap.execSqlNoError("create index wikiwordattrs_word on wikiwordattrs(word)")
     connwrap.execSqlNoError("create index wikiwordattrs_keyvalue on wikiwordattrs(key, value)")
+    connwrap.execSqlNoError("create index wikiwordrefs_word on wikiwordrefs(word)")
+    connwrap.execSqlNoError("create index wikiwordrefs_target on wikiwordrefs(target)")
     connwrap.execSqlNoError("create index changelog_word on changelog(word)")
     connwrap.execSqlNoError("create unique index headversion_pkey on headversion(word)")
     connwrap.execSqlNoError("create unique index datablocks_unifiedname on datablocks(unifiedname)")
@@ -559,7 +594,7 @@ def recreateCacheTables(connwrap):
     associated indices
     """
     CACHE_TABLES = ("wikirelations", "wikiwordattrs", "todos",
-            "wikiwordmatchterms")
+            "wikiwordrefs", "wikiwordmatchterms")
     
     for tn in CACHE_TABLES:
         connwrap.execSqlNoError("drop table %s" % tn)
@@ -784,7 +819,7 @@ def sqlite_testMatch(context, values):
     """
     nakedword = utf8Dec(values[0].value_blob(), "replace")[0]
     fileContents = utf8Dec(values[1].value_blob(), "replace")[0]
-    sarOp = sqlite.getTransObject(values[2].value_int())
+    sarOp = sqlite.getTransObject(values[2].value_int64())
     if sarOp.testWikiPage(nakedword, fileContents) == True:
         context.result_int(1)
     else:
@@ -897,6 +932,85 @@ def getSettingsInt(connwrap, key, default=None):
 
 
 
+# Full text index (SQLite FTS5) as alternative to the Whoosh search index.
+# It is an external content table over wikiwordcontent kept up to date
+# by triggers, so it changes in the same transaction as the content.
+
+FULLTEXT_INDEX_SCHEMA = (
+    "create virtual table wikiwordcontent_fts using fts5(content, "
+            "content='wikiwordcontent', "
+            "tokenize='unicode61 remove_diacritics 0')",
+    "create trigger wikiwordcontent_fts_insert after insert on "
+            "wikiwordcontent begin "
+            "insert into wikiwordcontent_fts(rowid, content) "
+            "values (new.rowid, new.content); end",
+    "create trigger wikiwordcontent_fts_delete after delete on "
+            "wikiwordcontent begin "
+            "insert into wikiwordcontent_fts(wikiwordcontent_fts, rowid, content) "
+            "values ('delete', old.rowid, old.content); end",
+    "create trigger wikiwordcontent_fts_update after update of content on "
+            "wikiwordcontent begin "
+            "insert into wikiwordcontent_fts(wikiwordcontent_fts, rowid, content) "
+            "values ('delete', old.rowid, old.content); "
+            "insert into wikiwordcontent_fts(rowid, content) "
+            "values (new.rowid, new.content); end"
+    )
+
+
+def isFullTextIndexAvailable(connwrap):
+    """
+    Returns True if the sqlite library supports FTS5 tables
+    """
+    try:
+        return bool(connwrap.execSqlQuerySingleItem(
+                "select sqlite_compileoption_used('ENABLE_FTS5')", default=0))
+    except sqlite.Error:
+        return False
+
+
+def hasFullTextIndex(connwrap):
+    """
+    Returns True if the full text index and its triggers exist
+    """
+    return connwrap.execSqlQuerySingleItem("select count(*) from sqlite_master "
+            "where name in ('wikiwordcontent_fts', 'wikiwordcontent_fts_insert', "
+            "'wikiwordcontent_fts_delete', 'wikiwordcontent_fts_update')",
+            default=0) == 4
+
+
+def createFullTextIndex(connwrap):
+    """
+    Create the full text index and fill it with the content of all pages
+    """
+    dropFullTextIndex(connwrap)
+    for sql in FULLTEXT_INDEX_SCHEMA:
+        connwrap.execSql(sql)
+
+    rebuildFullTextIndex(connwrap)
+
+
+def rebuildFullTextIndex(connwrap):
+    """
+    Build full text index again from the content table. Needed after
+    a "vacuum" because it may change the rowids of wikiwordcontent.
+    """
+    connwrap.execSql("insert into wikiwordcontent_fts(wikiwordcontent_fts) "
+            "values ('rebuild')")
+
+
+def dropFullTextIndex(connwrap):
+    """
+    Drop full text index and triggers. The triggers are removed even if the
+    sqlite library doesn't support FTS5 (wiki was created elsewhere)
+    so that the content table stays writable.
+    """
+    connwrap.execSqlNoError("drop trigger wikiwordcontent_fts_insert")
+    connwrap.execSqlNoError("drop trigger wikiwordcontent_fts_delete")
+    connwrap.execSqlNoError("drop trigger wikiwordcontent_fts_update")
+    connwrap.execSqlNoError("drop table wikiwordcontent_fts")
+
+
+
 def checkDatabaseFormat(connwrap):
     """
     Check the database format.
@@ -1257,6 +1371,19 @@ def updateDatabase(connwrap, dataDir):
     # --- WikiPad 2.1alpha.1 reached (formatver=9, writecompatver=9,
     #         readcompatver=9) ---
 
+    if formatver == 9:
+        # Create table "wikiwordrefs"
+        changeTableSchema(connwrap, "wikiwordrefs",
+                TABLE_DEFINITIONS["wikiwordrefs"])
+
+        # Mark all wikiwords to need a rebuild to fill it
+        connwrap.execSql("update wikiwordcontent set metadataprocessed=0;")
+
+        formatver = 10
+
+    # --- Reverse references reached (formatver=10, writecompatver=10,
+    #         readcompatver=9) ---
+
 
     # Write format information
 
@@ -1531,5 +1658,18 @@ invalid data.
         charlength: Integer. Length of the selection whose position is given in
             respective firstcharpos. Invalid if firstcharpos is -1.
 
+
+
+++ 2.1 to reverse references (formatver=10):
+
+    Table "wikiwordrefs" added:
+        Resolved targets of the references from a page to other pages, used
+        to find the pages to update when renaming pages.
+
+        word: Name of the page containing the reference
+        target: Page name the wiki word, the "[:page: ...]" insertion or the
+            attribute with wiki word value on page "word" points to.
+            Not resolved further through aliases.
+
 """
 
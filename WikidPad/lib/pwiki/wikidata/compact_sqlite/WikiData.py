@@ -18,12 +18,13 @@ import os, os.path
 
 from time import time, localtime
 import datetime
-import glob, traceback
+import glob, traceback, threading, re
 
-from wx import GetApp
+from pwiki.AppContext import GetApp
 
 from pwiki.WikiExceptions import *   # TODO make normal import
 from pwiki import SearchAndReplace
+from pwiki.Utilities import DUMBTHREADSTOP
 
 try:
     import pwiki.sqlite3api as sqlite
@@ -43,16 +44,71 @@ from ... import StringOps
 from ...StringOps import longPathEnc, \
         longPathDec, fileContentToUnicode, utf8Enc, utf8Dec
 
+from ..LinkGraph import LinkGraph
+from ..LinkTermIndex import LinkTermIndex
+
 
 import Consts
 
+
+class _ThreadReadAccess(threading.local):
+    """
+    Per-thread state of the read connection, see
+    WikiData.callWithReadConnection()
+    """
+    active = False   # True while a read-only method uses the connection
+    connWrap = None
+
+
 class WikiData:
     "Interface to wiki data."
+
+    # Methods which only read from the database and don't fill shared caches.
+    # In "readers" access mode the WikiDataSynchronizedProxy may run them
+    # on a per-thread read connection while another thread holds the lock.
+    READ_ONLY_METHODS = frozenset(("getContent", "search", "iterSearch",
+            "getTimestamps", "getWikiWordReadOnly",
+            "getExistingWikiWordInfo", "getMetaDataState",
+            "getWikiPageNamesForMetaDataState", "getAllDefinedWikiPageNames",
+            "getDefinedWikiPageNamesStartingWith", "isDefinedWikiPageName",
+            "getWikiPageLinkTermsStartingWith",
+            "getWikiPageNamesModifiedWithin", "getWikiPageCountsWithin",
+            "getTimeMinMax",
+            "getWikiPageNamesBefore", "getWikiPageNamesAfter",
+            "getFirstWikiPageName", "getNextWikiPageName",
+            "getAttributeNames", "getAttributeNamesStartingWith",
+            "getDistinctAttributeValues", "getAttributeTriples",
+            "getWordsForAttributeName", "getAttributesForWord", "getTodos",
+            "getWikiWordMatchTermsWith", "getDataBlockUnifNamesStartingWith",
+            "retrieveDataBlock", "retrieveDataBlockAsText",
+            "getPresentationBlock", "getDbSettingsValue",
+            "isFullTextIndexEnabled", "searchFullTextIndex"))
+
     def __init__(self, wikiDocument, dataDir, tempDir):
         self.wikiDocument = wikiDocument
         self.dataDir = dataDir
         self.resolveCaseNormed = False
-        self.cachedWikiPageLinkTermDict = None
+        # Page names and link terms, see _getLinkTermSnapshot()
+        self.linkTermIndex = LinkTermIndex()
+        # In-memory copy of relations and link terms, see _getLinkGraph()
+        self.linkGraph = LinkGraph()
+        self.readAccess = _ThreadReadAccess()
+        self.readConnWraps = []
+        self.readConnWrapsLock = threading.Lock()
+        self.writeConnWrap = None
+        # Does the sqlite library support the FTS5 full text index?
+        self.fullTextIndexAvailable = False
+        # Statistics about prefiltering of last search
+        self.lastSearchStatistics = None
+
+        # "serialized": All access goes through one connection (default)
+        # "readers": Additional read connections, database uses WAL journal
+        self.accessMode = self.wikiDocument.getWikiConfig().get("wiki_db",
+                "db_accessMode", "serialized")
+
+        # "stdlib" or "ctypes", see sqlite3api.connect()
+        self.sqliteDriver = GetApp().getGlobalConfig().get("main",
+                "sqlite_driver", "stdlib")
 
         dbPath = self.wikiDocument.getWikiConfig().get("wiki_db", "db_filename",
                 "").strip()
@@ -71,10 +127,11 @@ class WikiData:
             raise DbWriteAccessError(e)
 
         dbfile = longPathDec(dbfile)
+        self.dbFilename = dbfile
 
         try:
             self.connWrap = DbStructure.ConnectWrapSyncCommit(
-                    sqlite.connect(dbfile))
+                    sqlite.connect(dbfile, driver=self.sqliteDriver))
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbReadAccessError(e)
@@ -119,6 +176,19 @@ class WikiData:
         DbStructure.registerSqliteFunctions(self.connWrap)
 
 
+    def _getConnWrap(self):
+        readAccess = self.readAccess
+        if readAccess.active:
+            return readAccess.connWrap
+
+        return self.writeConnWrap
+
+    def _setConnWrap(self, connWrap):
+        self.writeConnWrap = connWrap
+
+    connWrap = property(_getConnWrap, _setConnWrap)
+
+
     def checkDatabaseFormat(self):
         return DbStructure.checkDatabaseFormat(self.connWrap)
 
@@ -156,6 +226,9 @@ class WikiData:
         # Activate UTF8 support for text in database (content is blob!)
         DbStructure.registerUtf8Support(self.connWrap)
 
+        if self.accessMode == "readers" and not recoveryMode:
+            self._activateWalMode()
+
         # Function to convert from content in database to
         # return value, used by getContent()
         self.contentDbToOutput = lambda c: utf8Dec(c, "replace")[0]
@@ -179,9 +252,11 @@ class WikiData:
         try:
             if not recoveryMode:
                 self._createTempTables()
+                self._checkFullTextIndex()
 
             # reset cache
-            self.cachedWikiPageLinkTermDict = None
+            self.linkTermIndex.invalidate()
+            self.linkGraph.invalidate()
             self.cachedGlobalAttrs = None
             
             if not recoveryMode:
@@ -199,6 +274,89 @@ class WikiData:
             raise lastException
 
 
+    def _activateWalMode(self):
+        """
+        Switch database to WAL journal mode which allows reading through
+        other connections while a write transaction is running. Falls back
+        to "serialized" access mode if this isn't possible (e.g. too old
+        sqlite library or network drive).
+        """
+        try:
+            self.connWrap.syncCommit()
+            journalMode = self.connWrap.execSqlQuerySingleItem(
+                    "pragma journal_mode = wal")
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            journalMode = None
+
+        if journalMode is None or journalMode.lower() != "wal":
+            self.accessMode = "serialized"
+
+
+    def _openReadConnection(self):
+        """
+        Open an additional connection for read-only methods of the
+        current thread.
+        """
+        try:
+            connWrap = DbStructure.ConnectWrapSyncCommit(
+                    sqlite.connect(self.dbFilename, driver=self.sqliteDriver))
+            connWrap.getConnection().setBusyTimeout(
+                    int(Consts.READCONNECTIONTIMEOUT * 1000))
+            connWrap.execSql("pragma query_only = 1")
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+        DbStructure.registerSqliteFunctions(connWrap)
+        DbStructure.registerUtf8Support(connWrap)
+
+        with self.readConnWrapsLock:
+            self.readConnWraps.append(connWrap)
+
+        return connWrap
+
+
+    def getAccessMode(self):
+        """
+        Return "readers" if read-only methods (see READ_ONLY_METHODS) can be
+        called through callWithReadConnection(), "serialized" otherwise.
+        """
+        return self.accessMode
+
+
+    def callWithReadConnection(self, function, *args, **kwargs):
+        """
+        Call  function  (one of READ_ONLY_METHODS) so that it uses the read
+        connection of the current thread instead of the main connection.
+        The read connection only sees committed data.
+        """
+        readAccess = self.readAccess
+        if readAccess.active:
+            return function(*args, **kwargs)
+
+        if readAccess.connWrap is None:
+            readAccess.connWrap = self._openReadConnection()
+
+        readAccess.active = True
+        try:
+            return function(*args, **kwargs)
+        finally:
+            readAccess.active = False
+
+
+    def _closeReadConnections(self):
+        with self.readConnWrapsLock:
+            readConnWraps = self.readConnWraps
+            self.readConnWraps = []
+
+        for connWrap in readConnWraps:
+            try:
+                connWrap.close()
+            except (IOError, OSError, sqlite.Error) as e:
+                traceback.print_exc()
+
+
     def _reinit(self):
         """
         Actual initialization or reinitialization after rebuildWiki()
@@ -219,6 +377,20 @@ class WikiData:
                 "on temppathfindparents(steps)")
 
 
+    def _checkFullTextIndex(self):
+        """
+        Check if the full text index can be used. If not, the triggers of
+        an existing index must be removed, otherwise writing content fails.
+        """
+        self.fullTextIndexAvailable = DbStructure.isFullTextIndexAvailable(
+                self.connWrap)
+
+        if not self.fullTextIndexAvailable and \
+                DbStructure.hasFullTextIndex(self.connWrap):
+            DbStructure.dropFullTextIndex(self.connWrap)
+            self.connWrap.commit()
+
+
     # ---------- Direct handling of page data ----------
 
     def getContent(self, word):
@@ -271,7 +443,7 @@ class WikiData:
     def setContent(self, word, content, moddate = None, creadate = None):
         """
         Sets the content, does not modify the cache information
-        except self.cachedWikiPageLinkTermDict
+        except the page names of self.linkTermIndex and self.linkGraph
         """
         if not content: content = ""  # ?
         
@@ -280,8 +452,6 @@ class WikiData:
         content = self.contentUniInputToDb(content)
         self.setContentRaw(word, content, moddate, creadate)
 
-        self.cachedWikiPageLinkTermDict = None
-
 
     def setContentRaw(self, word, content, moddate = None, creadate = None):
         """
@@ -321,6 +491,8 @@ class WikiData:
                     "(word, content, modified, created) "
                     "values (?,?,?,?)",
                     (word, sqlite.Binary(content), moddate, creadate))
+                self.linkGraph.addPage(word)
+                self.linkTermIndex.addPage(word)
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -329,14 +501,15 @@ class WikiData:
     def _renameContent(self, oldWord, newWord):
         """
         The content which was stored under oldWord is stored
-        after the call under newWord. The self.cachedWikiPageLinkTermDict
-        dictionary is updated, other caches won't be updated.
+        after the call under newWord. The self.linkTermIndex and
+        self.linkGraph are invalidated, other caches won't be updated.
         """
         try:
             self.connWrap.execSql("update wikiwordcontent set word = ? "
                     "where word = ?", (newWord, oldWord))
     
-            self.cachedWikiPageLinkTermDict = None
+            self.linkTermIndex.invalidate()
+            self.linkGraph.invalidate()
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -345,7 +518,8 @@ class WikiData:
     def _deleteContent(self, word):
         try:
             self.connWrap.execSql("delete from wikiwordcontent where word = ?", (word,))
-            self.cachedWikiPageLinkTermDict = None
+            self.linkTermIndex.removePage(word)
+            self.linkGraph.removePage(word)
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -506,17 +680,34 @@ class WikiData:
         try:
             # commit anything pending so we can rollback on error
             self.connWrap.syncCommit()
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
 
-            try:
-                self.connWrap.execSql("update wikirelations set word = ? where word = ?", (toWord, word))
-                self.connWrap.execSql("update wikiwordattrs set word = ? where word = ?", (toWord, word))
-                self.connWrap.execSql("update todos set word = ? where word = ?", (toWord, word))
-                self.connWrap.execSql("update wikiwordmatchterms set word = ? where word = ?", (toWord, word))
+        try:
+            self.renameWords(((word, toWord),))
+            self.commit()
+        except:
+            self.rollback()
+            raise
+
+
+    def renameWords(self, renameSeq):
+        """
+        Rename words in the order of renameSeq, a sequence of tuples
+        (word, toWord). Doesn't commit, so the renames can be part of a
+        larger transaction. The caller must call commit() or rollback()
+        afterwards.
+        """
+        try:
+            renameParams = [(toWord, word) for word, toWord in renameSeq]
+            for table in ("wikirelations", "wikiwordattrs", "todos",
+                    "wikiwordrefs", "wikiwordmatchterms"):
+                self.connWrap.executemany("update %s set word = ? "
+                        "where word = ?" % table, renameParams)
+
+            for word, toWord in renameSeq:
                 self._renameContent(word, toWord)
-                self.connWrap.commit()
-            except:
-                self.connWrap.rollback()
-                raise
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -541,6 +732,7 @@ class WikiData:
                     self.deleteChildRelationships(word)
                     self.deleteAttributes(word)
                     self.deleteTodos(word)
+                    self.deleteReferences(word)
                     if delContent:
                         self._deleteContent(word)
                     self.deleteWikiWordMatchTerms(word, syncUpdate=False)
@@ -548,6 +740,8 @@ class WikiData:
                     self.connWrap.commit()
                 except:
                     self.connWrap.rollback()
+                    self.linkGraph.invalidate()
+                    self.linkTermIndex.invalidate()
                     raise
             except (IOError, OSError, sqlite.Error) as e:
                 traceback.print_exc()
@@ -724,66 +918,64 @@ class WikiData:
 
 
 
-    def getParentlessWikiWords(self):
+    def _getLinkGraph(self):
         """
-        get the words that have no parents.
+        Return the LinkGraph, build it from the database if necessary.
         Function must work for read-only wiki.
-
-        NO LONGER VALID: (((also returns nodes that have files but
-        no entries in the wikiwords table.)))
         """
-        try:
-            # Also working but slower:
-#             return self.connWrap.execSqlQuerySingleColumn(
-#                     "select word from wikiwordcontent except "
-#                     "select wikiwordmatchterms.word "
-#                     "from wikiwordmatchterms inner join wikirelations "
-#                     "on matchterm == relation where "
-#                     "wikirelations.word != wikiwordmatchterms.word and "
-#                     "(type & 2) != 0")
-
+        if self.linkGraph.isValid():
+            return self.linkGraph
 
-            return self.connWrap.execSqlQuerySingleColumn(
-                    "select word from wikiwordcontent except "
-                    "select wikiwordmatchterms.word from wikiwordmatchterms "
-                    "where exists (select 1 from wikirelations where "
-                    "wikiwordmatchterms.matchterm == wikirelations.relation and "
-                    "wikirelations.word != wikiwordmatchterms.word) and "
-                    "(type & 2) != 0")
+        try:
+            self.linkGraph.build(
+                    self.connWrap.execSqlQuerySingleColumn(
+                        "select word from wikiwordcontent"),
+                    self.connWrap.execSqlQuery(
+                        "select word, relation from wikirelations "
+                        "order by rowid"),
+                    self.connWrap.execSqlQuery(
+                        "select matchterm, type, word from wikiwordmatchterms "
+                        "where (type & 2) != 0"))
+                    # Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK == 2
 
+            return self.linkGraph
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbReadAccessError(e)
 
 
+    def getParentlessWikiWords(self):
+        """
+        get the words that have no parents.
+        Function must work for read-only wiki.
+
+        NO LONGER VALID: (((also returns nodes that have files but
+        no entries in the wikiwords table.)))
+        """
+        return self._getLinkGraph().getParentlessWords()
+
+
     def getUndefinedWords(self):
         """
         List words which are childs of a word but are not defined, neither
         directly nor as alias.
         Function must work for read-only wiki.
         """
-        try:
-            return self.connWrap.execSqlQuerySingleColumn(
-                    "select relation from wikirelations "
-                    "except select word from wikiwordcontent "
-                    "except select matchterm from wikiwordmatchterms "
-                    "where (type & 2) != 0")
-            # Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK == 2
-
-        except (IOError, OSError, sqlite.Error) as e:
-            traceback.print_exc()
-            raise DbReadAccessError(e)
+        return self._getLinkGraph().getUndefinedWords()
 
 
-    def _addRelationship(self, word, rel):
+    def _addRelationships(self, word, rels):
         """
-        Add a relationship from word to rel. rel is a tuple (toWord, pos).
-        A relation from one word to another is unique and can't be added twice.
+        Add relationships from word to each rel in rels. rel is a tuple
+        (toWord, pos). A relation from one word to another is unique and
+        can't be added twice.
         """
+        if not rels:
+            return
         try:
-            self.connWrap.execSql(
+            self.connWrap.executemany(
                     "insert or replace into wikirelations(word, relation, firstcharpos) "
-                    "values (?, ?, ?)", (word, rel[0], rel[1]))
+                    "values (?, ?, ?)", [(word, rel[0], rel[1]) for rel in rels])
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -791,19 +983,21 @@ class WikiData:
     def updateChildRelations(self, word, childRelations):
         self.deleteChildRelationships(word)
         self.getExistingWikiWordInfo(word)
-        for r in childRelations:
-            self._addRelationship(word, r)
+        self._addRelationships(word, childRelations)
+
+        self.linkGraph.updateChildRelations(word,
+                [r[0] for r in childRelations])
 
     def deleteChildRelationships(self, fromWord):
         try:
             self.connWrap.execSql("delete from wikirelations where word = ?",
                     (fromWord,))
+            self.linkGraph.deleteChildRelations(fromWord)
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
 
 
-    # TODO Maybe optimize
     def getAllSubWords(self, words, level=-1):
         """
         Return all words which are children, grandchildren, etc.
@@ -811,34 +1005,10 @@ class WikiData:
         functions. All returned words are real existing words, no aliases.
         Function must work for read-only wiki.
         """
-        checkList = [(w, 0)
-                for w in (self.getWikiPageNameForLinkTerm(w) for w in words)
+        words = [w for w in (self.getWikiPageNameForLinkTerm(w) for w in words)
                 if w is not None]
-        checkList.reverse()
-        
-        resultSet = {}
-        result = []
-
-        while len(checkList) > 0:
-            toCheck, chLevel = checkList.pop()
-            if toCheck in resultSet:
-                continue
-
-            result.append(toCheck)
-            resultSet[toCheck] = None
-            
-            if level > -1 and chLevel >= level:
-                continue  # Don't go deeper
-            
-            children = self.getChildRelationships(toCheck, existingonly=True,
-                    selfreference=False)
-                    
-            children = [(self.getWikiPageNameForLinkTerm(c), chLevel + 1)
-                    for c in children]
-            children.reverse()
-            checkList += children
 
-        return result
+        return self._getLinkGraph().getAllSubWords(words, level)
 
 
     def findBestPathFromWordToWord(self, word, toWord):
@@ -847,61 +1017,13 @@ class WikiData:
         word and toWord are included as first/last element. If word == toWord,
         it is included only once as the single element of the list.
         If there is no path from word to toWord, [] is returned
-        Function must work for read-only wiki (should hold although function
-        writes to temporary table).
+        Function must work for read-only wiki.
         """
         # TODO Aliases supported?
-        
         if word == toWord:
             return [word]
-        try:
-            # Clear temporary table
-            self.connWrap.execSql("delete from temppathfindparents")
-    
-            self.connWrap.execSql("insert into temppathfindparents "+
-                    "(word, child, steps) select word, relation, 1 from wikirelations "+
-                    "where relation = ?", (word,))
-
-            step = 1
-            while True:
-                changes = self.connWrap.rowcount
-    
-                if changes == 0:
-                    # No more (grand-)parents
-                    return []
-
-                if self.connWrap.execSqlQuerySingleItem("select word from "+
-                        "temppathfindparents where word=?", (toWord,)) is not None:
-                    # Path found
-                    result = [toWord]
-                    crumb = toWord
-    
-                    while crumb != word:
-                        crumb = self.connWrap.execSqlQuerySingleItem(
-                                "select child from temppathfindparents where "+
-                                "word=?", (crumb,))
-                        result.append(crumb)
-
-                    # print "findBestPathFromWordToWord result", word, toWord, repr(result)
-    
-                    # Clear temporary table
-                    self.connWrap.execSql("delete from temppathfindparents")
 
-                    return result
-    
-                self.connWrap.execSql("""
-                    insert or ignore into temppathfindparents (word, child, steps)
-                    select wikirelations.word, temppathfindparents.word, ? from
-                        temppathfindparents inner join wikirelations on
-                        temppathfindparents.word == wikirelations.relation where
-                        temppathfindparents.steps == ?
-                    """, (step+1, step))
-    
-                step += 1
-        
-        except (IOError, OSError, sqlite.Error) as e:
-            traceback.print_exc()
-            raise DbReadAccessError(e)
+        return self._getLinkGraph().findBestPath(word, toWord)
 
 
     # ---------- Listing/Searching wiki words (see also "alias handling", "searching pages")----------
@@ -957,107 +1079,42 @@ class WikiData:
         so it must not rely on the presence of other cache
         information (e.g. relations).
 
-        The self.cachedWikiPageLinkTermDict is invalidated.
+        The self.linkTermIndex is invalidated.
         """
-        self.cachedWikiPageLinkTermDict = None
+        self.linkTermIndex.invalidate()
+        self.linkGraph.invalidate()
 
 
 
-    def _getCachedWikiPageLinkTermDict(self):
+    def _getLinkTermSnapshot(self):
         """
+        Return the current LinkTermSnapshot, build the LinkTermIndex from
+        the database if necessary.
         Function works for read-only wiki.
         """
-        class CachedWikiPageLinkTermDict:
-            def __init__(self, outer):
-                self.outer = outer
-                self.cache = {}
-                self.cacheNonExistent = set()
-                self.cacheComplete = False
-                self.resolveCaseNormed = self.outer.resolveCaseNormed
-                    
-
-            def get(self, key, default=None):
-                if self.cacheComplete:
-                    return self.cache.get(key, default)
-
-                if key in self.cache:
-                    return self.cache.get(key, default)
-                    
-                if key in self.cacheNonExistent:
-                    return default
-                
-                value = self._lookup(key)
-                
-                if value is None and self.resolveCaseNormed:
-                    value = self._lookupCaseNormed(key)
-                
-                if value is not None:
-                    self.cache[key] = value
-                    return value
-
-                self.cacheNonExistent.add(key)
-                return default
-
-
-            def _lookup(self, key):
-                if self.outer.isDefinedWikiPageName(key):
-                    return key
-                
-                try:
-                    return self.outer.connWrap.execSqlQuerySingleItem(
-                            "select word from wikiwordmatchterms "
-                            "where matchterm = ? and (type & 2) != 0 ", (key,))
-                    # Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK == 2
-                except (IOError, OSError, sqlite.Error) as e:
-                    traceback.print_exc()
-                    raise DbReadAccessError(e)
-                
-            def _lookupCaseNormed(self, key):
-                try:
-                    return self.outer.connWrap.execSqlQuerySingleItem(
-                            "select word from wikiwordmatchterms "
-                            "where matchtermnormcase = utf8Normcase(?) "
-                            "and (type & 2) != 0 ", (key,))
-                    # Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK == 2
-                except (IOError, OSError, sqlite.Error) as e:
-                    traceback.print_exc()
-                    raise DbReadAccessError(e)
-
-
-            def keys(self):
-                # This function is not affected by self.resolveCaseNormed
-                # because in theory it would have to return all possible
-                # lowercase-uppercase-combinations of a word to be
-                # accurate
-                if not self.cacheComplete:
-                    cacheDict = dict(self.outer.connWrap.execSqlQuery(
-                            "select word, word from wikiwordcontent union "
-                            "select matchterm, word from wikiwordmatchterms "
-                            "where (type & 2) != 0 and not matchterm in "
-                            "(select word from wikiwordcontent)"))
-                    # Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK == 2
-
-                    if not self.resolveCaseNormed:
-                        # Cache can't be complete with case normed resolving
-                        # because above
-                        self.cacheComplete = True
-                        self.cache = cacheDict
-
-                else:
-                    cacheDict = self.cache
-
-                return list(cacheDict)
+        snapshot = self.linkTermIndex.getSnapshot()
+        if snapshot is not None:
+            return snapshot
 
         try:
-            if self.cachedWikiPageLinkTermDict is None:
-                self.cachedWikiPageLinkTermDict = CachedWikiPageLinkTermDict(self)
-
-            return self.cachedWikiPageLinkTermDict
+            return self.linkTermIndex.build(self.connWrap.execSqlQueryIter(
+                    "select word, word, -1 from wikiwordcontent union all "
+                    "select word, matchterm, type from wikiwordmatchterms "
+                    "where (type & 2) != 0"))
+                    # Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK == 2
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbReadAccessError(e)
 
 
+    def getLinkTermIndex(self):
+        """
+        Return the LinkTermIndex. Its snapshot may be read by any thread
+        without going through the WikiDataSynchronizedProxy.
+        """
+        return self.linkTermIndex
+
+
 #     def _getCachedWikiPageLinkTermDict(self):
 #         """
 #         Function works for read-only wiki.
@@ -1093,7 +1150,7 @@ class WikiData:
         Return all links stored by production (in contrast to resolution)
         Function must work for read-only wiki.
         """
-        return list(self._getCachedWikiPageLinkTermDict().keys())
+        return self._getLinkTermSnapshot().keys()
 
 
     def getWikiPageLinkTermsStartingWith(self, thisStr, caseNormed=None):
@@ -1244,6 +1301,46 @@ class WikiData:
             raise DbReadAccessError(e)
 
 
+    def getWikiPageCountsWithin(self, stampType, startTime, bucketLength,
+            bucketCount):
+        """
+        Count wiki words per time span with one query. Returns a list of
+        bucketCount numbers, the i-th number counts the words with a time
+        value related to a particular time in the span from
+        startTime + i * bucketLength (inclusive) to
+        startTime + (i + 1) * bucketLength (exclusive).
+        Function must work for read-only wiki.
+
+        stampType -- 0: Modification time, 1: Creation, 2: Last visit
+        """
+        counts = [0] * bucketCount
+        field = self._STAMP_TYPE_TO_FIELD.get(stampType)
+        if field is None:
+            # Visited not supported yet
+            return counts
+
+        startTime = float(startTime)
+        bucketLength = float(bucketLength)
+
+        try:
+            result = self.connWrap.execSqlQuery(
+                    ("select cast((%s - ?) / ? as integer), count(*) "
+                    "from wikiwordcontent where %s >= ? and %s < ? group by 1") %
+                    (field, field, field), (startTime, bucketLength,
+                    startTime, startTime + bucketLength * bucketCount))
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+        for bucket, count in result:
+            # Rounding may put a value at the end into the bucket after
+            if bucket >= bucketCount:
+                bucket = bucketCount - 1
+            counts[bucket] += count
+
+        return counts
+
+
     def getFirstWikiPageName(self):
         """
         Returns the name of the "first" wiki word. See getNextWikiPageName()
@@ -1411,11 +1508,18 @@ class WikiData:
             raise DbReadAccessError(e)
 
 
-    def _setAttribute(self, word, key, value):
+    def _setAttributes(self, word, attrs):
+        """
+        attrs -- dictionary {key: sequence of values}
+        """
+        if not attrs:
+            return
         try:
-            self.connWrap.execSql(
+            self.connWrap.executemany(
                     "insert into wikiwordattrs(word, key, value) "
-                    "values (?, ?, ?)", (word, key, value))
+                    "values (?, ?, ?)",
+                    [(word, k, v) for k, values in attrs.items()
+                    for v in values])
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -1424,10 +1528,7 @@ class WikiData:
     def updateAttributes(self, word, attrs):
         self.deleteAttributes(word)
         self.getExistingWikiWordInfo(word)
-        for k in list(attrs.keys()):
-            values = attrs[k]
-            for v in values:
-                self._setAttribute(word, k, v)
+        self._setAttributes(word, attrs)
 
         self.cachedGlobalAttrs = None   # reset global attributes cache
 
@@ -1489,8 +1590,7 @@ class WikiData:
             return  # Nothing to change
 
         self.resolveCaseNormed = cn
-        # Clear cache which must be rebuilt differently depending on the setting
-        self.cachedWikiPageLinkTermDict = None
+        self.linkTermIndex.setResolveCaseNormed(cn)
 
 
     def getWikiPageNameForLinkTerm(self, alias):
@@ -1501,7 +1601,7 @@ class WikiData:
         of unaliasing must be performed in WikiDocument.
         Function must work for read-only wiki.
         """
-        return self._getCachedWikiPageLinkTermDict().get(alias, None)
+        return self._getLinkTermSnapshot().getWikiPageNameForLinkTerm(alias)
 
 
     # TODO: 2.4: Remove compatibility definitions
@@ -1557,14 +1657,15 @@ class WikiData:
     def updateTodos(self, word, todos):
         self.deleteTodos(word)
         self.getExistingWikiWordInfo(word)
-        for t in todos:
-            self._addTodo(word, t)
+        self._addTodos(word, todos)
 
 
-    def _addTodo(self, word, todo):
+    def _addTodos(self, word, todos):
+        if not todos:
+            return
         try:
-            self.connWrap.execSql("insert into todos(word, key, value) values (?, ?, ?)",
-                    (word, todo[0], todo[1]))
+            self.connWrap.executemany("insert into todos(word, key, value) values (?, ?, ?)",
+                    [(word, todo[0], todo[1]) for todo in todos])
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -1578,6 +1679,67 @@ class WikiData:
             raise DbWriteAccessError(e)
 
 
+    # ---------- Reference cache handling ----------
+
+    # Maximum number of targets per query in getReferringWikiPageNames(),
+    # stays below the default variable limit of SQLite
+    REFERENCE_QUERY_CHUNK_SIZE = 500
+
+    def updateReferences(self, word, targets):
+        """
+        Replace the references from page word to other pages.
+
+        targets -- sequence of page names the links, "page" insertions and
+                attributes with wiki word values of word point to
+        """
+        self.deleteReferences(word)
+        self.getExistingWikiWordInfo(word)
+        self._addReferences(word, targets)
+
+
+    def _addReferences(self, word, targets):
+        if not targets:
+            return
+        try:
+            self.connWrap.executemany("insert into wikiwordrefs(word, target) "
+                    "values (?, ?)", [(word, target) for target in targets])
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
+
+
+    def deleteReferences(self, word):
+        try:
+            self.connWrap.execSql("delete from wikiwordrefs where word = ?",
+                    (word,))
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
+
+
+    def getReferringWikiPageNames(self, targets):
+        """
+        Return set of names of pages with references to any of the page
+        names in targets. Pages whose meta-data isn't processed yet may be
+        missing.
+        Function must work for read-only wiki.
+        """
+        targets = list(targets)
+        result = set()
+        try:
+            for i in range(0, len(targets), self.REFERENCE_QUERY_CHUNK_SIZE):
+                chunk = targets[i:i + self.REFERENCE_QUERY_CHUNK_SIZE]
+                result.update(self.connWrap.execSqlQuerySingleColumn(
+                        "select distinct word from wikiwordrefs "
+                        "where target in (%s)" % ", ".join(["?"] * len(chunk)),
+                        chunk))
+
+            return result
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+
     # ---------- Wikiword matchterm cache handling ----------
 
     def getWikiWordMatchTermsWith(self, thisStr, orderBy=None, descend=False):
@@ -1641,28 +1803,43 @@ class WikiData:
 
 
     def updateWikiWordMatchTerms(self, word, wwmTerms, syncUpdate=False):
-        self.deleteWikiWordMatchTerms(word, syncUpdate=syncUpdate)
+        self._deleteWikiWordMatchTermsFromDb(word, syncUpdate)
         self.getExistingWikiWordInfo(word)
-        for t in wwmTerms:
-            assert t[2] == word
-            self._addWikiWordMatchTerm(t)
+        self._addWikiWordMatchTerms(word, wwmTerms)
 
+        self.linkGraph.updateMatchTerms(word, wwmTerms, syncUpdate)
+        self.linkTermIndex.updateMatchTerms(word, wwmTerms, syncUpdate)
 
-    def _addWikiWordMatchTerm(self, wwmTerm):
-        matchterm, typ, word, firstcharpos, charlength = wwmTerm
+
+    def _addWikiWordMatchTerms(self, word, wwmTerms):
+        """
+        wwmTerms -- sequence of tuples (matchterm, type, word, firstcharpos,
+                charlength), word must be the same for all
+        """
+        if not wwmTerms:
+            return
+        params = []
+        for matchterm, typ, termWord, firstcharpos, charlength in wwmTerms:
+            assert termWord == word
+            params.append((matchterm, typ, word, firstcharpos, charlength,
+                    matchterm.lower()))
         try:
             # TODO Check for name collisions
-            self.connWrap.execSql("insert into wikiwordmatchterms(matchterm, "
+            self.connWrap.executemany("insert into wikiwordmatchterms(matchterm, "
                     "type, word, firstcharpos, charlength, matchtermnormcase) "
-                    "values (?, ?, ?, ?, ?, ?)",
-                    (matchterm, typ, word, firstcharpos, charlength,
-                    matchterm.lower()))
+                    "values (?, ?, ?, ?, ?, ?)", params)
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
 
 
     def deleteWikiWordMatchTerms(self, word, syncUpdate=False):
+        self._deleteWikiWordMatchTermsFromDb(word, syncUpdate)
+        self.linkGraph.deleteMatchTerms(word, syncUpdate)
+        self.linkTermIndex.deleteMatchTerms(word, syncUpdate)
+
+
+    def _deleteWikiWordMatchTermsFromDb(self, word, syncUpdate):
         if syncUpdate:
             addSql = " and (type & 16) != 0"
         else:
@@ -1672,7 +1849,6 @@ class WikiData:
         try:
             self.connWrap.execSql("delete from wikiwordmatchterms where "
                     "word = ?" + addSql, (word,))
-            self.cachedWikiPageLinkTermDict = None
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -1811,18 +1987,34 @@ class WikiData:
         """
 
         if sarOp.isTextNeededForTest():
+            # Only pages containing the literal strings the search
+            # requires are tested in Python
+            params = []
+            prefilter = self._buildSearchPrefilterSql(
+                    sarOp.getContentPrefilter(), params)
+            if prefilter is None:
+                prefilter = "1"
+
             try:
-                result = self.connWrap.execSqlQuerySingleColumn(
-                        "select word from wikiwordcontent where "
-                        "testMatch(word, content, ?)",
-                        (sqlite.addTransObject(sarOp),))
+                rows = self.connWrap.execSqlQuery(
+                        "select word, testMatch(word, content, ?) "
+                        "from wikiwordcontent where " + prefilter,
+                        [sqlite.addTransObject(sarOp)] + params)
+
+                rowCount = self.connWrap.execSqlQuerySingleItem(
+                        "select count(*) from wikiwordcontent")
             except (IOError, OSError, sqlite.Error) as e:
                 traceback.print_exc()
                 raise DbReadAccessError(e)
             finally:
                 sqlite.delTransObject(sarOp)
-    
-            result = set(result)
+
+            self.lastSearchStatistics = {"rows": rowCount,
+                    "candidates": len(rows),
+                    "eliminated": rowCount - len(rows),
+                    "prefilter": prefilter}
+
+            result = set(word for word, match in rows if match)
             result -= exclusionSet
     
             return result
@@ -1844,6 +2036,140 @@ class WikiData:
             return result
 
 
+    def iterSearch(self, sarOp, exclusionSet, threadstop=DUMBTHREADSTOP):
+        """
+        Same as search() but returns an iterator over the matching page
+        names. All content is in the database, so the search itself runs
+        completely inside the call.
+        """
+        return iter(self.search(sarOp, exclusionSet))
+
+
+
+    # ---------- Full text index ----------
+    # Only available if checkCapability("fulltext index") returns a version
+
+    def isFullTextIndexEnabled(self):
+        """
+        Returns True if the full text index exists in the database.
+        """
+        try:
+            return DbStructure.hasFullTextIndex(self.connWrap)
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+
+    def setFullTextIndexEnabled(self, flag):
+        """
+        Create and fill or drop the full text index. The index is complete
+        after the call.
+        """
+        try:
+            self.connWrap.syncCommit()
+            try:
+                if flag:
+                    DbStructure.createFullTextIndex(self.connWrap)
+                else:
+                    DbStructure.dropFullTextIndex(self.connWrap)
+                self.connWrap.commit()
+            except:
+                self.connWrap.rollback()
+                raise
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
+
+
+    def updateFullTextIndex(self, word):
+        """
+        Update index entry for page  word  from its stored content.
+        Nothing to do here, the index is maintained by triggers on
+        wikiwordcontent.
+        """
+        pass
+
+
+    def rebuildFullTextIndex(self):
+        """
+        Refill the full text index from the content of all pages.
+        """
+        try:
+            DbStructure.rebuildFullTextIndex(self.connWrap)
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
+
+
+    def searchFullTextIndex(self, ftsQuery):
+        """
+        Return list of names of all pages matching the FTS5 query string
+        ftsQuery.
+        """
+        try:
+            return self.connWrap.execSqlQuerySingleColumn(
+                    "select word from wikiwordcontent where rowid in "
+                    "(select rowid from wikiwordcontent_fts "
+                    "where wikiwordcontent_fts match ?)", (ftsQuery,))
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+
+    def _buildSearchPrefilterSql(self, condition, params):
+        """
+        Translate prefilter condition as returned by
+        SearchReplaceOperation.getContentPrefilter() to an SQL expression
+        on the content column and append its parameters to  params .
+        Returns None if condition can't be expressed (then  params  is
+        left unchanged).
+        """
+        if condition is None:
+            return None
+
+        if condition[0] == "literal":
+            literal, caseSensitive = condition[1:]
+            if caseSensitive:
+                # Content is UTF-8, so a byte-wise search is enough
+                params.append(sqlite.Binary(utf8Enc(literal)[0]))
+                return "instr(content, ?) > 0"
+
+            # lower() of sqlite only handles ASCII. Characters with
+            # non-ASCII case variants (e.g. Kelvin sign for "k") can't be
+            # used, so take longest part without them
+            parts = re.split(r"[^\x20-\x7e]|[iIkKsS]", literal)
+            part = max(parts, key=len)
+            if part == "":
+                return None
+
+            params.append(part.lower())
+            return "instr(lower(content), ?) > 0"
+
+        subParams = []
+        subSqls = []
+        for sub in condition[1]:
+            subSql = self._buildSearchPrefilterSql(sub, subParams)
+            if subSql is not None:
+                subSqls.append(subSql)
+            elif condition[0] == "or":
+                # One alternative without restriction -> no restriction
+                return None
+
+        if len(subSqls) == 0:
+            return None
+
+        params += subParams
+        return "(" + (" %s " % condition[0]).join(subSqls) + ")"
+
+
+    def getLastSearchStatistics(self):
+        """
+        Return dictionary with number of rows, candidates tested after
+        prefiltering and eliminated rows of last call to search() or None.
+        """
+        return self.lastSearchStatistics
+
+
 # explain select distinct type from wikiwordmatchterms where type & 2
 # explain select type from (select distinct type from wikiwordmatchterms) where type & 2
 # explain select type, type & 2 from (select distinct type from wikiwordmatchterms where type > 1) 
@@ -1854,6 +2180,7 @@ class WikiData:
     _CAPABILITIES = {
         "rebuild": 1,
         "compactify": 1,     # = sqlite vacuum
+        "reference index": 1,   # getReferringWikiPageNames()
         "plain text import": 1,
         "recovery mode": 1,
 #         "asynchronous commit":1  # Commit can be done in separate thread, but
@@ -1867,6 +2194,10 @@ class WikiData:
         The capkey names the capability, the function returns normally
         a version number or None if not supported
         """
+        if capkey == "fulltext index":
+            # SQLite FTS5 table instead of Whoosh index
+            return 1 if self.fullTextIndexAvailable else None
+
         return WikiData._CAPABILITIES.get(capkey, None)
 
 
@@ -1880,7 +2211,8 @@ class WikiData:
         DbStructure.recreateCacheTables(self.connWrap)
         self.connWrap.syncCommit()
 
-        self.cachedWikiPageLinkTermDict = None
+        self.linkTermIndex.invalidate()
+        self.linkGraph.invalidate()
         self.cachedGlobalAttrs = None
 
 
@@ -1931,6 +2263,7 @@ class WikiData:
 
 
     def close(self):
+        self._closeReadConnections()
         self.connWrap.syncCommit()
         self.connWrap.close()
 
@@ -1950,6 +2283,8 @@ class WikiData:
         progresshandler -- Object, fulfilling the GuiProgressHandler
             protocol
         """
+        self.linkGraph.invalidate()
+        self.linkTermIndex.invalidate()
         try:
             self.connWrap.execSql("update wikiwordmatchterms "
                     "set matchtermnormcase=utf8Normcase(matchterm)")
@@ -2022,6 +2357,8 @@ class WikiData:
         """
         try:
             self.connWrap.rollback()
+            self.linkGraph.invalidate()
+            self.linkTermIndex.invalidate()
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -2037,6 +2374,12 @@ class WikiData:
         try:
             self.connWrap.syncCommit()
             self.connWrap.execSql("vacuum")
+
+            # Vacuum may have changed the rowids the index refers to
+            if self.fullTextIndexAvailable and \
+                    DbStructure.hasFullTextIndex(self.connWrap):
+                DbStructure.rebuildFullTextIndex(self.connWrap)
+                self.connWrap.commit()
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -29,6 +29,9 @@ class ConnectWrapBase:
     Connection (and Cursor)-Wrapper to simplify some operations.
     Base class to versions with synchronous and asynchronous commit.
     """
+    # Number of rows execSqlQueryIter() retrieves at once
+    QUERY_ITER_FETCH_SIZE = 500
+
     def __init__(self, connection):
         self.__dict__["dbConn"] = connection
         self.__dict__["dbCursor"] = connection.cursor()
@@ -67,18 +70,39 @@ class ConnectWrapBase:
         return self.dbCursor.fetchall()
 
 
-#     def execSqlQueryIter(self, sql, params=None):
-#         """
-#         utility method, executes the sql, returns an iterator
-#         over the query results
-#         """
-#         ## print "execSqlQuery sql", sql, repr(params)
-#         if params:
-#             self.dbCursor.execute(sql, params, typeDetect=sqlite.TYPEDET_FIRST)
-#         else:
-#             self.dbCursor.execute(sql, typeDetect=sqlite.TYPEDET_FIRST)
-# 
-#         return iter(self.dbCursor)
+    def execSqlQueryIter(self, sql, params=None, fetchSize=None):
+        """
+        utility method, executes the sql, returns an iterator
+        over the query results. The rows are retrieved in blocks of at most
+        fetchSize rows (None: QUERY_ITER_FETCH_SIZE) from an own cursor, so
+        other statements may be executed on the connection while iterating.
+        """
+        if fetchSize is None:
+            fetchSize = self.QUERY_ITER_FETCH_SIZE
+
+        cursor = self.dbConn.cursor()
+        try:
+            if params:
+                cursor.execute(sql, params, typeDetect=sqlite.TYPEDET_FIRST)
+            else:
+                cursor.execute(sql, typeDetect=sqlite.TYPEDET_FIRST)
+        except:
+            cursor.close()
+            raise
+
+        return self._iterCursor(cursor, fetchSize)
+
+
+    @staticmethod
+    def _iterCursor(cursor, fetchSize):
+        try:
+            while True:
+                rows = cursor.fetchmany(fetchSize)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
 
 
     def execSqlQuerySingleColumn(self, sql, params=None):
@@ -186,7 +210,7 @@ class ConnectWrapAsyncCommit(ConnectWrapBase):
         try:
             if not self.commitNeeded:
                 return
-            if self.commitTimer is not None and self.commitTimer.isAlive():
+            if self.commitTimer is not None and self.commitTimer.is_alive():
                 return
             t = threading.Timer(0.6, self._timerCommit)
             self.commitTimer = t
@@ -215,7 +239,7 @@ class ConnectWrapAsyncCommit(ConnectWrapBase):
         """
         self.accessLock.acquire()
         try:
-            if self.commitTimer is not None and self.commitTimer.isAlive():
+            if self.commitTimer is not None and self.commitTimer.is_alive():
                 self.commitTimer.cancel()
             self.dbConn.commit()
             self.commitNeeded = False
@@ -226,7 +250,7 @@ class ConnectWrapAsyncCommit(ConnectWrapBase):
     def rollback(self):
         self.accessLock.acquire()
         try:    
-            if self.commitTimer is not None and self.commitTimer.isAlive():
+            if self.commitTimer is not None and self.commitTimer.is_alive():
                 self.commitTimer.cancel()
             self.dbConn.rollback()
             self.commitNeeded = False
@@ -240,7 +264,7 @@ class ConnectWrapAsyncCommit(ConnectWrapBase):
         This function is not secured by a lock as it is only called
         by other functions.
         """
-        if self.commitTimer is not None and self.commitTimer.isAlive():
+        if self.commitTimer is not None and self.commitTimer.is_alive():
             self.commitTimer.cancel()
 
             if not self.commitNeeded:
@@ -353,8 +377,8 @@ class ConnectWrapAsyncCommit(ConnectWrapBase):
 
 
 
-VERSION_DB = 3
-VERSION_WRITECOMPAT = 3
+VERSION_DB = 4
+VERSION_WRITECOMPAT = 4
 VERSION_READCOMPAT = 3
 
 
@@ -422,6 +446,12 @@ TABLE_DEFINITIONS = {
         ("charlength", t.imo)  # Length of the todo
         ),
 
+
+    "wikiwordrefs": (     # Cache
+        ("word", t.t),
+        ("target", t.t)  # Resolved page name of link, insertion or attribute
+        ),
+
     
     "search_views": (     # Deleted since 2.0alpha1. For updating format only 
         ("title", t.pt),
@@ -468,6 +498,7 @@ MAIN_TABLES = (
     "wikirelations",
     "wikiwordattrs",
     "todos",
+    "wikiwordrefs",
 #     "search_views",
     "settings",
     "wikiwordmatchterms",
@@ -494,12 +525,14 @@ def rebuildIndices(connwrap):
     connwrap.execSqlNoError("drop index wikirelations_relation")    
     connwrap.execSqlNoError("drop index wikiwordattrs_word")
     connwrap.execSqlNoError("drop index wikiwordattrs_keyvalue")
+    connwrap.execSqlNoError("drop index wikiwordrefs_word")
+    connwrap.execSqlNoError("drop index wikiwordrefs_target")
     connwrap.execSqlNoError("drop index datablocks_unifiedname")
     connwrap.execSqlNoError("drop index datablocksexternal_unifiedname")
 
     connwrap.execSqlNoError("create unique index wikiwords_pkey on wikiwords(word)")
-    connwrap.execSqlNoError("create index wikiwords_modified on wikiwordcontent(modified)")
-    connwrap.execSqlNoError("create index wikiwords_created on wikiwordcontent(created)")
+    connwrap.execSqlNoError("create index wikiwords_modified on wikiwords(modified)")
+    connwrap.execSqlNoError("create index wikiwords_created on wikiwords(created)")
     connwrap.execSqlNoError("create index wikiwordmatchterms_matchterm on wikiwordmatchterms(matchterm)")
     connwrap.execSqlNoError("create index wikiwordmatchterms_matchtermnormcase on wikiwordmatchterms(matchtermnormcase)")
     connwrap.execSqlNoError("create unique index wikirelations_pkey on wikirelations(word, relation)")
@@ -507,6 +540,8 @@ def rebuildIndices(connwrap):
     connwrap.execSqlNoError("create index wikirelations_relation on wikirelations(relation)")
     connwrap.execSqlNoError("create index wikiwordattrs_word on wikiwordattrs(word)")
     connwrap.execSqlNoError("create index wikiwordattrs_keyvalue on wikiwordattrs(key, value)")
+    connwrap.execSqlNoError("create index wikiwordrefs_word on wikiwordrefs(word)")
+    connwrap.execSqlNoError("create index wikiwordrefs_target on wikiwordrefs(target)")
     connwrap.execSqlNoError("create unique index datablocks_unifiedname on datablocks(unifiedname)")
     connwrap.execSqlNoError("create unique index datablocksexternal_unifiedname on datablocksexternal(unifiedname)")
 
@@ -518,7 +553,7 @@ def recreateCacheTables(connwrap):
     associated indices
     """
     CACHE_TABLES = ("wikirelations", "wikiwordattrs", "todos",
-            "wikiwordmatchterms")
+            "wikiwordrefs", "wikiwordmatchterms")
     
     for tn in CACHE_TABLES:
         connwrap.execSqlNoError("drop table %s" % tn)
@@ -795,6 +830,59 @@ def getSettingsInt(connwrap, key, default=None):
 
 
 
+# Full text index (SQLite FTS5) as alternative to the Whoosh search index.
+# The content of the pages lives in files, so the index stores its own copy.
+# The rowid of an entry is the rowid of the page in wikiwords, entries are
+# written by WikiData.setContent() in the same transaction as the page entry.
+
+FULLTEXT_INDEX_SCHEMA = (
+    "create virtual table wikiwords_fts using fts5(content, "
+            "tokenize='unicode61 remove_diacritics 0')",
+    "create trigger wikiwords_fts_delete after delete on wikiwords begin "
+            "delete from wikiwords_fts where rowid = old.rowid; end"
+    )
+
+
+def isFullTextIndexAvailable(connwrap):
+    """
+    Returns True if the sqlite library supports FTS5 tables
+    """
+    try:
+        return bool(connwrap.execSqlQuerySingleItem(
+                "select sqlite_compileoption_used('ENABLE_FTS5')", default=0))
+    except sqlite.Error:
+        return False
+
+
+def hasFullTextIndex(connwrap):
+    """
+    Returns True if the full text index and its trigger exist
+    """
+    return connwrap.execSqlQuerySingleItem("select count(*) from sqlite_master "
+            "where name in ('wikiwords_fts', 'wikiwords_fts_delete')",
+            default=0) == 2
+
+
+def createFullTextIndex(connwrap):
+    """
+    Create the (empty) full text index
+    """
+    dropFullTextIndex(connwrap)
+    for sql in FULLTEXT_INDEX_SCHEMA:
+        connwrap.execSql(sql)
+
+
+def dropFullTextIndex(connwrap):
+    """
+    Drop full text index and trigger. The trigger is removed even if the
+    sqlite library doesn't support FTS5 (wiki was created elsewhere)
+    so that the wikiwords table stays writable.
+    """
+    connwrap.execSqlNoError("drop trigger wikiwords_fts_delete")
+    connwrap.execSqlNoError("drop table wikiwords_fts")
+
+
+
 def checkDatabaseFormat(connwrap):
     """
     Check the database format.
@@ -965,6 +1053,19 @@ def updateDatabase(connwrap, dataDir, pagefileSuffix):
     # --- WikiPad 2.1alpha1 reached (formatver=3, writecompatver=3,
     #         readcompatver=3) ---
 
+    if formatver == 3:
+        # Create table "wikiwordrefs"
+        changeTableSchema(connwrap, "wikiwordrefs",
+                TABLE_DEFINITIONS["wikiwordrefs"])
+
+        # Mark all wikiwords to need a rebuild to fill it
+        connwrap.execSql("update wikiwords set metadataprocessed=0;")
+
+        formatver = 4
+
+    # --- Reverse references reached (formatver=4, writecompatver=4,
+    #         readcompatver=3) ---
+
 
     connwrap.executemany("insert or replace into settings(key, value) "+
                 "values (?, ?)", (
@@ -1001,6 +1102,13 @@ def updateDatabase2(connwrap):
                 "values ('lastwriteprogver.sub', '"+str(Consts.VERSION_TUPLE[3])+"')")
         connwrap.execSql("insert or replace into settings(key, value) "
                 "values ('lastwriteprogver.patch', '"+str(Consts.VERSION_TUPLE[4])+"')")
+
+        # The indices on the time stamps were created for the wrong table
+        # before, create them for existing databases
+        connwrap.execSql("create index if not exists wikiwords_modified "
+                "on wikiwords(modified)")
+        connwrap.execSql("create index if not exists wikiwords_created "
+                "on wikiwords(created)")
     except sqlite.ReadOnlyDbError:
         pass
 
@@ -1166,4 +1274,17 @@ invalid data.
         charlength: Integer. Length of the selection whose position is given in
             respective firstcharpos. Invalid if firstcharpos is -1.
 
+
+
+++ 2.1 to reverse references (formatver=4):
+
+    Table "wikiwordrefs" added:
+        Resolved targets of the references from a page to other pages, used
+        to find the pages to update when renaming pages.
+
+        word: Name of the page containing the reference
+        target: Page name the wiki word, the "[:page: ...]" insertion or the
+            attribute with wiki word value on page "word" points to.
+            Not resolved further through aliases.
+
 """
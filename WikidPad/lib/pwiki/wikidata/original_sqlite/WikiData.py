@@ -18,12 +18,13 @@ import os, os.path
 
 from time import time, localtime
 import datetime
-import glob, traceback
+import glob, traceback, threading, concurrent.futures
 
-from wx import GetApp
+from pwiki.AppContext import GetApp
 
 from pwiki.WikiExceptions import *   # TODO make normal import
 from pwiki import SearchAndReplace
+from pwiki.Utilities import DUMBTHREADSTOP
 
 try:
     import pwiki.sqlite3api as sqlite
@@ -43,16 +44,75 @@ from ...StringOps import longPathEnc, \
         longPathDec, fileContentToUnicode, utf8Enc, utf8Dec
 from ...StringOps import writeEntireFile, iterCompatibleFilename
 
+from ..LinkGraph import LinkGraph
+from ..LinkTermIndex import LinkTermIndex
+
 
 import Consts
 
+
+class _ThreadReadAccess(threading.local):
+    """
+    Per-thread state of the read connection, see
+    WikiData.callWithReadConnection()
+    """
+    active = False   # True while a read-only method uses the connection
+    connWrap = None
+
+
 class WikiData:
     "Interface to wiki data."
+
+    # Methods which only read from the database and don't fill shared caches.
+    # In "readers" access mode the WikiDataSynchronizedProxy may run them
+    # on a per-thread read connection while another thread holds the lock.
+    # getContent() and search() are missing here because they may refresh
+    # the page file names in the database
+    READ_ONLY_METHODS = frozenset(("getTimestamps", "getWikiWordReadOnly",
+            "getExistingWikiWordInfo", "getMetaDataState",
+            "getWikiPageNamesForMetaDataState", "getAllDefinedWikiPageNames",
+            "getDefinedWikiPageNamesStartingWith", "isDefinedWikiPageName",
+            "getWikiPageLinkTermsStartingWith",
+            "getWikiPageNamesModifiedWithin", "getWikiPageCountsWithin",
+            "getTimeMinMax",
+            "getWikiPageNamesBefore", "getWikiPageNamesAfter",
+            "getFirstWikiPageName", "getNextWikiPageName",
+            "getAttributeNames", "getAttributeNamesStartingWith",
+            "getDistinctAttributeValues", "getAttributeTriples",
+            "getWordsForAttributeName", "getAttributesForWord", "getTodos",
+            "getWikiWordMatchTermsWith", "getDataBlockUnifNamesStartingWith",
+            "retrieveDataBlock", "retrieveDataBlockAsText",
+            "getPresentationBlock", "getDbSettingsValue",
+            "isFullTextIndexEnabled", "searchFullTextIndex"))
+
     def __init__(self, wikiDocument, dataDir, tempDir):
         self.wikiDocument = wikiDocument
         self.dataDir = dataDir
         self.resolveCaseNormed = False
-        self.cachedWikiPageLinkTermDict = None
+        # Page names and link terms, see _getLinkTermSnapshot()
+        self.linkTermIndex = LinkTermIndex()
+        # In-memory copy of relations and link terms, see _getLinkGraph()
+        self.linkGraph = LinkGraph()
+        self.readAccess = _ThreadReadAccess()
+        self.readConnWraps = []
+        self.readConnWrapsLock = threading.Lock()
+        self.writeConnWrap = None
+        # Does the sqlite library support the FTS5 full text index?
+        self.fullTextIndexAvailable = False
+        # Does the index exist (and must be updated by setContent())?
+        self.fullTextIndexEnabled = False
+        # Tuples (old path, new path) of page files renamed by renameWords()
+        # since last commit, moved back by rollback()
+        self.uncommittedFileRenames = []
+
+        # "serialized": All access goes through one connection (default)
+        # "readers": Additional read connections, database uses WAL journal
+        self.accessMode = self.wikiDocument.getWikiConfig().get("wiki_db",
+                "db_accessMode", "serialized")
+
+        # "stdlib" or "ctypes", see sqlite3api.connect()
+        self.sqliteDriver = GetApp().getGlobalConfig().get("main",
+                "sqlite_driver", "stdlib")
         
         dbPath = self.wikiDocument.getWikiConfig().get("wiki_db", "db_filename",
                 "").strip()
@@ -71,10 +131,11 @@ class WikiData:
             raise DbWriteAccessError(e)
 
         dbfile = longPathDec(dbfile)
+        self.dbFilename = dbfile
 
         try:
             self.connWrap = DbStructure.ConnectWrapSyncCommit(
-                    sqlite.connect(dbfile))
+                    sqlite.connect(dbfile, driver=self.sqliteDriver))
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbReadAccessError(e)
@@ -131,6 +192,19 @@ class WikiData:
             raise DbReadAccessError(e)
 
 
+    def _getConnWrap(self):
+        readAccess = self.readAccess
+        if readAccess.active:
+            return readAccess.connWrap
+
+        return self.writeConnWrap
+
+    def _setConnWrap(self, connWrap):
+        self.writeConnWrap = connWrap
+
+    connWrap = property(_getConnWrap, _setConnWrap)
+
+
     def checkDatabaseFormat(self):
         return DbStructure.checkDatabaseFormat(self.connWrap)
 
@@ -167,6 +241,9 @@ class WikiData:
         # Activate UTF8 support for text in database (content is blob!)
         DbStructure.registerUtf8Support(self.connWrap)
 
+        if self.accessMode == "readers":
+            self._activateWalMode()
+
         # Function to convert from content in database to
         # return value, used by getContent()
         self.contentDbToOutput = lambda c: utf8Dec(c, "replace")[0]
@@ -189,9 +266,11 @@ class WikiData:
 
         try:
             self._createTempTables()
+            self._checkFullTextIndex()
 
             # reset cache
-            self.cachedWikiPageLinkTermDict = None
+            self.linkTermIndex.invalidate()
+            self.linkGraph.invalidate()
             self.cachedGlobalAttrs = None
             self.getGlobalAttributes()
         except (IOError, OSError, sqlite.Error) as e:
@@ -207,6 +286,89 @@ class WikiData:
             raise lastException
 
 
+    def _activateWalMode(self):
+        """
+        Switch database to WAL journal mode which allows reading through
+        other connections while a write transaction is running. Falls back
+        to "serialized" access mode if this isn't possible (e.g. too old
+        sqlite library or network drive).
+        """
+        try:
+            self.connWrap.syncCommit()
+            journalMode = self.connWrap.execSqlQuerySingleItem(
+                    "pragma journal_mode = wal")
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            journalMode = None
+
+        if journalMode is None or journalMode.lower() != "wal":
+            self.accessMode = "serialized"
+
+
+    def _openReadConnection(self):
+        """
+        Open an additional connection for read-only methods of the
+        current thread.
+        """
+        try:
+            connWrap = DbStructure.ConnectWrapSyncCommit(
+                    sqlite.connect(self.dbFilename, driver=self.sqliteDriver))
+            connWrap.getConnection().setBusyTimeout(
+                    int(Consts.READCONNECTIONTIMEOUT * 1000))
+            connWrap.execSql("pragma query_only = 1")
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+        DbStructure.registerSqliteFunctions(connWrap)
+        DbStructure.registerUtf8Support(connWrap)
+
+        with self.readConnWrapsLock:
+            self.readConnWraps.append(connWrap)
+
+        return connWrap
+
+
+    def getAccessMode(self):
+        """
+        Return "readers" if read-only methods (see READ_ONLY_METHODS) can be
+        called through callWithReadConnection(), "serialized" otherwise.
+        """
+        return self.accessMode
+
+
+    def callWithReadConnection(self, function, *args, **kwargs):
+        """
+        Call  function  (one of READ_ONLY_METHODS) so that it uses the read
+        connection of the current thread instead of the main connection.
+        The read connection only sees committed data.
+        """
+        readAccess = self.readAccess
+        if readAccess.active:
+            return function(*args, **kwargs)
+
+        if readAccess.connWrap is None:
+            readAccess.connWrap = self._openReadConnection()
+
+        readAccess.active = True
+        try:
+            return function(*args, **kwargs)
+        finally:
+            readAccess.active = False
+
+
+    def _closeReadConnections(self):
+        with self.readConnWrapsLock:
+            readConnWraps = self.readConnWraps
+            self.readConnWraps = []
+
+        for connWrap in readConnWraps:
+            try:
+                connWrap.close()
+            except (IOError, OSError, sqlite.Error) as e:
+                traceback.print_exc()
+
+
     def _reinit(self):
         """
         Actual initialization or reinitialization after rebuildWiki()
@@ -227,6 +389,22 @@ class WikiData:
                 "on temppathfindparents(steps)")
 
 
+    def _checkFullTextIndex(self):
+        """
+        Check if the full text index can be used. If not, the trigger of
+        an existing index must be removed, otherwise deleting pages fails.
+        """
+        self.fullTextIndexAvailable = DbStructure.isFullTextIndexAvailable(
+                self.connWrap)
+
+        if DbStructure.hasFullTextIndex(self.connWrap):
+            if self.fullTextIndexAvailable:
+                self.fullTextIndexEnabled = True
+            else:
+                DbStructure.dropFullTextIndex(self.connWrap)
+                self.connWrap.commit()
+
+
     # ---------- Direct handling of page data ----------
     
     def getContent(self, word):
@@ -279,6 +457,8 @@ class WikiData:
                         "values (?, ?, ?, ?, ?)",
                         (word, creadate, moddate, fileName,
                         fileName.lower()))
+                self.linkGraph.addPage(word)
+                self.linkTermIndex.addPage(word)
             else:
                 self.connWrap.execSql("update wikiwords set modified = ? "
                         "where word = ?", (moddate, word))
@@ -293,8 +473,6 @@ class WikiData:
                         self.connWrap.execSql("update wikiwords set filepath = ?, "
                                 "filenamelowercase = ? where word = ?",
                                 (fileName, fileName.lower(), word))
-
-            self.cachedWikiPageLinkTermDict = None
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -304,7 +482,7 @@ class WikiData:
     def setContent(self, word, content, moddate = None, creadate = None):
         """
         Sets the content, does not modify the cache information
-        except self.cachedWikiPageLinkTermDict
+        except the page names of self.linkTermIndex and self.linkGraph
         """
         assert type(content) is str
         try:
@@ -319,6 +497,9 @@ class WikiData:
             self.connWrap.execSql("update wikiwords set filesignature = ?, "
                     "metadataprocessed = 0 where word = ?",
                     (sqlite.Binary(fileSig), word))
+
+            if self.fullTextIndexEnabled:
+                self._updateFullTextIndexEntry(word, content)
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -327,8 +508,8 @@ class WikiData:
     def _renameContent(self, oldWord, newWord):
         """
         The content which was stored under oldWord is stored
-        after the call under newWord. The self.cachedWikiPageLinkTermDict
-        dictionary is updated, other caches won't be updated.
+        after the call under newWord. The self.linkTermIndex and
+        self.linkGraph are invalidated, other caches won't be updated.
         """
         try:
             oldFilePath = self.getWikiWordFileNameRaw(oldWord)
@@ -342,10 +523,13 @@ class WikiData:
             fileName = self.createWikiWordFileName(newWord)
             newFilePath = os.path.join(head, fileName)
 
-            os.rename(longPathEnc(os.path.join(self.dataDir, oldFilePath)),
-                    longPathEnc(os.path.join(self.dataDir, newFilePath)))
+            oldFullPath = longPathEnc(os.path.join(self.dataDir, oldFilePath))
+            newFullPath = longPathEnc(os.path.join(self.dataDir, newFilePath))
+            os.rename(oldFullPath, newFullPath)
+            self.uncommittedFileRenames.append((oldFullPath, newFullPath))
 
-            self.cachedWikiPageLinkTermDict = None
+            self.linkTermIndex.invalidate()
+            self.linkGraph.invalidate()
 
             self.connWrap.execSql("update wikiwords set word = ?, filepath = ?, "
                     "filenamelowercase = ?, metadataprocessed = 0 where word = ?",
@@ -369,7 +553,8 @@ class WikiData:
 
             self.connWrap.execSql("delete from wikiwords where word = ?",
                     (word,))
-            self.cachedWikiPageLinkTermDict = None
+            self.linkTermIndex.removePage(word)
+            self.linkGraph.removePage(word)
             if fileName is not None and os.path.exists(fileName):
                 os.unlink(fileName)
         except (IOError, OSError, sqlite.Error) as e:
@@ -531,22 +716,54 @@ class WikiData:
         try:
             # commit anything pending so we can rollback on error
             self.connWrap.syncCommit()
+            self.uncommittedFileRenames = []
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
 
-            try:
-                self.connWrap.execSql("update wikirelations set word = ? where word = ?", (toWord, word))
-                self.connWrap.execSql("update wikiwordattrs set word = ? where word = ?", (toWord, word))
-                self.connWrap.execSql("update todos set word = ? where word = ?", (toWord, word))
-                self.connWrap.execSql("update wikiwordmatchterms set word = ? where word = ?", (toWord, word))
+        try:
+            self.renameWords(((word, toWord),))
+            self.commit()
+        except:
+            self.rollback()
+            raise
+
+
+    def renameWords(self, renameSeq):
+        """
+        Rename words in the order of renameSeq, a sequence of tuples
+        (word, toWord). Doesn't commit, so the renames can be part of a
+        larger transaction. The caller must call commit() or rollback()
+        afterwards, rollback() moves renamed page files back.
+        """
+        try:
+            renameParams = [(toWord, word) for word, toWord in renameSeq]
+            for table in ("wikirelations", "wikiwordattrs", "todos",
+                    "wikiwordrefs", "wikiwordmatchterms"):
+                self.connWrap.executemany("update %s set word = ? "
+                        "where word = ?" % table, renameParams)
+
+            for word, toWord in renameSeq:
                 self._renameContent(word, toWord)
-                self.connWrap.commit()
-            except:
-                self.connWrap.rollback()
-                raise
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
 
 
+    def _moveBackUncommittedFileRenames(self):
+        """
+        Undo file renames of renameWords() after a rollback.
+        """
+        fileRenames = self.uncommittedFileRenames
+        self.uncommittedFileRenames = []
+
+        for oldFullPath, newFullPath in reversed(fileRenames):
+            try:
+                os.rename(newFullPath, oldFullPath)
+            except OSError:
+                traceback.print_exc()
+
+
     def deleteWord(self, word, delContent=True):
         """
         delete everything about the wikiword passed in. an exception is raised
@@ -566,6 +783,7 @@ class WikiData:
                     self.deleteChildRelationships(word)
                     self.deleteAttributes(word)
                     self.deleteTodos(word)
+                    self.deleteReferences(word)
                     if delContent:
                         self._deleteContent(word)
                     self.deleteWikiWordMatchTerms(word, syncUpdate=False)
@@ -573,6 +791,8 @@ class WikiData:
                     self.connWrap.commit()
                 except:
                     self.connWrap.rollback()
+                    self.linkGraph.invalidate()
+                    self.linkTermIndex.invalidate()
                     raise
             except (IOError, OSError, sqlite.Error) as e:
                 traceback.print_exc()
@@ -692,6 +912,79 @@ class WikiData:
             raise DbWriteAccessError(e)
 
 
+    def getWikiPageFilesLocation(self):
+        """
+        Return tuple (directory, suffix) of the wiki page files.
+        """
+        return (self.dataDir, self.pagefileSuffix)
+
+
+    def getChangedFileSignatures(self, diskSigs, fileNames=None):
+        """
+        Compare the file signatures stored in DB with signatures of the
+        wiki page files retrieved by the caller in one pass over the
+        directory (see getWikiPageFilesLocation()).
+        Function must work for read-only wiki.
+
+        diskSigs -- dictionary {fileName: fileSig} of existing page files,
+                fileName relative to data directory
+        fileNames -- If not None, only these names of page files were
+                checked for  diskSigs , otherwise the whole directory
+
+        Returns tuple (changed, added, removed):
+            changed -- list of tuples (word, fileSig) of pages whose file
+                    differs from the stored signature
+            added -- list of names of page files not in database
+            removed -- list of words whose page file is missing
+        """
+        try:
+            if fileNames is None:
+                dbEntries = self.connWrap.execSqlQuery(
+                        "select word, filepath, filesignature from wikiwords")
+            else:
+                dbEntries = []
+                for fileName in fileNames:
+                    dbEntries += self.connWrap.execSqlQuery(
+                            "select word, filepath, filesignature from "
+                            "wikiwords where filepath = ?", (fileName,))
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+        changed = []
+        removed = []
+        dbFiles = set()
+        for word, filePath, dbFileSig in dbEntries:
+            dbFiles.add(filePath)
+            fileSig = diskSigs.get(filePath)
+            if fileSig is None:
+                removed.append(word)
+            elif fileSig != dbFileSig:
+                changed.append((word, fileSig))
+
+        added = [fn for fn in diskSigs if fn not in dbFiles]
+
+        return (changed, added, removed)
+
+
+    def refreshFileSignaturesAndMarkDirty(self, wordSigs):
+        """
+        Set file signatures and mark meta-data of the pages as dirty.
+
+        wordSigs -- sequence of tuples (word, fileSig) as returned
+                in "changed" by getChangedFileSignatures()
+        """
+        try:
+            for word, fileSig in wordSigs:
+                self.connWrap.execSql("update wikiwords set filesignature = ?, "
+                        "metadataprocessed = ? where word = ?",
+                        (sqlite.Binary(fileSig),
+                        Consts.WIKIWORDMETADATA_STATE_DIRTY, word))
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
+
+
 
 #             self.execSql("update wikiwords set filesignature = ?, "
 #                     "metadataprocessed = ? where word = ?", (fileSig, 0, word))
@@ -867,38 +1160,42 @@ class WikiData:
 
 
 
-    def getParentlessWikiWords(self):
+    def _getLinkGraph(self):
         """
-        get the words that have no parents.
+        Return the LinkGraph, build it from the database if necessary.
         Function must work for read-only wiki.
-
-        NO LONGER VALID: (((also returns nodes that have files but
-        no entries in the wikiwords table.)))
         """
-        try:
-            # Also working but slower:
-#             return self.connWrap.execSqlQuerySingleColumn(
-#                     "select word from wikiwords except "
-#                     "select wikiwordmatchterms.word "
-#                     "from wikiwordmatchterms inner join wikirelations "
-#                     "on matchterm == relation where "
-#                     "wikirelations.word != wikiwordmatchterms.word and "
-#                     "(type & 2) != 0")
-
+        if self.linkGraph.isValid():
+            return self.linkGraph
 
-            return self.connWrap.execSqlQuerySingleColumn(
-                    "select word from wikiwords except "
-                    "select wikiwordmatchterms.word from wikiwordmatchterms "
-                    "where exists (select 1 from wikirelations where "
-                    "wikiwordmatchterms.matchterm == wikirelations.relation and "
-                    "wikirelations.word != wikiwordmatchterms.word) and "
-                    "(type & 2) != 0")
+        try:
+            self.linkGraph.build(
+                    self.connWrap.execSqlQuerySingleColumn(
+                        "select word from wikiwords"),
+                    self.connWrap.execSqlQuery(
+                        "select word, relation from wikirelations "
+                        "order by rowid"),
+                    self.connWrap.execSqlQuery(
+                        "select matchterm, type, word from wikiwordmatchterms "
+                        "where (type & 2) != 0"))
+                    # Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK == 2
 
+            return self.linkGraph
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbReadAccessError(e)
 
 
+    def getParentlessWikiWords(self):
+        """
+        get the words that have no parents.
+        Function must work for read-only wiki.
+
+        NO LONGER VALID: (((also returns nodes that have files but
+        no entries in the wikiwords table.)))
+        """
+        return self._getLinkGraph().getParentlessWords()
+
 
     def getUndefinedWords(self):
         """
@@ -906,33 +1203,21 @@ class WikiData:
         directly nor as alias.
         Function must work for read-only wiki.
         """
-        try:
-#             return self.connWrap.execSqlQuerySingleColumn(
-#                     "select relation from wikirelations "
-#                     "except select word from wikiwords "
-#                     "except select value from wikiwordattrs where key='alias'")
-            return self.connWrap.execSqlQuerySingleColumn(
-                    "select relation from wikirelations "
-                    "except select word from wikiwords "
-                    "except select matchterm from wikiwordmatchterms "
-                    "where (type & 2) != 0")
-            # Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK == 2
+        return self._getLinkGraph().getUndefinedWords()
 
 
-        except (IOError, OSError, sqlite.Error) as e:
-            traceback.print_exc()
-            raise DbReadAccessError(e)
-
-
-    def _addRelationship(self, word, rel):
+    def _addRelationships(self, word, rels):
         """
-        Add a relationship from word to rel. rel is a tuple (toWord, pos).
-        A relation from one word to another is unique and can't be added twice.
+        Add relationships from word to each rel in rels. rel is a tuple
+        (toWord, pos). A relation from one word to another is unique and
+        can't be added twice.
         """
+        if not rels:
+            return
         try:
-            self.connWrap.execSql(
+            self.connWrap.executemany(
                     "insert or replace into wikirelations(word, relation, firstcharpos) "
-                    "values (?, ?, ?)", (word, rel[0], rel[1]))
+                    "values (?, ?, ?)", [(word, rel[0], rel[1]) for rel in rels])
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -940,19 +1225,21 @@ class WikiData:
     def updateChildRelations(self, word, childRelations):
         self.deleteChildRelationships(word)
         self.getExistingWikiWordInfo(word)
-        for r in childRelations:
-            self._addRelationship(word, r)
+        self._addRelationships(word, childRelations)
+
+        self.linkGraph.updateChildRelations(word,
+                [r[0] for r in childRelations])
 
     def deleteChildRelationships(self, fromWord):
         try:
             self.connWrap.execSql("delete from wikirelations where word = ?",
                     (fromWord,))
+            self.linkGraph.deleteChildRelations(fromWord)
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
 
 
-    # TODO Maybe optimize
     def getAllSubWords(self, words, level=-1):
         """
         Return all words which are children, grandchildren, etc.
@@ -960,34 +1247,10 @@ class WikiData:
         functions. All returned words are real existing words, no aliases.
         Function must work for read-only wiki.
         """
-        checkList = [(w, 0)
-                for w in (self.getWikiPageNameForLinkTerm(w) for w in words)
+        words = [w for w in (self.getWikiPageNameForLinkTerm(w) for w in words)
                 if w is not None]
-        checkList.reverse()
-        
-        resultSet = {}
-        result = []
-
-        while len(checkList) > 0:
-            toCheck, chLevel = checkList.pop()
-            if toCheck in resultSet:
-                continue
-
-            result.append(toCheck)
-            resultSet[toCheck] = None
-            
-            if level > -1 and chLevel >= level:
-                continue  # Don't go deeper
-            
-            children = self.getChildRelationships(toCheck, existingonly=True,
-                    selfreference=False)
-                    
-            children = [(self.getWikiPageNameForLinkTerm(c), chLevel + 1)
-                    for c in children]
-            children.reverse()
-            checkList += children
 
-        return result
+        return self._getLinkGraph().getAllSubWords(words, level)
 
 
     def findBestPathFromWordToWord(self, word, toWord):
@@ -996,86 +1259,13 @@ class WikiData:
         word and toWord are included as first/last element. If word == toWord,
         it is included only once as the single element of the list.
         If there is no path from word to toWord, [] is returned
-        Function must work for read-only wiki (should hold although function
-        writes to temporary table.
+        Function must work for read-only wiki.
         """
         # TODO Aliases supported?
-        
         if word == toWord:
             return [word]
-        try:
-            # Clear temporary table
-            self.connWrap.execSql("delete from temppathfindparents")
-    
-            self.connWrap.execSql("insert into temppathfindparents "+
-                    "(word, child, steps) select word, relation, 1 from wikirelations "+
-                    "where relation = ?", (word,))
 
-            step = 1
-            while True:
-                changes = self.connWrap.rowcount
-    
-                if changes == 0:
-                    # No more (grand-)parents
-                    return []
-
-                if self.connWrap.execSqlQuerySingleItem("select word from "+
-                        "temppathfindparents where word=?", (toWord,)) is not None:
-                    # Path found
-                    result = [toWord]
-                    crumb = toWord
-    
-                    while crumb != word:
-                        crumb = self.connWrap.execSqlQuerySingleItem(
-                                "select child from temppathfindparents where "+
-                                "word=?", (crumb,))
-                        result.append(crumb)
-
-                    # print "findBestPathFromWordToWord result", word, toWord, repr(result)
-    
-                    # Clear temporary table
-                    self.connWrap.execSql("delete from temppathfindparents")
-
-                    return result
-    
-                self.connWrap.execSql("""
-                    insert or ignore into temppathfindparents (word, child, steps)
-                    select wikirelations.word, temppathfindparents.word, ? from
-                        temppathfindparents inner join wikirelations on
-                        temppathfindparents.word == wikirelations.relation where
-                        temppathfindparents.steps == ?
-                    """, (step+1, step))
-    
-                step += 1
-        
-        except (IOError, OSError, sqlite.Error) as e:
-            traceback.print_exc()
-            raise DbReadAccessError(e)
-
-
-    def _findNewWordForFile(self, path):
-        wikiWord = StringOps.guessBaseNameByFilename(path, self.pagefileSuffix)
-        try:
-            if self.connWrap.execSqlQuerySingleItem(
-                    "select word from wikiwords where word = ?", (wikiWord,)):
-                for i in range(20):    # "while True" is too dangerous
-                    rand = StringOps.createRandomString(10)
-
-                    if self.connWrap.execSqlQuerySingleItem(
-                            "select word from wikiwords where word = ?",
-                            (wikiWord + "~" + rand,)):
-                        continue
-                    
-                    return wikiWord + "~" + rand
-
-                return None
-
-            else:
-                return wikiWord
-
-        except (IOError, OSError, sqlite.Error) as e:
-            traceback.print_exc()
-            raise DbWriteAccessError(e)
+        return self._getLinkGraph().findBestPath(word, toWord)
 
 
     # ---------- Listing/Searching wiki words (see also "alias handling", "searching pages")----------
@@ -1132,7 +1322,7 @@ class WikiData:
         so it must not rely on the presence of other cache
         information (e.g. relations).
 
-        The self.cachedWikiPageLinkTermDict is invalidated.
+        The self.linkTermIndex is invalidated.
         
         deleteFully -- if true, all cache information related to a no
             longer existing word is also deleted
@@ -1140,7 +1330,8 @@ class WikiData:
         diskFiles = frozenset(self._getAllWikiFileNamesFromDisk())
         dbFiles = frozenset(self._getAllWikiFileNamesFromDb())
         
-        self.cachedWikiPageLinkTermDict = None
+        self.linkTermIndex.invalidate()
+        self.linkGraph.invalidate()
         try:
             # Delete words for which no file is present anymore
             for path in self.connWrap.execSqlQuerySingleColumn(
@@ -1189,101 +1380,35 @@ class WikiData:
             raise DbWriteAccessError(e)
 
 
-    def _getCachedWikiPageLinkTermDict(self):
+    def _getLinkTermSnapshot(self):
         """
+        Return the current LinkTermSnapshot, build the LinkTermIndex from
+        the database if necessary.
         Function works for read-only wiki.
         """
-        class CachedWikiPageLinkTermDict:
-            def __init__(self, outer):
-                self.outer = outer
-                self.cache = {}
-                self.cacheNonExistent = set()
-                self.cacheComplete = False
-                self.resolveCaseNormed = self.outer.resolveCaseNormed
-                    
-
-            def get(self, key, default=None):
-                if self.cacheComplete:
-                    return self.cache.get(key, default)
-
-                if key in self.cache:
-                    return self.cache.get(key, default)
-                    
-                if key in self.cacheNonExistent:
-                    return default
-                
-                value = self._lookup(key)
-                
-                if value is None and self.resolveCaseNormed:
-                    value = self._lookupCaseNormed(key)
-                
-                if value is not None:
-                    self.cache[key] = value
-                    return value
-
-                self.cacheNonExistent.add(key)
-                return default
-
-
-            def _lookup(self, key):
-                if self.outer.isDefinedWikiPageName(key):
-                    return key
-                
-                try:
-                    return self.outer.connWrap.execSqlQuerySingleItem(
-                            "select word from wikiwordmatchterms "
-                            "where matchterm = ? and (type & 2) != 0 ", (key,))
-                    # Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK == 2
-                except (IOError, OSError, sqlite.Error) as e:
-                    traceback.print_exc()
-                    raise DbReadAccessError(e)
-                
-            def _lookupCaseNormed(self, key):
-                try:
-                    return self.outer.connWrap.execSqlQuerySingleItem(
-                            "select word from wikiwordmatchterms "
-                            "where matchtermnormcase = utf8Normcase(?) "
-                            "and (type & 2) != 0 ", (key,))
-                    # Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK == 2
-                except (IOError, OSError, sqlite.Error) as e:
-                    traceback.print_exc()
-                    raise DbReadAccessError(e)
-
-
-            def keys(self):
-                # This function is not affected by self.resolveCaseNormed
-                # because in theory it would have to return all possible
-                # lowercase-uppercase-combinations of a word to be
-                # accurate
-                if not self.cacheComplete:
-                    cacheDict = dict(self.outer.connWrap.execSqlQuery(
-                            "select word, word from wikiwords union "
-                            "select matchterm, word from wikiwordmatchterms "
-                            "where (type & 2) != 0 and not matchterm in "
-                            "(select word from wikiwords)"))
-                    # Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK == 2
-
-                    if not self.resolveCaseNormed:
-                        # Cache can't be complete with case normed resolving
-                        # because above
-                        self.cacheComplete = True
-                        self.cache = cacheDict
-
-                else:
-                    cacheDict = self.cache
-
-                return list(cacheDict)
+        snapshot = self.linkTermIndex.getSnapshot()
+        if snapshot is not None:
+            return snapshot
 
         try:
-            if self.cachedWikiPageLinkTermDict is None:
-                self.cachedWikiPageLinkTermDict = CachedWikiPageLinkTermDict(self)
-
-            return self.cachedWikiPageLinkTermDict
+            return self.linkTermIndex.build(self.connWrap.execSqlQueryIter(
+                    "select word, word, -1 from wikiwords union all "
+                    "select word, matchterm, type from wikiwordmatchterms "
+                    "where (type & 2) != 0"))
+                    # Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK == 2
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbReadAccessError(e)
 
 
+    def getLinkTermIndex(self):
+        """
+        Return the LinkTermIndex. Its snapshot may be read by any thread
+        without going through the WikiDataSynchronizedProxy.
+        """
+        return self.linkTermIndex
+
+
 #     def _getCachedWikiPageLinkTermDict(self):
 #         """
 #         Function works for read-only wiki.
@@ -1486,7 +1611,7 @@ class WikiData:
         Return all links stored by production (in contrast to resolution)
         Function must work for read-only wiki.
         """
-        return list(self._getCachedWikiPageLinkTermDict().keys())
+        return self._getLinkTermSnapshot().keys()
 
 
     def getWikiPageLinkTermsStartingWith(self, thisStr, caseNormed=None):
@@ -1638,6 +1763,46 @@ class WikiData:
             raise DbReadAccessError(e)
 
 
+    def getWikiPageCountsWithin(self, stampType, startTime, bucketLength,
+            bucketCount):
+        """
+        Count wiki words per time span with one query. Returns a list of
+        bucketCount numbers, the i-th number counts the words with a time
+        value related to a particular time in the span from
+        startTime + i * bucketLength (inclusive) to
+        startTime + (i + 1) * bucketLength (exclusive).
+        Function must work for read-only wiki.
+
+        stampType -- 0: Modification time, 1: Creation, 2: Last visit
+        """
+        counts = [0] * bucketCount
+        field = self._STAMP_TYPE_TO_FIELD.get(stampType)
+        if field is None:
+            # Visited not supported yet
+            return counts
+
+        startTime = float(startTime)
+        bucketLength = float(bucketLength)
+
+        try:
+            result = self.connWrap.execSqlQuery(
+                    ("select cast((%s - ?) / ? as integer), count(*) "
+                    "from wikiwords where %s >= ? and %s < ? group by 1") %
+                    (field, field, field), (startTime, bucketLength,
+                    startTime, startTime + bucketLength * bucketCount))
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+        for bucket, count in result:
+            # Rounding may put a value at the end into the bucket after
+            if bucket >= bucketCount:
+                bucket = bucketCount - 1
+            counts[bucket] += count
+
+        return counts
+
+
     def getFirstWikiPageName(self):
         """
         Returns the name of the "first" wiki word. See getNextWikiPageName()
@@ -1804,11 +1969,18 @@ class WikiData:
             raise DbReadAccessError(e)
 
             
-    def _setAttribute(self, word, key, value):
+    def _setAttributes(self, word, attrs):
+        """
+        attrs -- dictionary {key: sequence of values}
+        """
+        if not attrs:
+            return
         try:
-            self.connWrap.execSql(
+            self.connWrap.executemany(
                     "insert into wikiwordattrs(word, key, value) "
-                    "values (?, ?, ?)", (word, key, value))
+                    "values (?, ?, ?)",
+                    [(word, k, v) for k, values in attrs.items()
+                    for v in values])
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -1817,12 +1989,7 @@ class WikiData:
     def updateAttributes(self, word, attrs):
         self.deleteAttributes(word)
         self.getExistingWikiWordInfo(word)
-        for k in list(attrs.keys()):
-            values = attrs[k]
-            for v in values:
-                self._setAttribute(word, k, v)
-#                 if k == "alias":
-#                     self.setAsAlias(v)
+        self._setAttributes(word, attrs)
 
         self.cachedGlobalAttrs = None   # reset global attributes cache
 
@@ -1883,8 +2050,7 @@ class WikiData:
             return  # Nothing to change
 
         self.resolveCaseNormed = cn
-        # Clear cache which must be rebuilt differently depending on the setting
-        self.cachedWikiPageLinkTermDict = None
+        self.linkTermIndex.setResolveCaseNormed(cn)
 
 
     def getWikiPageNameForLinkTerm(self, alias):
@@ -1895,7 +2061,7 @@ class WikiData:
         of unaliasing must be performed in WikiDocument.
         Function must work for read-only wiki.
         """
-        return self._getCachedWikiPageLinkTermDict().get(alias, None)
+        return self._getLinkTermSnapshot().getWikiPageNameForLinkTerm(alias)
 
 
     # TODO: 2.4: Remove compatibility definitions
@@ -1952,14 +2118,15 @@ class WikiData:
     def updateTodos(self, word, todos):
         self.deleteTodos(word)
         self.getExistingWikiWordInfo(word)
-        for t in todos:
-            self._addTodo(word, t)
+        self._addTodos(word, todos)
 
 
-    def _addTodo(self, word, todo):
+    def _addTodos(self, word, todos):
+        if not todos:
+            return
         try:
-            self.connWrap.execSql("insert into todos(word, key, value) values (?, ?, ?)",
-                    (word, todo[0], todo[1]))
+            self.connWrap.executemany("insert into todos(word, key, value) values (?, ?, ?)",
+                    [(word, todo[0], todo[1]) for todo in todos])
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -1973,6 +2140,67 @@ class WikiData:
             raise DbWriteAccessError(e)
 
 
+    # ---------- Reference cache handling ----------
+
+    # Maximum number of targets per query in getReferringWikiPageNames(),
+    # stays below the default variable limit of SQLite
+    REFERENCE_QUERY_CHUNK_SIZE = 500
+
+    def updateReferences(self, word, targets):
+        """
+        Replace the references from page word to other pages.
+
+        targets -- sequence of page names the links, "page" insertions and
+                attributes with wiki word values of word point to
+        """
+        self.deleteReferences(word)
+        self.getExistingWikiWordInfo(word)
+        self._addReferences(word, targets)
+
+
+    def _addReferences(self, word, targets):
+        if not targets:
+            return
+        try:
+            self.connWrap.executemany("insert into wikiwordrefs(word, target) "
+                    "values (?, ?)", [(word, target) for target in targets])
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
+
+
+    def deleteReferences(self, word):
+        try:
+            self.connWrap.execSql("delete from wikiwordrefs where word = ?",
+                    (word,))
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
+
+
+    def getReferringWikiPageNames(self, targets):
+        """
+        Return set of names of pages with references to any of the page
+        names in targets. Pages whose meta-data isn't processed yet may be
+        missing.
+        Function must work for read-only wiki.
+        """
+        targets = list(targets)
+        result = set()
+        try:
+            for i in range(0, len(targets), self.REFERENCE_QUERY_CHUNK_SIZE):
+                chunk = targets[i:i + self.REFERENCE_QUERY_CHUNK_SIZE]
+                result.update(self.connWrap.execSqlQuerySingleColumn(
+                        "select distinct word from wikiwordrefs "
+                        "where target in (%s)" % ", ".join(["?"] * len(chunk)),
+                        chunk))
+
+            return result
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+
     # ---------- Wikiword matchterm cache handling ----------
 
     def getWikiWordMatchTermsWith(self, thisStr, orderBy=None, descend=False):
@@ -2033,28 +2261,43 @@ class WikiData:
 
 
     def updateWikiWordMatchTerms(self, word, wwmTerms, syncUpdate=False):
-        self.deleteWikiWordMatchTerms(word, syncUpdate=syncUpdate)
+        self._deleteWikiWordMatchTermsFromDb(word, syncUpdate)
         self.getExistingWikiWordInfo(word)
-        for t in wwmTerms:
-            assert t[2] == word
-            self._addWikiWordMatchTerm(t)
+        self._addWikiWordMatchTerms(word, wwmTerms)
+
+        self.linkGraph.updateMatchTerms(word, wwmTerms, syncUpdate)
+        self.linkTermIndex.updateMatchTerms(word, wwmTerms, syncUpdate)
 
 
-    def _addWikiWordMatchTerm(self, wwmTerm):
-        matchterm, typ, word, firstcharpos, charlength = wwmTerm
+    def _addWikiWordMatchTerms(self, word, wwmTerms):
+        """
+        wwmTerms -- sequence of tuples (matchterm, type, word, firstcharpos,
+                charlength), word must be the same for all
+        """
+        if not wwmTerms:
+            return
+        params = []
+        for matchterm, typ, termWord, firstcharpos, charlength in wwmTerms:
+            assert termWord == word
+            params.append((matchterm, typ, word, firstcharpos, charlength,
+                    matchterm.lower()))
         try:
             # TODO Check for name collisions
-            self.connWrap.execSql("insert into wikiwordmatchterms(matchterm, "
+            self.connWrap.executemany("insert into wikiwordmatchterms(matchterm, "
                     "type, word, firstcharpos, charlength, matchtermnormcase) "
-                    "values (?, ?, ?, ?, ?, ?)",
-                    (matchterm, typ, word, firstcharpos, charlength,
-                    matchterm.lower()))
+                    "values (?, ?, ?, ?, ?, ?)", params)
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
 
 
     def deleteWikiWordMatchTerms(self, word, syncUpdate=False):
+        self._deleteWikiWordMatchTermsFromDb(word, syncUpdate)
+        self.linkGraph.deleteMatchTerms(word, syncUpdate)
+        self.linkTermIndex.deleteMatchTerms(word, syncUpdate)
+
+
+    def _deleteWikiWordMatchTermsFromDb(self, word, syncUpdate):
         if syncUpdate:
             addSql = " and (type & 16) != 0"
         else:
@@ -2064,7 +2307,6 @@ class WikiData:
         try:
             self.connWrap.execSql("delete from wikiwordmatchterms where "
                     "word = ?" + addSql, (word,))
-            self.cachedWikiPageLinkTermDict = None
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -2326,7 +2568,7 @@ class WikiData:
 
     # ---------- Searching pages ----------
 
-    def search(self, sarOp, exclusionSet):  # TODO Threadholder for all
+    def search(self, sarOp, exclusionSet):
         """
         Search all content using the SearchAndReplaceOperation sarOp and
         return set of all page names that match the search criteria.
@@ -2337,36 +2579,208 @@ class WikiData:
         exclusionSet -- set of wiki words for which their pages shouldn't be
         searched here and which must not be part of the result set
         """
-        result = set()
+        return set(self.iterSearch(sarOp, exclusionSet))
 
-        if sarOp.isTextNeededForTest():
-            for word in self.getAllDefinedWikiPageNames():
-                if word in exclusionSet:
-                    continue
-                try:
-                    fileContents = self.getContent(word)
-                except WikiFileNotFoundException:
-                    # some error in cache (should not happen)
-                    continue
-    
-                if sarOp.testWikiPage(word, fileContents) == True:
-                    result.add(word)
-        else:
-            for word in self.getAllDefinedWikiPageNames():
-                if word in exclusionSet:
-                    continue
 
-                if sarOp.testWikiPage(word, None) == True:
-                    result.add(word)
+    def iterSearch(self, sarOp, exclusionSet, threadstop=DUMBTHREADSTOP):
+        """
+        Same as search() but returns an iterator which yields matching page
+        names as they are found. The page files are read ahead by a pool of
+        threads and tested in the calling thread in the order the reads
+        complete.
+
+        The database is only accessed during the call itself, so the
+        iterator can be consumed outside of the lock of a
+        WikiDataSynchronizedProxy.
+
+        threadstop -- Tested before each page, so a search can be canceled
+        """
+        try:
+            entries = [(word, filePath) for word, filePath in
+                    self.connWrap.execSqlQuery(
+                    "select word, filepath from wikiwords")
+                    if word not in exclusionSet]
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+        if not sarOp.isTextNeededForTest():
+            return self._iterSearchWithoutText(sarOp, entries, threadstop)
+
+        workerCount = max(1, GetApp().getGlobalConfig().getint("main",
+                "search_fileReadWorkerCount", 4))
+
+        return self._iterSearchPageFiles(sarOp, entries, workerCount,
+                threadstop)
+
+
+    @staticmethod
+    def _iterSearchWithoutText(sarOp, entries, threadstop):
+        for word, filePath in entries:
+            threadstop.testValidThread()
+            if sarOp.testWikiPage(word, None) == True:
+                yield word
+
+
+    def _readPageFileForSearch(self, word, filePath):
+        """
+        Called in a thread of the search pool. Returns tuple (word, content)
+        with content None if file can't be read.
+        """
+        try:
+            content = StringOps.loadEntireTxtFile(
+                    longPathEnc(join(self.dataDir, filePath)))
+            return (word, fileContentToUnicode(content))
+        except (IOError, OSError):
+            # some error in cache (should not happen)
+            return (word, None)
+
+
+    def _iterSearchPageFiles(self, sarOp, entries, workerCount, threadstop):
+        # Bound the number of files read ahead (and held in memory)
+        maxPending = workerCount * 4
+        entryIter = iter(entries)
+        pending = set()
+
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=workerCount)
+        try:
+            while True:
+                while len(pending) < maxPending:
+                    entry = next(entryIter, None)
+                    if entry is None:
+                        break
+                    pending.add(pool.submit(self._readPageFileForSearch,
+                            *entry))
+
+                if len(pending) == 0:
+                    return
+
+                done, pending = concurrent.futures.wait(pending,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in done:
+                    threadstop.testValidThread()
+                    word, content = future.result()
+                    if content is None:
+                        continue
+
+                    if sarOp.testWikiPage(word, content) == True:
+                        yield word
+        finally:
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+
+    # ---------- Full text index ----------
+    # Only available if checkCapability("fulltext index") returns a version
+
+    def isFullTextIndexEnabled(self):
+        """
+        Returns True if the full text index exists in the database.
+        """
+        try:
+            return DbStructure.hasFullTextIndex(self.connWrap)
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
+
+
+    def setFullTextIndexEnabled(self, flag):
+        """
+        Create and fill or drop the full text index. The index is complete
+        after the call, filling it reads all page files.
+        """
+        try:
+            self.connWrap.syncCommit()
+            try:
+                if flag:
+                    DbStructure.createFullTextIndex(self.connWrap)
+                    self._fillFullTextIndex()
+                else:
+                    DbStructure.dropFullTextIndex(self.connWrap)
+                self.connWrap.commit()
+            except:
+                self.connWrap.rollback()
+                raise
+
+            self.fullTextIndexEnabled = flag
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
+
+
+    def _fillFullTextIndex(self):
+        self.connWrap.execSql("delete from wikiwords_fts")
+        for word in self.getAllDefinedWikiPageNames():
+            self._updateFullTextIndexEntry(word)
+
+
+    def _updateFullTextIndexEntry(self, word, content=None):
+        """
+        Write index entry of  word . If content is None, it is read from
+        the page file.
+        """
+        if content is None:
+            try:
+                content = self.getContent(word)
+            except WikiFileNotFoundException:
+                self.connWrap.execSql("delete from wikiwords_fts where rowid = "
+                        "(select rowid from wikiwords where word = ?)", (word,))
+                return
+
+        self.connWrap.execSql("insert or replace into wikiwords_fts"
+                "(rowid, content) select rowid, ? from wikiwords "
+                "where word = ?", (content, word))
+
+
+    def updateFullTextIndex(self, word):
+        """
+        Update index entry for page  word  from its file, e.g. after the
+        file was modified outside of WikidPad.
+        """
+        if not self.fullTextIndexEnabled:
+            return
+
+        try:
+            self._updateFullTextIndexEntry(word)
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
+
+
+    def rebuildFullTextIndex(self):
+        """
+        Refill the full text index from the files of all pages.
+        """
+        try:
+            self._fillFullTextIndex()
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbWriteAccessError(e)
+
+
+    def searchFullTextIndex(self, ftsQuery):
+        """
+        Return list of names of all pages matching the FTS5 query string
+        ftsQuery.
+        """
+        try:
+            return self.connWrap.execSqlQuerySingleColumn(
+                    "select word from wikiwords where rowid in "
+                    "(select rowid from wikiwords_fts "
+                    "where wikiwords_fts match ?)", (ftsQuery,))
+        except (IOError, OSError, sqlite.Error) as e:
+            traceback.print_exc()
+            raise DbReadAccessError(e)
 
-        return result
-        
 
     # ---------- Miscellaneous ----------
 
     _CAPABILITIES = {
         "rebuild": 1,
         "compactify": 1,     # = sqlite vacuum
+        "reference index": 1,   # getReferringWikiPageNames()
         "filePerPage": 1,   # Uses a single file per page
 #         "versioning": 1,     # (old versioning)
 #         "plain text import":1   # Is already plain text      
@@ -2380,6 +2794,10 @@ class WikiData:
         a version number or None if not supported
         Function must work for read-only wiki.
         """
+        if capkey == "fulltext index":
+            # SQLite FTS5 table instead of Whoosh index
+            return 1 if self.fullTextIndexAvailable else None
+
         return WikiData._CAPABILITIES.get(capkey, None)
 
 
@@ -2405,7 +2823,8 @@ class WikiData:
         try:
             self.connWrap.syncCommit()
 
-            self.cachedWikiPageLinkTermDict = None
+            self.linkTermIndex.invalidate()
+            self.linkGraph.invalidate()
             self.cachedGlobalAttrs = None
 
             self.fullyResetMetaDataState()
@@ -2475,6 +2894,7 @@ class WikiData:
         Function must work for read-only wiki.
         """
         try:
+            self._closeReadConnections()
             self.connWrap.syncCommit()
             self.connWrap.close()
     
@@ -2497,6 +2917,8 @@ class WikiData:
         progresshandler -- Object, fulfilling the GuiProgressHandler
             protocol
         """
+        self.linkGraph.invalidate()
+        self.linkTermIndex.invalidate()
         try:
             self.connWrap.execSql("update wikiwordmatchterms "
                     "set matchtermnormcase=utf8Normcase(matchterm)")
@@ -2556,6 +2978,7 @@ class WikiData:
         """
         try:
             self.connWrap.commit()
+            self.uncommittedFileRenames = []
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -2567,6 +2990,9 @@ class WikiData:
         """
         try:
             self.connWrap.rollback()
+            self._moveBackUncommittedFileRenames()
+            self.linkGraph.invalidate()
+            self.linkTermIndex.invalidate()
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -2582,6 +3008,11 @@ class WikiData:
         try:
             self.connWrap.syncCommit()
             self.connWrap.execSql("vacuum")
+
+            # Vacuum may have changed the rowids the index refers to
+            if self.fullTextIndexEnabled:
+                self._fillFullTextIndex()
+                self.connWrap.commit()
         except (IOError, OSError, sqlite.Error) as e:
             traceback.print_exc()
             raise DbWriteAccessError(e)
@@ -0,0 +1,171 @@
+# coding: utf-8
+"""Measure memory of the HTML export of a large page.
+
+Generates a page with the given size, parses it and compares the peak
+memory allocated while the HTML is built as one string (as
+exportWikiPageToHtmlString() does) and while it is streamed to a file
+(as the export to files does). The page AST is created before the
+measurement, it is needed in both cases.
+
+Run it from the main WikidPad directory (it is not collected by pytest):
+
+    ..\\WikidPad> python tests\\benchmark_HtmlExport.py --size 50
+
+"""
+import argparse
+import builtins
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+builtins._ = builtins.N_ = lambda s: s  # see WikidPadStarter
+
+from pwiki import AppContext
+from pwiki.HeadlessApp import HeadlessApp
+
+AppContext.setHeadlessApp(HeadlessApp(wikidpad_dir, tempfile.mkdtemp()))
+
+from pwiki import Configuration
+from pwiki import HtmlExportEngine, WorkerSnapshot
+
+
+PARSER_MODULE_FILE = os.path.join(wikidpad_dir, "extensions", "wikidPadParser",
+        "WikidPadParser.py")
+EXPORTER_MODULE_FILE = os.path.join(wikidpad_dir, "extensions",
+        "HtmlExporter.py")
+
+FORMAT_KEY = (True, "off", False)
+
+BLOCKS = [
+    "+ Heading {n}\n\n",
+    "* item {n} with [BenchLink]\n* another item\n\n",
+    "Some *bold* and _italic_ text in paragraph {n}.\n\n",
+    "<<pre\npreformatted {n}\n>>\n\n",
+    "|| a | b |\n| {n} | [BenchPage] |\n\n",
+    ]
+
+
+def generate_page(size, seed=1):
+    """Return page text with roughly size characters."""
+    rnd = random.Random(seed)
+    parts = []
+    length = 0
+    n = 0
+    while length < size:
+        block = rnd.choice(BLOCKS).format(n=n)
+        parts.append(block)
+        length += len(block)
+        n += 1
+
+    return "".join(parts)
+
+
+def init_worker(exportDest):
+    settings = dict(Configuration.GLOBALDEFAULTS)
+    settings.update(Configuration.WIKIDEFAULTS)
+
+    snapshot = {
+            "config": dict(Configuration.WIKIDEFAULTS),
+            "ccWordBlacklist": set(),
+            "nccWordBlacklist": set(),
+            "linkTerms": ["BenchPage", "BenchLink"],
+            "headingsAsAliasesDepth": 0,
+            "globalConfig": settings,
+            "collation": ("C", 0),
+            "wikiName": "BenchPage",
+            "wikiAppDir": wikidpad_dir,
+            "wikiConfigPath": os.path.join(exportDest, "Bench.wiki"),
+            "dataDir": os.path.join(exportDest, "data"),
+            "storagePath": os.path.join(exportDest, "files"),
+            "globalAttrs": {},
+            "pageNameByLinkTerm": {"BenchPage": "BenchPage",
+                "BenchLink": "BenchLink"},
+            "resolveCaseNormed": False,
+            "exportAttrs": {},
+            "shortHints": {},
+            "imageDimsCachePath": os.path.join(exportDest,
+                "imagedimscache.sqlite"),
+            "exporterModuleName": "HtmlExporter",
+            "exporterModuleFile": EXPORTER_MODULE_FILE,
+            "exporterClassName": "HtmlExporter",
+            "jobData": {
+                "wordList": ["BenchPage", "BenchLink"],
+                "exportType": "html_single",
+                "exportDest": exportDest,
+                "compatFilenames": False,
+                "addOpt": (0, 0, "Table of Contents", "volatile", 1),
+                "usedFilenames": {"BenchPage": "BenchPage",
+                    "BenchLink": "BenchLink"},
+                "styleSheetList": [],
+                "avoidDeadWikiLinks": True
+            }
+        }
+
+    WorkerSnapshot.initWorker("pwiki.HtmlExportEngine", "_ExportWorkerState",
+            "wikidPadParser.WikidPadParser", PARSER_MODULE_FILE,
+            "wikidpad_default_2_0", snapshot)
+
+    return WorkerSnapshot.getWorkerState()
+
+
+def measure(label, fct):
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    fct()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] - base
+    print("%-10s peak %8.1f MB  %7.2f s" % (label, peak / 1e6, elapsed))
+
+
+def main():
+    argParser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    argParser.add_argument("--size", type=float, default=50,
+            help="size of the page in MB")
+    args = argParser.parse_args()
+
+    text = generate_page(int(args.size * 1e6))
+    print("Page size: %.1f MB" % (len(text) / 1e6))
+
+    exportDest = tempfile.mkdtemp(prefix="wpbench_")
+    workerState = init_worker(exportDest)
+    exporter = workerState.exporter
+
+    wikiPage = HtmlExportEngine._ExportSnapshotWikiPage(
+            workerState.wikiDocument, "BenchPage", text, FORMAT_KEY, {}, [])
+    workerState.wikiDocument.pages["BenchPage"] = wikiPage
+
+    start = time.perf_counter()
+    wikiPage.getLivePageAst()
+    print("Parsing %.2f s" % (time.perf_counter() - start))
+
+    outputFile = os.path.join(exportDest, "BenchPage.html")
+
+    def asString():
+        html = exporter.exportWikiPageToHtmlString(wikiPage)
+        with open(outputFile, "w", encoding="utf-8") as fp:
+            fp.write(html)
+
+    def streamed():
+        with open(outputFile, "w", encoding="utf-8") as fp:
+            exporter.writeWikiPageAsHtml(fp, wikiPage)
+
+    tracemalloc.start()
+    try:
+        measure("string", asString)
+        measure("streamed", streamed)
+    finally:
+        tracemalloc.stop()
+        os.unlink(outputFile)
+
+
+if __name__ == "__main__":
+    main()
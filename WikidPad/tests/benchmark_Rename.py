@@ -0,0 +1,176 @@
+# coding: utf-8
+"""Measure renaming many pages with WikiDocument.renameWikiWords().
+
+Copies the WikidPadHelp wiki (original_sqlite), adds generated pages
+(by default 20000) and rebuilds it. A folder page with subpages (by default
+500) is renamed at once, references to the subpages are spread over the
+other pages. Then some subpages (by default 50) are renamed back one by
+one, each with its own call of renameWikiWords() which updates the
+referencing pages.
+
+Run it from the main WikidPad directory (it is not collected by pytest):
+
+    ..\\WikidPad> python tests\\benchmark_Rename.py --pages 20000 --renames 500
+
+"""
+import argparse
+import builtins
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+builtins._ = builtins.N_ = lambda s: s  # see WikidPadStarter
+
+from pwiki import AppContext
+from pwiki.HeadlessApp import HeadlessApp, StreamProgressHandler
+
+AppContext.setHeadlessApp(HeadlessApp(wikidpad_dir, tempfile.mkdtemp()))
+
+from Consts import ModifyText
+from pwiki.BatchAction import _openWiki
+
+
+HELP_WIKI_DIR = os.path.join(wikidpad_dir, "WikidPadHelp")
+
+FOLDER = "BenchFolder"
+
+WORDS = ["wiki", "page", "link", "index", "search", "quick", "brown",
+        "alpha", "omega"]
+
+
+def generate_pages(count, renames, words_per_page, refs_per_page, seed=1):
+    """Yield (name, content) tuples. Every tenth page refers to subpages
+    of FOLDER."""
+    rnd = random.Random(seed)
+    yield FOLDER, "Folder with %i subpages\n" % renames
+    for i in range(renames):
+        yield "%s/Sub%04i" % (FOLDER, i), "[..] [../Sub%04i]\n" % (
+                (i + 1) % renames)
+
+    for i in range(count - renames - 1):
+        words = [rnd.choice(WORDS) for j in range(words_per_page)]
+        if i % 10 == 0:
+            words += ["[%s/Sub%04i]" % (FOLDER, rnd.randrange(renames))
+                    for j in range(refs_per_page)]
+        lines = [" ".join(words[j:j + 12])
+                for j in range(0, len(words), 12)]
+        yield "BenchPage%06i" % i, "\n".join(lines)
+
+
+def create_wiki(destDir):
+    shutil.copytree(HELP_WIKI_DIR, destDir)
+    return os.path.join(destDir, "WikidPadHelp.wiki")
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def wait_for_update(wikiDocument, timeout=600):
+    """
+    Wait until the update executor processed all queued meta-data updates.
+    """
+    updateExecutor = wikiDocument.getUpdateExecutor()
+    end = time.time() + timeout
+    while updateExecutor.getJobCount() > 0 and time.time() < end:
+        time.sleep(0.1)
+
+
+def rename_single(wikiDocument, renameSeq):
+    """
+    Rename pages one by one, each in its own transaction followed by the
+    update of the pages referring to it.
+    """
+    for word, toWord in renameSeq:
+        wikiDocument.renameWikiWords({word: toWord}, ModifyText.advanced)
+
+
+def bench_wiki(wikiPath, pages, singleCount):
+    """
+    Print the measured times.
+    """
+    app = AppContext.GetApp()
+    mainControl = _openWiki(app, wikiPath, True)
+    wikiDocument = mainControl.getWikiDocument()
+    try:
+        # The update executor may run already, so use the synchronized proxy
+        wikiData = wikiDocument.getWikiData()
+        for name, content in pages:
+            wikiData.setContent(name, content)
+        wikiData.commit()
+
+        duration, dummy = timed(wikiDocument.rebuildWiki,
+                StreamProgressHandler("rebuild", stream=io.StringIO()), False)
+        report("rebuild", duration)
+        wait_for_update(wikiDocument)
+
+        renameSeq = wikiDocument.buildRenameSeqWithSubpages(FOLDER,
+                FOLDER + "Renamed")
+
+        duration, dummy = timed(wikiDocument.renameWikiWords,
+                dict(renameSeq), ModifyText.advanced)
+        report("renameWikiWords, %i pages" % len(renameSeq), duration,
+                len(renameSeq))
+        wait_for_update(wikiDocument)
+
+        # Back to old names, except for the folder page
+        backSeq = [(toWord, word) for word, toWord in
+                renameSeq[1:singleCount + 1]]
+        duration, dummy = timed(rename_single, wikiDocument, backSeq)
+        report("renameWikiWords per page, %i" % len(backSeq), duration,
+                len(backSeq))
+    finally:
+        wikiDocument.release()
+        app.processPendingCalls()
+
+
+def report(label, duration, count=None):
+    line = "  %-36s%11.1f ms" % (label, duration * 1000)
+    if count:
+        line += "%9.1f ms/page" % (duration * 1000 / count)
+    print(line)
+    sys.stdout.flush()
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    argparser.add_argument("--pages", type=int, default=20000,
+            help="number of generated pages added to the help wiki")
+    argparser.add_argument("--renames", type=int, default=500,
+            help="number of renamed pages")
+    argparser.add_argument("--single", type=int, default=50,
+            help="number of pages renamed back one by one")
+    argparser.add_argument("--words", type=int, default=100,
+            help="words per page")
+    argparser.add_argument("--refs", type=int, default=5,
+            help="references to renamed pages per referencing page")
+    args = argparser.parse_args()
+
+    tempDir = tempfile.mkdtemp(prefix="wikidpad-bench-")
+    try:
+        pages = list(generate_pages(args.pages, args.renames, args.words,
+                args.refs))
+        wikiPath = create_wiki(os.path.join(tempDir, "wiki"))
+        print("%i generated pages" % args.pages)
+        bench_wiki(wikiPath, pages, args.single)
+    finally:
+        shutil.rmtree(tempDir, ignore_errors=True)
+
+    # Background threads of the wiki document may still be running
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+# coding: utf-8
+"""Compare the whoosh search index with the SQLite FTS5 full text index.
+
+Generates a compact_sqlite wiki database with random pages and measures
+indexing throughput and query latency of both index backends.
+
+Run it from the main WikidPad directory (it is not collected by pytest):
+
+    ..\\WikidPad> python tests\\benchmark_SearchIndex.py --pages 50000
+
+"""
+import argparse
+import builtins
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+builtins._ = builtins.N_ = lambda s: s  # see WikidPadStarter
+
+import whoosh.index
+from whoosh.qparser import QueryParser
+
+import pwiki.sqlite3api as sqlite
+from pwiki.wikidata.compact_sqlite import DbStructure
+from pwiki.WikiDocument import WikiDocument
+from pwiki.SearchAndReplace import whooshQueryToFts5
+
+
+QUERIES = [
+    "wiki",                     # frequent term
+    "zyxhabit",                 # rare term
+    "page link",                # AND
+    "alpha OR omega",           # OR
+    '"quick brown"',            # phrase
+    "lin*",                     # prefix
+    "index NOT search",         # negation
+    ]
+
+
+def build_vocabulary(rnd, size):
+    words = ["wiki", "page", "link", "index", "search", "quick", "brown",
+            "alpha", "omega", "zyxhabit", "linker", "lineup"]
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    while len(words) < size:
+        words.append("".join(rnd.choice(letters)
+                for i in range(rnd.randint(3, 10))))
+    return words
+
+
+def generate_pages(count, words_per_page, seed=1):
+    """Yield (name, content) tuples. Word frequencies follow roughly
+    Zipf's law, "zyxhabit" is rare."""
+    rnd = random.Random(seed)
+    vocabulary = build_vocabulary(rnd, 20000)
+    weights = [1.0 / (i + 1) for i in range(len(vocabulary))]
+    weights[vocabulary.index("zyxhabit")] = 0.00001
+
+    for i in range(count):
+        words = rnd.choices(vocabulary, weights, k=words_per_page)
+        lines = [" ".join(words[j:j + 12])
+                for j in range(0, len(words), 12)]
+        yield "BenchPage%06i" % i, "\n".join(lines)
+
+
+def open_database(dataDir):
+    DbStructure.createWikiDB(None, dataDir)
+    connwrap = DbStructure.ConnectWrapSyncCommit(
+            sqlite.connect(os.path.join(dataDir, "wiki.sli")))
+    DbStructure.registerSqliteFunctions(connwrap)
+    DbStructure.registerUtf8Support(connwrap)
+    return connwrap
+
+
+def store_pages(connwrap, pages):
+    ti = time.time()
+    for name, content in pages:
+        connwrap.execSql("insert into wikiwordcontent(word, content, "
+                "modified, created) values (?, ?, ?, ?)",
+                (name, sqlite.Binary(content.encode("utf-8")), ti, ti))
+    connwrap.commit()
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def median_latency(function, arg, repeat):
+    times = []
+    for i in range(repeat):
+        duration, result = timed(function, arg)
+        times.append(duration)
+    times.sort()
+    return times[len(times) // 2], result
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    argparser.add_argument("--pages", type=int, default=50000)
+    argparser.add_argument("--words", type=int, default=200,
+            help="words per page")
+    argparser.add_argument("--repeat", type=int, default=5,
+            help="repetitions of each query")
+    args = argparser.parse_args()
+
+    tempDir = tempfile.mkdtemp(prefix="wikidpad-bench-")
+    try:
+        print("Generating %i pages with %i words each" % (args.pages,
+                args.words))
+        pages = list(generate_pages(args.pages, args.words))
+        mbytes = sum(len(c) for n, c in pages) / (1024.0 * 1024.0)
+
+        # --- FTS5: pages written with active triggers (incremental)
+        ftsDir = os.path.join(tempDir, "fts")
+        connwrap = open_database(ftsDir)
+        if not DbStructure.isFullTextIndexAvailable(connwrap):
+            print("SQLite library doesn't support FTS5")
+            return 1
+
+        DbStructure.createFullTextIndex(connwrap)
+        connwrap.commit()
+        ftsIncremental, dummy = timed(store_pages, connwrap, pages)
+
+        # --- FTS5: bulk rebuild from existing content
+        def rebuild():
+            DbStructure.rebuildFullTextIndex(connwrap)
+            connwrap.commit()
+
+        ftsBulk, dummy = timed(rebuild)
+
+        # --- whoosh
+        whooshDir = os.path.join(tempDir, "whoosh")
+        os.mkdir(whooshDir)
+        schema = WikiDocument.getWhooshIndexSchema()
+        index = whoosh.index.create_in(whooshDir, schema)
+
+        def whoosh_index():
+            writer = index.writer()
+            for name, content in pages:
+                writer.add_document(unifName="wikipage/" + name,
+                        modTimestamp=0, content=content)
+            writer.commit()
+
+        whooshTime, dummy = timed(whoosh_index)
+
+        print()
+        print("Indexing %.1f MB" % mbytes)
+        for label, duration in (("FTS5 (triggers)", ftsIncremental),
+                ("FTS5 (rebuild)", ftsBulk), ("whoosh", whooshTime)):
+            print("  %-16s %8.2f s  %8.0f pages/s  %6.2f MB/s" % (label,
+                    duration, args.pages / duration, mbytes / duration))
+
+        # --- queries
+        queryParser = QueryParser("content", schema=schema)
+        searcher = index.searcher()
+
+        def fts_search(ftsQuery):
+            return connwrap.execSqlQuerySingleColumn(
+                    "select word from wikiwordcontent where rowid in "
+                    "(select rowid from wikiwordcontent_fts "
+                    "where wikiwordcontent_fts match ?)", (ftsQuery,))
+
+        def whoosh_search(q):
+            return [rd["unifName"][9:] for rd in searcher.search(q, limit=None)]
+
+        print()
+        print("Query latency (median of %i)" % args.repeat)
+        print("  %-20s %12s %12s %8s %8s" % ("query", "FTS5 ms", "whoosh ms",
+                "FTS5 #", "whoosh #"))
+        for queryStr in QUERIES:
+            q = queryParser.parse(queryStr)
+            ftsQuery = whooshQueryToFts5(q)
+            ftsTime, ftsResult = median_latency(fts_search, ftsQuery,
+                    args.repeat)
+            whooshTime, whooshResult = median_latency(whoosh_search, q,
+                    args.repeat)
+            print("  %-20s %12.2f %12.2f %8i %8i" % (queryStr, ftsTime * 1000,
+                    whooshTime * 1000, len(ftsResult), len(whooshResult)))
+
+        searcher.close()
+        connwrap.close()
+    finally:
+        shutil.rmtree(tempDir, ignore_errors=True)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
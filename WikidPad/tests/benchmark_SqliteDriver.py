@@ -0,0 +1,206 @@
+# coding: utf-8
+"""Compare the "stdlib" and the "ctypes" driver of sqlite3api.
+
+Copies the WikidPadHelp wiki (original_sqlite) once per driver, adds
+generated pages and measures the rebuild of the wiki,
+getAllDefinedWikiPageNames() and a text search. A compact_sqlite database
+with the same pages measures the search by the user-defined function
+"testMatch" which is called once per page.
+
+Run it from the main WikidPad directory (it is not collected by pytest):
+
+    ..\\WikidPad> python tests\\benchmark_SqliteDriver.py --pages 5000
+
+"""
+import argparse
+import builtins
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+builtins._ = builtins.N_ = lambda s: s  # see WikidPadStarter
+
+from pwiki import AppContext
+from pwiki.HeadlessApp import HeadlessApp, StreamProgressHandler
+
+AppContext.setHeadlessApp(HeadlessApp(wikidpad_dir, tempfile.mkdtemp()))
+
+import pwiki.sqlite3api as sqlite
+from pwiki.BatchAction import _openWiki
+from pwiki.SearchAndReplace import SearchReplaceOperation
+from pwiki.wikidata.compact_sqlite import DbStructure
+
+
+HELP_WIKI_DIR = os.path.join(wikidpad_dir, "WikidPadHelp")
+
+WORDS = ["wiki", "page", "link", "index", "search", "quick", "brown",
+        "alpha", "omega", "zyxhabit", "[BenchPage000001]", "BenchPage000002"]
+
+
+def generate_pages(count, words_per_page, seed=1):
+    """Yield (name, content) tuples."""
+    rnd = random.Random(seed)
+    for i in range(count):
+        words = [rnd.choice(WORDS) for j in range(words_per_page)]
+        lines = [" ".join(words[j:j + 12])
+                for j in range(0, len(words), 12)]
+        if i % 10 == 0:
+            lines.append("todo: check page %i" % i)
+        yield "BenchPage%06i" % i, "\n".join(lines)
+
+
+def create_wiki(destDir):
+    shutil.copytree(HELP_WIKI_DIR, destDir)
+    return os.path.join(destDir, "WikidPadHelp.wiki")
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def median_latency(function, repeat):
+    times = []
+    for i in range(repeat):
+        duration, result = timed(function)
+        times.append(duration)
+    times.sort()
+    return times[len(times) // 2], result
+
+
+def bench_wiki(wikiPath, compactDataDir, pages, driver, repeat):
+    """
+    Return dictionary {label: (seconds, result)}.
+    """
+    app = AppContext.GetApp()
+    app.getGlobalConfig().set("main", "sqlite_driver", driver)
+    mainControl = _openWiki(app, wikiPath, False)
+    wikiDocument = mainControl.getWikiDocument()
+    results = {}
+    try:
+        assert wikiDocument.baseWikiData.connWrap.getConnection().driver == \
+                driver
+
+        wikiData = wikiDocument.baseWikiData
+        for name, content in pages:
+            wikiData.setContent(name, content)
+        wikiData.commit()
+
+        def rebuild():
+            wikiDocument.rebuildWiki(StreamProgressHandler("rebuild",
+                    stream=io.StringIO()), False)
+
+        duration, dummy = timed(rebuild)
+        results["rebuild"] = (duration, None)
+
+        results["getAllDefinedWikiPageNames"] = median_latency(
+                wikiData.getAllDefinedWikiPageNames, repeat)
+
+        def search():
+            sarOp = SearchReplaceOperation()
+            sarOp.searchStr = "zyxhabit"
+            sarOp.wikiWide = True
+            sarOp.wildCard = "no"
+            return wikiDocument.searchWiki(sarOp, True)
+
+        results["search"] = median_latency(search, repeat)
+
+        results["testMatch (compact)"] = bench_test_match(compactDataDir,
+                pages, driver, repeat, wikiDocument)
+    finally:
+        wikiDocument.release()
+        app.processPendingCalls()
+
+    return results
+
+
+def bench_test_match(dataDir, pages, driver, repeat, wikiDocument):
+    """
+    Search of compact_sqlite: call "testMatch" for each page.
+    """
+    DbStructure.createWikiDB(None, dataDir)
+    connwrap = DbStructure.ConnectWrapSyncCommit(
+            sqlite.connect(os.path.join(dataDir, "wiki.sli"), driver=driver))
+    DbStructure.registerSqliteFunctions(connwrap)
+    DbStructure.registerUtf8Support(connwrap)
+
+    ti = time.time()
+    for name, content in pages:
+        connwrap.execSql("insert into wikiwordcontent(word, content, "
+                "modified, created) values (?, ?, ?, ?)",
+                (name, sqlite.Binary(content.encode("utf-8")), ti, ti))
+    connwrap.commit()
+
+    sarOp = SearchReplaceOperation()
+    sarOp.searchStr = "zyxhabit"
+    sarOp.wikiWide = True
+    sarOp.wildCard = "no"
+    sarOp.beginWikiSearch(wikiDocument)
+
+    def search():
+        try:
+            return [word for word, match in connwrap.execSqlQuery(
+                    "select word, testMatch(word, content, ?) "
+                    "from wikiwordcontent", (sqlite.addTransObject(sarOp),))
+                    if match]
+        finally:
+            sqlite.delTransObject(sarOp)
+
+    try:
+        return median_latency(search, repeat)
+    finally:
+        sarOp.endWikiSearch()
+        connwrap.close()
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    argparser.add_argument("--pages", type=int, default=5000,
+            help="number of generated pages added to the help wiki")
+    argparser.add_argument("--words", type=int, default=100,
+            help="words per page")
+    argparser.add_argument("--repeat", type=int, default=5,
+            help="repetitions of each query")
+    args = argparser.parse_args()
+
+    drivers = sqlite.getAvailableDrivers()
+    tempDir = tempfile.mkdtemp(prefix="wikidpad-bench-")
+    try:
+        pages = list(generate_pages(args.pages, args.words))
+        results = {}
+        for driver in drivers:
+            wikiPath = create_wiki(os.path.join(tempDir, driver))
+            results[driver] = bench_wiki(wikiPath,
+                    os.path.join(tempDir, driver + "_compact"), pages, driver,
+                    args.repeat)
+
+        print("%i generated pages, median of %i for queries" % (args.pages,
+                args.repeat))
+        print("  %-28s" % "" + "".join("%14s" % d for d in drivers))
+        for label in results[drivers[0]]:
+            print("  %-28s" % label + "".join("%11.1f ms" %
+                    (results[d][label][0] * 1000) for d in drivers))
+
+        for label in results[drivers[0]]:
+            sizes = set(len(results[d][label][1]) if results[d][label][1]
+                    else 0 for d in drivers)
+            if len(sizes) > 1:
+                print("Different result sizes for %s: %r" % (label, sizes))
+    finally:
+        shutil.rmtree(tempDir, ignore_errors=True)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
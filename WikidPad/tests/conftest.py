@@ -0,0 +1,34 @@
+# coding: utf-8
+"""Common setup of the tests, loaded by pytest before the test modules.
+
+Modules of WikidPad expect the translation functions `_` and `N_` as
+builtins (see WikidPadStarter) and are imported from the main WikidPad
+directory.
+
+"""
+import builtins
+import os
+import sys
+
+import pytest
+
+builtins._ = builtins.N_ = lambda s: s  # see WikidPadStarter
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki import AppContext
+from pwiki.HeadlessApp import HeadlessApp
+
+
+@pytest.fixture
+def app(tmpdir):
+    """
+    Headless app with the global configuration in a temporary directory.
+    """
+    app = HeadlessApp(wikidpad_dir, str(tmpdir))
+    AppContext.setHeadlessApp(app)
+    yield app
+    AppContext.setHeadlessApp(None)
@@ -0,0 +1,102 @@
+# coding: utf-8
+"""Test the SQLite FTS5 full text index.
+
+* Test translation of whoosh queries to FTS5 queries and searching the
+  full text index of a compact_sqlite database with them.
+
+"""
+import os
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import pytest
+
+from whoosh.qparser import QueryParser
+
+import pwiki.sqlite3api as sqlite
+from pwiki.wikidata.compact_sqlite import DbStructure
+from pwiki.WikiDocument import WikiDocument
+from pwiki.SearchAndReplace import whooshQueryToFts5
+
+
+PAGES = {
+    "PageOne": "The quick brown fox",
+    "PageTwo": "A brown dog and a quick cat",
+    "PageThree": "Linking pages: \"quoted\" text",
+    }
+
+
+def to_fts5(queryStr):
+    qp = QueryParser("content", schema=WikiDocument.getWhooshIndexSchema())
+    return whooshQueryToFts5(qp.parse(queryStr))
+
+
+@pytest.fixture
+def connwrap(tmp_path):
+    DbStructure.createWikiDB(None, str(tmp_path))
+    connwrap = DbStructure.ConnectWrapSyncCommit(
+            sqlite.connect(str(tmp_path / "wiki.sli")))
+    DbStructure.registerUtf8Support(connwrap)
+    if not DbStructure.isFullTextIndexAvailable(connwrap):
+        pytest.skip("SQLite library without FTS5")
+
+    for word, content in PAGES.items():
+        connwrap.execSql("insert into wikiwordcontent(word, content) "
+                "values (?, ?)", (word, sqlite.Binary(content.encode("utf-8"))))
+    DbStructure.createFullTextIndex(connwrap)
+    connwrap.commit()
+    yield connwrap
+    connwrap.close()
+
+
+def search(connwrap, queryStr):
+    ftsQuery = to_fts5(queryStr)
+    if ftsQuery is None:
+        return set()
+    return set(connwrap.execSqlQuerySingleColumn(
+            "select word from wikiwordcontent where rowid in "
+            "(select rowid from wikiwordcontent_fts "
+            "where wikiwordcontent_fts match ?)", (ftsQuery,)))
+
+
+def test_query_translation():
+    assert to_fts5('foo') == '"foo"'
+    assert to_fts5('foo bar') == '("foo") AND ("bar")'
+    assert to_fts5('foo OR bar') == '("foo") OR ("bar")'
+    assert to_fts5('"foo bar"') == '"foo bar"'
+    assert to_fts5('fo*') == '"fo"*'
+    assert to_fts5('foo ANDNOT bar') == '("foo") NOT ("bar")'
+    assert to_fts5('NOT foo') is None
+    assert to_fts5('unifName:foo') is None
+
+
+def test_search(connwrap):
+    assert search(connwrap, 'brown') == {"PageOne", "PageTwo"}
+    assert search(connwrap, 'brown NOT fox') == {"PageTwo"}
+    assert search(connwrap, '"quick brown"') == {"PageOne"}
+    assert search(connwrap, 'link*') == {"PageThree"}
+    assert search(connwrap, 'cat OR fox') == {"PageOne", "PageTwo"}
+    assert search(connwrap, 'quoted') == {"PageThree"}
+
+
+def test_index_follows_content(connwrap):
+    connwrap.execSql("update wikiwordcontent set content = ? where word = ?",
+            (sqlite.Binary(b"no animals here"), "PageOne"))
+    connwrap.execSql("update wikiwordcontent set word = ? where word = ?",
+            ("PageRenamed", "PageTwo"))
+    connwrap.execSql("delete from wikiwordcontent where word = ?",
+            ("PageThree",))
+    connwrap.commit()
+
+    assert search(connwrap, 'brown') == {"PageRenamed"}
+    assert search(connwrap, 'animals') == {"PageOne"}
+    assert search(connwrap, 'quoted') == set()
+
+    DbStructure.dropFullTextIndex(connwrap)
+    assert not DbStructure.hasFullTextIndex(connwrap)
+    # Content table stays writable without index
+    connwrap.execSql("delete from wikiwordcontent")
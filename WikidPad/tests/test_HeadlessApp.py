@@ -0,0 +1,58 @@
+# coding: utf-8
+"""Test HeadlessApp.
+
+* Test the headless application provides the wiki languages and is
+  returned by AppContext while installed.
+* Test calls queued by AppContext.callAfter() run in order.
+* Test progress output of StreamProgressHandler.
+
+"""
+import io
+import os
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki import AppContext
+from pwiki.HeadlessApp import StreamProgressHandler
+
+
+def test_app_context(app):
+    assert AppContext.isHeadless()
+    assert AppContext.GetApp() is app
+    assert AppContext.isMainThread()
+    assert not AppContext.isMainLoopRunning()
+
+
+def test_wiki_language(app):
+    desc = app.getWikiLanguageDescription("wikidpad_default_2_0")
+    assert desc is not None
+    assert app.createWikiParser("wikidpad_default_2_0") is not None
+    assert app.getWikiLanguageDescription("no_such_language") is None
+
+
+def test_call_after(app):
+    calls = []
+    AppContext.callAfter(calls.append, 1)
+    AppContext.callAfter(calls.append, 2)
+    assert calls == []
+
+    app.processPendingCalls()
+    assert calls == [1, 2]
+
+    app.processPendingCalls()
+    assert calls == [1, 2]
+
+
+def test_progress_handler():
+    stream = io.StringIO()
+    ph = StreamProgressHandler("Title", stream, reportPercentStep=50)
+    ph.open(4)
+    for step in range(4):
+        assert ph.update(step, "step %i" % step)
+    ph.close()
+
+    assert stream.getvalue() == "Title\n    0%  step 0\n   50%  step 2\n"
@@ -0,0 +1,167 @@
+# coding: utf-8
+"""Test HtmlExportEngine worker side.
+
+* Test that a worker renders pages from the snapshot, writes page files for
+  "html_single" and returns the page HTML for "html_multi".
+* Test that pages with insertions are left to the main process.
+* Test that relative image sizes are calculated by the worker.
+* Test that page content streamed to a file object is the same as the
+  content built as string.
+* Test that a page failing while rendering gives no multi page segment.
+
+"""
+import io
+import os
+import struct
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki import Configuration
+from pwiki import HtmlExportEngine, WorkerSnapshot
+
+
+PARSER_MODULE_FILE = os.path.join(wikidpad_dir, "extensions", "wikidPadParser",
+        "WikidPadParser.py")
+EXPORTER_MODULE_FILE = os.path.join(wikidpad_dir, "extensions",
+        "HtmlExporter.py")
+
+FORMAT_KEY = (True, "off", False)
+
+
+def initWorker(exportType, exportDest):
+    settings = dict(Configuration.GLOBALDEFAULTS)
+    settings.update(Configuration.WIKIDEFAULTS)
+
+    snapshot = {
+            "config": dict(Configuration.WIKIDEFAULTS),
+            "ccWordBlacklist": set(),
+            "nccWordBlacklist": set(),
+            "linkTerms": ["Root", "Child", "Kid"],
+            "globalConfigDir": exportDest,
+            "globalConfig": settings,
+            "collation": ("C", 0),
+            "wikiName": "Root",
+            "wikiAppDir": wikidpad_dir,
+            "wikiConfigPath": os.path.join(exportDest, "Root.wiki"),
+            "dataDir": os.path.join(exportDest, "data"),
+            "storagePath": os.path.join(exportDest, "files"),
+            "globalAttrs": {},
+            "pageNameByLinkTerm": {"Root": "Root", "Child": "Child",
+                "Kid": "Child"},
+            "resolveCaseNormed": False,
+            "exportAttrs": {},
+            "shortHints": {"Child": "Hint"},
+            "imageDimsCachePath": os.path.join(exportDest,
+                "imagedimscache.sqlite"),
+            "exporterModuleName": "HtmlExporter",
+            "exporterModuleFile": EXPORTER_MODULE_FILE,
+            "exporterClassName": "HtmlExporter",
+            "jobData": {
+                "wordList": ["Root", "Child"],
+                "exportType": exportType,
+                "exportDest": exportDest,
+                "compatFilenames": False,
+                "addOpt": (0, 0, "Table of Contents", "volatile", 1),
+                "usedFilenames": {"Root": "Root", "Child": "Child"},
+                "styleSheetList": [],
+                "avoidDeadWikiLinks": True
+            }
+        }
+
+    WorkerSnapshot.initWorker("pwiki.HtmlExportEngine", "_ExportWorkerState",
+            "wikidPadParser.WikidPadParser", PARSER_MODULE_FILE,
+            "wikidpad_default_2_0", snapshot)
+
+
+def test_render_single_files(app, tmpdir):
+    exportDest = str(tmpdir)
+    initWorker("html_single", exportDest)
+
+    results = HtmlExportEngine._renderPages([
+            ("Root", "See [Kid]\n[:page:Child]\n", FORMAT_KEY, {}, []),
+            ("Child", "Back to [Root]", FORMAT_KEY, {}, ["Root"])])
+
+    # Insertion must be rendered by main process
+    assert results == [None, ("", [])]
+    assert not os.path.exists(os.path.join(exportDest, "Root.html"))
+
+    with open(os.path.join(exportDest, "Child.html"), encoding="utf-8") as f:
+        html = f.read()
+
+    assert '<a href="Root.html" class="wikidpad">Root</a>' in html
+    assert "parent nodes:" in html
+
+
+def test_render_multi_page(app, tmpdir):
+    initWorker("html_multi", str(tmpdir))
+
+    results = HtmlExportEngine._renderPages([
+            ("Root", "See [Kid]\n", FORMAT_KEY, {}, []),
+            ("Child", "Not exported", FORMAT_KEY, {"export": ["False"]},
+                ["Root"])])
+
+    segment, storageFiles = results[0]
+    assert '<a name="Root" class="wikidpad">' in segment
+    assert '<a href="#Child" title="Hint" class="wikidpad">Kid</a>' in segment
+    assert results[1] == ("", [])
+
+
+def test_render_relative_image_size(app, tmpdir):
+    exportDest = str(tmpdir)
+    tmpdir.mkdir("files").join("img.gif").write_binary(
+            b"GIF89a" + struct.pack("<HH", 200, 100) + b"\0" * 20)
+    initWorker("html_single", exportDest)
+
+    results = HtmlExportEngine._renderPages([
+            ("Child", "rel://files/img.gif>r50%", FORMAT_KEY, {}, [])])
+
+    assert results[0] is not None
+    with open(os.path.join(exportDest, "Child.html"), encoding="utf-8") as f:
+        html = f.read()
+
+    assert 'width="100" height="50"' in html
+
+
+def test_streamed_equals_string(app, tmpdir):
+    initWorker("html_single", str(tmpdir))
+
+    text = "+ Heading\n\n* one\n* two\n\nSee [Root]\n\n<<pre\nx\n>>\n" * 20
+    workerState = WorkerSnapshot.getWorkerState()
+    exporter = workerState.exporter
+    wikiPage = HtmlExportEngine._ExportSnapshotWikiPage(
+            workerState.wikiDocument, "Child", text, FORMAT_KEY, {}, [])
+    workerState.wikiDocument.pages["Child"] = wikiPage
+    try:
+        string = exporter.formatContent(wikiPage)
+        fp = io.StringIO()
+        assert exporter.formatContent(wikiPage, fp=fp) == ""
+    finally:
+        del workerState.wikiDocument.pages["Child"]
+
+    assert "<h1" in string
+    assert fp.getvalue() == string
+
+
+def test_failed_multi_page_segment(app, tmpdir, monkeypatch):
+    initWorker("html_multi", str(tmpdir))
+
+    workerState = WorkerSnapshot.getWorkerState()
+    exporter = workerState.exporter
+    wikiPage = HtmlExportEngine._ExportSnapshotWikiPage(
+            workerState.wikiDocument, "Child", "text", FORMAT_KEY, {}, [])
+
+    def formatContent(wikiPage, fp=None):
+        fp.write("partial")
+        raise ValueError("render error")
+
+    workerState.wikiDocument.pages["Child"] = wikiPage
+    try:
+        assert "Child" in exporter._getMultiPageSegment("Child")
+        monkeypatch.setattr(exporter, "formatContent", formatContent)
+        assert exporter._getMultiPageSegment("Child") is None
+    finally:
+        del workerState.wikiDocument.pages["Child"]
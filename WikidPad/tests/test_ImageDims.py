@@ -0,0 +1,104 @@
+# coding: utf-8
+"""Test ImageDims.
+
+* Test dimensions are read from the headers of PNG, GIF, BMP and JPEG
+  images, also from streams which can't seek.
+* Test ImageDimsCache entries are validated by modification time and size
+  of the file.
+
+"""
+import io
+import os
+import struct
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import pytest
+
+from pwiki.ConnectWrapPysqlite import ConnectWrapBase
+from pwiki.ImageDims import readImageDims, getImageDims, ImageDimsCache
+
+
+def png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + \
+            struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0) + \
+            b"\0" * 100
+
+
+def gif(width, height):
+    return b"GIF89a" + struct.pack("<HH", width, height) + b"\0" * 100
+
+
+def bmp(width, height):
+    return b"BM" + b"\0" * 12 + struct.pack("<Iii", 40, width, height) + \
+            b"\0" * 100
+
+
+def jpeg(width, height, appSize=1000):
+    # SOI, APP1 segment (e.g. EXIF) and SOF0 segment
+    return b"\xff\xd8" + b"\xff\xe1" + struct.pack(">H", appSize + 2) + \
+            b"x" * appSize + b"\xff\xc0" + struct.pack(">HBHHB", 11, 8,
+            height, width, 1) + b"\x01\x11\x00" + b"\xff\xd9"
+
+
+class NonSeekable(io.RawIOBase):
+    def __init__(self, data):
+        self.stream = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def read(self, count=-1):
+        return self.stream.read(count)
+
+
+@pytest.mark.parametrize("factory", [png, gif, bmp, jpeg])
+def test_read_dims(factory):
+    data = factory(640, 480)
+    assert tuple(readImageDims(io.BytesIO(data))) == (640, 480)
+    assert tuple(readImageDims(NonSeekable(data))) == (640, 480)
+
+
+def test_read_dims_special_cases():
+    # Top-down bitmap has negative height
+    assert tuple(readImageDims(io.BytesIO(bmp(20, -10)))) == (20, 10)
+    # Frame header after large metadata
+    assert tuple(readImageDims(io.BytesIO(jpeg(3, 4, 60000)))) == (3, 4)
+
+    assert readImageDims(io.BytesIO(b"")) is None
+    assert readImageDims(io.BytesIO(b"no image data at all here")) is None
+    assert readImageDims(io.BytesIO(jpeg(3, 4)[:100])) is None
+
+
+@pytest.fixture
+def no_temp_handling(monkeypatch):
+    # Temp. handling needs the global configuration of the WikidPad app
+    monkeypatch.setattr(ConnectWrapBase, "adjustTempHandling",
+            lambda self: None)
+
+
+def test_cache(tmpdir, no_temp_handling):
+    imgPath = tmpdir.join("img.png")
+    imgPath.write_binary(png(10, 20))
+    url = "file:" + str(imgPath)
+
+    cache = ImageDimsCache(str(tmpdir.join("cache.sqlite")))
+    cache.open()
+    assert tuple(getImageDims(url, cache)) == (10, 20)
+    cache.close()
+
+    # Entry is used without reading the file
+    cache.open()
+    stat = os.stat(str(imgPath))
+    key = "file:" + os.path.normcase(str(imgPath))
+    cache.put(key, cache.getEntry(key)[0], 1, 2)
+    assert tuple(getImageDims(url, cache)) == (1, 2)
+
+    # Changed file isn't taken from cache
+    imgPath.write_binary(gif(30, 40) + b"more")
+    assert tuple(getImageDims(url, cache)) == (30, 40)
+    cache.close()
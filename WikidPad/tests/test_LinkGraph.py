@@ -0,0 +1,89 @@
+# coding: utf-8
+"""Test LinkGraph.
+
+* Test sub-tree, path to parent, parentless and undefined words on a small
+  graph with an alias.
+* Test incremental updates of relations and match terms.
+
+"""
+import os
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import Consts
+
+from pwiki.wikidata.LinkGraph import LinkGraph
+
+
+ASLINK = Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK
+SYNC = Consts.WIKIWORDMATCHTERMS_TYPE_SYNCUPDATE
+
+
+def buildGraph():
+    graph = LinkGraph()
+    graph.build(
+            ["Root", "Child", "GrandChild", "Other"],
+            [("Root", "Child"), ("Root", "Root"), ("Root", "Missing"),
+            ("Child", "Grandy"), ("GrandChild", "Child")],
+            [("Root", ASLINK, "Root"), ("Child", ASLINK, "Child"),
+            ("GrandChild", ASLINK, "GrandChild"),
+            ("Grandy", ASLINK | SYNC, "GrandChild"),
+            ("Other", ASLINK, "Other"),
+            ("NoLink", Consts.WIKIWORDMATCHTERMS_TYPE_EXPLICIT_ALIAS, "Other")])
+    return graph
+
+
+def test_queries():
+    graph = buildGraph()
+
+    assert graph.isValid()
+    assert graph.resolveLinkTerm("Grandy") == "GrandChild"
+    assert graph.resolveLinkTerm("NoLink") is None
+
+    assert graph.getAllSubWords(["Root"]) == ["Root", "Child", "GrandChild"]
+    assert graph.getAllSubWords(["Root"], 1) == ["Root", "Child"]
+    assert graph.getAllSubWords(["Other", "Child"]) == \
+            ["Other", "Child", "GrandChild"]
+
+    assert graph.findBestPath("Child", "Root") == ["Root", "Child"]
+    assert graph.findBestPath("Grandy", "Root") == ["Root", "Child", "Grandy"]
+    assert graph.findBestPath("Root", "Child") == []
+    assert graph.findBestPath("Other", "Other") == ["Other"]
+
+    assert sorted(graph.getParentlessWords()) == ["Other", "Root"]
+    assert graph.getUndefinedWords() == ["Missing"]
+
+
+def test_incremental_updates():
+    graph = buildGraph()
+
+    graph.updateChildRelations("Other", ["Root", "Missing"])
+    assert graph.getParentlessWords() == ["Other"]
+    assert graph.findBestPath("Child", "Other") == ["Other", "Root", "Child"]
+
+    graph.deleteChildRelations("Root")
+    graph.deleteChildRelations("Other")
+    assert graph.getUndefinedWords() == []
+    assert "Missing" not in graph.sourcesByTerm
+
+    # Non-sync update keeps the sync-updated alias
+    graph.updateMatchTerms("GrandChild", [("GrandChild", ASLINK, "GrandChild")])
+    assert graph.resolveLinkTerm("Grandy") == "GrandChild"
+
+    graph.deleteMatchTerms("GrandChild", syncUpdate=True)
+    assert graph.resolveLinkTerm("Grandy") is None
+    assert graph.getUndefinedWords() == ["Grandy"]
+
+    graph.addPage("Grandy")
+    assert graph.getUndefinedWords() == []
+    graph.removePage("Grandy")
+
+    graph.invalidate()
+    assert not graph.isValid()
+    # Updates of an invalid graph are ignored until it is built again
+    graph.addPage("Grandy")
+    assert graph.pageNames == set()
@@ -0,0 +1,126 @@
+# coding: utf-8
+"""Test LinkTermIndex.
+
+* Test resolution of page names and aliases, also case-normed.
+* Test incremental updates create new snapshots and leave old ones
+  unchanged, also when the deltas are merged.
+* Test the link terms changed between two snapshots.
+
+"""
+import os
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import Consts
+
+from pwiki.wikidata.LinkTermIndex import LinkTermIndex
+
+
+ASLINK = Consts.WIKIWORDMATCHTERMS_TYPE_ASLINK
+SYNC = Consts.WIKIWORDMATCHTERMS_TYPE_SYNCUPDATE
+
+
+def buildIndex():
+    index = LinkTermIndex()
+    assert index.getSnapshot() is None
+    index.build([("Root", "Root", -1), ("Child", "Child", -1),
+            ("Other", "Other", -1),
+            ("Root", "Root", ASLINK), ("Child", "Child", ASLINK),
+            ("Child", "Kid", ASLINK | SYNC), ("Other", "Kid", ASLINK),
+            ("Other", "NoLink", Consts.WIKIWORDMATCHTERMS_TYPE_EXPLICIT_ALIAS)])
+    return index
+
+
+def test_resolve():
+    index = buildIndex()
+    snapshot = index.getSnapshot()
+
+    assert snapshot.getWikiPageNameForLinkTerm("Root") == "Root"
+    # Smallest page name for alias of multiple pages
+    assert snapshot.getWikiPageNameForLinkTerm("Kid") == "Child"
+    assert snapshot.getWikiPageNameForLinkTerm("NoLink") is None
+    assert snapshot.getWikiPageNameForLinkTerm("kid") is None
+    assert sorted(snapshot.keys()) == ["Child", "Kid", "Other", "Root"]
+
+    index.setResolveCaseNormed(True)
+    assert snapshot.getWikiPageNameForLinkTerm("kid") is None
+    assert index.getSnapshot().getWikiPageNameForLinkTerm("kid") == "Child"
+    assert index.getSnapshot().getWikiPageNameForLinkTerm("ROOT") == "Root"
+
+
+def test_updates():
+    index = buildIndex()
+    snapshot = index.getSnapshot()
+
+    index.updateMatchTerms("Child", [("Youngster", ASLINK | SYNC, "Child")],
+            syncUpdate=True)
+    updated = index.getSnapshot()
+    assert updated.version > snapshot.version
+    assert updated.getWikiPageNameForLinkTerm("Kid") == "Other"
+    assert updated.getWikiPageNameForLinkTerm("Youngster") == "Child"
+    # Non-sync match terms are kept
+    assert updated.getWikiPageNameForLinkTerm("Child") == "Child"
+    assert snapshot.getWikiPageNameForLinkTerm("Youngster") is None
+
+    index.addPage("New")
+    index.removePage("Other")
+    index.deleteMatchTerms("Other")
+    current = index.getSnapshot()
+    assert current.getWikiPageNameForLinkTerm("New") == "New"
+    assert current.getWikiPageNameForLinkTerm("Other") is None
+    assert current.getWikiPageNameForLinkTerm("Kid") is None
+    assert sorted(current.keys()) == ["Child", "New", "Root", "Youngster"]
+    assert updated.getWikiPageNameForLinkTerm("Kid") == "Other"
+
+    index.invalidate()
+    assert index.getSnapshot() is None
+    # Updates of invalid index are ignored
+    index.addPage("Ignored")
+    assert index.getSnapshot() is None
+
+
+def test_merge_deltas():
+    index = buildIndex()
+    index.MAX_DELTA_SIZE = 4
+    snapshot = index.getSnapshot()
+
+    for i in range(10):
+        index.addPage("Page%i" % i)
+
+    current = index.getSnapshot()
+    assert len(current.termsDelta) + len(current.normTermsDelta) <= 4
+    for i in range(10):
+        assert current.getWikiPageNameForLinkTerm("Page%i" % i) == "Page%i" % i
+    assert snapshot.getWikiPageNameForLinkTerm("Page0") is None
+    assert "Page0" not in snapshot.terms
+
+
+def test_term_changes():
+    index = buildIndex()
+    snapshot = index.getSnapshot()
+    assert snapshot.getTermChangesSince(snapshot) == ([], [])
+
+    index.addPage("New")
+    updated = index.getSnapshot()
+    index.removePage("Other")
+    index.deleteMatchTerms("Other")
+    index.addPage("Temp")
+    index.removePage("Temp")
+    current = index.getSnapshot()
+
+    assert updated.getTermChangesSince(snapshot) == (["New"], [])
+    added, removed = current.getTermChangesSince(updated)
+    assert (added, sorted(removed)) == ([], ["Other"])
+    added, removed = current.getTermChangesSince(snapshot)
+    assert (added, sorted(removed)) == (["New"], ["Other"])
+
+    # "Kid" is still an alias of "Child"
+    assert "Kid" in current.keys()
+
+    index.MAX_DELTA_SIZE = 0
+    index.addPage("Merged")
+    assert index.getSnapshot().getTermChangesSince(current) is None
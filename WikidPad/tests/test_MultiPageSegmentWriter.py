@@ -0,0 +1,202 @@
+# coding: utf-8
+"""Test MultiPageSegmentWriter of the HTML exporter.
+
+* Test that the file is rewritten only from the first changed segment and
+  that it always matches a full write.
+* Test that pages without segment are left out but keep their children.
+* Test that a continuous export ignores updates of not exported pages
+  with unchanged relations and rebuilds the table of contents only if
+  relations changed.
+
+"""
+import os
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+sys.path.append(os.path.join(wikidpad_dir, 'extensions'))
+
+from HtmlExporter import HtmlExporter, MultiPageSegmentWriter
+
+
+def readFile(path):
+    with open(path, "rb") as f:
+        return f.read().decode("utf-8").replace(os.linesep, "\n")
+
+
+def test_write_from_segments(tmpdir):
+    path = str(tmpdir.join("wiki.html"))
+    writer = MultiPageSegmentWriter()
+    writer.reset(path)
+
+    writer.setHeadSegments(["<head>\n", "<toc/>"])
+    writer.setPageSegment("A", "<a>ä</a>", ("B",))
+    writer.setPageSegment("B", "<b/>")
+    writer.setPageSegment("C", "<c/>")
+    writer.setFootSegment("</html>")
+
+    writer.write(["A", "B", "C"])
+    assert readFile(path) == "<head>\n<toc/><a>ä</a><b/><c/></html>"
+    assert writer.getPageChildren("A") == frozenset(("B",))
+
+    # Nothing changed
+    assert writer.write(["A", "B", "C"]) == 0
+
+    # Only the tail from page "C" on is written again
+    writer.setPageSegment("C", "<cc/>")
+    assert writer.write(["A", "B", "C"]) == len("<cc/></html>")
+    assert readFile(path) == "<head>\n<toc/><a>ä</a><b/><cc/></html>"
+
+    # Removed and missing pages are left out, file is truncated
+    writer.removePageSegment("B")
+    writer.write(["A", "B", "C", "D"])
+    assert readFile(path) == "<head>\n<toc/><a>ä</a><cc/></html>"
+
+    # Changed header leads to full rewrite
+    writer.setHeadSegments(["<head>\n"])
+    writer.write(["C", "A"])
+    assert readFile(path) == "<head>\n<cc/><a>ä</a></html>"
+
+
+def test_external_change_rewrites_file(tmpdir):
+    path = str(tmpdir.join("wiki.html"))
+    writer = MultiPageSegmentWriter()
+    writer.reset(path)
+    writer.setPageSegment("A", "<a/>")
+    writer.setFootSegment("</html>")
+    writer.write(["A"])
+
+    with open(path, "wb") as f:
+        f.write(b"garbage")
+
+    writer.setFootSegment("</body></html>")
+    writer.write(["A"])
+    assert readFile(path) == "<a/></body></html>"
+
+
+def test_page_without_segment(tmpdir):
+    path = str(tmpdir.join("wiki.html"))
+    writer = MultiPageSegmentWriter()
+    writer.reset(path)
+    writer.setPageSegment("A", "<a/>")
+    writer.setPageSegment("B", None, ("A",))
+    writer.write(["A", "B"])
+
+    assert readFile(path) == "<a/>"
+    assert writer.hasPageSegment("A")
+    assert not writer.hasPageSegment("B")
+    assert not writer.hasPageSegment("C")
+    assert writer.getPageChildren("B") == frozenset(("A",))
+
+
+class MockWikiPage:
+    def __init__(self, wikiWord, children, attrs):
+        self.wikiWord = wikiWord
+        self.children = children
+        self.attrs = attrs
+
+    def getWikiWord(self):
+        return self.wikiWord
+
+    def getChildRelationships(self, existingonly=False, selfreference=True):
+        return list(self.children)
+
+    def getAttributes(self):
+        return self.attrs
+
+
+class MockWikiDocument:
+    def __init__(self):
+        self.pages = {}
+
+    def getWikiPage(self, word):
+        return self.pages[word]
+
+    def getWikiPageNameForLinkTerm(self, linkTerm):
+        return linkTerm if linkTerm in self.pages else None
+
+    def getWikiData(self):
+        return self
+
+
+class MockListPagesOperation:
+    def testWikiPageByDocPage(self, wikiPage):
+        return True
+
+
+def createExporter(tmpdir, wikiDocument):
+    exporter = HtmlExporter.__new__(HtmlExporter)
+    exporter.wikiDocument = wikiDocument
+    exporter.exportType = "html_multi"
+    exporter.exportDest = str(tmpdir)
+    exporter.listPagesOperation = MockListPagesOperation()
+    exporter.wordList = ["A", "B", "N"]
+    exporter.addOpt = (0, 1, "Table of Contents", "", 0)
+    exporter.multiPageWriter = MultiPageSegmentWriter()
+    exporter.multiPageWriter.reset(str(tmpdir.join("wiki.html")))
+    exporter.multiPageUpdateTimer = None
+    exporter.multiPageDirtyWords = set()
+    exporter.multiPageMembershipChanged = set()
+    exporter.multiPageTreeInfos = {}
+    exporter.scheduled = []
+    exporter.headCount = 0
+
+    def getMultiPageHeadSegments(title, tocMode):
+        exporter.headCount += 1
+        return ["<toc/>"]
+
+    def scheduleMultiPageUpdate(words, membershipChanged=()):
+        exporter.scheduled.append(words)
+        exporter.multiPageDirtyWords.update(words)
+        exporter.multiPageMembershipChanged.update(membershipChanged)
+
+    exporter._getMultiPageHeadSegments = getMultiPageHeadSegments
+    exporter._scheduleMultiPageUpdate = scheduleMultiPageUpdate
+    exporter._getMultiPageSegment = lambda word: \
+            "<%s/>" % word if exporter.shouldExport(word) else None
+    exporter.mainControl = type("MockMainControl", (), {"wikiName": "A"})
+    exporter.setLinkConverter = lambda linkConverter: None
+    exporter.buildStyleSheetList = lambda: None
+    exporter.getFileFooter = lambda: ""
+    exporter.copyCssFiles = lambda dest: None
+
+    for word in exporter.wordList:
+        exporter._renderMultiPageSegment(word)
+
+    return exporter
+
+
+def test_continuous_update(tmpdir):
+    wikiDocument = MockWikiDocument()
+    wikiDocument.pages["A"] = MockWikiPage("A", ["B"], {})
+    wikiDocument.pages["B"] = MockWikiPage("B", [], {})
+    wikiDocument.pages["N"] = MockWikiPage("N", [], {"export": ["False"]})
+    exporter = createExporter(tmpdir, wikiDocument)
+    path = str(tmpdir.join("wiki.html"))
+
+    # Not exported page with unchanged relations is ignored
+    exporter.onUpdatedWikiPage({"wikiPage": wikiDocument.pages["N"]})
+    assert exporter.scheduled == []
+
+    # Changed text of exported page doesn't need a new table of contents
+    exporter.onUpdatedWikiPage({"wikiPage": wikiDocument.pages["B"]})
+    exporter._writeMultiPageUpdates()
+    assert exporter.scheduled == [("B",)]
+    assert exporter.headCount == 0
+    assert readFile(path) == "<A/><B/>"
+
+    # New child of not exported page changes the content tree
+    wikiDocument.pages["N"].children = ["A"]
+    exporter.onUpdatedWikiPage({"wikiPage": wikiDocument.pages["N"]})
+    exporter._writeMultiPageUpdates()
+    assert exporter.scheduled == [("B",), ("N",)]
+    assert exporter.headCount == 1
+    assert readFile(path) == "<toc/><A/><B/>"
+
+    # Tree order attribute changes the content tree
+    wikiDocument.pages["B"].attrs = {"priority": ["1"]}
+    exporter.onUpdatedWikiPage({"wikiPage": wikiDocument.pages["B"]})
+    exporter._writeMultiPageUpdates()
+    assert exporter.headCount == 2
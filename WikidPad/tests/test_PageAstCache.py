@@ -0,0 +1,118 @@
+# coding: utf-8
+"""Test PageAstCache.
+
+* Test storing and retrieving page ASTs, LRU eviction and that only AST
+  classes can be loaded from the cache file, also not through dotted names.
+* Test that an AST which can't be pickled isn't cached.
+
+"""
+import os
+import pickle
+import sys
+import zlib
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import pytest
+
+from pwiki.ConnectWrapPysqlite import ConnectWrapBase
+from pwiki.PageAstCache import PageAstCache
+from pwiki.WikiPyparsing import buildSyntaxNode
+
+
+@pytest.fixture(autouse=True)
+def no_temp_handling(monkeypatch):
+    # Temp. handling needs the global configuration of the WikidPad app
+    monkeypatch.setattr(ConnectWrapBase, "adjustTempHandling",
+            lambda self: None)
+
+
+def build_ast(text):
+    words = text.split(" ")
+    sub = []
+    pos = 0
+    for w in words:
+        node = buildSyntaxNode(w, pos, "plainText")
+        node.extra = (w, len(w))
+        sub.append(node)
+        pos += len(w)
+    return buildSyntaxNode(sub, 0, "text")
+
+
+def open_cache(path, maxSize=1024 * 1024):
+    cache = PageAstCache(str(path), maxSize)
+    cache.open()
+    assert cache.isOpen()
+    return cache
+
+
+def test_roundtrip(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = open_cache(path)
+    ast = build_ast("some page text")
+    cache.put("k1", ast)
+    assert cache.get("k1").getString() == ast.getString()
+    cache.close()
+
+    cache = open_cache(path)
+    loaded = cache.get("k1")
+    assert loaded.getString() == "somepagetext"
+    assert loaded.strLength == ast.strLength
+    assert loaded.sub[1].extra == ("page", 4)
+    assert cache.get("k2") is None
+    cache.close()
+
+
+def test_lru_eviction(tmp_path):
+    dataSize = len(zlib.compress(pickle.dumps(build_ast("page 0"),
+            pickle.HIGHEST_PROTOCOL)))
+    cache = open_cache(tmp_path / "cache.sqlite", maxSize=dataSize * 5)
+    for i in range(5):
+        cache.put("k%i" % i, build_ast("page %i" % i))
+    cache.flush()
+
+    # Use the oldest entry so the second oldest one is evicted first
+    assert cache.get("k0") is not None
+    cache.put("k5", build_ast("page 5"))
+    cache.flush()
+
+    assert cache.get("k0") is not None
+    assert cache.get("k1") is None
+    assert cache.get("k5") is not None
+    assert cache.getStatistics()["size"] <= dataSize * 5
+    cache.close()
+
+
+def test_foreign_classes_refused(tmp_path):
+    cache = open_cache(tmp_path / "cache.sqlite")
+    ast = build_ast("page")
+    ast.sub[0].extra = os.path.join   # Function from a module not allowed
+    cache.put("k", ast)
+    assert cache.get("k") is None
+    cache.close()
+
+
+def test_dotted_names_refused(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = open_cache(path)
+    cache.allowModule("pwiki.PageAstCache")
+    # Protocol 4 pickle calling os.getcwd() through the global
+    # "pwiki.PageAstCache" "os.getcwd" (the allowed module imports os)
+    data = (b"\x80\x04\x8c\x12pwiki.PageAstCache\x8c\x09os.getcwd\x93"
+            b")R.")
+    cache.pendingPuts["k"] = (zlib.compress(data), 0)
+    assert cache.get("k") is None
+    cache.close()
+
+
+def test_unpicklable_not_cached(tmp_path):
+    cache = open_cache(tmp_path / "cache.sqlite")
+    ast = build_ast("page")
+    ast.sub[0].extra = lambda: None
+    cache.put("k", ast)
+    assert cache.get("k") is None
+    assert cache.getStatistics()["pending"] == 0
+    cache.close()
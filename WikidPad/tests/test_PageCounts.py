@@ -0,0 +1,103 @@
+# coding: utf-8
+"""Test counting wiki pages per time span for the timeline and calendar.
+
+* Test the grouped query of compact_sqlite counts the modification times
+  per span, including the span boundaries.
+* Test WikiDocument only queries the spans which aren't cached.
+
+"""
+import os
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import pytest
+
+import pwiki.sqlite3api as sqlite
+from pwiki.wikidata.compact_sqlite import DbStructure
+from pwiki.wikidata.compact_sqlite.WikiData import WikiData
+from pwiki.WikiDocument import WikiDocument
+
+
+DAY = 86400
+START = 1500000000.0
+
+# Modification times relative to START
+MODIFIED = {
+    "PageBefore": -1.0,
+    "PageStart": 0.0,
+    "PageFirstDay": 3600.0,
+    "PageSecondDay": DAY,
+    "PageThirdDay": 2 * DAY + 0.5,
+    "PageEnd": 3 * DAY - 0.001,
+    "PageAfter": 3 * DAY,
+    }
+
+
+class CountingWikiData:
+    """
+    Uses the query of compact_sqlite and records the queried spans.
+    """
+    _STAMP_TYPE_TO_FIELD = WikiData._STAMP_TYPE_TO_FIELD
+    getWikiPageCountsWithin_ = WikiData.getWikiPageCountsWithin
+
+    def __init__(self, connWrap):
+        self.connWrap = connWrap
+        self.queries = []
+
+    def getWikiPageCountsWithin(self, stampType, startTime, bucketLength,
+            bucketCount):
+        self.queries.append((startTime, bucketCount))
+        return self.getWikiPageCountsWithin_(stampType, startTime,
+                bucketLength, bucketCount)
+
+
+class CachingWikiDocument:
+    PAGE_COUNT_CACHE_SIZE = WikiDocument.PAGE_COUNT_CACHE_SIZE
+    getWikiPageCountsWithin = WikiDocument.getWikiPageCountsWithin
+
+    def __init__(self, wikiData):
+        self.wikiData = wikiData
+        self.pageCountCache = {}
+
+    def getWikiData(self):
+        return self.wikiData
+
+
+@pytest.fixture
+def wikiData(tmp_path):
+    DbStructure.createWikiDB(None, str(tmp_path))
+    connWrap = DbStructure.ConnectWrapSyncCommit(
+            sqlite.connect(str(tmp_path / "wiki.sli")))
+
+    for word, modified in MODIFIED.items():
+        connWrap.execSql("insert into wikiwordcontent(word, created, "
+                "modified) values (?, ?, ?)", (word, START, START + modified))
+    connWrap.commit()
+    yield CountingWikiData(connWrap)
+    connWrap.close()
+
+
+def test_counts(wikiData):
+    assert wikiData.getWikiPageCountsWithin(0, START, DAY, 3) == [2, 1, 2]
+    assert wikiData.getWikiPageCountsWithin(0, START - DAY, 2 * DAY, 3) == \
+            [3, 3, 1]
+    assert wikiData.getWikiPageCountsWithin(1, START, DAY, 2) == [7, 0]
+    # Visited isn't supported
+    assert wikiData.getWikiPageCountsWithin(2, START, DAY, 2) == [0, 0]
+
+
+def test_cache(wikiData):
+    wikiDocument = CachingWikiDocument(wikiData)
+
+    assert wikiDocument.getWikiPageCountsWithin(0, START, DAY, 2) == [2, 1]
+    assert wikiDocument.getWikiPageCountsWithin(0, START, DAY, 3) == \
+            [2, 1, 2]
+    assert wikiDocument.getWikiPageCountsWithin(0, START + DAY, DAY, 2) == \
+            [1, 2]
+
+    # Only the day which wasn't cached yet was queried again
+    assert wikiData.queries == [(START, 2), (START + 2 * DAY, 1)]
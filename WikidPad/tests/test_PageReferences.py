@@ -0,0 +1,70 @@
+# coding: utf-8
+"""Test the references of a page which are stored for renaming.
+
+* Test wiki words, "page" insertions and attributes with wiki word values
+  are resolved relative to the page and returned once.
+* Test the rebuild result contains the same references.
+
+"""
+import os
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki import ParseUtilities
+from pwiki.Utilities import DUMBTHREADSTOP
+from pwiki.DocPages import WikiPage
+from pwiki.RebuildEngine import extractRebuildResultFromPageAst
+from pwiki.WorkerSnapshot import SnapshotWikiDocument, SnapshotWikiPage
+
+
+LANGUAGE = "wikidpad_default_2_0"
+
+TEXT = """[/Sub] [../Other] [//Top] [/Sub]
+[:page: ../Included]
+[template: //Templates/Tmpl]
+[parent: ..]
+[color: red]
+[:rel: children]
+"""
+
+
+def parse(app, wikiWord, text):
+    langHelper = app.createWikiLanguageHelper(LANGUAGE)
+    wikiDocument = SnapshotWikiDocument(LANGUAGE, {"config": {},
+            "ccWordBlacklist": set(), "nccWordBlacklist": set(),
+            "linkTerms": []})
+    page = SnapshotWikiPage(wikiDocument, wikiWord)
+    formatDetails = ParseUtilities.WikiPageFormatDetails(
+            withCamelCase=True, wikiDocument=wikiDocument, basePage=page,
+            wikiLanguageDetails=langHelper.createWikiLanguageDetails(
+                wikiDocument, page))
+
+    parser = app.createWikiParser(LANGUAGE)
+    try:
+        pageAst = parser.parse(LANGUAGE, text, formatDetails, DUMBTHREADSTOP)
+    finally:
+        app.freeWikiParser(parser)
+
+    return pageAst, langHelper, page
+
+
+def test_references(app):
+    pageAst, langHelper, page = parse(app, "Main/Page", TEXT)
+    assert WikiPage.extractReferencesFromPageAst(pageAst, langHelper,
+            page) == ["Main/Page/Sub", "Other", "Top", "Included",
+            "Templates/Tmpl", "Main"]
+
+
+def test_rebuild_result(app):
+    pageAst, langHelper, page = parse(app, "Main/Page", TEXT)
+    attrs, todos, childRelations, headingTerms, references = \
+            extractRebuildResultFromPageAst(pageAst, 0, langHelper, page)
+    assert references == WikiPage.extractReferencesFromPageAst(pageAst,
+            langHelper, page)
+    # Child relations only contain the wiki words
+    assert [rel[0] for rel in childRelations] == ["Main/Page/Sub",
+            "Other", "Top"]
@@ -0,0 +1,155 @@
+# coding: utf-8
+"""Test ParseUtilities.
+
+* Test the multi-pattern matcher used for autoLink "relax" mode against
+  the former approach of one regular expression per link term.
+* Test WikiDocument applies only the changed link terms to the matcher.
+
+"""
+import os
+import re
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki.ParseUtilities import AutoLinkRelaxMatcher
+from pwiki.WikiDocument import WikiDocument
+from pwiki.wikidata.LinkTermIndex import LinkTermIndex
+
+
+WORDS = ["WikiWord", "Wiki Word Page", "foo bar", "foo", "C++", "x_y",
+        "Über Straße", "!!!", ""]
+
+
+def regex_matches(words, text):
+    """Reference implementation: earliest match, longest term first."""
+    relaxList = []
+    for w in sorted(words, key=len, reverse=True):
+        parts = [p for p in re.split(r"[\W]+", w) if p != ""]
+        if not parts:
+            continue
+        relaxList.append((re.compile(r"\b" + r"[\W]+".join(parts) + r"\b",
+                re.IGNORECASE | re.UNICODE), w))
+
+    result = []
+    offset = 0
+    while text != "":
+        found = None
+        for regex, word in relaxList:
+            match = regex.search(text)
+            if match and (found is None or match.start() < found[0]):
+                found = (match.start(), match.end(), word)
+        if found is None:
+            break
+        result.append((offset + found[0], offset + found[1], found[2]))
+        offset += found[1]
+        text = text[found[1]:]
+
+    return result
+
+
+def test_relax_matches_like_regexes():
+    matcher = AutoLinkRelaxMatcher(WORDS)
+    for text in [
+            "A wiki  word page and wikiword, also FOO--bar and foo.",
+            "food foo bar baz c and C++ x_y xy",
+            "über   STRASSE über-straße",
+            "",
+            "no match here"]:
+        assert list(matcher.iterMatches(text)) == regex_matches(WORDS, text)
+
+
+def test_relax_longest_term_wins():
+    matcher = AutoLinkRelaxMatcher(["foo", "foo bar"])
+    assert list(matcher.iterMatches("x foo  bar")) == [(2, 10, "foo bar")]
+    assert list(matcher.iterMatches("x foo baz")) == [(2, 5, "foo")]
+
+
+def test_relax_incremental_update():
+    matcher = AutoLinkRelaxMatcher(["foo", "foo bar", "Foo-Bar"])
+    assert len(matcher) == 3
+
+    matcher.removeWord("foo bar")
+    assert list(matcher.iterMatches("foo bar")) == [(0, 7, "Foo-Bar")]
+
+    matcher.updateWords(["foo", "baz"])
+    assert "Foo-Bar" not in matcher
+    assert list(matcher.iterMatches("foo bar baz")) == \
+            [(0, 3, "foo"), (8, 11, "baz")]
+
+    matcher.updateWords([])
+    assert len(matcher) == 0
+    assert list(matcher.iterMatches("foo bar baz")) == []
+
+
+def test_relax_change_words():
+    matcher = AutoLinkRelaxMatcher(["foo", "foo bar"])
+    matcher.changeWords(["baz", "foo"], ["foo bar", "missing"])
+    assert sorted(matcher._words) == ["baz", "foo"]
+    assert list(matcher.iterMatches("foo bar baz")) == \
+            [(0, 3, "foo"), (8, 11, "baz")]
+
+
+class CountingWikiData:
+    def __init__(self, linkTermIndex):
+        self.linkTermIndex = linkTermIndex
+        self.allLinksCount = 0
+
+    def getAllProducedWikiLinks(self):
+        self.allLinksCount += 1
+        snapshot = self.linkTermIndex.getSnapshot()
+        if snapshot is None:
+            snapshot = self.linkTermIndex.build([("Root", "Root", -1)])
+        return snapshot.keys()
+
+
+class RelaxWikiDocument:
+    getAutoLinkRelaxInfo = WikiDocument.getAutoLinkRelaxInfo
+
+    def __init__(self):
+        self.linkTermIndex = LinkTermIndex()
+        self.wikiData = CountingWikiData(self.linkTermIndex)
+        self.autoLinkRelaxInfo = None
+        self.autoLinkRelaxSnapshot = None
+        self.autoLinkRelaxInfoStale = False
+
+    def getWikiData(self):
+        return self.wikiData
+
+    def getWikiDefaultWikiLanguage(self):
+        return "wikidpad_default_2_0"
+
+
+def test_relax_info_follows_link_terms(app):
+    wikiDocument = RelaxWikiDocument()
+    wikiData = wikiDocument.getWikiData()
+    matcher = wikiDocument.getAutoLinkRelaxInfo()
+    assert "Root" in matcher
+    assert wikiDocument.getAutoLinkRelaxInfo() is matcher
+
+    # Index didn't exist before the build so all terms are compared once
+    wikiDocument.autoLinkRelaxInfoStale = True
+    assert wikiDocument.getAutoLinkRelaxInfo() is matcher
+    assert wikiData.allLinksCount == 2
+
+    wikiDocument.linkTermIndex.addPage("New Page")
+    wikiDocument.autoLinkRelaxInfoStale = True
+    assert wikiDocument.getAutoLinkRelaxInfo() is matcher
+    assert "New Page" in matcher
+
+    wikiDocument.linkTermIndex.removePage("Root")
+    wikiDocument.autoLinkRelaxInfoStale = True
+    wikiDocument.getAutoLinkRelaxInfo()
+    assert "Root" not in matcher
+    assert list(matcher.iterMatches("a new-page")) == [(2, 10, "New Page")]
+    assert wikiData.allLinksCount == 2
+
+    # Rebuilt index, changes are unknown
+    wikiDocument.linkTermIndex.invalidate()
+    wikiDocument.autoLinkRelaxInfoStale = True
+    wikiDocument.getAutoLinkRelaxInfo()
+    assert wikiData.allLinksCount == 3
+    assert sorted(matcher._words) == ["Root"]
@@ -0,0 +1,144 @@
+# coding: utf-8
+"""Test RebuildEngine.
+
+* Test that a rebuild with the process pool stores the parse results of all
+  pages and skips pages which can't be retrieved or read.
+
+"""
+import os
+import sys
+import threading
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki.Configuration import SnapshotConfiguration
+from pwiki.ParseUtilities import WikiPageFormatDetails
+from pwiki.RebuildEngine import RebuildEngine
+
+
+LANGUAGE = "wikidpad_default_2_0"
+
+PARSER_MODULE_FILE = os.path.join(wikidpad_dir, "extensions", "wikidPadParser",
+        "WikidPadParser.py")
+
+
+class MockWikiData:
+    def __init__(self):
+        self.signatures = []
+
+    def getAllProducedWikiLinks(self):
+        return []
+
+    def refreshFileSignatureForWikiPageName(self, word):
+        self.signatures.append(word)
+
+    def commit(self):
+        pass
+
+    def updateCachedGlobalAttrs(self):
+        pass
+
+
+class MockWikiDocument:
+    def __init__(self, pages):
+        self.pages = pages
+        self.wikiData = MockWikiData()
+        self.wikiConfig = SnapshotConfiguration({})
+        self.wikiConfig.configDefaults = {}
+
+    def getWikiData(self):
+        return self.wikiData
+
+    def getWikiConfig(self):
+        return self.wikiConfig
+
+    def getWikiDefaultWikiLanguage(self):
+        return LANGUAGE
+
+    def getCcWordBlacklist(self):
+        return set()
+
+    def getNccWordBlacklist(self):
+        return set()
+
+    def getPageAstCache(self):
+        return None
+
+    def _getWikiPageNoErrorNoCache(self, word):
+        if word == "MissingPage":
+            raise IOError("Page can't be retrieved")
+        return self.pages[word]
+
+
+class MockWikiPage:
+    def __init__(self, wikiWord, text):
+        self.wikiWord = wikiWord
+        self.text = text
+        self.textOperationLock = threading.RLock()
+        self.liveTextPlaceHold = object()
+        self.attrs = None
+        self.childRelations = None
+
+    def getLiveText(self):
+        if self.text is None:
+            raise IOError("Page file can't be read")
+        return self.text
+
+    def getFormatDetails(self):
+        return WikiPageFormatDetails(autoLinkMode="off")
+
+    def buildMatchTerms(self, headingTerms):
+        return []
+
+    def refreshAttributesFromRebuildResult(self, attrs, liveTextPlaceHold,
+            formatDetails):
+        self.attrs = attrs
+
+    def refreshMainDbCacheFromRebuildResult(self, todos, childRelations,
+            headingTerms, references, liveTextPlaceHold, formatDetails):
+        self.childRelations = childRelations
+
+
+class MockProgressHandler:
+    def __init__(self):
+        self.steps = []
+
+    def update(self, step, msg):
+        self.steps.append(step)
+        return True
+
+
+def test_rebuild_skips_failed_pages(app):
+    pages = {}
+    words = []
+    for i in range(6):
+        word = "Page%i" % i
+        pages[word] = MockWikiPage(word, "[color: red]\nLink to [Page%i]\n" %
+                ((i + 1) % 6))
+        words.append(word)
+
+    pages["UnreadablePage"] = MockWikiPage("UnreadablePage", None)
+    words[2:2] = ["UnreadablePage", "MissingPage"]
+
+    wikiDocument = MockWikiDocument(pages)
+    engine = RebuildEngine(wikiDocument, 1, "wikidPadParser.WikidPadParser",
+            PARSER_MODULE_FILE)
+    engine.CHUNK_SIZE = 2
+    progresshandler = MockProgressHandler()
+
+    assert engine.rebuildAttributesAndSyntax(words, progresshandler, 5) == \
+            5 + 2 * len(words)
+
+    assert progresshandler.steps == list(range(5, 5 + 2 * len(words)))
+    assert not engine.poolBroken
+    assert wikiDocument.wikiData.signatures == ["Page%i" % i for i in range(6)]
+    for i in range(6):
+        page = pages["Page%i" % i]
+        assert page.attrs == {"color": ["red"]}
+        assert [c[0] for c in page.childRelations] == \
+                ["Page%i" % ((i + 1) % 6)]
+
+    assert pages["UnreadablePage"].attrs is None
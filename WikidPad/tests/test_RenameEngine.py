@@ -0,0 +1,93 @@
+# coding: utf-8
+"""Test RenameEngine.
+
+* Test all renames are checked before renaming, names freed by a previous
+  rename may be reused but not be taken twice.
+* Test the simple text modification replaces all old names in one pass.
+* Test the previous page texts are written back if the transaction fails.
+
+"""
+import os
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import pytest
+
+from pwiki.Configuration import SnapshotConfiguration
+from pwiki.RenameEngine import RenameEngine
+from pwiki.WikiExceptions import WikiDataException
+
+
+class MockWikiDocument:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def getWikiConfig(self):
+        return SnapshotConfiguration({})
+
+    def getWikiDefaultWikiLanguage(self):
+        return "wikidpad_default_2_0"
+
+    def isDefinedWikiLinkTerm(self, word):
+        return word in self.pages
+
+    def getWikiPage(self, word):
+        return self.pages[word]
+
+
+class MockWikiPage:
+    def __init__(self, text):
+        self.text = text
+
+    def getLiveText(self):
+        return self.text
+
+    def getLiveTextNoTemplate(self):
+        return self.text
+
+    def replaceLiveText(self, text, fireEvent=True, updateMetaData=True):
+        self.text = text
+
+
+def test_check_renames(app):
+    engine = RenameEngine(MockWikiDocument({"PageA": None, "PageB": None}))
+
+    engine.checkRenames([("PageB", "PageC"), ("PageA", "PageB")])
+
+    with pytest.raises(WikiDataException):
+        engine.checkRenames([("PageA", "PageB")])
+    with pytest.raises(WikiDataException):
+        engine.checkRenames([("PageA", "PageC"), ("PageB", "PageC")])
+    with pytest.raises(WikiDataException):
+        engine.checkRenames([("PageA", "PageC"), ("PageC", "PageD"),
+                ("PageB", "PageD")])
+
+
+def test_replace_words(app):
+    pages = {"Main": MockWikiPage("Folder Folder/Sub Folders PageA\n"),
+            "Other": MockWikiPage("nothing\n")}
+    engine = RenameEngine(MockWikiDocument(pages))
+
+    modifiedPages = engine._replaceWords(["Main", "Other"],
+            {"Folder": "Dir", "Folder/Sub": "Dir/Sub", "PageA": "Folder"})
+
+    assert modifiedPages == [pages["Main"]]
+    assert pages["Main"].text == "Dir Dir/Sub Folders Folder\n"
+    assert pages["Other"].text == "nothing\n"
+
+
+def test_restore_texts(app):
+    pages = {"Main": MockWikiPage("Folder\n")}
+    engine = RenameEngine(MockWikiDocument(pages))
+
+    engine._replaceWords(["Main"], {"Folder": "Dir"})
+    engine._replaceWords(["Main"], {"Dir": "Other"})
+    assert pages["Main"].text == "Other\n"
+
+    # Transaction failed
+    engine._restoreTexts()
+    assert pages["Main"].text == "Folder\n"
@@ -0,0 +1,55 @@
+# coding: utf-8
+"""Test SearchAndReplace.
+
+* Test the content prefilter (literal substrings a page must contain)
+  derived from the search operation tree.
+
+"""
+import os
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki.SearchAndReplace import SearchReplaceOperation
+
+
+def prefilter(searchStr, **settings):
+    sarOp = SearchReplaceOperation()
+    sarOp.searchStr = searchStr
+    for key, value in settings.items():
+        setattr(sarOp, key, value)
+    return sarOp.getContentPrefilter()
+
+
+def test_literal():
+    assert prefilter("foo bar", wildCard="no", caseSensitive=True) == \
+            ("literal", "foo bar", True)
+    assert prefilter("foo.bar", wildCard="no") == \
+            ("literal", "foo.bar", False)
+
+
+def test_regex():
+    assert prefilter(r"\bfoo\b", caseSensitive=True) == \
+            ("literal", "foo", True)
+    assert prefilter(r"ab+c\d*x") == ("and", [("literal", "a", False),
+            ("literal", "b", False), ("literal", "c", False),
+            ("literal", "x", False)])
+    assert prefilter(r"foo|bar", caseSensitive=True) == ("or", [
+            ("literal", "foo", True), ("literal", "bar", True)])
+    assert prefilter(r"(?i)foo", caseSensitive=True) == \
+            ("literal", "foo", False)
+    assert prefilter(r"x*") is None
+    assert prefilter(r"foo|\w+") is None
+
+
+def test_boolean():
+    assert prefilter("foo and bar", booleanOp=True, caseSensitive=True) == \
+            ("and", [("literal", "foo", True), ("literal", "bar", True)])
+    assert prefilter("foo or bar", booleanOp=True, caseSensitive=True) == \
+            ("or", [("literal", "foo", True), ("literal", "bar", True)])
+    assert prefilter("foo and not bar", booleanOp=True,
+            caseSensitive=True) == ("literal", "foo", True)
+    assert prefilter("foo or not bar", booleanOp=True) is None
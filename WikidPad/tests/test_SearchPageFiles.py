@@ -0,0 +1,127 @@
+# coding: utf-8
+"""Test searching the page files of an original_sqlite (file per page) wiki.
+
+* Test that iterSearch() reads the page files ahead in threads, skips
+  excluded pages and pages whose file is missing.
+* Test that a canceled search stops and reads only a bounded number of
+  files ahead.
+
+"""
+import os
+import sys
+import threading
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import pytest
+
+from pwiki.StringOps import getFileSignatureBlock
+from pwiki.Utilities import FunctionThreadStop
+from pwiki.WikiExceptions import NotCurrentThreadException
+from pwiki.wikidata.original_sqlite.WikiData import WikiData
+
+
+PAGE_COUNT = 60
+
+
+class MockConfiguration:
+    def __init__(self, settings):
+        self.settings = settings
+
+    def get(self, section, option, default=None):
+        return self.settings.get((section, option), default)
+
+    def getint(self, section, option, default=None):
+        return int(self.get(section, option, default))
+
+    def getboolean(self, section, option, default=None):
+        return bool(self.get(section, option, default))
+
+    def set(self, section, option, value):
+        self.settings[(section, option)] = value
+
+
+class MockWikiDocument:
+    def __init__(self):
+        self.wikiConfig = MockConfiguration({})
+
+    def getWikiConfig(self):
+        return self.wikiConfig
+
+    def getFileSignatureBlock(self, filename):
+        return getFileSignatureBlock(filename, 0)
+
+
+class MockSearchOperation:
+    """
+    Finds pages containing  searchStr.
+    """
+    def __init__(self, searchStr):
+        self.searchStr = searchStr
+        self.testedWords = []
+
+    def isTextNeededForTest(self):
+        return True
+
+    def testWikiPage(self, word, text):
+        self.testedWords.append(word)
+        return self.searchStr in text
+
+
+@pytest.fixture
+def wikiData(app, tmpdir, monkeypatch):
+    wikiData = WikiData(MockWikiDocument(), str(tmpdir), str(tmpdir))
+    wikiData.connect()
+    for i in range(PAGE_COUNT):
+        wikiData.setContent("Page%i" % i, "Hay\nneedle\n" if i % 3 == 0
+                else "Hay\n")
+    wikiData.commit()
+
+    # Count the page files read by the threads
+    wikiData.readWords = []
+    readLock = threading.Lock()
+    readPageFile = wikiData._readPageFileForSearch
+
+    def readPageFileForSearch(word, filePath):
+        with readLock:
+            wikiData.readWords.append(word)
+        return readPageFile(word, filePath)
+
+    monkeypatch.setattr(wikiData, "_readPageFileForSearch",
+            readPageFileForSearch)
+
+    yield wikiData
+    wikiData.close()
+
+
+def test_search(wikiData):
+    os.unlink(wikiData.getWikiWordFileName("Page3"))
+    sarOp = MockSearchOperation("needle")
+
+    found = list(wikiData.iterSearch(sarOp, {"Page6"}))
+
+    assert sorted(found) == sorted("Page%i" % i
+            for i in range(0, PAGE_COUNT, 3) if i not in (3, 6))
+    assert len(found) == len(set(found))
+    assert "Page6" not in wikiData.readWords
+    assert "Page3" in wikiData.readWords
+    assert "Page3" not in sarOp.testedWords
+    assert len(sarOp.testedWords) == PAGE_COUNT - 2
+
+
+def test_canceled_search(wikiData):
+    sarOp = MockSearchOperation("Hay")
+    found = []
+    threadstop = FunctionThreadStop(lambda: len(found) == 0)
+
+    with pytest.raises(NotCurrentThreadException):
+        for word in wikiData.iterSearch(sarOp, set(), threadstop):
+            found.append(word)
+
+    assert found == sarOp.testedWords
+    assert len(found) == 1
+    # Default worker count is 4, so at most 16 files are read ahead
+    assert len(wikiData.readWords) <= 16
@@ -0,0 +1,116 @@
+# coding: utf-8
+"""Test sqlite3api.
+
+* Test both drivers return the same types and values, also for bytes
+  parameters which are bound as text and for Binary.
+* Test user-defined functions with the context/values interface.
+* Test transactions are started by modifying statements and errors are
+  converted to the exceptions of sqlite3api.
+* Test executemany() and the streaming ConnectWrapBase.execSqlQueryIter().
+
+"""
+import os
+import sys
+
+import pytest
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import pwiki.sqlite3api as sqlite
+from pwiki.wikidata.original_sqlite import DbStructure
+
+
+@pytest.fixture(params=sqlite.getAvailableDrivers())
+def conn(request, tmpdir):
+    conn = sqlite.connect(str(tmpdir.join("test.sli")), driver=request.param)
+    assert conn.driver == request.param
+    # as done by DbStructure.registerUtf8Support()
+    conn.setBindFctFinder(DbStructure.utf8_bind_fctfinder)
+    conn.setColumnFctFinder(DbStructure.utf8_column_fctfinder)
+    cursor = conn.cursor()
+    cursor.execute("create table words (word text, data blob, num integer)")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_types(conn):
+    cursor = conn.cursor()
+    cursor.execute("insert into words (word, data, num) values (?, ?, ?)",
+            ("Wörd", sqlite.Binary(b"\x00\xff"), 5))
+    assert cursor.rowcount == 1
+    assert cursor.lastrowid == 1
+    cursor.execute("insert into words (word, data, num) values (?, ?, ?)",
+            (b"Other", sqlite.Binary(b"ab"), 2 ** 40))
+
+    cursor.execute("select word, data, num, typeof(word) from words "
+            "order by num", typeDetect=sqlite.TYPEDET_FIRST)
+    assert cursor.fetchall() == [("Wörd", b"\x00\xff", 5, "text"),
+            ("Other", b"ab", 2 ** 40, "text")]
+
+    cursor.execute("select num from words where word = ?", (b"Other",))
+    assert cursor.fetchone() == (2 ** 40,)
+    assert cursor.fetchone() is None
+
+
+def sqlite_lowerSuffix(context, values):
+    word = values[0].value_text().decode("utf-8").lower()
+    context.result_text((word + values[1].value_text().decode("utf-8"))
+            .encode("utf-8"))
+
+
+def test_create_function(conn):
+    conn.createFunction("lowerSuffix", 2, sqlite_lowerSuffix)
+    cursor = conn.cursor()
+    cursor.execute("select lowerSuffix(?, ?), lowerSuffix(?, 1)",
+            ("ÄB", "c", "X"))
+    assert cursor.fetchone() == ("äbc", "x1")
+
+
+def test_transactions(conn):
+    cursor = conn.cursor()
+    cursor.execute("insert into words (word) values ('a')")
+    conn.rollback()
+    cursor.execute("select count(*) from words")
+    assert cursor.fetchone() == (0,)
+
+    cursor.execute("insert into words (word) values ('a')")
+    conn.commit()
+    conn.rollback()
+    cursor.execute("select count(*) from words")
+    assert cursor.fetchone() == (1,)
+
+    with pytest.raises(sqlite.Error):
+        cursor.execute("select * from missingtable")
+
+
+def test_executemany(conn):
+    cursor = conn.cursor()
+    cursor.executemany("insert into words (word, num) values (?, ?)",
+            [("a", 1), (b"b", 2), ("c", 3)])
+    assert cursor.rowcount == 3
+    conn.rollback()
+    cursor.execute("select count(*) from words")
+    assert cursor.fetchone() == (0,)
+
+    cursor.executemany("insert into words (word, num) values (?, ?)",
+            (("w%i" % i, i) for i in range(1000)))
+    conn.commit()
+    cursor.execute("select word from words where num = 999")
+    assert cursor.fetchall() == [("w999",)]
+
+
+def test_query_iter(conn):
+    connWrap = DbStructure.ConnectWrapSyncCommit(conn)
+    connWrap.executemany("insert into words (word, num) values (?, ?)",
+            (("w%i" % i, i) for i in range(25)))
+
+    rows = connWrap.execSqlQueryIter("select word, num from words "
+            "order by num", fetchSize=10)
+    assert next(rows) == ("w0", 0)
+    # Other statements don't disturb the iteration
+    assert connWrap.execSqlQuerySingleItem("select count(*) from words") == 25
+    assert [num for word, num in rows] == list(range(1, 25))
@@ -0,0 +1,79 @@
+# coding: utf-8
+"""Test StyleRuns.
+
+* Test StyleCollector creates the same style bytes as one byte per
+  character, also for characters with multiple bytes in UTF-8 and
+  overlapping styles.
+* Test orStyleRanges sets the bits like a bytewise or.
+* Test getDiffRange finds the range of differing bytes.
+
+"""
+import os
+import random
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki.StyleRuns import StyleCollector, orStyleRanges, getDiffRange
+
+
+def bytelenSct(us):
+    return len(us.encode("utf-8"))
+
+
+def test_collector():
+    text = "abäc d€ efg"
+    collector = StyleCollector(0, text, bytelenSct)
+    collector.bindStyle(1, 2, 3)
+    collector.bindStyle(3, 1, 3)
+    collector.bindStyle(5, 4, 5)
+    # Overlaps previous style
+    collector.bindStyle(7, 3, 6)
+
+    expected = b"\x00" + b"\x03" * 4 + b"\x00" + b"\x05" * 4 + \
+            b"\x06" * 3 + b"\x00"
+    assert collector.value() == expected
+    assert collector.getStyleRanges() == [(1, 5, 3), (6, 10, 5), (10, 13, 6)]
+    # Result stays the same
+    assert collector.value() == expected
+
+
+def test_collector_start_pos():
+    collector = StyleCollector(1, "äbcdef", bytelenSct, startCharPos=2)
+    collector.bindStyle(3, 2, 4)
+    assert collector.value() == b"\x01\x04\x04\x01"
+
+
+def test_or_style_ranges():
+    rnd = random.Random(1)
+    stylebytes = bytes(rnd.randrange(32) for i in range(1000))
+    spellbytes = bytearray(1000)
+    ranges = []
+    for start in range(5, 1000, 97):
+        end = start + rnd.randrange(1, 20)
+        spellbytes[start:end] = b"\x80" * (end - start)
+        ranges.append((start, end, 0x80))
+
+    expected = bytes(a | b for a, b in zip(stylebytes, spellbytes))
+    assert orStyleRanges(stylebytes, ranges) == expected
+    assert orStyleRanges(stylebytes, []) == stylebytes
+
+
+def test_diff_range():
+    a = bytes(range(100))
+    assert getDiffRange(a, a) is None
+    assert getDiffRange(b"", b"") is None
+
+    b = bytearray(a)
+    b[10] = 255
+    assert getDiffRange(a, bytes(b)) == (10, 11)
+
+    b[57] = 255
+    assert getDiffRange(a, bytes(b)) == (10, 58)
+
+    assert getDiffRange(b"\x01", b"\x02") == (0, 1)
+    assert getDiffRange(b"\x01\x00", b"\x02\x00") == (0, 1)
+    assert getDiffRange(b"\x00\x01", b"\x00\x02") == (1, 2)
@@ -0,0 +1,99 @@
+# coding: utf-8
+"""Test Utilities.
+
+* Test MultiThreadExecutor: jobs with common keys are serialized, other
+  jobs run concurrently, deque priorities are honored.
+
+"""
+import os
+import sys
+import threading
+import time
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki.Utilities import MultiThreadExecutor
+
+
+class Executor(MultiThreadExecutor):
+    # No wx application running which could receive events
+    def _fireStateChange(self, running=None):
+        pass
+
+
+def jobKeys(idx, fct, args):
+    return args[:1]
+
+
+def test_keys_serialize_jobs():
+    executor = Executor(2, workerCount=4, jobKeysFunction=jobKeys)
+    lock = threading.Lock()
+    running = {}
+    maxRunning = {}
+    order = []
+
+    def job(key, number):
+        with lock:
+            running[key] = running.get(key, 0) + 1
+            maxRunning[key] = max(maxRunning.get(key, 0), running[key])
+            order.append((key, number))
+        time.sleep(0.01)
+        with lock:
+            running[key] -= 1
+
+    executor.prepare()
+    for number in range(5):
+        for key in ("a", "b", "c"):
+            executor.executeAsync(1, job, key, number)
+    executor.start()
+    executor.end()
+
+    assert maxRunning == {"a": 1, "b": 1, "c": 1}
+    for key in ("a", "b", "c"):
+        assert [n for k, n in order if k == key] == list(range(5))
+    assert executor.getThroughput() == 15 / executor.THROUGHPUT_SPAN
+
+
+def test_parallel_and_priority():
+    executor = Executor(2, workerCount=2, jobKeysFunction=jobKeys)
+    barrier = threading.Barrier(2, timeout=10)
+    order = []
+
+    def job(key):
+        order.append(key)
+        if key in ("x", "y"):
+            # Deadlocks (and times out) if jobs don't run concurrently
+            barrier.wait()
+
+    executor.prepare()
+    executor.executeAsync(1, job, "low")
+    executor.executeAsync(0, job, "x")
+    executor.executeAsync(0, job, "y")
+    executor.start()
+    executor.end()
+
+    assert not barrier.broken
+    assert set(order[:2]) == {"x", "y"}
+    assert order[2] == "low"
+
+
+def test_pause_and_hard_end():
+    executor = Executor(1, workerCount=3)
+    done = []
+
+    executor.start()
+    assert executor.pause(wait=True)
+    assert executor.threads == []
+
+    executor.executeAsync(0, done.append, 1)
+    assert done == []
+    executor.start()
+    assert executor.execute(0, lambda: 2) == 2
+    assert done == [1]
+
+    executor.end(hardEnd=True)
+    assert executor.threads == []
+    assert not executor.isValidThread()
@@ -0,0 +1,142 @@
+# coding: utf-8
+"""Test WikiDataSynchronizedProxy in "readers" access mode.
+
+* Test that a read-only function runs while another thread holds the lock
+  and sees only committed data.
+* Test that a read falls back to the locked main connection if the read
+  connection fails.
+
+"""
+import os
+import sys
+import threading
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import pytest
+
+from pwiki.WikiExceptions import DbReadAccessError
+from pwiki.wikidata.compact_sqlite.WikiData import WikiData
+from pwiki.WikiDocument import WikiDataSynchronizedProxy
+
+
+class MockConfiguration:
+    def __init__(self, settings):
+        self.settings = settings
+
+    def get(self, section, option, default=None):
+        return self.settings.get((section, option), default)
+
+    def set(self, section, option, value):
+        self.settings[(section, option)] = value
+
+
+class MockWikiDocument:
+    def __init__(self):
+        self.wikiConfig = MockConfiguration(
+                {("wiki_db", "db_accessMode"): "readers"})
+
+    def getWikiConfig(self):
+        return self.wikiConfig
+
+
+class WriterThread(threading.Thread):
+    """
+    Holds the proxy lock and writes page "NewPage" but commits only when
+    told to.
+    """
+    def __init__(self, proxy):
+        threading.Thread.__init__(self)
+        self.proxy = proxy
+        self.written = threading.Event()
+        self.commitNow = threading.Event()
+        self.committed = threading.Event()
+        self.releaseNow = threading.Event()
+
+    def run(self):
+        lock = self.proxy.proxyAccessLock
+        lock.acquire()
+        try:
+            self.proxy.setContent("NewPage", "new content")
+            self.written.set()
+            self.commitNow.wait(10)
+            self.proxy.commit()
+            self.committed.set()
+            self.releaseNow.wait(10)
+        finally:
+            lock.release()
+
+
+@pytest.fixture
+def proxy(app, tmpdir):
+    wikiData = WikiData(MockWikiDocument(), str(tmpdir), str(tmpdir))
+    wikiData.connect()
+    assert wikiData.getAccessMode() == "readers"
+    wikiData.setContent("OldPage", "old content")
+    wikiData.commit()
+
+    proxy = WikiDataSynchronizedProxy(wikiData)
+    yield proxy
+    proxy.close()
+
+
+def test_read_while_locked(proxy):
+    writer = WriterThread(proxy)
+    writer.start()
+    try:
+        assert writer.written.wait(10)
+
+        # Lock is held by writer, read doesn't wait but doesn't see
+        # uncommitted page
+        assert proxy.isDefinedWikiPageName("OldPage")
+        assert not proxy.isDefinedWikiPageName("NewPage")
+
+        writer.commitNow.set()
+        assert writer.committed.wait(10)
+
+        # Lock is still held by writer
+        assert proxy.isDefinedWikiPageName("NewPage")
+        assert proxy.getContent("NewPage") == "new content"
+    finally:
+        writer.commitNow.set()
+        writer.releaseNow.set()
+        writer.join()
+
+    statistics = proxy.getAccessStatistics()
+    assert statistics["access mode"] == "readers"
+    assert statistics["read connection calls"] == 4
+    assert statistics["read connection fallbacks"] == 0
+
+
+def test_fallback_to_lock(proxy, monkeypatch):
+    def callWithReadConnection(function, *args, **kwargs):
+        raise DbReadAccessError(Exception("database is locked"))
+
+    monkeypatch.setattr(proxy.wikiData, "callWithReadConnection",
+            callWithReadConnection)
+
+    writer = WriterThread(proxy)
+    writer.start()
+    try:
+        assert writer.written.wait(10)
+        writer.commitNow.set()
+        assert writer.committed.wait(10)
+
+        # Read waits for the lock now
+        result = []
+        reader = threading.Thread(target=lambda: result.append(
+                proxy.isDefinedWikiPageName("NewPage")))
+        reader.start()
+        reader.join(0.2)
+        assert reader.is_alive()
+    finally:
+        writer.commitNow.set()
+        writer.releaseNow.set()
+        writer.join()
+
+    reader.join(10)
+    assert result == [True]
+    assert proxy.getAccessStatistics()["read connection fallbacks"] == 1
@@ -0,0 +1,103 @@
+# coding: utf-8
+"""Test WikiFileWatcher.
+
+* Test scanning of wiki page files and that the polling and the inotify
+  watcher report added, changed and removed page files.
+
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+from pwiki.WikiFileWatcher import scanWikiPageFiles, \
+        PollingWikiFileWatcher, InotifyWikiFileWatcher, LinuxHacks
+
+
+def writeFile(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+class ChangeCollector:
+    def __init__(self):
+        self.changed = set()
+        self.event = threading.Event()
+
+    def __call__(self, fileNames):
+        self.changed.update(fileNames)
+        self.event.set()
+
+    def waitFor(self, fileNames, timeout=5.0):
+        end = time.time() + timeout
+        while not fileNames <= self.changed and time.time() < end:
+            self.event.wait(0.05)
+            self.event.clear()
+        return self.changed
+
+
+def test_scan(tmp_path):
+    writeFile(str(tmp_path / "PageOne.wiki"), "one")
+    writeFile(str(tmp_path / "other.txt"), "other")
+    os.mkdir(str(tmp_path / "Dir.wiki"))
+
+    result = scanWikiPageFiles(str(tmp_path), ".wiki")
+    assert list(result) == ["PageOne.wiki"]
+    assert result["PageOne.wiki"].st_size == 3
+
+    result = scanWikiPageFiles(str(tmp_path), ".wiki",
+            ["PageOne.wiki", "Missing.wiki", "Dir.wiki"])
+    assert list(result) == ["PageOne.wiki"]
+
+
+def runWatcher(watcher, collector, tmp_path):
+    watcher.start()
+    try:
+        # Give the watcher time to take its first snapshot
+        time.sleep(0.2)
+        writeFile(str(tmp_path / "New.wiki"), "new")
+        writeFile(str(tmp_path / "Changed.wiki"), "changed text")
+        os.unlink(str(tmp_path / "Removed.wiki"))
+        writeFile(str(tmp_path / "ignored.tmp"), "ignored")
+
+        expected = {"New.wiki", "Changed.wiki", "Removed.wiki"}
+        assert collector.waitFor(expected) == expected
+    finally:
+        watcher.stop()
+
+    assert watcher.thread is None
+
+
+def prepareFiles(tmp_path):
+    writeFile(str(tmp_path / "Changed.wiki"), "text")
+    writeFile(str(tmp_path / "Removed.wiki"), "text")
+    writeFile(str(tmp_path / "Unchanged.wiki"), "text")
+
+
+def test_polling_watcher(tmp_path):
+    prepareFiles(tmp_path)
+    collector = ChangeCollector()
+    watcher = PollingWikiFileWatcher(str(tmp_path), ".wiki", collector,
+            interval=0.05)
+    runWatcher(watcher, collector, tmp_path)
+
+
+def test_inotify_watcher(tmp_path):
+    if LinuxHacks is None:
+        pytest.skip("inotify not available")
+
+    prepareFiles(tmp_path)
+    collector = ChangeCollector()
+    watcher = InotifyWikiFileWatcher(str(tmp_path), ".wiki", collector)
+    if not watcher.isValid():
+        pytest.skip("inotify not available")
+
+    runWatcher(watcher, collector, tmp_path)
+    assert watcher.fd is None
@@ -42,6 +42,8 @@ from tests.helper import (
     TESTS_DIR, get_text, parse, MockWikiDocument, getApp,
     WikiWordNotFoundException, NodeFinder, ast_eq)
 
+from pwiki.Utilities import DUMBTHREADSTOP
+
 from wikidPadParser.WikidPadParser import count_max_number_of_consecutive_quotes
 
 
@@ -1169,3 +1171,66 @@ def test_generate_text_quotes():
         result = langHelper.generate_text(ast, page)
         result_fragment = result.strip()
         assert result == text_out, err_msg()
+
+
+def test_parse_incremental():
+    """
+    Reparse only the changed part of a page and compare with full parse.
+    """
+    text = """+ Heading 1
+
+This is a sentence with a WikiWord.
+
+    * bullet
+    * another bullet
+
+*bold text* and [a link]
+
++ Heading 2
+
+Last paragraph.
+"""
+    wikidoc = MockWikiDocument({'TestPage': text}, LANGUAGE_NAME)
+    page = wikidoc.getWikiPage('TestPage')
+    format_details = page.getFormatDetails()
+    parser = getApp().createWikiParser(LANGUAGE_NAME)
+    base_ast = parser.parse(LANGUAGE_NAME, text, format_details,
+                            DUMBTHREADSTOP)
+
+    def parse_incremental(new_text):
+        return parser.parseIncremental(LANGUAGE_NAME, new_text,
+                                       format_details, DUMBTHREADSTOP,
+                                       text, base_ast)
+
+    # Change inside a paragraph, the paragraphs after the (indented) list
+    # are reused
+    new_text = text.replace('a sentence', 'another sentence')
+    result = parse_incremental(new_text)
+    assert result is not None
+    ast, (start, base_end, end) = result
+    assert start == text.index('This is')
+    assert base_end == text.index('*bold text*')
+    assert end - base_end == len('nother')
+    assert ast.getString() == new_text
+    assert ast_eq(ast, parse(new_text, 'TestPage', LANGUAGE_NAME))
+
+    # New WikiWord in list
+    new_text = text.replace('another bullet', 'another BulletPoint')
+    ast, _ = parse_incremental(new_text)
+    assert NodeFinder(ast).count('wikiWord') == \
+        NodeFinder(base_ast).count('wikiWord') + 1
+    assert ast_eq(ast, parse(new_text, 'TestPage', LANGUAGE_NAME))
+
+    # Change at the end of the text
+    new_text = text + 'More text'
+    ast, (start, base_end, end) = parse_incremental(new_text)
+    assert (base_end, end) == (len(text), len(new_text))
+    assert ast_eq(ast, parse(new_text, 'TestPage', LANGUAGE_NAME))
+
+    # A new bold start may change the text up to the next '*'
+    new_text = text.replace('Last', '*Last')
+    assert parse_incremental(new_text) is None
+
+    # A new table may span multiple paragraphs
+    new_text = text.replace('This is', '<<|\nThis is')
+    assert parse_incremental(new_text) is None
@@ -0,0 +1,46 @@
+# coding: utf-8
+"""Test WorkerSnapshot.
+
+* Test importing a module of an artificial package from its file and
+  that nothing remains in sys.modules if the import fails.
+
+"""
+import os
+import sys
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import pytest
+
+from pwiki.WorkerSnapshot import importModuleFromFile
+
+
+def test_import_module_from_file(tmpdir):
+    pluginDir = tmpdir.mkdir("plugins")
+    moduleFile = pluginDir.join("Good.py")
+    moduleFile.write("VALUE = 42\n")
+
+    try:
+        module = importModuleFromFile("testplugins.Good", str(moduleFile))
+        assert module.VALUE == 42
+        assert sys.modules["testplugins"].__path__ == [str(pluginDir)]
+        assert importModuleFromFile("testplugins.Good",
+                str(moduleFile)) is module
+    finally:
+        sys.modules.pop("testplugins.Good", None)
+        sys.modules.pop("testplugins", None)
+
+
+def test_failed_import_removed(tmpdir):
+    moduleFile = tmpdir.mkdir("plugins").join("Broken.py")
+    moduleFile.write("VALUE = 1\nraise ImportError('broken')\n")
+
+    for i in range(2):
+        with pytest.raises(ImportError):
+            importModuleFromFile("testbroken.Broken", str(moduleFile))
+
+        assert "testbroken.Broken" not in sys.modules
+        assert "testbroken" not in sys.modules
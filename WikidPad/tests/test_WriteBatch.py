@@ -0,0 +1,160 @@
+# coding: utf-8
+"""Test WriteBatch.
+
+* Test that meta-data writes of many pages are committed together and that
+  pages whose live text changed before the commit are marked dirty again.
+* Test that pages are written to the whoosh search index in batches and
+  only pages with unchanged live text are marked as indexed.
+
+"""
+import os
+import sys
+import threading
+
+# run from WikidPad directory
+wikidpad_dir = os.path.abspath('.')
+sys.path.append(wikidpad_dir)
+sys.path.append(os.path.join(wikidpad_dir, 'lib'))
+
+import Consts
+import whoosh.index
+
+from pwiki.WikiDocument import WikiDocument as RealWikiDocument
+from pwiki.WriteBatch import MetaDataWriteBatch, SearchIndexWriteBatch
+
+
+class WikiData:
+    def __init__(self):
+        self.commitCount = 0
+        self.states = {}
+
+    def setMetaDataState(self, word, state):
+        self.states[word] = state
+
+    def commit(self):
+        self.commitCount += 1
+
+
+class UpdateExecutor:
+    dequeCount = 4
+
+    def __init__(self):
+        self.jobs = []
+
+    def executeAsync(self, idx, fct, *args, **kwargs):
+        self.jobs.append((idx, fct))
+
+
+class WikiDocument:
+    def __init__(self, searchIndex=None):
+        self.wikiData = WikiData()
+        self.updateExecutor = UpdateExecutor()
+        self.searchIndex = searchIndex
+
+    def getWikiData(self):
+        return self.wikiData
+
+    def getUpdateExecutor(self):
+        return self.updateExecutor
+
+    def getSearchIndex(self):
+        return self.searchIndex
+
+
+class WikiPage:
+    def __init__(self, word):
+        self.word = word
+        self.textOperationLock = threading.RLock()
+        self.liveTextPlaceHold = object()
+        self.updateCount = 0
+
+    def getWikiWord(self):
+        return self.word
+
+    def getUnifiedPageName(self):
+        return "wikipage/" + self.word
+
+    def isInvalid(self):
+        return False
+
+    def initiateUpdate(self):
+        self.updateCount += 1
+
+
+def test_count_limit():
+    doc = WikiDocument()
+    batch = MetaDataWriteBatch(doc, maxPages=3, maxDelay=1000)
+    pages = [WikiPage("Page%i" % i) for i in range(7)]
+    for page in pages:
+        batch.addPage(page, page.liveTextPlaceHold)
+
+    assert doc.wikiData.commitCount == 2
+    assert batch.getPendingCount() == 1
+    # Rest is committed by a job in the lowest priority queue
+    assert [idx for idx, fct in doc.updateExecutor.jobs] == [3, 3, 3]
+    doc.updateExecutor.jobs[-1][1]()
+    assert doc.wikiData.commitCount == 3
+    assert batch.getPendingCount() == 0
+    assert doc.wikiData.states == {}
+
+
+def test_time_limit():
+    doc = WikiDocument()
+    batch = MetaDataWriteBatch(doc, maxPages=100, maxDelay=0)
+    page = WikiPage("Page")
+    batch.addPage(page, page.liveTextPlaceHold)
+    assert doc.wikiData.commitCount == 1
+
+
+def test_changed_live_text():
+    doc = WikiDocument()
+    batch = MetaDataWriteBatch(doc, maxPages=100, maxDelay=1000)
+    changed = WikiPage("Changed")
+    unchanged = WikiPage("Unchanged")
+    batch.addPage(changed, changed.liveTextPlaceHold)
+    batch.addPage(unchanged, unchanged.liveTextPlaceHold)
+
+    changed.liveTextPlaceHold = object()
+    # Second update with new text doesn't hide the outdated first one
+    batch.addPage(changed, changed.liveTextPlaceHold)
+    batch.flush()
+
+    assert doc.wikiData.commitCount == 1
+    assert doc.wikiData.states == {
+            "Changed": Consts.WIKIWORDMETADATA_STATE_DIRTY}
+    assert changed.updateCount == 1
+    assert unchanged.updateCount == 0
+
+
+def test_search_index(tmp_path):
+    index = whoosh.index.create_in(str(tmp_path),
+            RealWikiDocument.getWhooshIndexSchema())
+    doc = WikiDocument(index)
+    batch = SearchIndexWriteBatch(doc, maxPages=100, maxDelay=1000)
+
+    def search(word):
+        with index.searcher() as s:
+            return sorted(rd["unifName"] for rd in s.documents(content=word))
+
+    pages = [WikiPage("Page%i" % i) for i in range(3)]
+    for page in pages:
+        batch.addPage(page, page.liveTextPlaceHold, 0, "apple")
+    batch.flush()
+    assert index.doc_count() == 3
+    assert set(doc.wikiData.states.values()) == \
+            {Consts.WIKIWORDMETADATA_STATE_INDEXED}
+
+    doc.wikiData.states = {}
+    pages[0].liveTextPlaceHold = object()
+    batch.addPage(pages[0], object(), 0, "banana")
+    batch.addPage(pages[1], pages[1].liveTextPlaceHold, 0, "banana")
+    batch.removePage(pages[2])
+    assert search("banana") == []
+    batch.flush()
+
+    # Outdated text of Page0 is neither indexed nor marked as indexed
+    index = index.refresh()
+    assert search("banana") == ["wikipage/Page1"]
+    assert search("apple") == ["wikipage/Page0"]
+    assert doc.wikiData.states == {
+            "Page1": Consts.WIKIWORDMETADATA_STATE_INDEXED}